@@ -3,6 +3,8 @@ ASGI config for IdeaFlow project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Run with uvicorn, e.g. ``uvicorn IdeaFlow.asgi:application --workers 4``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -12,5 +14,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'IdeaFlow.settings')
+# Route the IO-bound endpoints to their async views (settings.ASYNC_VIEWS)
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
@@ -0,0 +1,80 @@
+"""
+Async Views - پایه viewهای async برای اجرای ASGI (uvicorn)
+DRF فقط handlerهای sync دارد؛ AsyncAPIView همان مراحل dispatch در DRF را اجرا می‌کند ولی
+handler را await می‌کند. مراحلی که به دیتابیس یا کش می‌روند (احراز هویت JWT، دسترسی، throttle)
+با run_sync در thread اجرا می‌شوند و event loop فقط منتظر I/O کند (LLM، SMTP) می‌ماند.
+"""
+
+import asyncio
+import weakref
+
+from asgiref.sync import sync_to_async
+from decouple import config
+from django.db import close_old_connections
+from rest_framework.views import APIView
+
+# Sync (ORM) phases running at once per ASGI process. Under ASGI every request context opens
+# its own database connection, so hundreds of in-flight LLM calls would otherwise mean
+# hundreds of Postgres connections.
+ASYNC_DB_CONCURRENCY = config('ASYNC_DB_CONCURRENCY', default=16, cast=int)
+
+_db_slots = weakref.WeakKeyDictionary()
+
+
+def _slots():
+    loop = asyncio.get_running_loop()
+    slots = _db_slots.get(loop)
+    if slots is None:
+        slots = _db_slots[loop] = asyncio.Semaphore(ASYNC_DB_CONCURRENCY)
+    return slots
+
+
+def _call_and_release(func, args, kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # The next phase may come seconds later (after the LLM call): give the connection back
+        close_old_connections()
+
+
+async def run_sync(func, *args, **kwargs):
+    """
+    اجرای یک مرحله sync (ORM، کش) از داخل کد async
+    حداکثر ASYNC_DB_CONCURRENCY مرحله همزمان و بستن اتصال دیتابیس در پایان هر مرحله
+    """
+    async with _slots():
+        return await sync_to_async(_call_and_release)(func, args, kwargs)
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView با متدهای async (async def post ...)
+    همه handlerهای کلاس باید async باشند (شرط Django برای view_is_async)
+    ORM داخل handler فقط از طریق run_sync
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await run_sync(self.initial, request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            # http_method_not_allowed is sync but only ever raises
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = await run_sync(self.handle_exception, exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def options(self, request, *args, **kwargs):
+        return super().options(request, *args, **kwargs)
@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third-party apps
     'rest_framework',
@@ -54,6 +55,11 @@ INSTALLED_APPS = [
     'subscriptions',
 ]
 
+# Benchmark suite (run_benchmarks): development only unless BENCHMARKS=1
+BENCHMARKS = config('BENCHMARKS', default=DEBUG, cast=bool)
+if BENCHMARKS:
+    INSTALLED_APPS.append('benchmarks')
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Add Whitenoise
@@ -87,6 +93,11 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'IdeaFlow.wsgi.application'
 
+# ASGI deployment (uvicorn, IdeaFlow/asgi.py turns this on): the LLM chat and password reset
+# endpoints are routed to async views, so a waiting LLM/SMTP call holds no worker or thread.
+# Under WSGI async views would only add an event loop per request, so they stay off.
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
@@ -99,10 +110,47 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST'),
         'PORT': config('DB_PORT'),
+        'OPTIONS': {
+            # Title typo search (ideas/search.py) filters with the index-backed %> operator,
+            # whose threshold is this session setting (PostgreSQL's default is 0.6)
+            'options': f"-c pg_trgm.word_similarity_threshold={config('SEARCH_TRIGRAM_THRESHOLD', default=0.3, cast=float)}",
+        },
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Throttle counters and the plan cache must be shared by every gunicorn worker and node,
+# so production sets REDIS_URL; without it each process gets its own in-memory store
+
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'ideaflow',
+        },
+        'throttle': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'ideaflow-throttle',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'throttle': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'throttle',
+        },
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -174,6 +222,18 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # Only views with a throttle_scope are limited (see subscriptions/throttles.py)
+    'DEFAULT_THROTTLE_CLASSES': [
+        'subscriptions.throttles.PlanRateThrottle',
+    ],
+    # Per-endpoint caps, applied on top of the plan's per-minute budget for the scope's group
+    'DEFAULT_THROTTLE_RATES': {
+        'ai_score': config('THROTTLE_AI_SCORE', default='10/min'),
+        'ai_chat': config('THROTTLE_AI_CHAT', default='30/min'),
+        'star': config('THROTTLE_STAR', default='30/min'),
+        'comment': config('THROTTLE_COMMENT', default='10/min'),
+        'invest': config('THROTTLE_INVEST', default='10/hour'),
+    },
 }
 
 
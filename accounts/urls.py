@@ -2,6 +2,7 @@
 Accounts URLs - مسیرهای کاربری
 """
 
+from django.conf import settings
 from django.urls import path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
@@ -20,7 +21,8 @@ urlpatterns = [
     path('google/', views.GoogleAuthView.as_view(), name='google_auth'),
     
     # Password Reset
-    path('password-reset/', views.PasswordResetRequestView.as_view(), name='password_reset'),
+    path('password-reset/', (views.PasswordResetRequestAsyncView if settings.ASYNC_VIEWS
+                             else views.PasswordResetRequestView).as_view(), name='password_reset'),
     path('password-reset/confirm/', views.PasswordResetConfirmView.as_view(), name='password_reset_confirm'),
     
     # Profile
@@ -2,6 +2,7 @@
 Accounts Views - ویوهای کاربری
 """
 
+from asgiref.sync import sync_to_async
 from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -16,6 +17,8 @@ from django.conf import settings
 import secrets
 import string
 
+from IdeaFlow.async_views import AsyncAPIView, run_sync
+
 from .serializers import (
     UserSerializer,
     UserRegistrationSerializer,
@@ -175,34 +178,28 @@ class GoogleAuthView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
 
 
-class PasswordResetRequestView(APIView):
+class PasswordResetMixin:
     """
-    درخواست بازیابی رمزعبور
+    ساخت لینک، ارسال ایمیل و پاسخ بازیابی رمزعبور (مشترک بین نسخه sync و async)
     """
-    permission_classes = [AllowAny]
     
-    def post(self, request):
-        serializer = PasswordResetRequestSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        
-        email = serializer.validated_data['email']
+    def _reset_link(self, user):
+        """خروجی: (uid, token, reset_url)"""
+        # Generate token
+        token = default_token_generator.make_token(user)
+        uid = urlsafe_base64_encode(force_bytes(user.pk))
         
+        # Build reset URL (frontend URL)
+        frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:5173')
+        reset_url = f"{frontend_url}/reset-password/{uid}/{token}"
+        return uid, token, reset_url
+    
+    def _send_reset_email(self, email, reset_url):
+        # Send email (MVP: just print to console if email not configured)
         try:
-            user = User.objects.get(email=email)
-            
-            # Generate token
-            token = default_token_generator.make_token(user)
-            uid = urlsafe_base64_encode(force_bytes(user.pk))
-            
-            # Build reset URL (frontend URL)
-            frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:5173')
-            reset_url = f"{frontend_url}/reset-password/{uid}/{token}"
-            
-            # Send email (MVP: just print to console if email not configured)
-            try:
-                send_mail(
-                    subject='بازیابی رمزعبور - IdeaFlow',
-                    message=f'''سلام!
+            send_mail(
+                subject='بازیابی رمزعبور - IdeaFlow',
+                message=f'''سلام!
 
 شما درخواست بازیابی رمزعبور کرده‌اید.
 
@@ -216,29 +213,73 @@ class PasswordResetRequestView(APIView):
 با تشکر،
 تیم IdeaFlow
 ''',
-                    from_email=settings.DEFAULT_FROM_EMAIL if hasattr(settings, 'DEFAULT_FROM_EMAIL') else 'noreply@ideaflow.ir',
-                    recipient_list=[email],
-                    fail_silently=True,
-                )
-            except Exception:
-                # Email not configured - just log
-                print(f"Password reset link: {reset_url}")
-            
-            return Response({
-                'message': 'اگر این ایمیل در سیستم وجود داشته باشد، لینک بازیابی ارسال می‌شود.',
-                # For MVP/development, return the reset info
-                'debug': {
-                    'uid': uid,
-                    'token': token,
-                    'reset_url': reset_url
-                }
-            })
-            
+                from_email=settings.DEFAULT_FROM_EMAIL if hasattr(settings, 'DEFAULT_FROM_EMAIL') else 'noreply@ideaflow.ir',
+                recipient_list=[email],
+                fail_silently=True,
+            )
+        except Exception:
+            # Email not configured - just log
+            print(f"Password reset link: {reset_url}")
+    
+    def _reset_response(self, uid=None, token=None, reset_url=None):
+        # For security, the same message whether or not the email exists
+        data = {
+            'message': 'اگر این ایمیل در سیستم وجود داشته باشد، لینک بازیابی ارسال می‌شود.',
+        }
+        if uid:
+            # For MVP/development, return the reset info
+            data['debug'] = {
+                'uid': uid,
+                'token': token,
+                'reset_url': reset_url
+            }
+        return Response(data)
+
+
+class PasswordResetRequestView(PasswordResetMixin, APIView):
+    """
+    درخواست بازیابی رمزعبور
+    """
+    permission_classes = [AllowAny]
+    
+    def post(self, request):
+        serializer = PasswordResetRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        email = serializer.validated_data['email']
+        
+        try:
+            user = User.objects.get(email=email)
         except User.DoesNotExist:
-            # For security, return same message
-            return Response({
-                'message': 'اگر این ایمیل در سیستم وجود داشته باشد، لینک بازیابی ارسال می‌شود.'
-            })
+            return self._reset_response()
+        
+        uid, token, reset_url = self._reset_link(user)
+        self._send_reset_email(email, reset_url)
+        return self._reset_response(uid, token, reset_url)
+
+
+class PasswordResetRequestAsyncView(PasswordResetMixin, AsyncAPIView):
+    """
+    نسخه async درخواست بازیابی رمزعبور (فقط با ASYNC_VIEWS، accounts/urls.py)
+    ارسال SMTP در thread pool جداگانه انجام می‌شود و event loop را نگه نمی‌دارد
+    """
+    permission_classes = [AllowAny]
+    
+    async def post(self, request):
+        serializer = PasswordResetRequestSerializer(data=request.data)
+        await run_sync(serializer.is_valid, raise_exception=True)
+        
+        email = serializer.validated_data['email']
+        
+        try:
+            user = await run_sync(User.objects.get, email=email)
+        except User.DoesNotExist:
+            return self._reset_response()
+        
+        uid, token, reset_url = self._reset_link(user)
+        # A plain worker thread: SMTP round trips must not hold a database slot
+        await sync_to_async(self._send_reset_email, thread_sensitive=False)(email, reset_url)
+        return self._reset_response(uid, token, reset_url)
 
 
 class PasswordResetConfirmView(APIView):
@@ -1,9 +1,11 @@
 from rest_framework import serializers
+from django.db.models import Prefetch
 from django.contrib.auth import get_user_model
 from ideas.models import Idea
 from support.models import SupportTicket, TicketMessage
 from support.serializers import TicketMessageSerializer
 from subscriptions.models import UserSubscription, SubscriptionPlan
+from scoring.models import LLMUsageDaily
 
 User = get_user_model()
 
@@ -23,7 +25,7 @@ class AdminIdeaSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Idea
-        fields = '__all__'
+        exclude = ['search_vector']
 
 class AdminTicketSerializer(serializers.ModelSerializer):
     """
@@ -36,6 +38,12 @@ class AdminTicketSerializer(serializers.ModelSerializer):
     class Meta:
         model = SupportTicket
         fields = ['id', 'user', 'user_email', 'user_name', 'subject', 'status', 'priority', 'created_at', 'updated_at', 'messages']
+    
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('user').prefetch_related(
+            Prefetch('messages', queryset=TicketMessage.objects.select_related('sender'))
+        )
         
 class AdminSubscriptionSerializer(serializers.ModelSerializer):
     """
@@ -47,4 +55,19 @@ class AdminSubscriptionSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserSubscription
         fields = ['id', 'user', 'plan', 'start_date', 'end_date', 'is_active', 'plan_slug', 'duration_days']
-        read_only_fields = ['id', 'plan', 'start_date', 'end_date', 'is_active'] 
+        read_only_fields = ['id', 'plan', 'start_date', 'end_date', 'is_active']
+
+
+class AdminLLMUsageSerializer(serializers.ModelSerializer):
+    """
+    سریالایزر مصرف روزانه LLM برای ادمین
+    """
+    total_tokens = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = LLMUsageDaily
+        fields = [
+            'date', 'plan', 'endpoint', 'model', 'calls', 'errors', 'rate_limited',
+            'prompt_tokens', 'completion_tokens', 'total_tokens',
+            'latency_p50_ms', 'latency_p95_ms', 'latency_max_ms', 'updated_at'
+        ]
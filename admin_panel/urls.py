@@ -6,6 +6,7 @@ router = DefaultRouter()
 router.register(r'users', views.AdminUserViewSet, basename='admin-user')
 router.register(r'ideas', views.AdminIdeaViewSet, basename='admin-idea')
 router.register(r'tickets', views.AdminTicketViewSet, basename='admin-ticket')
+router.register(r'llm-usage', views.AdminLLMUsageViewSet, basename='admin-llm-usage')
 
 urlpatterns = [
     path('', include(router.urls)),
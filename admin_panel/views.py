@@ -1,4 +1,4 @@
-from rest_framework import viewsets, permissions, status
+from rest_framework import mixins, viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
@@ -6,13 +6,16 @@ from django.utils import timezone
 from datetime import timedelta
 
 from ideas.models import Idea
+from ideas.pagination import IdeaFeedPagination
 from support.models import SupportTicket, TicketMessage
 from subscriptions.models import UserSubscription, SubscriptionPlan
+from scoring.models import LLMUsageDaily
 from .serializers import (
     AdminUserSerializer,
     AdminIdeaSerializer,
     AdminTicketSerializer,
-    AdminSubscriptionSerializer
+    AdminSubscriptionSerializer,
+    AdminLLMUsageSerializer
 )
 from support.serializers import TicketMessageSerializer
 
@@ -52,33 +55,28 @@ class AdminUserViewSet(viewsets.ModelViewSet):
         except SubscriptionPlan.DoesNotExist:
             return Response({'error': 'Plan not found'}, status=400)
             
-        start_date = timezone.now()
-        end_date = start_date + timedelta(days=duration_days)
-        
-        # Deactivate old subs
-        UserSubscription.objects.filter(user=user, is_active=True).update(is_active=False)
-        
-        UserSubscription.objects.create(
+        # One subscription per user: replace the current plan (free give)
+        UserSubscription.objects.update_or_create(
             user=user,
-            plan=plan,
-            start_date=start_date,
-            end_date=end_date,
-            is_active=True,
-            payment_amount=0 # Free give
+            defaults={
+                'plan': plan,
+                'expires_at': timezone.now() + timedelta(days=duration_days),
+            }
         )
         
         return Response({'status': 'Subscription added'})
 
 class AdminIdeaViewSet(viewsets.ModelViewSet):
-    queryset = Idea.objects.all().order_by('-created_at')
+    queryset = Idea.objects.select_related('user').order_by('-created_at')
     serializer_class = AdminIdeaSerializer
     permission_classes = [IsSuperUserOrStaff]
+    pagination_class = IdeaFeedPagination
     
     # Standard CRUD is enough for delete/view
     # Filter backend can be added later
 
 class AdminTicketViewSet(viewsets.ModelViewSet):
-    queryset = SupportTicket.objects.all().order_by('-created_at')
+    queryset = AdminTicketSerializer.setup_eager_loading(SupportTicket.objects.all().order_by('-created_at'))
     serializer_class = AdminTicketSerializer
     permission_classes = [IsSuperUserOrStaff]
     
@@ -108,3 +106,33 @@ class AdminTicketViewSet(viewsets.ModelViewSet):
         ticket.status = SupportTicket.Status.CLOSED
         ticket.save()
         return Response({'status': 'Ticket closed'})
+
+
+class AdminLLMUsageViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    مصرف روزانه LLM به تفکیک پلن (توکن‌ها، تعداد خطا، تأخیر p50/p95)
+    داده از LLMUsageDaily که worker هر چند دقیقه از تله‌متری خام بازمحاسبه می‌کند
+    ?days=14 (حداکثر 90) ?plan=pro ?detail=1 (تفکیک اندپوینت و مدل به جای جمع کل پلن)
+    """
+    serializer_class = AdminLLMUsageSerializer
+    permission_classes = [IsSuperUserOrStaff]
+    pagination_class = None
+    
+    DEFAULT_DAYS = 14
+    MAX_DAYS = 90
+    
+    def get_queryset(self):
+        params = self.request.query_params
+        try:
+            days = min(max(int(params.get('days', self.DEFAULT_DAYS)), 1), self.MAX_DAYS)
+        except ValueError:
+            days = self.DEFAULT_DAYS
+        
+        queryset = LLMUsageDaily.objects.filter(date__gt=timezone.localdate() - timedelta(days=days))
+        if params.get('detail') in ('1', 'true'):
+            queryset = queryset.exclude(endpoint=LLMUsageDaily.ALL)
+        else:
+            queryset = queryset.filter(endpoint=LLMUsageDaily.ALL, model=LLMUsageDaily.ALL)
+        if params.get('plan'):
+            queryset = queryset.filter(plan=params['plan'])
+        return queryset.order_by('-date', 'plan', 'endpoint', 'model')
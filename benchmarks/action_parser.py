@@ -0,0 +1,293 @@
+"""
+Action Parser Benchmark - مقایسه scoring.system_actions با پیاده‌سازی قبلی (regex)
+پاسخ‌های ضبط‌شده مشاور (با اکشن‌های معمول، JSON تودرتوی گراف و حالت‌های خراب) هم برای
+اندازه‌گیری زمان و هم برای بررسی درستی خروجی استفاده می‌شوند
+"""
+
+import json
+import re
+import time
+
+from scoring.system_actions import SystemActionParser, parse_system_actions
+
+STREAM_CHUNK_SIZE = 16
+
+_PARAGRAPH = (
+    'برای فاز اول روی یک **MVP** ساده تمرکز کن: ثبت‌نام، ساخت پروفایل و یک داشبورد گزارش. '
+    'هزینه جذب مشتری را از همین حالا اندازه بگیر تا قبل از جذب سرمایه عدد واقعی داشته باشی.\n\n'
+)
+
+_NODE_GRAPH = {
+    'action': 'add_block',
+    'block': {
+        'type': 'node_graph',
+        'name': 'نقشه ایده',
+        'value': {
+            'nodes': [
+                {'id': 1, 'type': 'idea', 'label': 'ایده اصلی', 'x': 200, 'y': 100, 'color': '#6366f1'},
+                {'id': 2, 'type': 'problem', 'label': 'مشکل {هزینه بالا}', 'x': 100, 'y': 200, 'color': '#ef4444'},
+                {'id': 3, 'type': 'solution', 'label': 'راه‌حل', 'x': 300, 'y': 200, 'color': '#10b981'},
+                {'id': 4, 'type': 'market', 'label': 'بازار', 'x': 400, 'y': 150, 'color': '#f59e0b'},
+            ],
+            'edges': [{'from': 1, 'to': 2}, {'from': 2, 'to': 3}, {'from': 1, 'to': 4}],
+        },
+    },
+}
+
+
+def _action_block(*actions, indent=2, tag='__SYSTEM_ACTION__'):
+    body = '\n'.join(json.dumps(action, ensure_ascii=False, indent=indent) for action in actions)
+    return f'```{tag}\n{body}\n```'
+
+
+# name, response text, expected number of actions
+RECORDED_RESPONSES = [
+    ('plain_advice', (
+        'با توجه به ایده‌ات برای **MVP** به این منابع نیاز داری:\n\n'
+        '| آیتم | هزینه تقریبی |\n|------|-------------|\n| توسعه اپ | ۴۰-۶۰ میلیون |\n'
+        '| سرور (۶ ماه) | ۱۰ میلیون |\n\n\n\n'
+        '**پیشنهاد:** بودجه رو روی **۸۰ تا ۱۲۰ میلیون تومان** تنظیم کنیم. موافقی؟'
+    ), 0),
+    ('update_field', (
+        'عالی! الان بودجه رو تنظیم میکنم...\n\n'
+        + _action_block({'action': 'update_field', 'field': 'budget', 'value': '۸۰ تا ۱۲۰ میلیون تومان'}, indent=None)
+        + '\n\n✅ **بودجه با موفقیت ثبت شد!** میخوای یه چک‌لیست هم بسازم؟'
+    ), 1),
+    ('batch_update', (
+        'هر دو تغییر رو اعمال میکنم:\n\n'
+        + _action_block({'action': 'batch_update', 'updates': [
+            {'field': 'budget', 'value': '۱۰۰ میلیون'},
+            {'field': 'required_skills', 'value': 'برنامه‌نویس فول‌استک، طراح UI/UX'},
+        ]})
+        + '\n\n✅ بودجه و مهارت‌ها به‌روز شدند.'
+    ), 1),
+    ('node_graph', (
+        'نقشه ایده‌ات رو ساختم، مشکل و راه‌حل رو به هم وصل کردم:\n\n'
+        + _action_block(_NODE_GRAPH)
+        + '\n\n✅ گراف اضافه شد. میخوای رقبا رو هم اضافه کنم؟'
+    ), 1),
+    ('node_graph_compact', (
+        'گراف آماده‌ست:\n' + _action_block(_NODE_GRAPH, indent=None) + '\nبررسیش کن.'
+    ), 1),
+    ('two_actions_one_block', (
+        'چک‌لیست و پیشرفت رو با هم به‌روز میکنم.\n\n'
+        + _action_block(
+            {'action': 'add_checklist_item', 'block_index': 0, 'item': {'text': 'مصاحبه با ۱۰ مشتری', 'done': False}},
+            {'action': 'update_block', 'block_index': 1, 'value': 40},
+        )
+        + '\n\n✅ انجام شد.'
+    ), 2),
+    ('fence_in_string', (
+        'مراحل اجرا رو با دستور نصب به‌روز کردم:\n\n'
+        + _action_block({'action': 'update_field', 'field': 'execution_steps',
+                         'value': '۱. نصب وابستگی‌ها:\n```bash\npip install -r requirements.txt\n```\n۲. اجرای سرور'})
+        + '\n\n✅ مراحل اجرا ثبت شد.'
+    ), 1),
+    ('json_fallback', (
+        'بودجه رو تغییر میدم:\n\n'
+        + _action_block({'action': 'update_field', 'field': 'budget', 'value': '۵۰ میلیون'}, tag='json')
+        + '\n\nانجام شد!'
+    ), 1),
+    ('code_and_json_example', (
+        'برای API می‌تونی از این ساختار استفاده کنی:\n\n'
+        '```python\nresponse = requests.get(url, timeout=10)\n```\n\n'
+        'و خروجی نمونه:\n\n```json\n{"id": 1, "title": "نمونه", "meta": {"tags": ["a", "b"]}}\n```\n\nسؤالی بود بپرس.'
+    ), 0),
+    ('unterminated_block', (
+        'الان عنوان رو عوض میکنم.\n\n'
+        '```__SYSTEM_ACTION__\n{"action": "update_field", "field": "title", "value": "اپ رزرو نوبت"}\n'
+    ), 1),
+    ('long_plan', (
+        _PARAGRAPH * 20
+        + _action_block({'action': 'add_block', 'block': {'type': 'checklist', 'name': 'مراحل', 'value': [
+            {'text': f'مرحله {i}', 'done': False} for i in range(10)
+        ]}})
+        + '\n\n' + _PARAGRAPH * 5
+    ), 1),
+]
+
+
+class LegacyStreamFilter:
+    """فیلتر stream قبلی (فقط برای مقایسه؛ حذف بلوک‌ها بدون خواندن اکشن)"""
+
+    FENCE = '```'
+    ACTION_TAG = '__SYSTEM_ACTION__'
+    JSON_TAG = 'json'
+
+    TEXT, ACTION, JSON, CODE = range(4)
+
+    def __init__(self):
+        self.state = self.TEXT
+        self.buffer = ''
+
+    def _split_partial_fence(self, text):
+        stripped = text.rstrip('`')
+        tail = text[len(stripped):]
+        if len(tail) < len(self.FENCE):
+            return stripped, tail
+        return text, ''
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        out = []
+
+        while self.buffer:
+            if self.state == self.TEXT:
+                idx = self.buffer.find(self.FENCE)
+                if idx == -1:
+                    safe, self.buffer = self._split_partial_fence(self.buffer)
+                    out.append(safe)
+                    break
+                out.append(self.buffer[:idx])
+                rest = self.buffer[idx + len(self.FENCE):]
+                if self.ACTION_TAG.startswith(rest) or self.JSON_TAG.startswith(rest):
+                    self.buffer = self.buffer[idx:]
+                    break
+                if rest.startswith(self.ACTION_TAG):
+                    self.state = self.ACTION
+                    self.buffer = rest[len(self.ACTION_TAG):]
+                elif rest.startswith(self.JSON_TAG):
+                    self.state = self.JSON
+                    self.buffer = self.buffer[idx:]
+                else:
+                    self.state = self.CODE
+                    out.append(self.FENCE)
+                    self.buffer = rest
+
+            elif self.state == self.ACTION:
+                idx = self.buffer.find(self.FENCE)
+                if idx == -1:
+                    _, self.buffer = self._split_partial_fence(self.buffer)
+                    break
+                self.state = self.TEXT
+                self.buffer = self.buffer[idx + len(self.FENCE):]
+
+            elif self.state == self.JSON:
+                idx = self.buffer.find(self.FENCE, len(self.FENCE))
+                if idx == -1:
+                    break
+                block = self.buffer[:idx + len(self.FENCE)]
+                if '"action"' not in block:
+                    out.append(block)
+                self.state = self.TEXT
+                self.buffer = self.buffer[idx + len(self.FENCE):]
+
+            else:
+                idx = self.buffer.find(self.FENCE)
+                if idx == -1:
+                    safe, self.buffer = self._split_partial_fence(self.buffer)
+                    out.append(safe)
+                    break
+                out.append(self.buffer[:idx + len(self.FENCE)])
+                self.state = self.TEXT
+                self.buffer = self.buffer[idx + len(self.FENCE):]
+
+        return ''.join(out)
+
+    def finish(self):
+        remaining = self.buffer
+        self.buffer = ''
+        if self.state == self.ACTION:
+            return ''
+        if self.state == self.JSON and '"action"' in remaining:
+            return ''
+        return remaining
+
+
+def legacy_extract_actions(response_text):
+    """ChatAdvisor._extract_system_actions قبلی"""
+    actions = []
+    matches = re.findall(r'```__SYSTEM_ACTION__\s*(\{[\s\S]*?\})\s*```', response_text, re.DOTALL)
+    for match in matches:
+        try:
+            action = json.loads(match.strip())
+            if 'action' in action:
+                actions.append(action)
+        except json.JSONDecodeError:
+            continue
+    if not actions:
+        for match in re.findall(r'```json\s*(\{[^`]+\})\s*```', response_text, re.DOTALL):
+            try:
+                action = json.loads(match)
+                if 'action' in action:
+                    actions.append(action)
+            except json.JSONDecodeError:
+                continue
+    return actions
+
+
+def legacy_clean_response(response_text):
+    """ChatAdvisor._clean_response قبلی"""
+    cleaned = re.sub(r'```__SYSTEM_ACTION__[\s\S]*?```', '', response_text)
+    cleaned = re.sub(r'```json\s*\{[^`]*"action"[^`]*\}\s*```', '', cleaned)
+    cleaned = re.sub(r'\n{3,}', '\n\n', cleaned)
+    return cleaned.strip()
+
+
+def legacy_parse(text):
+    return legacy_clean_response(text), legacy_extract_actions(text)
+
+
+def legacy_stream(chunks):
+    """مسیر stream قبلی: فیلتر روی هر تکه و پارس دوباره کل پاسخ در پایان"""
+    stream_filter = LegacyStreamFilter()
+    for chunk in chunks:
+        stream_filter.feed(chunk)
+    stream_filter.finish()
+    return legacy_parse(''.join(chunks))
+
+
+def stream(chunks):
+    parser = SystemActionParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.finish()
+    return parser.content, parser.actions
+
+
+def _chunks(text, size=STREAM_CHUNK_SIZE):
+    return [text[start:start + size] for start in range(0, len(text), size)]
+
+
+def _per_call_us(func, arg, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func(arg)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def check(name, text, expected_actions):
+    """بررسی خروجی پارسر جدید (کامل و stream)؛ خروجی: لیست خطاها"""
+    problems = []
+    content, actions = parse_system_actions(text)
+    if len(actions) != expected_actions:
+        problems.append(f'{name}: {len(actions)} actions, expected {expected_actions}')
+    if '"action"' in content or '__SYSTEM_ACTION__' in content:
+        problems.append(f'{name}: action JSON left in the visible text')
+    for size in (1, 7, STREAM_CHUNK_SIZE):
+        if stream(_chunks(text, size)) != (content, actions):
+            problems.append(f'{name}: streaming in {size}-char chunks gives a different result')
+    return problems
+
+
+def run(iterations=2000):
+    """اندازه‌گیری هر پاسخ ضبط‌شده؛ خروجی: (ردیف‌های نتیجه، خطاهای درستی)"""
+    rows, problems = [], []
+    for name, text, expected_actions in RECORDED_RESPONSES:
+        problems.extend(check(name, text, expected_actions))
+        chunks = _chunks(text)
+        legacy = legacy_parse(text)
+        current = parse_system_actions(text)
+        rows.append({
+            'name': name,
+            'chars': len(text),
+            'legacy_us': _per_call_us(legacy_parse, text, iterations),
+            'parser_us': _per_call_us(parse_system_actions, text, iterations),
+            'legacy_stream_us': _per_call_us(legacy_stream, chunks, iterations),
+            'parser_stream_us': _per_call_us(stream, chunks, iterations),
+            'legacy_actions': len(legacy[1]),
+            'parser_actions': len(current[1]),
+            'same_content': legacy[0] == current[0],
+            'same_actions': legacy[1] == current[1],
+        })
+    return rows, problems
@@ -0,0 +1,336 @@
+"""
+Benchmark Dataset - ساخت داده واقعی‌نما برای بنچمارک
+کاربران، ایده‌ها با بلوک، ستاره، کامنت، سرمایه‌گذاری، چت و تیکت (با bulk_create)
+"""
+
+import io
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.postgres.search import SearchVector
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Avg, Count, Sum
+from django.utils import timezone
+
+from ideas.models import (
+    Category, Idea, IdeaTag, IdeaCustomField, IdeaStar, Comment,
+    InvestmentRequest, InvestmentMessage, ChatSession, ChatMessage,
+    IdeaSignature, IdeaSignatureBand,
+)
+from ideas.search import SEARCH_CONFIG
+from ideas.similarity import idea_tokens, similarity_index
+from scoring.models import UserScore, ScoreLog, ScoringJob
+from scoring.ranking import recompute_ranks
+from subscriptions.models import SubscriptionPlan, UserSubscription
+from support.models import SupportTicket, TicketMessage
+
+User = get_user_model()
+
+BATCH_SIZE = 2000
+
+WORDS = (
+    'اپلیکیشن سفارش غذا خانگی آموزش آنلاین برنامه نویسی کودکان اجاره خودرو '
+    'هوش مصنوعی بازار فروشگاه پلتفرم سلامت پزشکی گردشگری کشاورزی هوشمند '
+    'marketplace delivery fintech saas analytics logistics booking subscription'
+).split()
+
+CATEGORIES = ['فناوری', 'آموزش', 'سلامت', 'غذا', 'حمل و نقل', 'مالی', 'گردشگری', 'کشاورزی']
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def _blocks(rng):
+    return [
+        {'type': 'checklist', 'name': 'کارها', 'value': [
+            {'text': _text(rng, 3), 'done': rng.random() < 0.5} for _ in range(rng.randint(2, 6))
+        ]},
+        {'type': 'tags', 'name': 'برچسب‌ها', 'value': [
+            {'text': rng.choice(WORDS), 'color': '#6c5ce7'} for _ in range(3)
+        ]},
+        {'type': 'progress', 'name': 'پیشرفت', 'value': rng.randint(0, 100)},
+        {'type': 'node_graph', 'name': 'نقشه', 'value': {
+            'nodes': [{'id': f'n{i}', 'type': 'step', 'label': _text(rng, 2), 'x': i * 80, 'y': 40}
+                      for i in range(4)],
+            'edges': [{'from': f'n{i}', 'to': f'n{i + 1}'} for i in range(3)],
+        }},
+    ]
+
+
+class BenchmarkDataset:
+    """
+    ساخت داده با seed ثابت؛ شناسه‌های نمونه برای ساخت URL اندپوینت‌ها در self.refs
+    """
+
+    def __init__(self, users=2000, ideas=5000, seed=1404, stdout=None):
+        self.num_users = users
+        self.num_ideas = ideas
+        self.rng = random.Random(seed)
+        self.stdout = stdout
+        self.refs = {}
+
+    def _log(self, message):
+        if self.stdout:
+            self.stdout.write(message)
+
+    def seed(self):
+        with transaction.atomic():
+            self._seed_plans()
+            self._seed_users()
+            self._seed_ideas()
+            self._seed_marketplace()
+            self._seed_chats()
+            self._seed_support()
+            self._seed_scores()
+        self._pick_refs()
+        # Fresh planner statistics, as autovacuum would have in production (outside the transaction)
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM ANALYZE')
+        return self.refs
+
+    # ========== Seeding ==========
+
+    def _seed_plans(self):
+        self.free_plan = SubscriptionPlan.objects.create(
+            name='رایگان', slug='free', is_free=True, order=0,
+            ideas_per_day=1000, ai_chats_per_day=1000, ai_scoring_attempts=1000, custom_fields_per_idea=1000
+        )
+        self.pro_plan = SubscriptionPlan.objects.create(
+            name='حرفه‌ای', slug='pro', price=199000, order=1, is_featured=True,
+            ideas_per_day=1000, ai_chats_per_day=1000, ai_scoring_attempts=1000, custom_fields_per_idea=1000
+        )
+        self.categories = Category.objects.bulk_create([
+            Category(name=name, slug=f'cat-{i}') for i, name in enumerate(CATEGORIES)
+        ])
+
+    def _seed_users(self):
+        password = make_password('benchmark')
+        users = [
+            User(email=f'user{i}@bench.local', username=f'user{i}', password=password,
+                 first_name=f'کاربر{i}', last_name='بنچمارک')
+            for i in range(self.num_users)
+        ]
+        users.append(User(email='staff@bench.local', username='staff', password=password,
+                          is_staff=True, is_superuser=True))
+        self.users = User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+        self.staff = self.users.pop()
+
+        expires_at = timezone.now() + timedelta(days=30)
+        UserSubscription.objects.bulk_create([
+            UserSubscription(user=user, plan=self.pro_plan, expires_at=expires_at)
+            for user in self.users[::10]
+        ], batch_size=BATCH_SIZE)
+        self._log(f'  {len(self.users)} users')
+
+    def _seed_ideas(self):
+        rng, now = self.rng, timezone.now()
+        ideas = [
+            Idea(
+                user=rng.choice(self.users),
+                category=rng.choice(self.categories),
+                title=_text(rng, 4),
+                description=_text(rng, 60),
+                budget=f'{rng.randint(10, 900)} میلیون تومان',
+                execution_steps=_text(rng, 20),
+                required_skills=_text(rng, 5),
+                blocks=_blocks(rng),
+                ai_score=rng.choice([None, rng.randint(0, 100)]),
+                scoring_count=rng.randint(0, 2),
+                visibility='public' if rng.random() < 0.8 else 'private',
+            )
+            for _ in range(self.num_ideas)
+        ]
+        self.ideas = Idea.objects.bulk_create(ideas, batch_size=BATCH_SIZE)
+
+        # bulk_create skips auto_now_add overrides and signals: spread dates, build search vectors
+        for idea in self.ideas:
+            idea.created_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+        Idea.objects.bulk_update(self.ideas, ['created_at'], batch_size=BATCH_SIZE)
+
+        IdeaTag.objects.bulk_create([
+            IdeaTag(idea=idea, name=name)
+            for idea in self.ideas
+            for name in set(rng.sample(WORDS, 2))
+        ], batch_size=BATCH_SIZE)
+        IdeaCustomField.objects.bulk_create([
+            IdeaCustomField(idea=idea, name='مخاطب', value=_text(rng, 3), order=0)
+            for idea in self.ideas[::3]
+        ], batch_size=BATCH_SIZE)
+        Idea.objects.update(search_vector=(
+            SearchVector('title', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+        ))
+        self.public_ideas = [idea for idea in self.ideas if idea.visibility == 'public']
+        self._seed_signatures()
+        self._log(f'  {len(self.ideas)} ideas')
+
+    def _seed_signatures(self):
+        """
+        امضاهای MinHash به صورت bulk؛ index_idea همسایه‌های هر ایده را هم بروز می‌کند
+        و با واژگان کوچک این دیتاست عملاً O(n^2) می‌شود
+        """
+        hasher = similarity_index.hasher
+        signatures, bands = [], []
+        for idea in Idea.objects.prefetch_related('tags').iterator(chunk_size=500):
+            tokens = idea_tokens(idea)
+            signature = hasher.signature(tokens)
+            signatures.append(IdeaSignature(
+                idea_id=idea.id, content_hash=similarity_index._content_hash(tokens), minhash=signature
+            ))
+            bands.extend(
+                IdeaSignatureBand(idea_id=idea.id, band=band, bucket=bucket)
+                for band, bucket in enumerate(hasher.band_buckets(signature))
+            )
+        IdeaSignature.objects.bulk_create(signatures, batch_size=BATCH_SIZE)
+        IdeaSignatureBand.objects.bulk_create(bands, batch_size=BATCH_SIZE)
+
+    def _seed_marketplace(self):
+        rng = self.rng
+
+        stars = set()
+        for idea in self.public_ideas:
+            for user in rng.sample(self.users, rng.randint(0, 8)):
+                stars.add((idea.id, user.id))
+        IdeaStar.objects.bulk_create(
+            [IdeaStar(idea_id=idea_id, user_id=user_id) for idea_id, user_id in stars],
+            batch_size=BATCH_SIZE
+        )
+
+        parents = Comment.objects.bulk_create([
+            Comment(idea=idea, user=rng.choice(self.users), content=_text(rng, 15))
+            for idea in self.public_ideas
+            for _ in range(rng.randint(0, 4))
+        ], batch_size=BATCH_SIZE)
+        Comment.objects.bulk_create([
+            Comment(idea_id=parent.idea_id, parent=parent, user=rng.choice(self.users), content=_text(rng, 8))
+            for parent in parents
+            for _ in range(rng.randint(0, 3))
+        ], batch_size=BATCH_SIZE)
+
+        def investor_for(idea):
+            investor = rng.choice(self.users)
+            return investor if investor.id != idea.user_id else self.staff
+
+        requests = InvestmentRequest.objects.bulk_create([
+            InvestmentRequest(
+                idea=idea,
+                investor=investor_for(idea),
+                request_type=rng.choice(['investment', 'purchase']),
+                amount=f'{rng.randint(50, 5000)} میلیون',
+                share_percentage=rng.randint(5, 40),
+                message=_text(rng, 20),
+            )
+            for idea in rng.sample(self.public_ideas, len(self.public_ideas) // 5)
+        ], batch_size=BATCH_SIZE)
+        InvestmentMessage.objects.bulk_create([
+            InvestmentMessage(
+                request=request,
+                sender_id=rng.choice([request.investor_id, request.idea.user_id]),
+                content=_text(rng, 12),
+                is_read=rng.random() < 0.6,
+            )
+            for request in requests
+            for _ in range(rng.randint(1, 8))
+        ], batch_size=BATCH_SIZE)
+
+        # Counters are maintained by signals, which bulk_create bypasses
+        call_command('reconcile_idea_counters', stdout=io.StringIO())
+        self._log(f'  {len(stars)} stars, {len(parents)} threads, {len(requests)} investment requests')
+
+    def _seed_chats(self):
+        rng = self.rng
+        sessions = ChatSession.objects.bulk_create([
+            ChatSession(idea=idea, is_active=True) for idea in self.ideas[::2]
+        ], batch_size=BATCH_SIZE)
+        ChatMessage.objects.bulk_create([
+            ChatMessage(session=session, role=role, content=_text(rng, 40))
+            for session in sessions
+            for _ in range(rng.randint(1, 6))
+            for role in ('user', 'assistant')
+        ], batch_size=BATCH_SIZE)
+        self._log(f'  {len(sessions)} chat sessions')
+
+    def _seed_support(self):
+        rng = self.rng
+        tickets = SupportTicket.objects.bulk_create([
+            SupportTicket(user=user, subject=_text(rng, 5)) for user in self.users[::4]
+        ], batch_size=BATCH_SIZE)
+        TicketMessage.objects.bulk_create([
+            TicketMessage(ticket=ticket, sender=rng.choice([ticket.user, self.staff]), content=_text(rng, 20))
+            for ticket in tickets
+            for _ in range(rng.randint(1, 5))
+        ], batch_size=BATCH_SIZE)
+
+    def _seed_scores(self):
+        stats = {
+            row['user']: row for row in Idea.objects.values('user').annotate(
+                count=Count('id'), scored=Count('ai_score'), total=Sum('ai_score'), avg=Avg('ai_score')
+            )
+        }
+        UserScore.objects.bulk_create([
+            UserScore(
+                user=user,
+                ideas_count=stats.get(user.id, {}).get('count', 0),
+                scored_ideas_count=stats.get(user.id, {}).get('scored', 0),
+                sum_ai_score=int(stats.get(user.id, {}).get('total') or 0),
+                avg_ai_score=stats.get(user.id, {}).get('avg') or 0,
+                total_score=int(stats.get(user.id, {}).get('total') or 0),
+            )
+            for user in self.users
+        ], batch_size=BATCH_SIZE)
+        recompute_ranks()
+        ScoreLog.objects.bulk_create([
+            ScoreLog(user=user, action='idea_created', points_change=10, description='ثبت ایده')
+            for user in self.users
+            for _ in range(3)
+        ], batch_size=BATCH_SIZE)
+
+    # ========== Reference objects for endpoint URLs ==========
+
+    def _pick_refs(self):
+        """یک کاربر پرکار (مالک ایده با چت، تیکت و سرمایه‌گذاری) و داده‌های مرتبط"""
+        request = InvestmentRequest.objects.select_related('idea').annotate(
+            n=Count('messages')
+        ).order_by('-n', 'id').first()
+        owner = request.idea.user
+        idea = Idea.objects.filter(user=owner, visibility='public').order_by('id').first()
+        session = ChatSession.objects.filter(idea=idea).first() or ChatSession.objects.create(idea=idea)
+        if not idea.blocks:
+            idea.blocks = _blocks(self.rng)
+            idea.save(update_fields=['blocks'])
+        custom_field = IdeaCustomField.objects.create(idea=idea, name='کانال فروش', value='آنلاین', order=99)
+        ticket = SupportTicket.objects.filter(user=owner).first() or SupportTicket.objects.create(
+            user=owner, subject='بنچمارک'
+        )
+        other_idea = Idea.objects.filter(visibility='public').exclude(user=owner).order_by('-created_at').first()
+        original = Idea.objects.filter(
+            visibility='public', created_at__lt=other_idea.created_at
+        ).exclude(id=other_idea.id).order_by('created_at').first()
+        comment = Comment.objects.create(idea=other_idea, user=owner, content='کامنت بنچمارک')
+
+        # Under negotiation, so accept/reject/complete all take their success path
+        request.status = 'negotiation'
+        request.save(update_fields=['status'])
+
+        job = ScoringJob.objects.create(idea=idea, user=owner, status=ScoringJob.Status.DONE)
+
+        self.refs = {
+            'owner_id': owner.id,
+            'investor_id': request.investor_id,
+            'staff_id': self.staff.id,
+            'member_id': self.users[-1].id,
+            'idea_id': idea.id,
+            'session_id': session.id,
+            'custom_field_id': custom_field.id,
+            'ticket_id': ticket.id,
+            'public_idea_id': other_idea.id,
+            'original_idea_id': original.id if original else idea.id,
+            'comment_id': comment.id,
+            'investment_id': request.id,
+            'job_id': job.id,
+            'category_id': self.categories[0].id,
+        }
@@ -0,0 +1,181 @@
+"""
+Benchmark Endpoints - فهرست اندپوینت‌های API برای بنچمارک
+هر مورد: نام پایدار (کلید baseline)، متد، مسیر با شناسه‌های dataset.refs، نقش کاربر و بدنه
+"""
+
+from collections import namedtuple
+
+from django.urls import URLPattern, URLResolver, get_resolver
+
+
+# role: 'owner' (صاحب ایده با چت/تیکت/سرمایه‌گذاری)، 'investor'، 'member'، 'staff' یا None (ناشناس)
+Endpoint = namedtuple('Endpoint', ['name', 'method', 'path', 'role', 'data', 'stream'])
+
+
+def endpoint(name, method, path, role='owner', data=None, stream=False):
+    return Endpoint(name, method, path, role, data, stream)
+
+
+IDEA = '/api/ideas/{idea_id}/'
+EXPLORE = '/api/ideas/marketplace/explore/'
+INVESTMENT = '/api/ideas/marketplace/investments/{investment_id}/'
+
+NEW_IDEA = {
+    'title': 'اپلیکیشن رزرو آنلاین کلاس ورزشی',
+    'description': 'پلتفرمی برای رزرو و پرداخت آنلاین کلاس‌های ورزشی محله',
+    'budget': '300 میلیون تومان',
+    'visibility': 'public',
+    'tags': ['ورزش', 'رزرو'],
+    'custom_fields': [{'name': 'مخاطب', 'value': 'باشگاه‌ها'}],
+}
+
+ENDPOINTS = [
+    # ---------- accounts ----------
+    endpoint('accounts.me', 'get', '/api/accounts/me/'),
+    endpoint('accounts.me.update', 'patch', '/api/accounts/me/', data={'first_name': 'بنچمارک'}),
+
+    # ---------- ideas ----------
+    endpoint('ideas.categories', 'get', '/api/ideas/categories/', role=None),
+    endpoint('ideas.category', 'get', '/api/ideas/categories/{category_id}/', role=None),
+    endpoint('ideas.list', 'get', '/api/ideas/'),
+    endpoint('ideas.create', 'post', '/api/ideas/', data=NEW_IDEA),
+    endpoint('ideas.my', 'get', '/api/ideas/my/'),
+    endpoint('ideas.retrieve', 'get', IDEA),
+    endpoint('ideas.update', 'patch', IDEA, data={'title': 'عنوان ویرایش‌شده', 'tags': ['آموزش']}),
+    endpoint('ideas.delete', 'delete', IDEA),
+    endpoint('ideas.ai_score', 'post', IDEA + 'ai_score/'),
+    endpoint('ideas.similar', 'get', IDEA + 'similar/'),
+    endpoint('ideas.chat', 'get', IDEA + 'chat/'),
+    endpoint('ideas.chat.send', 'post', IDEA + 'chat/', data={'message': 'بازار هدف من چقدر بزرگ است؟'}),
+    endpoint('ideas.chat.stream', 'post', IDEA + 'chat/stream/',
+             data={'message': 'مدل درآمدی پیشنهاد بده'}, stream=True),
+    endpoint('ideas.chat.history', 'get', IDEA + 'chat/history/'),
+    endpoint('ideas.chat.apply_action', 'post', IDEA + 'chat/apply-action/', data={
+        'action': {'action': 'update_field', 'field': 'required_skills', 'value': 'فروش'},
+    }),
+    endpoint('ideas.custom_fields', 'get', IDEA + 'custom-fields/'),
+    endpoint('ideas.custom_fields.create', 'post', IDEA + 'custom-fields/',
+             data={'name': 'رقبا', 'value': 'اسنپ'}),
+    endpoint('ideas.custom_field.update', 'patch', IDEA + 'custom-fields/{custom_field_id}/',
+             data={'value': 'حضوری'}),
+    endpoint('ideas.custom_field.delete', 'delete', IDEA + 'custom-fields/{custom_field_id}/'),
+
+    # ---------- marketplace ----------
+    endpoint('explore.list', 'get', EXPLORE, role='member'),
+    endpoint('explore.list.anonymous', 'get', EXPLORE, role=None),
+    endpoint('explore.popular', 'get', EXPLORE + '?ordering=-star_count', role='member'),
+    endpoint('explore.top_rated', 'get', EXPLORE + '?ordering=-ai_score', role='member'),
+    endpoint('explore.search', 'get', EXPLORE + '?search=هوش مصنوعی', role='member'),
+    endpoint('explore.search.short', 'get', EXPLORE + '?search=هو', role='member'),
+    endpoint('explore.retrieve', 'get', EXPLORE + '{public_idea_id}/', role='member'),
+    endpoint('explore.star', 'post', EXPLORE + '{public_idea_id}/star/', role='member'),
+    endpoint('explore.comments', 'get', EXPLORE + '{public_idea_id}/comments/', role='member'),
+    endpoint('explore.comments.create', 'post', EXPLORE + '{public_idea_id}/comments/', role='member',
+             data={'content': 'ایده جالبی است'}),
+    endpoint('explore.invest', 'post', EXPLORE + '{public_idea_id}/invest/', role='member',
+             data={'request_type': 'investment', 'amount': '500 میلیون', 'message': 'علاقه‌مندم'}),
+    endpoint('explore.report_duplicate', 'post', EXPLORE + '{public_idea_id}/report_duplicate/',
+             role='member', data={'original_idea_id': '{original_idea_id}'}),
+    endpoint('investments.list', 'get', '/api/ideas/marketplace/investments/'),
+    endpoint('investments.retrieve', 'get', INVESTMENT),
+    endpoint('investments.accept', 'post', INVESTMENT + 'accept/'),
+    endpoint('investments.reject', 'post', INVESTMENT + 'reject/'),
+    endpoint('investments.complete', 'post', INVESTMENT + 'complete/'),
+    endpoint('investments.messages', 'get', INVESTMENT + 'messages/'),
+    endpoint('investments.messages.send', 'post', INVESTMENT + 'messages/', role='investor',
+             data={'content': 'سهم ۲۰ درصد چطور است؟'}),
+    endpoint('comments.list', 'get', '/api/ideas/marketplace/comments/'),
+    endpoint('comments.update', 'patch', '/api/ideas/marketplace/comments/{comment_id}/',
+             data={'content': 'ویرایش شد'}),
+    endpoint('comments.delete', 'delete', '/api/ideas/marketplace/comments/{comment_id}/'),
+
+    # ---------- scoring ----------
+    endpoint('scoring.my', 'get', '/api/scoring/my/'),
+    endpoint('scoring.leaderboard', 'get', '/api/scoring/leaderboard/'),
+    endpoint('scoring.leaderboard.avg', 'get', '/api/scoring/leaderboard/?sort=avg'),
+    endpoint('scoring.logs', 'get', '/api/scoring/logs/'),
+    endpoint('scoring.job', 'get', '/api/scoring/jobs/{job_id}/'),
+    endpoint('scoring.update_ranks', 'post', '/api/scoring/update-ranks/', role='staff'),
+
+    # ---------- subscriptions ----------
+    endpoint('subscriptions.plans', 'get', '/api/subscriptions/plans/', role=None),
+    endpoint('subscriptions.my', 'get', '/api/subscriptions/my-subscription/'),
+    endpoint('subscriptions.limits', 'get', '/api/subscriptions/limits/'),
+
+    # ---------- support ----------
+    endpoint('support.tickets', 'get', '/api/support/tickets/'),
+    endpoint('support.tickets.create', 'post', '/api/support/tickets/',
+             data={'subject': 'مشکل پرداخت'}),
+    endpoint('support.ticket', 'get', '/api/support/tickets/{ticket_id}/'),
+    endpoint('support.ticket.reply', 'post', '/api/support/tickets/{ticket_id}/reply/',
+             data={'content': 'هنوز مشکل دارم'}),
+
+    # ---------- admin panel ----------
+    endpoint('admin.users', 'get', '/api/admin-panel/users/', role='staff'),
+    endpoint('admin.user', 'get', '/api/admin-panel/users/{member_id}/', role='staff'),
+    endpoint('admin.user.ban', 'post', '/api/admin-panel/users/{member_id}/ban/', role='staff'),
+    endpoint('admin.user.unban', 'post', '/api/admin-panel/users/{member_id}/unban/', role='staff'),
+    endpoint('admin.user.give_subscription', 'post', '/api/admin-panel/users/{member_id}/give_subscription/',
+             role='staff', data={'plan_slug': 'pro', 'duration_days': 30}),
+    endpoint('admin.ideas', 'get', '/api/admin-panel/ideas/', role='staff'),
+    endpoint('admin.idea', 'get', '/api/admin-panel/ideas/{idea_id}/', role='staff'),
+    endpoint('admin.idea.delete', 'delete', '/api/admin-panel/ideas/{idea_id}/', role='staff'),
+    endpoint('admin.tickets', 'get', '/api/admin-panel/tickets/', role='staff'),
+    endpoint('admin.ticket', 'get', '/api/admin-panel/tickets/{ticket_id}/', role='staff'),
+    endpoint('admin.ticket.reply', 'post', '/api/admin-panel/tickets/{ticket_id}/reply/',
+             role='staff', data={'content': 'بررسی شد'}),
+    endpoint('admin.ticket.close', 'post', '/api/admin-panel/tickets/{ticket_id}/close/', role='staff'),
+    endpoint('admin.llm_usage', 'get', '/api/admin-panel/llm-usage/', role='staff'),
+]
+
+# Routes deliberately left out: they talk to external services (Google, SMTP) or only
+# exercise the password hasher / JWT signing, which says nothing about our queries
+SKIPPED_ROUTES = [
+    'admin/',
+    'api/accounts/register/',
+    'api/accounts/login/',
+    'api/accounts/token/refresh/',
+    'api/accounts/logout/',
+    'api/accounts/google/',
+    'api/accounts/password-reset/',
+    'api/accounts/change-password/',
+]
+
+
+def _iter_routes(patterns, prefix=''):
+    for pattern in patterns:
+        # Same shape as ResolverMatch.route: regex anchors dropped from each piece
+        route = prefix + str(pattern.pattern).lstrip('^')
+        if isinstance(pattern, URLResolver):
+            yield from _iter_routes(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern):
+            yield route, pattern
+
+
+def uncovered_routes(endpoints=ENDPOINTS):
+    """
+    مسیرهای API که هیچ بنچمارکی ندارند (برای جلوگیری از جا ماندن اندپوینت‌های جدید)
+    """
+    from django.urls import resolve
+
+    covered = set()
+    for item in endpoints:
+        path = item.path.split('?')[0]
+        sample = path.format_map(_SampleIds())
+        covered.add(resolve(sample).route)
+
+    missing = []
+    for route, pattern in _iter_routes(get_resolver().url_patterns):
+        # Router extras: API root, format suffixes, static media
+        if pattern.name == 'api-root' or 'format' in pattern.pattern.regex.groupindex:
+            continue
+        if not route.startswith('api/') or any(route.startswith(skip) for skip in SKIPPED_ROUTES):
+            continue
+        if route not in covered:
+            missing.append(route)
+    return missing
+
+
+class _SampleIds(dict):
+    def __missing__(self, key):
+        return '1'
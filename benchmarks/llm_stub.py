@@ -0,0 +1,93 @@
+"""
+Stub LLM - جایگزین آفلاین کلاینت Groq برای بنچمارک
+پاسخ‌های ثابت و قطعی، بدون هیچ درخواست شبکه
+"""
+
+import json
+from contextlib import contextmanager
+
+from scoring.llm_client import LLMResponse
+
+
+SCORE_RESULT = {
+    'scores': {
+        'innovation': 12,
+        'feasibility': 14,
+        'market_potential': 13,
+        'impact': 11,
+        'competitive_advantage': 10,
+    },
+    'total_score': 60,
+    'feedback': {
+        'strengths': ['بازار هدف مشخص'],
+        'weaknesses': ['مدل درآمدی مبهم'],
+        'suggestions': ['یک MVP کوچک بسازید'],
+        'comparison': '',
+    },
+    'summary': 'ایده قابل قبول با ریسک اجرایی بالا',
+    'verdict': 'متوسط',
+}
+
+CHAT_REPLY = (
+    'پیشنهاد می‌کنم بازار هدف را دقیق‌تر مشخص کنی و هزینه جذب مشتری را تخمین بزنی.\n\n'
+    '```__SYSTEM_ACTION__\n'
+    '{"action": "update_field", "field": "required_skills", "value": "بازاریابی دیجیتال"}\n'
+    '```'
+)
+
+
+class StubLLMClient:
+    """پیاده‌سازی هم‌شکل با LLMClient (chat_completion / stream_chat_completion و نسخه‌های async)"""
+
+    is_configured = True
+    model = 'benchmark-stub'
+
+    def __init__(self, chunk_size=16):
+        self.chunk_size = chunk_size
+        self.calls = 0
+
+    def _reply_for(self, messages, params):
+        if params.get('response_format', {}).get('type') == 'json_object':
+            return json.dumps(SCORE_RESULT, ensure_ascii=False)
+        return CHAT_REPLY
+
+    def chat_completion(self, messages, model=None, **params):
+        self.calls += 1
+        content = self._reply_for(messages, params)
+        data = {
+            'choices': [{'message': {'role': 'assistant', 'content': content}}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+        }
+        return LLMResponse(data, 200, latency_ms=0, attempts=1)
+
+    def stream_chat_completion(self, messages, model=None, **params):
+        self.calls += 1
+        content = self._reply_for(messages, params)
+        for start in range(0, len(content), self.chunk_size):
+            yield content[start:start + self.chunk_size]
+
+    async def achat_completion(self, messages, model=None, **params):
+        return self.chat_completion(messages, model=model, **params)
+
+    async def astream_chat_completion(self, messages, model=None, **params):
+        for chunk in self.stream_chat_completion(messages, model=model, **params):
+            yield chunk
+
+
+@contextmanager
+def use_stub_llm(stub=None):
+    """جایگزینی موقت کلاینت سرویس‌های AI با stub"""
+    from scoring.ai_service import idea_analyzer
+    from scoring.chat_advisor import chat_advisor
+    from scoring.chat_summary import chat_summarizer
+
+    stub = stub or StubLLMClient()
+    services = [idea_analyzer, chat_advisor, chat_summarizer]
+    originals = [service.client for service in services]
+    for service in services:
+        service.client = stub
+    try:
+        yield stub
+    finally:
+        for service, original in zip(services, originals):
+            service.client = original
@@ -0,0 +1,42 @@
+"""
+Management command to compare the __SYSTEM_ACTION__ parser with the previous regex implementation
+Usage: python manage.py run_action_parser_benchmark [--iterations 2000]
+
+Runs on the recorded advisor responses in benchmarks/action_parser.py (no database needed).
+Fails when the parser misses an expected action, leaks action JSON into the visible text,
+or gives a different result when the response arrives in stream chunks.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.action_parser import run
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the single-pass system action parser against the previous regex implementation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000, help='Parses per response and mode')
+
+    def handle(self, *args, **options):
+        rows, problems = run(iterations=options['iterations'])
+
+        self.stdout.write(
+            f"{'response':<24} {'chars':>6}  {'legacy':>8} {'parser':>8}  "
+            f"{'legacy stream':>13} {'parser stream':>13}  actions  text"
+        )
+        for row in rows:
+            self.stdout.write(
+                f"{row['name']:<24} {row['chars']:>6}  {row['legacy_us']:>6.1f}us {row['parser_us']:>6.1f}us  "
+                f"{row['legacy_stream_us']:>11.1f}us {row['parser_stream_us']:>11.1f}us  "
+                f"{row['legacy_actions']:>2} -> {row['parser_actions']:<2} "
+                f"{'same' if row['same_content'] else 'differs'}"
+            )
+
+        legacy = sum(row['legacy_stream_us'] for row in rows)
+        current = sum(row['parser_stream_us'] for row in rows)
+        self.stdout.write(f'Streaming path total: {legacy:.1f}us -> {current:.1f}us ({legacy / current:.2f}x)')
+
+        if problems:
+            raise CommandError('Action parser problems:\n  ' + '\n  '.join(problems))
+        self.stdout.write(self.style.SUCCESS(f'{len(rows)} recorded responses parsed correctly'))
@@ -0,0 +1,114 @@
+"""
+Management command to run the API query-count / latency regression benchmarks
+Usage: python manage.py run_benchmarks [--update-baseline] [--keepdb] [--users 2000 --ideas 5000]
+
+Runs against a separate test database (test_<DB_NAME>), seeded from scratch, with the
+LLM client replaced by an offline stub. Fails when an endpoint issues more queries,
+returns a different status, or gets slower than benchmarks/baseline.json allows.
+"""
+
+import json
+import os
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from benchmarks.dataset import BenchmarkDataset
+from benchmarks.endpoints import ENDPOINTS, uncovered_routes
+from benchmarks.llm_stub import use_stub_llm
+from benchmarks.runner import BenchmarkRunner, compare
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'baseline.json')
+
+
+class Command(BaseCommand):
+    help = 'Seeds a benchmark dataset and checks every API endpoint against the stored baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--update-baseline', action='store_true', help='Write the results as the new baseline')
+        parser.add_argument('--keepdb', action='store_true', help='Reuse (and flush) an existing test database')
+        parser.add_argument('--users', type=int, default=2000, help='Number of seeded users')
+        parser.add_argument('--ideas', type=int, default=5000, help='Number of seeded ideas')
+        parser.add_argument('--repeat', type=int, default=5, help='Measured runs per endpoint (median is kept)')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative slowdown')
+        parser.add_argument('--slack-ms', type=float, default=5.0, help='Allowed absolute slowdown in ms')
+        parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline file path')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Benchmarks need PostgreSQL (full-text search, GIN indexes)')
+
+        missing = uncovered_routes()
+        if missing:
+            raise CommandError('Endpoints without a benchmark:\n  ' + '\n  '.join(missing))
+
+        baseline = self._load_baseline(options)
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            if options['keepdb']:
+                call_command('flush', interactive=False, verbosity=0)
+
+            self.stdout.write(f"Seeding {options['users']} users / {options['ideas']} ideas...")
+            started = time.perf_counter()
+            refs = BenchmarkDataset(
+                users=options['users'], ideas=options['ideas'], stdout=self.stdout
+            ).seed()
+            self.stdout.write(f'Seeded in {time.perf_counter() - started:.1f}s\n')
+
+            with use_stub_llm():
+                results = BenchmarkRunner(refs, repeat=options['repeat']).run(on_result=self._report)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        if options['update_baseline']:
+            self._write_baseline(options, results)
+            return
+
+        regressions = compare(
+            results, baseline['endpoints'], tolerance=options['tolerance'], slack_ms=options['slack_ms']
+        )
+        if regressions:
+            raise CommandError('Benchmark regressions:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS(f'{len(results)} endpoints within baseline'))
+
+    def _report(self, item, result):
+        self.stdout.write(
+            f"{item.name:<34} {result['status']:>3}  {result['queries']:>3} queries  "
+            f"db {result['db_ms']:>7.1f}ms  wall {result['wall_ms']:>7.1f}ms"
+        )
+
+    def _load_baseline(self, options):
+        if options['update_baseline']:
+            return None
+        try:
+            with open(options['baseline'], encoding='utf-8') as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            raise CommandError(f"No baseline at {options['baseline']}; run with --update-baseline first")
+
+        meta = baseline.get('meta', {})
+        if (meta.get('users'), meta.get('ideas')) != (options['users'], options['ideas']):
+            raise CommandError(
+                f"Baseline was recorded with {meta.get('users')} users / {meta.get('ideas')} ideas; "
+                f'query counts and timings are only comparable on the same dataset'
+            )
+        return baseline
+
+    def _write_baseline(self, options, results):
+        baseline = {
+            'meta': {
+                'users': options['users'],
+                'ideas': options['ideas'],
+                'repeat': options['repeat'],
+                'postgres': connection.pg_version,
+            },
+            'endpoints': results,
+        }
+        with open(options['baseline'], 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        self.stdout.write(self.style.SUCCESS(f"Baseline for {len(results)} endpoints written to {options['baseline']}"))
@@ -0,0 +1,151 @@
+"""
+Benchmark Runner - اجرای اندپوینت‌ها و اندازه‌گیری تعداد کوئری، زمان دیتابیس و زمان کل
+هر درخواست داخل یک تراکنش rollback‌شده اجرا می‌شود تا همه اجراها روی داده یکسان باشند
+"""
+
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection, transaction
+from rest_framework.test import APIClient
+
+from .endpoints import ENDPOINTS
+
+User = get_user_model()
+
+ROLE_REFS = {
+    'owner': 'owner_id',
+    'investor': 'investor_id',
+    'member': 'member_id',
+    'staff': 'staff_id',
+}
+
+
+class _Rollback(Exception):
+    pass
+
+
+class QueryRecorder:
+    """
+    شمارش کوئری‌ها و زمان دقیق آن‌ها با execute_wrapper
+    (برخلاف CaptureQueriesContext به DEBUG و سقف 9000 کوئری queries_log وابسته نیست)
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def _format(value, refs):
+    """جایگذاری شناسه‌های refs در مسیر و بدنه درخواست"""
+    if isinstance(value, str):
+        return value.format_map(refs)
+    if isinstance(value, dict):
+        return {key: _format(item, refs) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_format(item, refs) for item in value]
+    return value
+
+
+class BenchmarkRunner:
+    """
+    اجرای هر اندپوینت repeat بار و گزارش میانه
+    خروجی هر اندپوینت: {queries, db_ms, wall_ms, status}
+    """
+
+    def __init__(self, refs, repeat=5, endpoints=ENDPOINTS):
+        self.refs = refs
+        self.repeat = repeat
+        self.endpoints = endpoints
+
+    def _client(self, role):
+        client = APIClient()
+        if role:
+            # Fresh instance each time so cached relations don't leak between runs
+            client.force_authenticate(User.objects.get(id=self.refs[ROLE_REFS[role]]))
+        return client
+
+    def _request(self, item):
+        client = self._client(item.role)
+        path = _format(item.path, self.refs)
+        data = _format(item.data, self.refs)
+        kwargs = {'format': 'json'} if data is not None else {}
+        return getattr(client, item.method)(path, data, **kwargs)
+
+    def measure(self, item):
+        """یک اجرا: (status, queries, db_ms, wall_ms) و سپس rollback همه تغییرات"""
+        result = {}
+        # Each run starts with empty rate-limit windows, like the rolled-back data
+        caches['throttle'].clear()
+        try:
+            with transaction.atomic():
+                recorder = QueryRecorder()
+                with connection.execute_wrapper(recorder):
+                    started = time.perf_counter()
+                    response = self._request(item)
+                    if item.stream:
+                        # The view only does its work while the body is consumed
+                        b''.join(response.streaming_content)
+                    wall_ms = (time.perf_counter() - started) * 1000
+                result['status'] = response.status_code
+                result['queries'] = recorder.count
+                result['db_ms'] = recorder.seconds * 1000
+                result['wall_ms'] = wall_ms
+                raise _Rollback
+        except _Rollback:
+            pass
+        return result
+
+    def run_endpoint(self, item):
+        # One warm-up run fills per-process caches (content types, URL resolver, plans)
+        self.measure(item)
+        runs = [self.measure(item) for _ in range(self.repeat)]
+        return {
+            'status': runs[-1]['status'],
+            'queries': max(run['queries'] for run in runs),
+            'db_ms': round(statistics.median(run['db_ms'] for run in runs), 2),
+            'wall_ms': round(statistics.median(run['wall_ms'] for run in runs), 2),
+        }
+
+    def run(self, on_result=None):
+        results = {}
+        for item in self.endpoints:
+            results[item.name] = self.run_endpoint(item)
+            if on_result:
+                on_result(item, results[item.name])
+        return results
+
+
+def compare(results, baseline, tolerance=0.25, slack_ms=5.0):
+    """
+    مقایسه با baseline؛ خروجی لیست پیام‌های رگرسیون
+    - تعداد کوئری و status باید دقیقاً برابر یا بهتر باشد
+    - زمان‌ها تا baseline * (1 + tolerance) + slack_ms مجاز است (نویز ماشین CI)
+    """
+    regressions = []
+    for name, current in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            regressions.append(f'{name}: missing from baseline (run with --update-baseline)')
+            continue
+        if current['status'] != expected['status']:
+            regressions.append(f"{name}: status {current['status']} (baseline {expected['status']})")
+        if current['queries'] > expected['queries']:
+            regressions.append(f"{name}: {current['queries']} queries (baseline {expected['queries']})")
+        for metric in ('db_ms', 'wall_ms'):
+            limit = expected[metric] * (1 + tolerance) + slack_ms
+            if current[metric] > limit:
+                regressions.append(
+                    f'{name}: {metric} {current[metric]:.1f} > {limit:.1f} (baseline {expected[metric]:.1f})'
+                )
+    return regressions
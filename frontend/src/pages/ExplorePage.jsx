@@ -16,14 +16,17 @@ function ExplorePage() {
 
     const [ideas, setIdeas] = useState([]);
     const [loading, setLoading] = useState(true);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [searchQuery, setSearchQuery] = useState('');
     const [sortBy, setSortBy] = useState('newest');
     const [minScore, setMinScore] = useState('');
 
-    // Load ideas
-    const loadIdeas = useCallback(async () => {
+    // Load ideas (first page, or the next page when a cursor is given)
+    const loadIdeas = useCallback(async (cursor = null) => {
         try {
-            setLoading(true);
+            if (cursor) setLoadingMore(true);
+            else setLoading(true);
             const params = {};
 
             if (searchQuery) params.search = searchQuery;
@@ -31,14 +34,18 @@ function ExplorePage() {
             if (sortBy === 'top_rated') params.sort = 'top_rated';
             if (sortBy === 'newest') params.ordering = '-created_at';
             if (minScore) params.min_score = minScore;
+            if (cursor) params.cursor = cursor;
 
             const data = await marketplaceService.getPublicIdeas(params);
-            setIdeas(data.results || data);
+            const results = data.results || data;
+            setIdeas(prev => cursor ? [...prev, ...results] : results);
+            setNextCursor(marketplaceService.getCursor(data.next));
         } catch (error) {
             console.error('Error loading ideas:', error);
             toast.error('خطا در بارگذاری ایده‌ها');
         } finally {
             setLoading(false);
+            setLoadingMore(false);
         }
     }, [searchQuery, sortBy, minScore]);
 
@@ -190,6 +197,17 @@ function ExplorePage() {
                         ))}
                     </div>
                 )}
+
+                {!loading && nextCursor && (
+                    <div className="explore-page__more">
+                        <button
+                            onClick={() => loadIdeas(nextCursor)}
+                            disabled={loadingMore}
+                        >
+                            {loadingMore ? 'در حال بارگذاری...' : 'ایده‌های بیشتر'}
+                        </button>
+                    </div>
+                )}
             </main>
         </div>
     );
@@ -67,13 +67,13 @@ function IdeaChatPage() {
         messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
     };
 
-    // Execute AI action
-    const executeAction = async (action) => {
-        if (!action || applyingAction) return;
+    // Execute AI actions (all actions of one reply are applied together)
+    const executeActions = async (actions) => {
+        if (!actions?.length || applyingAction) return;
 
         setApplyingAction(true);
         try {
-            const result = await ideaService.applyAction(ideaId, action);
+            const result = await ideaService.applyActions(ideaId, actions);
             if (result.success) {
                 // Update local idea state with new data
                 setIdea(result.idea);
@@ -106,24 +106,45 @@ function IdeaChatPage() {
 
         setIsLoading(true);
 
+        // Placeholder that fills up as tokens stream in
+        const streamingId = `streaming-${Date.now()}`;
+        let streamStarted = false;
+
         try {
-            const response = await ideaService.sendChatMessage(ideaId, userMessage);
+            const response = await ideaService.streamChatMessage(ideaId, userMessage, (text) => {
+                if (!streamStarted) {
+                    streamStarted = true;
+                    setMessages(prev => [...prev, {
+                        id: streamingId,
+                        role: 'assistant',
+                        content: text,
+                        created_at: new Date().toISOString()
+                    }]);
+                    return;
+                }
+                setMessages(prev => prev.map(m =>
+                    m.id === streamingId ? { ...m, content: m.content + text } : m
+                ));
+            });
             const aiMessage = response.message;
 
-            setMessages(prev => [...prev, aiMessage]);
+            setMessages(prev => [...prev.filter(m => m.id !== streamingId), aiMessage]);
 
             // Auto-execute action if present (AI confirmed user approval)
-            if (aiMessage.suggested_action) {
+            const actions = response.all_actions?.length
+                ? response.all_actions
+                : [aiMessage.suggested_action].filter(Boolean);
+            if (actions.length) {
                 // Small delay for better UX
                 setTimeout(() => {
-                    executeAction(aiMessage.suggested_action);
+                    executeActions(actions);
                 }, 500);
             }
         } catch (error) {
             console.error('Error sending message:', error);
             const errorMsg = error.response?.data?.error || 'خطا در ارسال پیام';
             toast.error(errorMsg);
-            setMessages(prev => prev.slice(0, -1));
+            setMessages(prev => prev.filter(m => m.id !== streamingId).slice(0, -1));
             setInputValue(userMessage);
         } finally {
             setIsLoading(false);
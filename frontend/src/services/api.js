@@ -31,15 +31,19 @@ api.interceptors.request.use(
     }
 );
 
+// Token expired - clear it and redirect to login (also used by fetch-based requests)
+export const handleUnauthorized = () => {
+    localStorage.removeItem('access_token');
+    localStorage.removeItem('refresh_token');
+    window.location.href = '/login';
+};
+
 // Response interceptor - handle errors
 api.interceptors.response.use(
     (response) => response,
     (error) => {
         if (error.response?.status === 401) {
-            // Token expired - redirect to login
-            localStorage.removeItem('access_token');
-            localStorage.removeItem('refresh_token');
-            window.location.href = '/login';
+            handleUnauthorized();
         }
         return Promise.reject(error);
     }
@@ -2,14 +2,14 @@
  * Idea Service - سرویس مدیریت ایده‌ها و چت
  */
 
-import api from './api';
+import api, { handleUnauthorized } from './api';
 
 class IdeaService {
     // ========== Idea CRUD ==========
 
     async getMyIdeas() {
-        const response = await api.get('/ideas/my/');
-        return response.data;
+        const response = await api.get('/ideas/my/', { params: { page_size: 100 } });
+        return response.data.results || response.data;
     }
 
     async getIdea(id) {
@@ -33,9 +33,27 @@ class IdeaService {
 
     // ========== AI Scoring ==========
 
-    async getAIScore(ideaId) {
+    async getAIScore(ideaId, { pollInterval = 2000, maxWait = 120000 } = {}) {
+        // Scoring runs in a background job; poll its status until it finishes
         const response = await api.post(`/ideas/${ideaId}/ai_score/`);
-        return response.data;
+        const jobId = response.data.job_id;
+        const deadline = Date.now() + maxWait;
+
+        while (Date.now() < deadline) {
+            await new Promise((resolve) => setTimeout(resolve, pollInterval));
+            const { data: job } = await api.get(`/scoring/jobs/${jobId}/`);
+
+            if (job.status === 'done') {
+                return job.result;
+            }
+            if (job.status === 'failed') {
+                const error = new Error(job.error);
+                error.response = { data: job.result || { error: job.error } };
+                throw error;
+            }
+        }
+
+        throw new Error('Scoring job timed out');
     }
 
     async getSimilarIdeas(ideaId) {
@@ -55,6 +73,62 @@ class IdeaService {
         return response.data;
     }
 
+    /**
+     * ارسال پیام با پاسخ تدریجی (SSE)
+     * onDelta برای هر تکه متن صدا زده می‌شود؛ خروجی همان پاسخ sendChatMessage است
+     */
+    async streamChatMessage(ideaId, message, onDelta) {
+        const token = localStorage.getItem('access_token');
+        const response = await fetch(`${api.defaults.baseURL}/ideas/${ideaId}/chat/stream/`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream',
+                ...(token ? { Authorization: `Bearer ${token}` } : {}),
+            },
+            body: JSON.stringify({ message }),
+        });
+
+        const fail = (data) => {
+            const error = new Error(data?.error || data?.detail || 'Stream failed');
+            error.response = { status: response.status, data };
+            throw error;
+        };
+
+        // Rejected before the stream started (limits, throttling, auth): a plain JSON error body
+        if (!response.ok) {
+            if (response.status === 401) handleUnauthorized();
+            fail(await response.json().catch(() => null));
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let result = null;
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const raw = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                const event = raw.match(/^event: (.*)$/m)?.[1];
+                const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || 'null');
+
+                if (event === 'delta') onDelta?.(data.text);
+                else if (event === 'done') result = data;
+                else if (event === 'error') fail(data);
+            }
+        }
+
+        if (!result) fail(null);
+        return result;
+    }
+
     async getChatHistory(ideaId) {
         const response = await api.get(`/ideas/${ideaId}/chat/history/`);
         return response.data;
@@ -65,6 +139,14 @@ class IdeaService {
         return response.data;
     }
 
+    /**
+     * همه اکشن‌های یک پاسخ در یک تراکنش (همه یا هیچ‌کدام)
+     */
+    async applyActions(ideaId, actions) {
+        const response = await api.post(`/ideas/${ideaId}/chat/apply-action/`, { actions });
+        return response.data;
+    }
+
     // ========== Custom Fields ==========
 
     async getCustomFields(ideaId) {
@@ -15,6 +15,14 @@ const marketplaceService = {
         return response.data;
     },
 
+    /**
+     * استخراج cursor صفحه بعد از لینک next
+     */
+    getCursor: (url) => {
+        if (!url) return null;
+        return new URL(url).searchParams.get('cursor');
+    },
+
     /**
      * دریافت جزئیات یک ایده عمومی
      */
@@ -38,7 +46,7 @@ const marketplaceService = {
      */
     getComments: async (ideaId) => {
         const response = await api.get(`/ideas/marketplace/explore/${ideaId}/comments/`);
-        return response.data;
+        return response.data.results || response.data;
     },
 
     /**
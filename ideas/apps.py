@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class IdeasConfig(AppConfig):
     name = 'ideas'
+
+    def ready(self):
+        import ideas.signals
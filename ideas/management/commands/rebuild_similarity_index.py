@@ -0,0 +1,27 @@
+"""
+Management command to rebuild the idea similarity index
+Usage: python manage.py rebuild_similarity_index
+"""
+
+from django.core.management.base import BaseCommand
+from ideas.models import Idea, IdeaSignature, IdeaSignatureBand
+from ideas.similarity import similarity_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds MinHash signatures and similar_count for all ideas'
+
+    def handle(self, *args, **options):
+        # Start from an empty index so every similar_count is rebuilt from scratch
+        IdeaSignatureBand.objects.all().delete()
+        IdeaSignature.objects.all().delete()
+        Idea.objects.update(similar_count=0)
+
+        count = 0
+        for idea in Idea.objects.prefetch_related('tags').iterator(chunk_size=500):
+            similarity_index.index_idea(idea, force=True)
+            count += 1
+            if count % 100 == 0:
+                self.stdout.write(f'Indexed {count} ideas...')
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully indexed {count} ideas'))
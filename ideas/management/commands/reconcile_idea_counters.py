@@ -0,0 +1,43 @@
+"""
+Management command to repair drift in the denormalized idea counters
+Usage: python manage.py reconcile_idea_counters [--dry-run]
+"""
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from ideas.models import Idea, IdeaStar, Comment
+
+
+def _count_subquery(model):
+    counts = model.objects.filter(idea=OuterRef('pk')).order_by().values('idea').annotate(
+        total=Count('id')
+    ).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = 'Recomputes Idea.star_count and Idea.comment_count where they drifted from the real rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report ideas with drifted counters')
+
+    def handle(self, *args, **options):
+        actual_stars = _count_subquery(IdeaStar)
+        actual_comments = _count_subquery(Comment)
+
+        drifted = Idea.objects.alias(
+            actual_stars=actual_stars,
+            actual_comments=actual_comments,
+        ).filter(
+            ~Q(star_count=actual_stars) | ~Q(comment_count=actual_comments)
+        )
+
+        if options['dry_run']:
+            self.stdout.write(f'{drifted.count()} ideas have drifted counters')
+            return
+
+        # Single UPDATE ... WHERE, only rewriting rows that are actually wrong
+        fixed = drifted.update(star_count=actual_stars, comment_count=actual_comments)
+        self.stdout.write(self.style.SUCCESS(f'Reconciled counters for {fixed} ideas'))
@@ -6,7 +6,8 @@ from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
-from django.db.models import Count, Q
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
 from django.utils import timezone
 
 from .models import (
@@ -18,6 +19,8 @@ from .serializers import (
     InvestmentRequestSerializer, InvestmentMessageSerializer,
     DuplicateReportSerializer
 )
+from .pagination import IdeaFeedPagination, CommentPagination, MessageThreadPagination
+from .search import IdeaSearchFilter
 
 
 class ExploreViewSet(viewsets.ReadOnlyModelViewSet):
@@ -26,17 +29,17 @@ class ExploreViewSet(viewsets.ReadOnlyModelViewSet):
     با جستجو، فیلتر و مرتب‌سازی
     """
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['title', 'description', 'tags__name']
-    ordering_fields = ['created_at', 'ai_score']
-    ordering = ['-created_at']
+    pagination_class = IdeaFeedPagination
+    # Set per action; see subscriptions.throttles.PlanRateThrottle
+    throttle_scope = None
+    # IdeaSearchFilter runs last so relevance wins over the default ordering
+    filter_backends = [filters.OrderingFilter, IdeaSearchFilter]
+    ordering_fields = ['created_at', 'ai_score', 'star_count']
+    # No default `ordering`: it would override `sort` below (Idea.Meta already orders by -created_at)
     
     def get_queryset(self):
-        queryset = Idea.objects.filter(
-            visibility='public'
-        ).select_related('user', 'category').annotate(
-            star_count=Count('stars'),
-            comment_count=Count('comments')
+        queryset = self.get_serializer_class().setup_eager_loading(
+            Idea.objects.filter(visibility='public'), self.request
         )
         
         # Filter by category
@@ -52,9 +55,9 @@ class ExploreViewSet(viewsets.ReadOnlyModelViewSet):
         # Sort by stars count
         sort = self.request.query_params.get('sort')
         if sort == 'popular':
-            queryset = queryset.order_by('-star_count')
+            queryset = queryset.order_by('-star_count', '-created_at')
         elif sort == 'top_rated':
-            queryset = queryset.order_by('-ai_score')
+            queryset = queryset.order_by(F('ai_score').desc(nulls_last=True), '-created_at')
         
         return queryset
     
@@ -63,36 +66,43 @@ class ExploreViewSet(viewsets.ReadOnlyModelViewSet):
             return IdeaPublicDetailSerializer
         return IdeaPublicPreviewSerializer
     
-    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated], throttle_scope='star')
     def star(self, request, pk=None):
         """ستاره دادن/برداشتن"""
         idea = self.get_object()
         
-        # Check if already starred
-        star = IdeaStar.objects.filter(idea=idea, user=request.user).first()
-        if star:
-            star.delete()
-            return Response({
-                'starred': False,
-                'star_count': idea.stars.count()
-            })
-        else:
-            IdeaStar.objects.create(idea=idea, user=request.user)
-            return Response({
-                'starred': True,
-                'star_count': idea.stars.count()
-            })
+        # Toggle; star_count is adjusted by the IdeaStar signals
+        deleted, _ = IdeaStar.objects.filter(idea=idea, user=request.user).delete()
+        starred = not deleted
+        if starred:
+            try:
+                with transaction.atomic():
+                    IdeaStar.objects.create(idea=idea, user=request.user)
+            except IntegrityError:
+                # Concurrent double-click: the other request already starred it
+                pass
+        
+        idea.refresh_from_db(fields=['star_count'])
+        return Response({
+            'starred': starred,
+            'star_count': idea.star_count
+        })
     
-    @action(detail=True, methods=['get', 'post'], permission_classes=[IsAuthenticated])
+    @action(detail=True, methods=['get', 'post'], permission_classes=[IsAuthenticated],
+            throttle_scope='comment')
     def comments(self, request, pk=None):
         """کامنت‌های ایده"""
         idea = self.get_object()
         
         if request.method == 'GET':
             # فقط کامنت‌های اصلی (نه ریپلای‌ها)
-            comments = idea.comments.filter(parent=None).order_by('-created_at')[:50]
-            serializer = CommentSerializer(comments, many=True)
-            return Response(serializer.data)
+            comments = CommentSerializer.setup_eager_loading(
+                idea.comments.filter(parent=None).order_by('-created_at')
+            )
+            paginator = CommentPagination()
+            page = paginator.paginate_queryset(comments, request, view=self)
+            serializer = CommentSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
         
         elif request.method == 'POST':
             content = request.data.get('content')
@@ -113,7 +123,7 @@ class ExploreViewSet(viewsets.ReadOnlyModelViewSet):
             )
             return Response(CommentSerializer(comment).data, status=status.HTTP_201_CREATED)
     
-    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated], throttle_scope='invest')
     def invest(self, request, pk=None):
         """درخواست سرمایه‌گذاری"""
         idea = self.get_object()
@@ -194,9 +204,10 @@ class InvestmentRequestViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         # درخواست‌هایی که کاربر فرستاده یا دریافت کرده
-        return InvestmentRequest.objects.filter(
-            Q(investor=user) | Q(idea__user=user)
-        ).select_related('idea', 'investor', 'idea__user')
+        return InvestmentRequestSerializer.setup_eager_loading(
+            InvestmentRequest.objects.filter(Q(investor=user) | Q(idea__user=user)),
+            self.request
+        )
     
     @action(detail=True, methods=['post'])
     def accept(self, request, pk=None):
@@ -263,9 +274,13 @@ class InvestmentRequestViewSet(viewsets.ModelViewSet):
             # Mark as read
             investment.messages.exclude(sender=request.user).update(is_read=True)
             
-            messages = investment.messages.all()
-            serializer = InvestmentMessageSerializer(messages, many=True)
-            return Response(serializer.data)
+            # Newest page first; each page is returned oldest-to-newest
+            messages = investment.messages.order_by('-created_at')
+            paginator = MessageThreadPagination()
+            page = paginator.paginate_queryset(messages, request, view=self)
+            page.reverse()
+            serializer = InvestmentMessageSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
         
         elif request.method == 'POST':
             content = request.data.get('content')
@@ -293,7 +308,7 @@ class CommentViewSet(viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     
     def get_queryset(self):
-        return Comment.objects.filter(user=self.request.user)
+        return CommentSerializer.setup_eager_loading(Comment.objects.filter(user=self.request.user))
     
     def perform_update(self, serializer):
         serializer.save(is_edited=True)
@@ -0,0 +1,42 @@
+# Generated by Django 6.0 on 2026-10-18 01:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ideas', '0006_marketplace_models'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdeaSignature',
+            fields=[
+                ('idea', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='ideas.idea')),
+                ('content_hash', models.CharField(max_length=64, verbose_name='هش محتوا')),
+                ('minhash', models.JSONField(default=list, verbose_name='امضای MinHash')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'امضای شباهت',
+                'verbose_name_plural': 'امضاهای شباهت',
+            },
+        ),
+        migrations.CreateModel(
+            name='IdeaSignatureBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('bucket', models.BigIntegerField()),
+                ('idea', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='signature_bands', to='ideas.idea')),
+            ],
+            options={
+                'verbose_name': 'باند LSH',
+                'verbose_name_plural': 'باندهای LSH',
+                'indexes': [models.Index(fields=['band', 'bucket'], name='ideas_ideas_band_61f988_idx')],
+                'unique_together': {('idea', 'band')},
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 6.0 on 2026-10-18 02:00
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+# ideas.similarity.normalize_text and ideas.search.build_search_vector as of this migration,
+# in SQL: one UPDATE for all ideas instead of two queries per idea
+NORMALIZE_FROM = 'يىئكۀةأإٱؤ\u200c۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩\u0640'
+NORMALIZE_TO = 'یییکههاااو 01234567890123456789'  # Tatweel has no counterpart: translate() drops it
+DIACRITICS = '[\u064b-\u065f\u0670]'
+
+
+def backfill_search_vector(apps, schema_editor):
+    Idea = apps.get_model('ideas', 'Idea')
+    IdeaTag = apps.get_model('ideas', 'IdeaTag')
+    quote = schema_editor.quote_name
+
+    def normalized(column):
+        return f"lower(regexp_replace(translate(coalesce({column}, ''), %(from)s, %(to)s), %(diacritics)s, '', 'g'))"
+
+    def weighted(column, weight):
+        return f"setweight(to_tsvector('simple', {normalized(column)}), '{weight}')"
+
+    tags = (
+        f"(SELECT string_agg(t.{quote('name')}, ' ') FROM {quote(IdeaTag._meta.db_table)} AS t "
+        f"WHERE t.{quote('idea_id')} = i.{quote('id')})"
+    )
+    schema_editor.execute(
+        f"UPDATE {quote(Idea._meta.db_table)} AS i SET {quote('search_vector')} = "
+        f"{weighted('i.' + quote('title'), 'A')} || {weighted(tags, 'A')} "
+        f"|| {weighted('i.' + quote('description'), 'B')}",
+        {'from': NORMALIZE_FROM, 'to': NORMALIZE_TO, 'diacritics': DIACRITICS},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ideas', '0007_idea_similarity_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='idea',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='idea',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='idea_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='idea',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='idea_title_trgm_gin', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(backfill_search_vector, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 6.0 on 2026-10-18 02:02
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Idea = apps.get_model('ideas', 'Idea')
+    IdeaStar = apps.get_model('ideas', 'IdeaStar')
+    Comment = apps.get_model('ideas', 'Comment')
+
+    def count_of(model):
+        counts = model.objects.filter(idea=OuterRef('pk')).order_by().values('idea').annotate(
+            total=Count('id')
+        ).values('total')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    Idea.objects.update(star_count=count_of(IdeaStar), comment_count=count_of(Comment))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ideas', '0008_idea_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idea',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد کامنت\u200cها'),
+        ),
+        migrations.AddField(
+            model_name='idea',
+            name='star_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد ستاره\u200cها'),
+        ),
+        migrations.AddIndex(
+            model_name='idea',
+            index=models.Index(fields=['visibility', '-star_count'], name='ideas_idea_visibil_785dcd_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
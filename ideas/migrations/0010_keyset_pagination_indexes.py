@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 02:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ideas', '0009_idea_star_count_comment_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='idea',
+            name='ideas_idea_visibil_785dcd_idx',
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['idea', 'parent', '-created_at', '-id'], name='ideas_comme_idea_id_df818a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='idea',
+            index=models.Index(fields=['visibility', '-star_count', '-id'], name='ideas_idea_visibil_864da5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='idea',
+            index=models.Index(fields=['visibility', '-created_at', '-id'], name='ideas_idea_visibil_99f6fc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='investmentmessage',
+            index=models.Index(fields=['request', '-created_at', '-id'], name='ideas_inves_request_8c8ca1_idx'),
+        ),
+    ]
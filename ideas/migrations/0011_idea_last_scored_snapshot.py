@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 03:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ideas', '0010_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idea',
+            name='last_scored_snapshot',
+            field=models.JSONField(blank=True, null=True, verbose_name='نسخه آخرین امتیازدهی'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-18 03:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ideas', '0011_idea_last_scored_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatsession',
+            name='summarized_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد پیام\u200cهای خلاصه\u200cشده'),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='summarized_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='خلاصه تا'),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='summary',
+            field=models.TextField(blank=True, verbose_name='خلاصه گفتگو'),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='summary_pending',
+            field=models.BooleanField(default=False, verbose_name='در انتظار خلاصه\u200cسازی'),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['session', 'created_at'], name='ideas_chatm_session_36f249_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatsession',
+            index=models.Index(condition=models.Q(('summary_pending', True)), fields=['id'], name='chatsession_summary_pending'),
+        ),
+    ]
@@ -4,6 +4,8 @@ Ideas Models - مدل‌های ایده‌ها
 
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 
 class Category(models.Model):
@@ -101,6 +103,12 @@ class Idea(models.Model):
         blank=True,
         verbose_name='توضیحات در زمان آخرین امتیازدهی'
     )
+    # متن همه فیلدهای امتیازدهی‌شده (scoring/change_detection.py)
+    last_scored_snapshot = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name='نسخه آخرین امتیازدهی'
+    )
     ai_feedback = models.TextField(
         blank=True,
         verbose_name='بازخورد هوش مصنوعی'
@@ -110,6 +118,19 @@ class Idea(models.Model):
         verbose_name='تعداد ایده‌های مشابه'
     )
     
+    # Marketplace counters (kept in sync by ideas/signals.py, repaired by reconcile_idea_counters)
+    star_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='تعداد ستاره‌ها'
+    )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='تعداد کامنت‌ها'
+    )
+    
+    # Full-text search (title/tags weight A, description weight B) - ideas/search.py
+    search_vector = SearchVectorField(null=True, editable=False)
+    
     # Limits
     scoring_count = models.PositiveIntegerField(
         default=0,
@@ -142,6 +163,10 @@ class Idea(models.Model):
             models.Index(fields=['-created_at']),
             models.Index(fields=['user', '-created_at']),
             models.Index(fields=['visibility']),
+            models.Index(fields=['visibility', '-star_count', '-id']),
+            models.Index(fields=['visibility', '-created_at', '-id']),
+            GinIndex(fields=['search_vector'], name='idea_search_vector_gin'),
+            GinIndex(fields=['title'], name='idea_title_trgm_gin', opclasses=['gin_trgm_ops']),
         ]
     
     def __str__(self):
@@ -172,6 +197,52 @@ class IdeaTag(models.Model):
         return self.name
 
 
+class IdeaSignature(models.Model):
+    """
+    امضای MinHash ایده (ایندکس شباهت - ideas/similarity.py)
+    """
+    idea = models.OneToOneField(
+        Idea,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='signature'
+    )
+    content_hash = models.CharField(max_length=64, verbose_name='هش محتوا')
+    minhash = models.JSONField(default=list, verbose_name='امضای MinHash')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'امضای شباهت'
+        verbose_name_plural = 'امضاهای شباهت'
+    
+    def __str__(self):
+        return f"Signature: {self.idea_id}"
+
+
+class IdeaSignatureBand(models.Model):
+    """
+    باندهای LSH امضای ایده - ایده‌های هم‌باکت کاندید شباهت هستند
+    """
+    idea = models.ForeignKey(
+        Idea,
+        on_delete=models.CASCADE,
+        related_name='signature_bands'
+    )
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+    
+    class Meta:
+        verbose_name = 'باند LSH'
+        verbose_name_plural = 'باندهای LSH'
+        unique_together = ['idea', 'band']
+        indexes = [
+            models.Index(fields=['band', 'bucket']),
+        ]
+    
+    def __str__(self):
+        return f"{self.idea_id}:{self.band}"
+
+
 class IdeaCustomField(models.Model):
     """
     فیلدهای سفارشی ایده‌ها - کاربر می‌تواند فیلد دلخواه بسازد
@@ -232,10 +303,20 @@ class ChatSession(models.Model):
     updated_at = models.DateTimeField(auto_now=True, verbose_name='آخرین بروزرسانی')
     is_active = models.BooleanField(default=True, verbose_name='فعال')
     
+    # خلاصه غلتان پیام‌های قدیمی (scoring/chat_summary.py)؛ فقط پیام‌های بعد از summarized_until
+    # به صورت کامل برای مدل ارسال می‌شوند
+    summary = models.TextField(blank=True, verbose_name='خلاصه گفتگو')
+    summarized_until = models.DateTimeField(null=True, blank=True, verbose_name='خلاصه تا')
+    summarized_count = models.PositiveIntegerField(default=0, verbose_name='تعداد پیام‌های خلاصه‌شده')
+    summary_pending = models.BooleanField(default=False, verbose_name='در انتظار خلاصه‌سازی')
+    
     class Meta:
         verbose_name = 'جلسه چت'
         verbose_name_plural = 'جلسات چت'
         ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(summary_pending=True), name='chatsession_summary_pending'),
+        ]
     
     def __str__(self):
         return f"چت: {self.idea.title[:30]} ({self.created_at.strftime('%Y-%m-%d')})"
@@ -280,6 +361,9 @@ class ChatMessage(models.Model):
         verbose_name = 'پیام چت'
         verbose_name_plural = 'پیام‌های چت'
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['session', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.get_role_display()}: {self.content[:50]}..."
@@ -320,6 +404,9 @@ class Comment(models.Model):
         verbose_name = 'کامنت'
         verbose_name_plural = 'کامنت‌ها'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['idea', 'parent', '-created_at', '-id']),
+        ]
     
     def __str__(self):
         return f"{self.user.email}: {self.content[:30]}..."
@@ -441,6 +528,9 @@ class InvestmentMessage(models.Model):
         verbose_name = 'پیام مذاکره'
         verbose_name_plural = 'پیام‌های مذاکره'
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['request', '-created_at', '-id']),
+        ]
     
     def __str__(self):
         return f"{self.sender.email}: {self.content[:30]}..."
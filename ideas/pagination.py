@@ -0,0 +1,253 @@
+"""
+Keyset Pagination - صفحه‌بندی cursor برای فیدها
+به جای COUNT(*) و OFFSET، هر صفحه با شرط WHERE روی کلید مرتب‌سازی
+(مثلاً (created_at, id)) از ایندکس خوانده می‌شود و هزینه همه صفحات ثابت است
+"""
+
+import base64
+import json
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, OrderBy, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    صفحه‌بندی keyset با cursor مبهم (base64)
+    - ترتیب از order_by کوئری (بعد از فیلترها) گرفته می‌شود و id برای یکتایی اضافه می‌شود
+    - پشتیبانی از NULL (مثلاً ai_score) مطابق nulls_first/nulls_last
+    - خروجی: {next, previous, results}
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    # Used when the queryset has no ordering at all
+    default_ordering = ('-created_at',)
+
+    # ========== Ordering ==========
+
+    def get_keys(self, queryset):
+        """
+        کلیدهای مرتب‌سازی: [(name, descending, nulls_last), ...] با id در انتها
+        """
+        ordering = list(queryset.query.order_by)
+        if not ordering and queryset.query.default_ordering:
+            ordering = list(queryset.model._meta.ordering)
+        if not ordering:
+            ordering = list(self.default_ordering)
+
+        keys = []
+        for item in ordering:
+            if isinstance(item, str):
+                descending = item.startswith('-')
+                name, nulls_last = item.lstrip('-'), None
+            elif isinstance(item, OrderBy) and isinstance(item.expression, F):
+                name, descending = item.expression.name, item.descending
+                nulls_last = True if item.nulls_last else (False if item.nulls_first else None)
+            else:
+                raise TypeError(f'KeysetPagination cannot paginate on ordering {item!r}')
+            if name == 'pk':
+                name = 'id'
+            if nulls_last is None:
+                # PostgreSQL default: NULLs sort as larger than any value
+                nulls_last = not descending
+            keys.append((name, descending, nulls_last))
+
+        if not any(name == 'id' for name, _, _ in keys):
+            keys.append(('id', keys[0][1], not keys[0][1]))
+        return keys
+
+    def _order_by(self, keys):
+        return [
+            OrderBy(F(name), descending=descending,
+                    nulls_last=nulls_last or None, nulls_first=(not nulls_last) or None)
+            for name, descending, nulls_last in keys
+        ]
+
+    @staticmethod
+    def _reverse(keys):
+        return [(name, not descending, not nulls_last) for name, descending, nulls_last in keys]
+
+    # ========== Keyset filter ==========
+
+    @staticmethod
+    def _after(name, value, descending, nulls_last):
+        """سطرهایی که در این ترتیب بعد از value می‌آیند"""
+        if value is None:
+            return Q(pk__in=[]) if nulls_last else Q(**{f'{name}__isnull': False})
+        condition = Q(**{f'{name}__lt' if descending else f'{name}__gt': value})
+        if nulls_last:
+            condition |= Q(**{f'{name}__isnull': True})
+        return condition
+
+    @staticmethod
+    def _equal(name, value):
+        if value is None:
+            return Q(**{f'{name}__isnull': True})
+        return Q(**{name: value})
+
+    def keyset_filter(self, keys, values):
+        """
+        (k1, k2, ..., id) > (v1, v2, ..., vid) به صورت
+        k1 > v1 OR (k1 = v1 AND k2 > v2) OR ...
+        """
+        condition = Q(pk__in=[])
+        prefix = Q()
+        for (name, descending, nulls_last), value in zip(keys, values):
+            condition |= prefix & self._after(name, value, descending, nulls_last)
+            prefix &= self._equal(name, value)
+        return condition
+
+    # ========== Cursor encoding ==========
+
+    def encode_cursor(self, keys, values, reverse=False):
+        payload = {
+            'k': [name for name, _, _ in keys],
+            'v': [self._dump_value(value) for value in values],
+        }
+        if reverse:
+            payload['r'] = 1
+        raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request, queryset, keys):
+        """خروجی: (values, reverse) یا None اگر cursor ارسال نشده باشد"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+            payload = json.loads(raw.decode('utf-8'))
+            names, values = payload['k'], payload['v']
+            if names != [name for name, _, _ in keys] or len(values) != len(keys):
+                raise ValueError('cursor does not match the current ordering')
+            values = [
+                self._load_value(queryset.model, name, value)
+                for name, value in zip(names, values)
+            ]
+        except (TypeError, ValueError, KeyError, ValidationError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return values, bool(payload.get('r'))
+
+    @staticmethod
+    def _dump_value(value):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+    @staticmethod
+    def _load_value(model, name, value):
+        if value is None:
+            return None
+        if not isinstance(value, (str, int, float)):
+            raise ValueError('unsupported cursor value')
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotation (e.g. search_rank)
+            return value
+        return field.to_python(value)
+
+    # ========== Pagination API ==========
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                size = int(request.query_params[self.page_size_query_param])
+                if size > 0:
+                    return min(size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        keys = self.get_keys(queryset)
+        cursor = self.decode_cursor(request, queryset, keys)
+        values, reverse = cursor if cursor else (None, False)
+
+        scan_keys = self._reverse(keys) if reverse else keys
+        queryset = queryset.order_by(*self._order_by(scan_keys))
+        if values is not None:
+            queryset = queryset.filter(self.keyset_filter(scan_keys, values))
+
+        # One extra row tells whether another page exists, without COUNT(*)
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        page = rows[:self.page_size]
+        if reverse:
+            page.reverse()
+
+        def key_values(obj):
+            return [getattr(obj, name) for name, _, _ in keys]
+
+        self.next_cursor = self.previous_cursor = None
+        if page:
+            if has_more or reverse:
+                self.next_cursor = self.encode_cursor(keys, key_values(page[-1]))
+            if values is not None and (has_more or not reverse):
+                self.previous_cursor = self.encode_cursor(keys, key_values(page[0]), reverse=True)
+        elif values is not None:
+            # Empty page past either end: point back the way we came
+            self.previous_cursor = self.encode_cursor(keys, values, reverse=not reverse)
+        return page
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self._link(self.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class IdeaFeedPagination(KeysetPagination):
+    """فید ایده‌ها (Explore، لیست ایده‌ها، پنل ادمین)"""
+    page_size = 20
+
+
+class CommentPagination(KeysetPagination):
+    page_size = 50
+
+
+class MessageThreadPagination(KeysetPagination):
+    """
+    رشته پیام‌ها: جدیدترین صفحه اول، next به پیام‌های قدیمی‌تر می‌رود
+    (نمایش هر صفحه به ترتیب زمانی با reverse در view)
+    """
+    page_size = 50
+    default_ordering = ('-created_at',)
@@ -0,0 +1,29 @@
+"""
+Ideas Renderers - رندرکننده‌های پاسخ
+"""
+
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+
+def sse_event(event, data):
+    """قالب‌بندی یک رویداد Server-Sent Events"""
+    payload = json.dumps(data, ensure_ascii=False, cls=DjangoJSONEncoder)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+class ServerSentEventRenderer(BaseRenderer):
+    """
+    پذیرش هدر Accept: text/event-stream
+    پاسخ‌های عادی (مثلاً خطای محدودیت) به صورت یک رویداد error ارسال می‌شوند
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return sse_event('error', data).encode(self.charset)
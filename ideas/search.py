@@ -0,0 +1,91 @@
+"""
+Idea Search - جستجوی تمام‌متن ایده‌ها با PostgreSQL
+ستون tsvector با ایندکس GIN، رتبه‌بندی ts_rank و fallback شباهت trigram
+"""
+
+import re
+
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity,
+)
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast
+from rest_framework import filters
+
+from .similarity import normalize_text
+
+# No Persian dictionary ships with PostgreSQL; text is normalised in Python instead
+SEARCH_CONFIG = 'simple'
+
+_QUERY_TOKEN_RE = re.compile(r'\w+')
+
+
+def build_search_vector(title, description, tag_names):
+    """عبارت tsvector ایده: عنوان و تگ‌ها با وزن A، توضیحات با وزن B"""
+    return (
+        SearchVector(Value(normalize_text(title)), weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Value(normalize_text(' '.join(tag_names))), weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Value(normalize_text(description)), weight='B', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vector(idea_id):
+    """بروزرسانی ستون search_vector یک ایده (بدون ارسال سیگنال save)"""
+    from .models import Idea, IdeaTag
+
+    idea = Idea.objects.filter(id=idea_id).values('title', 'description').first()
+    if idea is None:
+        return
+    tag_names = list(IdeaTag.objects.filter(idea_id=idea_id).values_list('name', flat=True))
+    Idea.objects.filter(id=idea_id).update(
+        search_vector=build_search_vector(idea['title'], idea['description'], tag_names)
+    )
+
+
+class IdeaSearchFilter(filters.BaseFilterBackend):
+    """
+    جایگزین SearchFilter برای ایده‌ها
+    - جستجوی تمام‌متن (پیشوندی) روی search_vector و مرتب‌سازی بر اساس ts_rank
+    - برای عبارت‌های کوتاه یا غلط املایی: شباهت trigram روی عنوان (عملگر %> با ایندکس
+      idea_title_trgm_gin؛ آستانه: pg_trgm.word_similarity_threshold در settings)
+    هر دو در یک کوئری: نتایج تمام‌متن اول، سپس عنوان‌های مشابه
+    """
+    search_param = 'search'
+    min_fulltext_length = 3
+
+    def get_search_terms(self, request):
+        return normalize_text(request.query_params.get(self.search_param, '')).strip()
+
+    def fulltext_query(self, terms):
+        tokens = _QUERY_TOKEN_RE.findall(terms)
+        if not tokens:
+            return None
+        # Prefix match on every token so partially typed words still hit
+        return SearchQuery(' & '.join(f'{token}:*' for token in tokens),
+                           search_type='raw', config=SEARCH_CONFIG)
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+
+        # Keep the view's ordering as a tie-breaker after relevance
+        ordering = list(queryset.query.order_by) or ['-created_at']
+
+        # Filter with the operators the GIN indexes serve; similarity is only computed for ordering
+        similar = Q(title__trigram_word_similar=terms)
+        rank = TrigramWordSimilarity(terms, 'title')
+        query = self.fulltext_query(terms) if len(terms) >= self.min_fulltext_length else None
+        if query is not None:
+            fulltext = Q(search_vector=query)
+            similar |= fulltext
+            # Normalization 32 keeps ts_rank below 1: full-text hits rank above any similarity
+            rank = Case(
+                When(fulltext, then=Value(1.0) + SearchRank(F('search_vector'), query, normalization=32)),
+                default=rank,
+            )
+
+        # Ranks are real (float4); cast to double so keyset cursor values round-trip exactly
+        return queryset.filter(similar).annotate(
+            search_rank=Cast(rank, FloatField())
+        ).order_by('-search_rank', *ordering)
@@ -2,6 +2,9 @@
 Ideas Serializers - سریالایزرهای ایده‌ها
 """
 
+from django.db import transaction
+from django.db.models import BooleanField, Count, Exists, IntegerField, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
 from rest_framework import serializers
 from .models import (
     Idea, Category, IdeaTag, IdeaCustomField, ChatSession, ChatMessage,
@@ -56,6 +59,17 @@ class IdeaSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'user', 'ai_score', 'ai_feedback', 'similar_count', 
                            'scoring_count', 'edit_count', 'created_at', 'updated_at']
     
+    def update(self, instance, validated_data):
+        """
+        فقط فیلدهای ارسال‌شده نوشته می‌شوند (save با update_fields)، نه کل سطر؛
+        ستون‌های امتیاز را worker امتیازدهی همزمان می‌نویسد
+        """
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        if validated_data:
+            instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
+    
     def get_remaining_scoring_attempts(self, obj):
         return max(0, obj.MAX_SCORING_ATTEMPTS - obj.scoring_count)
     
@@ -90,15 +104,17 @@ class IdeaCreateSerializer(serializers.ModelSerializer):
         tags_data = validated_data.pop('tags', [])
         custom_fields_data = validated_data.pop('custom_fields', [])
         
-        idea = Idea.objects.create(**validated_data)
-        
-        # Create tags
-        for tag_name in tags_data:
-            IdeaTag.objects.create(idea=idea, name=tag_name)
-        
-        # Create custom fields
-        for field_data in custom_fields_data:
-            IdeaCustomField.objects.create(idea=idea, **field_data)
+        with transaction.atomic():
+            idea = Idea.objects.create(**validated_data)
+            
+            # Create tags
+            for tag_name in tags_data:
+                IdeaTag.objects.create(idea=idea, name=tag_name)
+            
+            # Create custom fields (bulk: the idea is new, so there is no cached context to invalidate)
+            IdeaCustomField.objects.bulk_create(
+                IdeaCustomField(idea=idea, **field_data) for field_data in custom_fields_data
+            )
         
         return idea
     
@@ -127,10 +143,19 @@ class IdeaListSerializer(serializers.ModelSerializer):
             'visibility', 'has_chat', 'created_at'
         ]
     
+    @staticmethod
+    def setup_eager_loading(queryset, request=None):
+        """همه داده‌های لیست در یک کوئری (بدون کوئری جداگانه برای هر ایده)"""
+        return queryset.select_related('user', 'category').annotate(
+            has_active_chat=Exists(ChatSession.objects.filter(idea=OuterRef('pk'), is_active=True))
+        )
+    
     def get_remaining_scoring_attempts(self, obj):
         return max(0, obj.MAX_SCORING_ATTEMPTS - obj.scoring_count)
     
     def get_has_chat(self, obj):
+        if hasattr(obj, 'has_active_chat'):
+            return obj.has_active_chat
         return obj.chat_sessions.filter(is_active=True).exists()
 
 
@@ -158,15 +183,36 @@ class ChatSessionSerializer(serializers.ModelSerializer):
 
 class ChatSessionListSerializer(serializers.ModelSerializer):
     """سریالایزر لیست جلسات چت"""
-    message_count = serializers.IntegerField(read_only=True)
+    message_count = serializers.SerializerMethodField()
     last_message = serializers.SerializerMethodField()
     
     class Meta:
         model = ChatSession
         fields = ['id', 'idea', 'created_at', 'updated_at', 'is_active', 'message_count', 'last_message']
     
+    @staticmethod
+    def setup_eager_loading(queryset, request=None):
+        message_counts = ChatMessage.objects.filter(session=OuterRef('pk')).order_by().values('session').annotate(
+            total=Count('id')
+        ).values('total')
+        return queryset.annotate(
+            messages_total=Coalesce(Subquery(message_counts, output_field=IntegerField()), 0)
+        ).prefetch_related(Prefetch(
+            'messages',
+            queryset=ChatMessage.objects.order_by('-created_at', '-id')[:1],
+            to_attr='latest_messages'
+        ))
+    
+    def get_message_count(self, obj):
+        if hasattr(obj, 'messages_total'):
+            return obj.messages_total
+        return obj.message_count
+    
     def get_last_message(self, obj):
-        last = obj.messages.last()
+        if hasattr(obj, 'latest_messages'):
+            last = obj.latest_messages[0] if obj.latest_messages else None
+        else:
+            last = obj.messages.last()
         if last:
             return {
                 'role': last.role,
@@ -198,14 +244,39 @@ class CommentSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'user', 'created_at', 'is_edited']
     
+    # Limit to 5 replies
+    MAX_REPLIES = 5
+    
+    @staticmethod
+    def _with_replies_count(queryset):
+        reply_counts = Comment.objects.filter(parent=OuterRef('pk')).order_by().values('parent').annotate(
+            total=Count('id')
+        ).values('total')
+        return queryset.select_related('user').annotate(
+            replies_total=Coalesce(Subquery(reply_counts, output_field=IntegerField()), 0)
+        )
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset, request=None):
+        """کامنت‌ها + ۵ پاسخ آخر هر کدام با تعداد ثابت کوئری"""
+        replies = cls._with_replies_count(Comment.objects.order_by('-created_at', '-id'))
+        return cls._with_replies_count(queryset).prefetch_related(
+            Prefetch('replies', queryset=replies[:cls.MAX_REPLIES], to_attr='recent_replies')
+        )
+    
     def get_replies(self, obj):
         # Only get top-level replies
-        if obj.parent is None:
-            replies = obj.replies.all()[:5]  # Limit to 5 replies
+        if obj.parent_id is None:
+            if hasattr(obj, 'recent_replies'):
+                replies = obj.recent_replies
+            else:
+                replies = obj.replies.select_related('user')[:self.MAX_REPLIES]
             return CommentSerializer(replies, many=True).data
         return []
     
     def get_replies_count(self, obj):
+        if hasattr(obj, 'replies_total'):
+            return obj.replies_total
         return obj.replies.count()
 
 
@@ -253,19 +324,46 @@ class InvestmentRequestSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'idea', 'investor', 'status', 'created_at', 'updated_at']
     
+    @staticmethod
+    def setup_eager_loading(queryset, request=None):
+        """شمارش پیام‌ها، خوانده‌نشده‌ها و آخرین پیام به صورت subquery"""
+        def count_of(messages):
+            counts = messages.order_by().values('request').annotate(total=Count('id')).values('total')
+            return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+        
+        messages = InvestmentMessage.objects.filter(request=OuterRef('pk'))
+        unread = messages.filter(is_read=False)
+        if request and request.user.is_authenticated:
+            unread = unread.exclude(sender=request.user)
+        return queryset.select_related('idea', 'investor', 'idea__user').annotate(
+            messages_total=count_of(messages),
+            unread_total=count_of(unread) if request else Value(0),
+            last_message_content=Subquery(
+                messages.order_by('-created_at', '-id').values('content')[:1]
+            ),
+        )
+    
     def get_messages_count(self, obj):
+        if hasattr(obj, 'messages_total'):
+            return obj.messages_total
         return obj.messages.count()
     
     def get_unread_count(self, obj):
+        if hasattr(obj, 'unread_total'):
+            return obj.unread_total
         request = self.context.get('request')
         if request:
             return obj.messages.exclude(sender=request.user).filter(is_read=False).count()
         return 0
     
     def get_last_message(self, obj):
-        last_msg = obj.messages.order_by('-created_at').first()
-        if last_msg:
-            return last_msg.content[:50] + '...' if len(last_msg.content) > 50 else last_msg.content
+        if hasattr(obj, 'last_message_content'):
+            content = obj.last_message_content
+        else:
+            last_msg = obj.messages.order_by('-created_at').first()
+            content = last_msg.content if last_msg else None
+        if content:
+            return content[:50] + '...' if len(content) > 50 else content
         return None
 
 
@@ -296,8 +394,6 @@ class IdeaPublicPreviewSerializer(serializers.ModelSerializer):
     """
     user_name = serializers.CharField(source='user.full_name', read_only=True)
     category_name = serializers.CharField(source='category.name', read_only=True)
-    star_count = serializers.SerializerMethodField()
-    comment_count = serializers.SerializerMethodField()
     is_starred = serializers.SerializerMethodField()
     short_description = serializers.SerializerMethodField()
     
@@ -309,13 +405,18 @@ class IdeaPublicPreviewSerializer(serializers.ModelSerializer):
             'visibility', 'created_at'
         ]
     
-    def get_star_count(self, obj):
-        return obj.stars.count()
-    
-    def get_comment_count(self, obj):
-        return obj.comments.count()
+    @staticmethod
+    def setup_eager_loading(queryset, request=None):
+        """is_starred برای کاربر فعلی با یک EXISTS در همان کوئری لیست"""
+        if request and request.user.is_authenticated:
+            starred = Exists(IdeaStar.objects.filter(idea=OuterRef('pk'), user=request.user))
+        else:
+            starred = Value(False, output_field=BooleanField())
+        return queryset.select_related('user', 'category').annotate(starred_by_me=starred)
     
     def get_is_starred(self, obj):
+        if hasattr(obj, 'starred_by_me'):
+            return obj.starred_by_me
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.stars.filter(user=request.user).exists()
@@ -335,8 +436,6 @@ class IdeaPublicDetailSerializer(serializers.ModelSerializer):
     """
     user_name = serializers.CharField(source='user.full_name', read_only=True)
     category_name = serializers.CharField(source='category.name', read_only=True)
-    star_count = serializers.SerializerMethodField()
-    comment_count = serializers.SerializerMethodField()
     is_starred = serializers.SerializerMethodField()
     my_investment_request = serializers.SerializerMethodField()
     
@@ -349,13 +448,11 @@ class IdeaPublicDetailSerializer(serializers.ModelSerializer):
             'visibility', 'created_at'
         ]
     
-    def get_star_count(self, obj):
-        return obj.stars.count()
-    
-    def get_comment_count(self, obj):
-        return obj.comments.count()
+    setup_eager_loading = staticmethod(IdeaPublicPreviewSerializer.setup_eager_loading)
     
     def get_is_starred(self, obj):
+        if hasattr(obj, 'starred_by_me'):
+            return obj.starred_by_me
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.stars.filter(user=request.user).exists()
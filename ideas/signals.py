@@ -0,0 +1,95 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Idea, IdeaTag, IdeaStar, Comment, IdeaCustomField
+from .search import update_search_vector
+from .similarity import similarity_index
+
+
+def _schedule_idea_index(idea_id):
+    """
+    Index after commit, so an idea and its tags are indexed together
+    and ideas deleted in the same transaction are skipped.
+    """
+    def _index():
+        idea = Idea.objects.filter(id=idea_id).first()
+        if idea:
+            update_search_vector(idea.id)
+            similarity_index.index_idea(idea)
+    transaction.on_commit(_index)
+
+
+@receiver(post_save, sender=Idea)
+def index_idea_content(sender, instance, **kwargs):
+    """
+    Re-index an idea for full-text and similarity search when its content changes.
+    """
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not {'title', 'description'} & set(update_fields):
+        return
+    _schedule_idea_index(instance.id)
+
+
+@receiver(pre_delete, sender=Idea)
+def remove_idea_similarity(sender, instance, **kwargs):
+    """
+    Drop the idea from its neighbours' similar_count before it is deleted.
+    """
+    similarity_index.remove_idea(instance.id)
+
+
+@receiver(post_save, sender=IdeaTag)
+@receiver(post_delete, sender=IdeaTag)
+def index_tag_content(sender, instance, **kwargs):
+    """
+    Tags are part of both the search vector and the similarity signature.
+    """
+    _schedule_idea_index(instance.idea_id)
+
+
+def _adjust_counter(idea_id, field, delta):
+    """
+    Atomic in-database increment, so concurrent stars/comments never lose updates.
+    """
+    Idea.objects.filter(id=idea_id).update(**{field: Greatest(F(field) + delta, 0)})
+
+
+@receiver(post_save, sender=IdeaStar)
+def increment_star_count(sender, instance, created, **kwargs):
+    if created:
+        _adjust_counter(instance.idea_id, 'star_count', 1)
+
+
+@receiver(post_delete, sender=IdeaStar)
+def decrement_star_count(sender, instance, **kwargs):
+    _adjust_counter(instance.idea_id, 'star_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def increment_comment_count(sender, instance, created, **kwargs):
+    if created:
+        _adjust_counter(instance.idea_id, 'comment_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, **kwargs):
+    """
+    Also fires for replies removed by cascade with their parent.
+    """
+    _adjust_counter(instance.idea_id, 'comment_count', -1)
+
+
+@receiver(post_save, sender=IdeaCustomField)
+@receiver(post_delete, sender=IdeaCustomField)
+def touch_idea_for_custom_field(sender, instance, origin=None, **kwargs):
+    """
+    Custom fields are part of the chat advisor's idea context, which is cached
+    by (idea.id, idea.updated_at); bumping updated_at invalidates it.
+    """
+    if isinstance(origin, Idea):
+        # The idea itself is being deleted
+        return
+    Idea.objects.filter(id=instance.idea_id).update(updated_at=timezone.now())
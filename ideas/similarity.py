@@ -0,0 +1,232 @@
+"""
+Similarity Engine - موتور تشخیص ایده‌های مشابه
+توکن‌سازی سازگار با فارسی + امضای MinHash و ایندکس LSH ذخیره‌شده در دیتابیس
+"""
+
+import hashlib
+import random
+import re
+import zlib
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, When
+
+
+# ========== Persian-aware tokenization ==========
+
+_CHAR_MAP = str.maketrans({
+    'ي': 'ی', 'ى': 'ی', 'ئ': 'ی',
+    'ك': 'ک',
+    'ۀ': 'ه', 'ة': 'ه',
+    'أ': 'ا', 'إ': 'ا', 'ٱ': 'ا',
+    'ؤ': 'و',
+    '\u200c': ' ',  # ZWNJ: «می‌خواهم» و «می خواهم» یکسان شوند
+    '\u0640': '',   # Tatweel
+    **{persian: str(i) for i, persian in enumerate('۰۱۲۳۴۵۶۷۸۹')},
+    **{arabic: str(i) for i, arabic in enumerate('٠١٢٣٤٥٦٧٨٩')},
+})
+
+_DIACRITICS_RE = re.compile('[\u064b-\u065f\u0670]')
+_TOKEN_RE = re.compile(r'\w+')
+
+STOPWORDS = frozenset('''
+و در به از که این آن با را برای تا یا هم اما اگر نیز بر پس چون چه هر همه
+است هست بود شد شده شود می نمی ها های ای یک دو سه خود ما من تو او شما ایشان
+کند کرد کنند کنیم کرده دارد دارند داشت باشد باید نیست بی تر ترین ان
+the a an and or of to in for on with is are be this that it by as at from
+'''.split())
+
+
+def normalize_text(text):
+    """یکسان‌سازی نویسه‌های عربی/فارسی، حذف اعراب و نیم‌فاصله"""
+    text = (text or '').translate(_CHAR_MAP)
+    text = _DIACRITICS_RE.sub('', text)
+    return text.lower()
+
+
+def tokenize(text):
+    """توکن‌های معنادار متن (بدون کلمات ایست و توکن‌های تک‌حرفی)"""
+    return [
+        token for token in _TOKEN_RE.findall(normalize_text(text))
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+def idea_tokens(idea):
+    """مجموعه توکن‌های عنوان، توضیحات و تگ‌های ایده"""
+    tags = ' '.join(tag.name for tag in idea.tags.all())
+    return set(tokenize(f'{idea.title} {idea.description} {tags}'))
+
+
+# ========== MinHash / LSH ==========
+
+class MinHasher:
+    """
+    امضای MinHash با خانواده هش (a*x + b) mod p
+    تعداد جایگشت‌ها = bands * rows
+    """
+
+    PRIME = (1 << 61) - 1
+    MAX_HASH = (1 << 32) - 1
+
+    def __init__(self, bands=32, rows=2, seed=1404):
+        self.bands = bands
+        self.rows = rows
+        self.num_perm = bands * rows
+        rng = random.Random(seed)
+        self.permutations = [
+            (rng.randrange(1, self.PRIME), rng.randrange(0, self.PRIME))
+            for _ in range(self.num_perm)
+        ]
+
+    def signature(self, tokens):
+        """امضای MinHash برای مجموعه توکن‌ها"""
+        if not tokens:
+            return []
+        hashes = [zlib.crc32(token.encode('utf-8')) for token in tokens]
+        prime, max_hash = self.PRIME, self.MAX_HASH
+        return [
+            min(((a * h + b) % prime) & max_hash for h in hashes)
+            for a, b in self.permutations
+        ]
+
+    def band_buckets(self, signature):
+        """هش هر باند امضا (کلید جستجوی LSH)"""
+        buckets = []
+        for band in range(self.bands):
+            rows = signature[band * self.rows:(band + 1) * self.rows]
+            digest = hashlib.blake2b(repr(rows).encode(), digest_size=8).digest()
+            buckets.append(int.from_bytes(digest, 'big', signed=True))
+        return buckets
+
+    @staticmethod
+    def jaccard(sig_a, sig_b):
+        """تخمین شباهت Jaccard از روی دو امضا"""
+        if not sig_a or not sig_b or len(sig_a) != len(sig_b):
+            return 0.0
+        return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+class SimilarityIndex:
+    """
+    ایندکس LSH روی جداول IdeaSignature / IdeaSignatureBand
+    - به‌روزرسانی تدریجی هنگام ذخیره ایده یا تگ
+    - similar_count هنگام ایندکس (نه هنگام خواندن) محاسبه می‌شود
+    """
+
+    # Minimum estimated Jaccard similarity for two ideas to count as similar
+    THRESHOLD = 0.2
+    MAX_CANDIDATES = 200
+
+    def __init__(self, hasher=None):
+        self.hasher = hasher or MinHasher()
+
+    def _content_hash(self, tokens):
+        return hashlib.sha256(' '.join(sorted(tokens)).encode('utf-8')).hexdigest()
+
+    def _neighbors(self, idea_id, signature, public_only=False):
+        """ایده‌های مشابه بر اساس امضا: [(idea_id, similarity), ...] نزولی"""
+        from .models import IdeaSignature, IdeaSignatureBand
+
+        if not signature:
+            return []
+
+        bucket_filter = Q()
+        for band, bucket in enumerate(self.hasher.band_buckets(signature)):
+            bucket_filter |= Q(band=band, bucket=bucket)
+
+        candidates = IdeaSignatureBand.objects.filter(bucket_filter).exclude(idea_id=idea_id)
+        if public_only:
+            candidates = candidates.filter(idea__visibility='public')
+        # Ideas sharing the most bands first; caps work for very common buckets
+        candidate_ids = candidates.values('idea_id').annotate(
+            hits=Count('id')
+        ).order_by('-hits').values_list('idea_id', flat=True)[:self.MAX_CANDIDATES]
+
+        scored = []
+        for other_id, other_sig in IdeaSignature.objects.filter(
+            idea_id__in=list(candidate_ids)
+        ).values_list('idea_id', 'minhash'):
+            similarity = self.hasher.jaccard(signature, other_sig)
+            if similarity >= self.THRESHOLD:
+                scored.append((other_id, similarity))
+
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored
+
+    def _adjust_counts(self, idea_ids, delta):
+        from .models import Idea
+
+        if not idea_ids:
+            return
+        if delta > 0:
+            Idea.objects.filter(id__in=idea_ids).update(similar_count=F('similar_count') + delta)
+        else:
+            Idea.objects.filter(id__in=idea_ids).update(similar_count=Case(
+                When(similar_count__gt=0, then=F('similar_count') + delta),
+                default=0
+            ))
+
+    def index_idea(self, idea, force=False):
+        """ایندکس (یا بازایندکس) یک ایده؛ اگر محتوا تغییری نکرده باشد کاری انجام نمی‌شود"""
+        from .models import Idea, IdeaSignature, IdeaSignatureBand
+
+        tokens = idea_tokens(idea)
+        content_hash = self._content_hash(tokens)
+
+        with transaction.atomic():
+            current = IdeaSignature.objects.select_for_update().filter(idea_id=idea.id).first()
+            if current and current.content_hash == content_hash and not force:
+                return False
+
+            old_neighbors = {i for i, _ in self._neighbors(idea.id, current.minhash)} if current else set()
+
+            signature = self.hasher.signature(tokens)
+            IdeaSignature.objects.update_or_create(
+                idea_id=idea.id,
+                defaults={'content_hash': content_hash, 'minhash': signature}
+            )
+            IdeaSignatureBand.objects.filter(idea_id=idea.id).delete()
+            if signature:
+                IdeaSignatureBand.objects.bulk_create([
+                    IdeaSignatureBand(idea_id=idea.id, band=band, bucket=bucket)
+                    for band, bucket in enumerate(self.hasher.band_buckets(signature))
+                ])
+
+            new_neighbors = {i for i, _ in self._neighbors(idea.id, signature)}
+
+            # Similarity is symmetric: neighbours gain/lose this idea
+            self._adjust_counts(new_neighbors - old_neighbors, +1)
+            self._adjust_counts(old_neighbors - new_neighbors, -1)
+            Idea.objects.filter(id=idea.id).update(similar_count=len(new_neighbors))
+            idea.similar_count = len(new_neighbors)
+
+        return True
+
+    def remove_idea(self, idea_id):
+        """حذف ایده از ایندکس (قبل از حذف خود ایده صدا زده می‌شود)"""
+        from .models import IdeaSignature
+
+        current = IdeaSignature.objects.filter(idea_id=idea_id).first()
+        if current is None:
+            return
+        neighbors = {i for i, _ in self._neighbors(idea_id, current.minhash)}
+        self._adjust_counts(neighbors, -1)
+        current.delete()
+
+    def most_similar(self, idea, k=5, public_only=True):
+        """
+        k ایده شبیه‌تر: [(idea_id, similarity), ...]
+        فقط خواندنی: ایندکس با signal بعد از commit (ideas/signals.py) یا rebuild_similarity_index نوشته می‌شود؛
+        برای ایده‌ای که هنوز ایندکس نشده امضا در حافظه ساخته می‌شود
+        """
+        from .models import IdeaSignature
+
+        signature = IdeaSignature.objects.filter(idea_id=idea.id).values_list('minhash', flat=True).first()
+        if signature is None:
+            signature = self.hasher.signature(idea_tokens(idea))
+        return self._neighbors(idea.id, signature, public_only=public_only)[:k]
+
+
+# Singleton instance
+similarity_index = SimilarityIndex()
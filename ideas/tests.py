@@ -1,3 +1,396 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db.models import ExpressionWrapper, F, FloatField
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from scoring.chat_advisor import chat_advisor
+from subscriptions.models import UsageLog
+from subscriptions.services import LimitService
+
+from .models import ChatMessage, Comment, Idea, IdeaSignature, IdeaTag
+from .pagination import KeysetPagination
+from .serializers import IdeaSerializer
+from .similarity import MinHasher, SimilarityIndex, similarity_index, tokenize
+
+User = get_user_model()
+
+
+def make_user(name='owner'):
+    return User.objects.create_user(username=name, email=f'{name}@example.com', password='pass1234')
+
+
+class IdeaUpdateTests(TestCase):
+    """ویرایش ایده نباید ستون‌هایی را که worker امتیازدهی همزمان می‌نویسد بازنویسی کند"""
+
+    def setUp(self):
+        self.user = make_user()
+        self.idea = Idea.objects.create(user=self.user, title='اپ رزرو نوبت', description='توضیحات')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_edit_keeps_a_score_written_during_the_request(self):
+        idea_id = self.idea.pk
+
+        def scored_meanwhile(attrs):
+            # The worker saves its result after the view loaded the idea
+            Idea.objects.filter(pk=idea_id).update(ai_score=42.0, scoring_count=1, ai_feedback='خلاصه')
+            return attrs
+
+        with mock.patch.object(IdeaSerializer, 'validate', side_effect=scored_meanwhile):
+            response = self.client.patch(f'/api/ideas/{idea_id}/', {'title': 'اپ رزرو آنلاین'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['edit_count'], 1)
+        idea = Idea.objects.get(pk=idea_id)
+        self.assertEqual(idea.title, 'اپ رزرو آنلاین')
+        self.assertEqual((idea.ai_score, idea.scoring_count, idea.ai_feedback), (42.0, 1, 'خلاصه'))
+        self.assertEqual(idea.edit_count, 1)
+
+    def test_edit_limit(self):
+        Idea.objects.filter(pk=self.idea.pk).update(edit_count=Idea.MAX_EDIT_ATTEMPTS)
+        response = self.client.patch(f'/api/ideas/{self.idea.pk}/', {'title': 'عنوان تازه'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Idea.objects.get(pk=self.idea.pk).title, 'اپ رزرو نوبت')
+
+
+def read_events(response):
+    """رویدادهای SSE پاسخ به صورت [(event, data), ...]"""
+    body = b''.join(response.streaming_content).decode()
+    events = []
+    for raw in body.split('\n\n'):
+        if raw:
+            event, data = raw.split('\n', 1)
+            events.append((event.removeprefix('event: '), json.loads(data.removeprefix('data: '))))
+    return events
+
+
+class ChatStreamTests(TestCase):
+    """chat/stream: رویدادهای delta/done/error، ذخیره پاسخ و برگشت سهمیه در خطا"""
+
+    def setUp(self):
+        for alias in ('default', 'throttle'):
+            caches[alias].clear()
+        self.user = make_user()
+        self.idea = Idea.objects.create(user=self.user, title='اپ رزرو نوبت', description='توضیحات')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/ideas/{self.idea.pk}/chat/stream/'
+
+    def send(self, events):
+        with mock.patch.object(chat_advisor, 'stream_chat', return_value=iter(events)) as stream_chat:
+            response = self.client.post(self.url, {'message': 'بازار هدف چیست؟'}, format='json',
+                                        HTTP_ACCEPT='text/event-stream')
+            # The advisor is only iterated while the body streams
+            events = read_events(response)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(stream_chat.call_args.args[2], 'بازار هدف چیست؟')
+        return events
+
+    def chats_used(self):
+        return UsageLog.objects.get(user=self.user, usage_type=UsageLog.UsageType.AI_CHAT).count
+
+    def test_done_saves_the_reply(self):
+        action = {'action': 'update_field', 'field': 'budget', 'value': '۵۰ میلیون'}
+        events = self.send([
+            ('delta', 'بازار '),
+            ('delta', 'هدف'),
+            ('done', {'content': 'بازار هدف', 'suggested_action': action, 'all_actions': [action]}),
+        ])
+
+        self.assertEqual([event for event, _ in events], ['delta', 'delta', 'done'])
+        self.assertEqual(''.join(data['text'] for event, data in events[:2]), 'بازار هدف')
+        done = events[-1][1]
+        self.assertEqual(done['all_actions'], [action])
+        reply = ChatMessage.objects.get(pk=done['message']['id'])
+        self.assertEqual((reply.role, reply.content, reply.suggested_action), ('assistant', 'بازار هدف', action))
+        self.assertEqual(list(reply.session.messages.values_list('role', flat=True)), ['user', 'assistant'])
+        self.assertEqual(self.chats_used(), 1)
+
+    def test_error_refunds_the_chat(self):
+        events = self.send([
+            ('delta', 'بازار '),
+            ('error', {'content': '⚠️ خطا در ارتباط با سرور AI.', 'error': 'timeout'}),
+        ])
+
+        self.assertEqual(events, [('delta', {'text': 'بازار '}), ('error', {'error': '⚠️ خطا در ارتباط با سرور AI.'})])
+        self.assertFalse(ChatMessage.objects.filter(session__idea=self.idea, role='assistant').exists())
+        self.assertEqual(self.chats_used(), 0)
+
+    def test_daily_limit(self):
+        limit = LimitService.get_limits(self.user)['ai_chats_per_day']
+        UsageLog.objects.create(user=self.user, usage_type=UsageLog.UsageType.AI_CHAT, count=limit)
+
+        with mock.patch.object(chat_advisor, 'stream_chat') as stream_chat:
+            response = self.client.post(self.url, {'message': 'سلام'}, format='json', HTTP_ACCEPT='text/event-stream')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('event: error', response.content.decode())
+        stream_chat.assert_not_called()
+        self.assertFalse(ChatMessage.objects.filter(session__idea=self.idea).exists())
+
+
+class KeysetPaginationTests(TestCase):
+    """صفحه‌بندی cursor: بدون تکرار و جاافتادگی در هر دو جهت، با مقادیر برابر و NULL"""
+
+    def setUp(self):
+        self.user = make_user()
+        self.factory = APIRequestFactory()
+        base = timezone.now() - timedelta(days=1)
+        scores = [None, 70.5, None, 70.5, 12.0, 70.5, None, 88.25, 12.0, 40.0, None]
+        for i, score in enumerate(scores):
+            idea = Idea.objects.create(user=self.user, title=f'ایده {i}', description='توضیحات', ai_score=score)
+            # Pairs of ideas share a timestamp
+            Idea.objects.filter(pk=idea.pk).update(created_at=base + timedelta(minutes=i // 2))
+        self.ideas = Idea.objects.filter(user=self.user)
+
+    def paginate(self, queryset, page_size, cursor=None):
+        paginator = KeysetPagination()
+        params = {'page_size': page_size}
+        if cursor:
+            params['cursor'] = cursor
+        page = paginator.paginate_queryset(queryset, Request(self.factory.get('/ideas/', params)))
+        return [obj.pk for obj in page], paginator
+
+    def walk(self, queryset, page_size):
+        """همه صفحات رو به جلو و سپس برگشت با previous؛ خروجی: (ترتیب رفت، ترتیب برگشت)"""
+        forward, cursor, pages = [], None, []
+        while True:
+            ids, paginator = self.paginate(queryset, page_size, cursor)
+            forward += ids
+            pages.append(ids)
+            cursor = paginator.next_cursor
+            if cursor is None:
+                break
+        backward = pages[-1][:]
+        cursor = paginator.previous_cursor
+        while cursor:
+            ids, paginator = self.paginate(queryset, page_size, cursor)
+            backward = ids + backward
+            cursor = paginator.previous_cursor
+        return forward, backward
+
+    def assert_walk(self, queryset, expected, page_size=3):
+        forward, backward = self.walk(queryset, page_size)
+        self.assertEqual(forward, expected)
+        self.assertEqual(backward, expected)
+
+    def test_cursor_round_trip(self):
+        paginator = KeysetPagination()
+        keys = paginator.get_keys(self.ideas)
+        self.assertEqual(keys, [('created_at', True, False), ('id', True, False)])
+
+        idea = self.ideas.first()
+        cursor = paginator.encode_cursor(keys, [idea.created_at, idea.pk], reverse=True)
+        request = Request(self.factory.get('/ideas/', {'cursor': cursor}))
+        self.assertEqual(paginator.decode_cursor(request, self.ideas, keys), ([idea.created_at, idea.pk], True))
+
+        # A cursor from another ordering, or garbage, is a 404
+        other_keys = paginator.get_keys(self.ideas.order_by('title'))
+        for bad in (paginator.encode_cursor(other_keys, ['x', idea.pk]), 'not-a-cursor', cursor[:-4]):
+            with self.assertRaises(NotFound):
+                paginator.decode_cursor(Request(self.factory.get('/ideas/', {'cursor': bad})), self.ideas, keys)
+
+    def test_ties_on_the_ordering_key(self):
+        ideas = list(self.ideas)
+        expected = [idea.pk for idea in sorted(ideas, key=lambda idea: (idea.created_at, idea.pk), reverse=True)]
+        for page_size in (1, 2, 3, 4, 20):
+            with self.subTest(page_size=page_size):
+                self.assert_walk(self.ideas, expected, page_size)
+
+    def test_nulls_last(self):
+        queryset = self.ideas.order_by(F('ai_score').desc(nulls_last=True), 'created_at')
+        ideas = list(self.ideas)
+        scored = sorted((idea for idea in ideas if idea.ai_score is not None),
+                        key=lambda idea: (-idea.ai_score, idea.created_at, -idea.pk))
+        # id follows the first key's direction (descending)
+        unscored = sorted((idea for idea in ideas if idea.ai_score is None), key=lambda idea: (idea.created_at, -idea.pk))
+        self.assert_walk(queryset, [idea.pk for idea in scored + unscored])
+
+    def test_nulls_first_ascending(self):
+        queryset = self.ideas.order_by(F('ai_score').asc(nulls_first=True))
+        ideas = list(self.ideas)
+        unscored = sorted((idea.pk for idea in ideas if idea.ai_score is None))
+        scored = [idea.pk for idea in sorted((idea for idea in ideas if idea.ai_score is not None),
+                                             key=lambda idea: (idea.ai_score, idea.pk))]
+        self.assert_walk(queryset, unscored + scored)
+
+    def test_float_annotation_round_trip(self):
+        # Like search_rank: a float annotation (not a model field) with ties
+        queryset = self.ideas.filter(ai_score__isnull=False).annotate(
+            search_rank=ExpressionWrapper(F('ai_score') / 7.0, output_field=FloatField())
+        ).order_by('-search_rank')
+        ideas = sorted(queryset, key=lambda idea: (idea.search_rank, idea.pk), reverse=True)
+        self.assertNotEqual(ideas[0].search_rank, round(ideas[0].search_rank, 6))
+        self.assert_walk(queryset, [idea.pk for idea in ideas], page_size=2)
+
+    def test_page_size_is_capped(self):
+        ids, paginator = self.paginate(self.ideas, 1000)
+        self.assertEqual(paginator.page_size, KeysetPagination.max_page_size)
+        self.assertEqual(len(ids), self.ideas.count())
+        self.assertIsNone(paginator.next_cursor)
+        self.assertIsNone(paginator.previous_cursor)
+
+
+class PaginatedEndpointTests(TestCase):
+    """شکل پاسخ صفحه‌بندی‌شده: {next, previous, results}"""
+
+    def setUp(self):
+        self.user = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def follow(self, url):
+        """همه صفحات با لینک next؛ خروجی: (شناسه‌ها، پاسخ‌ها)"""
+        ids, responses = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(list(response.data), ['next', 'previous', 'results'])
+            responses.append(response.data)
+            ids += [item['id'] for item in response.data['results']]
+            url = response.data['next']
+        return ids, responses
+
+    def test_my_ideas(self):
+        ideas = [Idea.objects.create(user=self.user, title=f'ایده {i}', description='توضیحات') for i in range(5)]
+        Idea.objects.create(user=make_user('other'), title='ایده دیگران', description='توضیحات')
+
+        ids, pages = self.follow('/api/ideas/my/?page_size=2')
+        self.assertEqual(ids, [idea.pk for idea in reversed(ideas)])
+        self.assertEqual(len(pages), 3)
+        self.assertIsNone(pages[0]['previous'])
+        self.assertIsNotNone(pages[1]['previous'])
+
+        previous = self.client.get(pages[1]['previous'])
+        self.assertEqual([item['id'] for item in previous.data['results']], ids[:2])
+
+    def test_comments(self):
+        idea = Idea.objects.create(user=self.user, title='ایده عمومی', description='توضیحات')
+        comments = [Comment.objects.create(idea=idea, user=self.user, content=f'نظر {i}') for i in range(4)]
+        Comment.objects.create(idea=idea, user=self.user, parent=comments[0], content='پاسخ')
+
+        ids, pages = self.follow(f'/api/ideas/marketplace/explore/{idea.pk}/comments/?page_size=3')
+        # Top-level comments only, newest first; replies come nested
+        self.assertEqual(ids, [comment.pk for comment in reversed(comments)])
+        self.assertEqual(len(pages), 2)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/ideas/my/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+HONEY = 'پرورش زنبور عسل ارگانیک در کندوهای مدرن و فروش مستقیم عسل روستا به خریداران شهری'
+HONEY_VARIANT = 'پرورش زنبور عسل ارگانیک در کندوهای مدرن و فروش مستقیم عسل روستا به رستوران‌های شهری'
+BICYCLE = 'تعمیر سیار دوچرخه برقی در محله با قطعات یدکی اصل و نوبت‌دهی تلفنی'
+
+
+class MinHasherTests(SimpleTestCase):
+    """امضای MinHash باید بین پردازه‌ها و اجراها ثابت باشد (در دیتابیس ذخیره می‌شود)"""
+
+    def test_signature_is_stable(self):
+        tokens = set(tokenize(HONEY))
+        signature = MinHasher().signature(tokens)
+        self.assertEqual(len(signature), MinHasher().num_perm)
+        self.assertEqual(MinHasher().signature(set(sorted(tokens, reverse=True))), signature)
+        self.assertEqual(MinHasher().band_buckets(signature), MinHasher().band_buckets(signature))
+        # Pinned: a change here silently invalidates every stored signature
+        self.assertEqual(MinHasher().signature({'عسل'})[:3], [1104924120, 3596614654, 3099764248])
+        self.assertNotEqual(MinHasher(seed=1).signature(tokens), signature)
+        self.assertEqual(MinHasher().signature(set()), [])
+
+    def test_jaccard_estimate(self):
+        hasher = MinHasher()
+        honey = hasher.signature(set(tokenize(HONEY)))
+        self.assertEqual(hasher.jaccard(honey, honey), 1.0)
+        self.assertGreater(hasher.jaccard(honey, hasher.signature(set(tokenize(HONEY_VARIANT)))), 0.6)
+        self.assertLess(hasher.jaccard(honey, hasher.signature(set(tokenize(BICYCLE)))), 0.1)
+        self.assertEqual(hasher.jaccard(honey, []), 0.0)
+
+    def test_tokenize_normalizes_persian(self):
+        self.assertEqual(tokenize('كيك‌های خانگي'), tokenize('کیک های خانگی'))
+        self.assertEqual(tokenize('در ۱۴۰۴ و با AI'), ['1404', 'ai'])
+
+
+class SimilarityIndexTests(TestCase):
+    """ایندکس LSH: similar_count دوطرفه، بازایندکس، حذف و جستجوی فقط‌خواندنی"""
+
+    def setUp(self):
+        self.user = make_user()
+
+    def create(self, title, description, **fields):
+        # Indexing runs after commit (ideas/signals.py)
+        with self.captureOnCommitCallbacks(execute=True):
+            return Idea.objects.create(user=self.user, title=title, description=description, **fields)
+
+    def similar_count(self, idea):
+        return Idea.objects.get(pk=idea.pk).similar_count
+
+    def test_index_and_most_similar(self):
+        honey = self.create('عسل ارگانیک روستا', HONEY)
+        variant = self.create('عسل ارگانیک روستا', HONEY_VARIANT)
+        bicycle = self.create('دوچرخه برقی', BICYCLE)
+
+        self.assertEqual((self.similar_count(honey), self.similar_count(variant), self.similar_count(bicycle)), (1, 1, 0))
+        neighbors = similarity_index.most_similar(honey)
+        self.assertEqual([idea_id for idea_id, _ in neighbors], [variant.pk])
+        self.assertGreaterEqual(neighbors[0][1], SimilarityIndex.THRESHOLD)
+        self.assertEqual(similarity_index.most_similar(bicycle), [])
+        # Unchanged content is not re-indexed
+        self.assertFalse(similarity_index.index_idea(honey))
+
+    def test_reindex_moves_neighbours(self):
+        honey = self.create('عسل ارگانیک روستا', HONEY)
+        variant = self.create('عسل ارگانیک روستا', HONEY_VARIANT)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            variant.title, variant.description = 'دوچرخه برقی', BICYCLE
+            variant.save(update_fields=['title', 'description'])
+        self.assertEqual((self.similar_count(honey), self.similar_count(variant)), (0, 0))
+
+        # Tags are part of the signature too
+        before = IdeaSignature.objects.get(idea=honey).minhash
+        with self.captureOnCommitCallbacks(execute=True):
+            IdeaTag.objects.create(idea=honey, name='گرده‌افشانی')
+        self.assertNotEqual(IdeaSignature.objects.get(idea=honey).minhash, before)
+
+    def test_remove_idea(self):
+        honey = self.create('عسل ارگانیک روستا', HONEY)
+        variant = self.create('عسل ارگانیک روستا', HONEY_VARIANT)
+
+        variant.delete()
+        self.assertEqual(self.similar_count(honey), 0)
+        self.assertFalse(IdeaSignature.objects.filter(idea_id=variant.pk).exists())
+        # Removing again is a no-op
+        similarity_index.remove_idea(variant.pk)
+        self.assertEqual(self.similar_count(honey), 0)
+
+    def test_private_ideas_are_not_suggested(self):
+        honey = self.create('عسل ارگانیک روستا', HONEY)
+        self.create('عسل ارگانیک روستا', HONEY_VARIANT, visibility=Idea.VisibilityChoices.PRIVATE)
+
+        self.assertEqual(similarity_index.most_similar(honey), [])
+        self.assertEqual(len(similarity_index.most_similar(honey, public_only=False)), 1)
+
+    def test_similar_endpoint_does_not_write(self):
+        variant = self.create('عسل ارگانیک روستا', HONEY_VARIANT)
+        # Not indexed yet (its on-commit callback never ran)
+        honey = Idea.objects.create(user=self.user, title='عسل ارگانیک روستا', description=HONEY)
+        signatures = IdeaSignature.objects.count()
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(f'/api/ideas/{honey.pk}/similar/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data['ideas']], [variant.pk])
+        self.assertGreater(response.data['ideas'][0]['similarity'], 50)
+        self.assertEqual(IdeaSignature.objects.count(), signatures)
+        self.assertEqual(self.similar_count(variant), 0)
@@ -2,6 +2,7 @@
 Ideas URLs - مسیرهای ایده‌ها
 """
 
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
@@ -24,3 +25,10 @@ urlpatterns = [
     path('', include(router.urls)),
     path('marketplace/', include(marketplace_router.urls)),
 ]
+
+if settings.ASYNC_VIEWS:
+    # ASGI: chat endpoints run as async views; the router's sync actions stay as fallback
+    urlpatterns = [
+        path('<int:pk>/chat/', views.IdeaChatAsyncView.as_view()),
+        path('<int:pk>/chat/stream/', views.IdeaChatStreamAsyncView.as_view()),
+    ] + urlpatterns
@@ -2,10 +2,19 @@
 Ideas Views - ویوهای ایده‌ها
 """
 
+from contextlib import aclosing
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.renderers import JSONRenderer
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+
+from IdeaFlow.async_views import AsyncAPIView, run_sync
 
 from .models import Idea, Category, ChatSession, ChatMessage, IdeaCustomField
 from .serializers import (
@@ -19,8 +28,12 @@ from .serializers import (
     SendChatMessageSerializer,
     IdeaCustomFieldSerializer,
 )
+from .pagination import IdeaFeedPagination
+from .renderers import ServerSentEventRenderer, sse_event
 from subscriptions.services import LimitService
 from subscriptions.models import UsageLog
+from scoring.chat_summary import load_history
+from scoring.llm_dispatch import LLMCaller
 
 
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
@@ -32,19 +45,89 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticatedOrReadOnly]
 
 
-class IdeaViewSet(viewsets.ModelViewSet):
+class ChatTurnMixin:
+    """
+    مراحل مشترک یک پیام چت در IdeaViewSet و viewهای async (IdeaChatAsyncView)
+    """
+    
+    def _start_chat_turn(self, request, idea):
+        """
+        اعتبارسنجی پیام کاربر، بررسی محدودیت و ذخیره پیام
+        خروجی: (error_response, session, user_message, history, reservation)
+        """
+        serializer = SendChatMessageSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        user_message = serializer.validated_data['message']
+        
+        # Reserve one chat from today's quota before calling the LLM
+        reservation = LimitService.reserve(request.user, UsageLog.UsageType.AI_CHAT)
+        if reservation is None:
+            return Response({
+                'error': 'شما به سقف پیام‌های روزانه رسیده‌اید. برای ادامه، پلن خود را ارتقا دهید.',
+            }, status=status.HTTP_429_TOO_MANY_REQUESTS), None, None, None, None
+        
+        # A failure before the LLM call gives the reserved chat back
+        with reservation:
+            # Get or create session
+            session, _ = ChatSession.objects.get_or_create(
+                idea=idea,
+                is_active=True
+            )
+            
+            # Recent unsummarised history (before the new message); older turns live in session.summary
+            history = load_history(session)
+            
+            # Save user message
+            ChatMessage.objects.create(
+                session=session,
+                role='user',
+                content=user_message
+            )
+        
+        return None, session, user_message, history, reservation
+    
+    def _active_session_response(self, idea):
+        """جلسه فعال ایده (در صورت نبود ساخته می‌شود)"""
+        session, created = ChatSession.objects.get_or_create(
+            idea=idea,
+            is_active=True
+        )
+        serializer = ChatSessionSerializer(session)
+        return Response(serializer.data)
+    
+    def _save_reply(self, session, result):
+        """ذخیره پاسخ AI؛ خروجی: داده پاسخ (پیام ذخیره‌شده و شناسه جلسه)"""
+        ai_message = ChatMessage.objects.create(
+            session=session,
+            role='assistant',
+            content=result.get('content', ''),
+            suggested_action=result.get('suggested_action')
+        )
+        return {
+            'message': ChatMessageSerializer(ai_message).data,
+            'session_id': session.id,
+            # Every action in the reply; chat/apply-action applies them together
+            'all_actions': result.get('all_actions') or [],
+        }
+
+
+class IdeaViewSet(ChatTurnMixin, viewsets.ModelViewSet):
     """
     CRUD ایده‌ها
     """
     permission_classes = [IsAuthenticated]
+    pagination_class = IdeaFeedPagination
+    # Set per action; see subscriptions.throttles.PlanRateThrottle
+    throttle_scope = None
     
     def get_queryset(self):
         user = self.request.user
         if self.action == 'list':
             # Show public ideas or user's own ideas
-            return Idea.objects.filter(
-                visibility='public'
-            ).select_related('user', 'category')
+            return IdeaListSerializer.setup_eager_loading(
+                Idea.objects.filter(visibility='public')
+            )
         return Idea.objects.filter(user=user).select_related('category')
     
     def get_serializer_class(self):
@@ -55,8 +138,9 @@ class IdeaViewSet(viewsets.ModelViewSet):
         return IdeaSerializer
     
     def create(self, request, *args, **kwargs):
-        # Check daily limit
-        if not LimitService.can_create_idea(request.user):
+        # Reserve today's quota atomically (concurrent requests can't both pass the check)
+        reservation = LimitService.reserve(request.user, UsageLog.UsageType.IDEA_CREATE)
+        if reservation is None:
             limits = LimitService.get_remaining_limits(request.user)
             return Response({
                 'error': 'محدودیت روزانه',
@@ -64,15 +148,15 @@ class IdeaViewSet(viewsets.ModelViewSet):
                 'upgrade_url': '/plans'
             }, status=status.HTTP_429_TOO_MANY_REQUESTS)
         
-        return super().create(request, *args, **kwargs)
+        # Validation errors raise, which refunds the reservation
+        with reservation:
+            return super().create(request, *args, **kwargs)
     
     def perform_create(self, serializer):
-        # Save idea and increment usage
-        idea = serializer.save(user=self.request.user)
-        LimitService.increment_usage(self.request.user, UsageLog.UsageType.IDEA_CREATE)
+        serializer.save(user=self.request.user)
 
     def perform_update(self, serializer):
-        idea = self.get_object()
+        idea = serializer.instance
         
         # Check edit limit
         if idea.edit_count >= idea.MAX_EDIT_ATTEMPTS:
@@ -81,182 +165,81 @@ class IdeaViewSet(viewsets.ModelViewSet):
                 'error': f'شما به سقف {idea.MAX_EDIT_ATTEMPTS} بار ویرایش رسیده‌اید.'
             })
 
-        # Save updates
+        # Save only the submitted fields (IdeaSerializer.update): the scoring worker may be
+        # writing ai_score, scoring_count and last_scored_* for this idea at the same time
         updated_idea = serializer.save()
         
-        # Increment edit count
+        # Increment edit count in the database, without rewriting the rest of the row
+        Idea.objects.filter(pk=idea.pk).update(edit_count=F('edit_count') + 1)
         updated_idea.edit_count += 1
-        updated_idea.save()
     
     @action(detail=False, methods=['get'])
     def my(self, request):
         """
         ایده‌های کاربر فعلی
         """
-        ideas = Idea.objects.filter(user=request.user).select_related('category')
-        serializer = IdeaListSerializer(ideas, many=True)
-        return Response(serializer.data)
+        ideas = IdeaListSerializer.setup_eager_loading(Idea.objects.filter(user=request.user))
+        page = self.paginate_queryset(ideas)
+        serializer = IdeaListSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], throttle_scope='ai_score')
     def ai_score(self, request, pk=None):
         """
-        دریافت امتیاز AI برای ایده با Groq
+        ثبت درخواست امتیاز AI برای ایده (پردازش در پس‌زمینه)
         محدودیت: حداکثر 3 بار امتیازگیری
+        پاسخ 202 شامل شناسه کار است؛ وضعیت از /api/scoring/jobs/<id>/ خوانده می‌شود
+        POST {"refresh": true}: تحلیل تازه حتی اگر همین محتوا قبلاً تحلیل شده باشد
         """
         idea = self.get_object()
         
-        # Check scoring limit
-        if idea.scoring_count >= idea.MAX_SCORING_ATTEMPTS:
-            return Response({
-                'error': f'شما فقط {idea.MAX_SCORING_ATTEMPTS} بار می‌توانید امتیازگیری کنید',
-                'remaining_attempts': 0
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Check if edited since last score (for re-scoring)
-        if idea.scoring_count > 0 and idea.last_scored_description:
-            # Simple text comparison (can be improved)
-            if idea.description.strip() == idea.last_scored_description.strip():
-                return Response({
-                    'error': 'برای امتیازگیری مجدد باید ایده را ویرایش کنید و تغییرات معناداری ایجاد کنید.',
-                    'remaining_attempts': idea.MAX_SCORING_ATTEMPTS - idea.scoring_count
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-        # Import AI service
-        from scoring.ai_service import idea_analyzer
-        
-        # Get category name
-        category_name = idea.category.name if idea.category else None
-        
-        # Get blocks data if available
-        blocks_data = idea.blocks if hasattr(idea, 'blocks') and idea.blocks else None
-        
-        # Analyze idea with AI (including blocks and advanced fields)
-        result = idea_analyzer.analyze_idea(
-            title=idea.title,
-            description=idea.description,
-            category=category_name,
-            previous_description=idea.last_scored_description if idea.scoring_count > 0 else None,
-            previous_score=idea.ai_score if idea.scoring_count > 0 else None,
-            blocks=blocks_data,
-            budget=idea.budget if hasattr(idea, 'budget') else None,
-            execution_steps=idea.execution_steps if hasattr(idea, 'execution_steps') else None,
-            required_skills=idea.required_skills if hasattr(idea, 'required_skills') else None
-        )
-        
-        # Check for errors
-        if 'error' in result:
-            return Response({
-                'error': result['error']
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        from scoring.services import ScoringService
+        from scoring.jobs import enqueue_scoring
         
-        # Save scores to idea
-        idea.ai_score = result.get('total_score', 0)
+        error = ScoringService.check_can_score(idea)
+        if error:
+            return Response(error, status=status.HTTP_400_BAD_REQUEST)
         
-        # Save current description as last scored
-        idea.last_scored_description = idea.description
-        
-        # Create detailed feedback
-        feedback_parts = []
-        
-        # Summary
-        if result.get('summary'):
-            feedback_parts.append(f"📝 {result['summary']}")
-        
-        # Verdict
-        verdict_map = {
-            'عالی': '🏆',
-            'خوب': '👍',
-            'متوسط': '👌',
-            'نیاز به بهبود': '📈',
-            'ضعیف': '⚠️'
-        }
-        verdict = result.get('verdict', '')
-        if verdict:
-            emoji = verdict_map.get(verdict, '📊')
-            feedback_parts.append(f"\n{emoji} **ارزیابی کلی:** {verdict}")
-        
-        # Scores breakdown
-        scores = result.get('scores', {})
-        if scores:
-            feedback_parts.append("\n\n📊 **امتیازات تفکیکی:**")
-            score_labels = {
-                'innovation': 'نوآوری',
-                'feasibility': 'امکان‌پذیری',
-                'market_potential': 'پتانسیل بازار',
-                'impact': 'تأثیرگذاری',
-                'competitive_advantage': 'مزیت رقابتی'
-            }
-            for key, label in score_labels.items():
-                if key in scores:
-                    feedback_parts.append(f"• {label}: {scores[key]}/20")
-        
-        # Strengths
-        feedback = result.get('feedback', {})
-        if feedback.get('strengths'):
-            feedback_parts.append("\n\n✅ **نقاط قوت:**")
-            for s in feedback['strengths']:
-                feedback_parts.append(f"• {s}")
-        
-        # Weaknesses
-        if feedback.get('weaknesses'):
-            feedback_parts.append("\n\n⚠️ **نقاط ضعف:**")
-            for w in feedback['weaknesses']:
-                feedback_parts.append(f"• {w}")
-        
-        # Suggestions
-        if feedback.get('suggestions'):
-            feedback_parts.append("\n\n💡 **پیشنهادات:**")
-            for sg in feedback['suggestions']:
-                feedback_parts.append(f"• {sg}")
-        
-        idea.ai_feedback = '\n'.join(feedback_parts)
-        
-        # Increment scoring count
-        idea.scoring_count += 1
-        idea.save()
-        
-        # Update user score
-        from scoring.models import UserScore
-        user_score, _ = UserScore.objects.get_or_create(user=idea.user)
-        user_score.update_score()
-        
-        remaining = idea.MAX_SCORING_ATTEMPTS - idea.scoring_count
+        refresh = str(request.data.get('refresh', '')).lower() in ('1', 'true')
+        job, created = enqueue_scoring(idea, request.user, bypass_cache=refresh)
         
         return Response({
-            'ai_score': idea.ai_score,
-            'ai_feedback': idea.ai_feedback,
-            'scores': result.get('scores', {}),
-            'verdict': result.get('verdict', ''),
-            'scoring_count': idea.scoring_count,
-            'remaining_attempts': remaining,
-            'message': f'امتیاز AI محاسبه شد. ({remaining} بار دیگر باقی مانده)'
-        })
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': reverse('scoring:scoring_job', kwargs={'pk': job.id}),
+            'message': 'درخواست امتیازدهی ثبت شد و در حال پردازش است.' if created
+                       else 'درخواست امتیازدهی این ایده در حال پردازش است.'
+        }, status=status.HTTP_202_ACCEPTED)
     
     @action(detail=True, methods=['get'])
     def similar(self, request, pk=None):
         """
-        ایده‌های مشابه
-        (در آینده با الگوریتم مقایسه متنی پیاده‌سازی می‌شود)
+        ایده‌های مشابه (ایندکس MinHash/LSH - ideas/similarity.py)
+        فقط خواندنی؛ ایندکس بعد از commit ذخیره ایده به‌روز می‌شود (ideas/signals.py)
         """
         idea = self.get_object()
         
-        # TODO: پیاده‌سازی الگوریتم همخوانی متنی
-        similar_ideas = Idea.objects.filter(
-            visibility='public'
-        ).exclude(id=idea.id)[:5]
+        from .similarity import similarity_index
+        neighbors = similarity_index.most_similar(idea, k=5)
+        
+        ideas_by_id = IdeaListSerializer.setup_eager_loading(Idea.objects.all()).in_bulk(
+            [idea_id for idea_id, _ in neighbors]
+        )
+        similar_ideas = [ideas_by_id[idea_id] for idea_id, _ in neighbors if idea_id in ideas_by_id]
         
-        idea.similar_count = similar_ideas.count()
-        idea.save()
+        data = IdeaListSerializer(similar_ideas, many=True).data
+        similarity_by_id = dict(neighbors)
+        for item in data:
+            item['similarity'] = round(similarity_by_id[item['id']] * 100)
         
-        serializer = IdeaListSerializer(similar_ideas, many=True)
         return Response({
-            'count': similar_ideas.count(),
-            'ideas': serializer.data
+            'count': len(data),
+            'ideas': data
         })
     
     # ========== Chat Actions ==========
     
-    @action(detail=True, methods=['get', 'post'], url_path='chat')
+    @action(detail=True, methods=['get', 'post'], url_path='chat', throttle_scope='ai_chat')
     def chat(self, request, pk=None):
         """
         دریافت یا شروع چت برای ایده
@@ -266,64 +249,66 @@ class IdeaViewSet(viewsets.ModelViewSet):
         idea = self.get_object()
         
         if request.method == 'GET':
-            # Get or create active session
-            session, created = ChatSession.objects.get_or_create(
-                idea=idea,
-                is_active=True
-            )
-            serializer = ChatSessionSerializer(session)
-            return Response(serializer.data)
+            return self._active_session_response(idea)
         
         elif request.method == 'POST':
-            serializer = SendChatMessageSerializer(data=request.data)
-            serializer.is_valid(raise_exception=True)
-            
-            user_message = serializer.validated_data['message']
-            
-            # Check chat limit
-            from subscriptions.services import LimitService
-            if not LimitService.can_chat_with_ai(request.user):
-                return Response({
-                    'error': 'شما به سقف پیام‌های روزانه رسیده‌اید. برای ادامه، پلن خود را ارتقا دهید.',
-                }, status=status.HTTP_429_TOO_MANY_REQUESTS)
-            
-            # Get or create session
-            session, _ = ChatSession.objects.get_or_create(
-                idea=idea,
-                is_active=True
-            )
-            
-            # Save user message
-            ChatMessage.objects.create(
-                session=session,
-                role='user',
-                content=user_message
-            )
-            
-            # Get chat history
-            history = list(session.messages.values('role', 'content'))
+            error_response, session, user_message, history, reservation = self._start_chat_turn(request, idea)
+            if error_response:
+                return error_response
             
             # Call AI advisor
             from scoring.chat_advisor import chat_advisor
-            result = chat_advisor.chat(idea, history[:-1], user_message)
+            with reservation:
+                result = chat_advisor.chat(
+                    idea, history, user_message,
+                    caller=LLMCaller.for_user(request.user, 'chat'),
+                    session=session,
+                )
             
-            # Save AI response
-            ai_message = ChatMessage.objects.create(
-                session=session,
-                role='assistant',
-                content=result.get('content', ''),
-                suggested_action=result.get('suggested_action')
-            )
+            # Failed LLM calls don't count against the quota
+            if result.get('error'):
+                reservation.refund()
             
-            # Increment usage
-            from subscriptions.models import UsageLog
-            LimitService.increment_usage(request.user, UsageLog.UsageType.AI_CHAT)
-            
-            # Return updated session
-            return Response({
-                'message': ChatMessageSerializer(ai_message).data,
-                'session_id': session.id,
-            })
+            # Save AI response
+            return Response(self._save_reply(session, result))
+    
+    @action(detail=True, methods=['post'], url_path='chat/stream', throttle_scope='ai_chat',
+            renderer_classes=[JSONRenderer, ServerSentEventRenderer])
+    def chat_stream(self, request, pk=None):
+        """
+        ارسال پیام چت با پاسخ تدریجی (Server-Sent Events)
+        رویدادها: delta (تکه متن)، done (پیام ذخیره‌شده)، error
+        """
+        idea = self.get_object()
+        
+        error_response, session, user_message, history, reservation = self._start_chat_turn(request, idea)
+        if error_response:
+            return error_response
+        
+        from scoring.chat_advisor import chat_advisor
+        events = chat_advisor.stream_chat(
+            idea, history, user_message,
+            caller=LLMCaller.for_user(request.user, 'chat_stream'),
+            session=session,
+        )
+        
+        def event_stream():
+            # A client disconnect (GeneratorExit) keeps the charge: the LLM call was already made
+            with reservation:
+                for event, data in events:
+                    if event == 'delta':
+                        yield sse_event('delta', {'text': data})
+                    elif event == 'error':
+                        reservation.refund()
+                        yield sse_event('error', {'error': data.get('content')})
+                    else:
+                        # Persist the final message once the stream is complete
+                        yield sse_event('done', self._save_reply(session, data))
+        
+        response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Disable nginx buffering
+        return response
     
     @action(detail=True, methods=['get'], url_path='chat/history')
     def chat_history(self, request, pk=None):
@@ -331,7 +316,7 @@ class IdeaViewSet(viewsets.ModelViewSet):
         تاریخچه همه جلسات چت
         """
         idea = self.get_object()
-        sessions = idea.chat_sessions.all()
+        sessions = ChatSessionListSerializer.setup_eager_loading(idea.chat_sessions.all())
         serializer = ChatSessionListSerializer(sessions, many=True)
         return Response(serializer.data)
     
@@ -339,7 +324,7 @@ class IdeaViewSet(viewsets.ModelViewSet):
     def apply_chat_action(self, request, pk=None):
         """
         اجرای اکشن پیشنهادی AI
-        POST: {"action": {...}}
+        POST: {"action": {...}} یا {"actions": [...]} (همه در یک تراکنش؛ اگر یکی نامعتبر باشد هیچ‌کدام)
         """
         idea = self.get_object()
         
@@ -349,15 +334,19 @@ class IdeaViewSet(viewsets.ModelViewSet):
                 'error': 'شما مجاز به این عملیات نیستید'
             }, status=status.HTTP_403_FORBIDDEN)
         
-        action_data = request.data.get('action')
-        if not action_data or not isinstance(action_data, dict):
+        actions = request.data.get('actions')
+        if actions is None:
+            actions = [request.data.get('action')]
+        if not isinstance(actions, list) or not actions or not all(
+            action and isinstance(action, dict) for action in actions
+        ):
             return Response({
                 'error': 'اکشن نامعتبر'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Apply action
+        # Apply actions
         from scoring.chat_advisor import chat_advisor
-        result = chat_advisor.apply_action(idea, action_data)
+        result = chat_advisor.apply_actions(idea, actions)
         
         if result.get('success'):
             # Refresh idea data
@@ -429,3 +418,93 @@ class IdeaViewSet(viewsets.ModelViewSet):
             field.delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
 
+
+# ========== Async (ASGI) Views ==========
+
+class IdeaChatAsyncView(ChatTurnMixin, AsyncAPIView):
+    """
+    نسخه async اکشن chat در IdeaViewSet (فقط با ASYNC_VIEWS، ideas/urls.py)
+    در انتظار پاسخ LLM هیچ thread یا پردازه‌ای اشغال نمی‌شود
+    """
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'ai_chat'
+    llm_endpoint = 'chat'
+    
+    def get_object(self):
+        # Same lookup as IdeaViewSet for detail actions
+        idea = get_object_or_404(
+            Idea.objects.filter(user=self.request.user).select_related('category'),
+            pk=self.kwargs['pk']
+        )
+        self.check_object_permissions(self.request, idea)
+        return idea
+    
+    def _begin_turn(self, request):
+        """
+        مرحله sync شروع پیام (run_sync): ایده، رزرو سهمیه، ذخیره پیام کاربر و caller
+        خروجی: (error_response, idea, session, user_message, history, reservation, caller)
+        """
+        idea = self.get_object()
+        error_response, session, user_message, history, reservation = self._start_chat_turn(request, idea)
+        if error_response:
+            return error_response, None, None, None, None, None, None
+        with reservation:
+            caller = LLMCaller.for_user(request.user, self.llm_endpoint)
+        return None, idea, session, user_message, history, reservation, caller
+    
+    async def get(self, request, pk=None):
+        return await run_sync(lambda: self._active_session_response(self.get_object()))
+    
+    async def post(self, request, pk=None):
+        error_response, idea, session, user_message, history, reservation, caller = (
+            await run_sync(self._begin_turn, request)
+        )
+        if error_response:
+            return error_response
+        
+        from scoring.chat_advisor import chat_advisor
+        async with reservation:
+            result = await chat_advisor.achat(idea, history, user_message, caller=caller, session=session)
+        
+        # Failed LLM calls don't count against the quota
+        if result.get('error'):
+            await reservation.arefund()
+        
+        return Response(await run_sync(self._save_reply, session, result))
+
+
+class IdeaChatStreamAsyncView(IdeaChatAsyncView):
+    """
+    نسخه async اکشن chat/stream (Server-Sent Events با async iterator)
+    قطع اتصال کاربر stream را cancel و اتصال provider را همان لحظه آزاد می‌کند
+    """
+    http_method_names = ['post', 'options']
+    renderer_classes = [JSONRenderer, ServerSentEventRenderer]
+    llm_endpoint = 'chat_stream'
+    
+    async def post(self, request, pk=None):
+        error_response, idea, session, user_message, history, reservation, caller = (
+            await run_sync(self._begin_turn, request)
+        )
+        if error_response:
+            return error_response
+        
+        from scoring.chat_advisor import chat_advisor
+        events = chat_advisor.astream_chat(idea, history, user_message, caller=caller, session=session)
+        
+        async def event_stream():
+            # A client disconnect (CancelledError) keeps the charge: the LLM call was already made
+            async with reservation, aclosing(events):
+                async for event, data in events:
+                    if event == 'delta':
+                        yield sse_event('delta', {'text': data})
+                    elif event == 'error':
+                        await reservation.arefund()
+                        yield sse_event('error', {'error': data.get('content')})
+                    else:
+                        yield sse_event('done', await run_sync(self._save_reply, session, data))
+        
+        response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Disable nginx buffering
+        return response
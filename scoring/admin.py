@@ -3,7 +3,7 @@ Scoring Admin - پنل مدیریت امتیازها
 """
 
 from django.contrib import admin
-from .models import UserScore, ScoreLog
+from .models import UserScore, ScoreLog, ScoringJob, AnalysisCacheEntry, LLMCall, LLMUsageDaily
 
 
 @admin.register(UserScore)
@@ -21,3 +21,45 @@ class ScoreLogAdmin(admin.ModelAdmin):
     list_filter = ['action', 'created_at']
     search_fields = ['user__email', 'description']
     ordering = ['-created_at']
+
+
+@admin.register(ScoringJob)
+class ScoringJobAdmin(admin.ModelAdmin):
+    list_display = [
+        'id', 'idea', 'user', 'status', 'attempts', 'cache_hit', 'prescreen_reason', 'created_at', 'finished_at'
+    ]
+    list_filter = ['status', 'cache_hit', 'prescreen_reason', 'created_at']
+    search_fields = ['user__email', 'idea__title']
+    ordering = ['-created_at']
+    readonly_fields = ['result', 'error', 'started_at', 'finished_at']
+
+
+@admin.register(AnalysisCacheEntry)
+class AnalysisCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ['key', 'model', 'hit_count', 'created_at', 'last_used_at']
+    list_filter = ['model']
+    search_fields = ['key']
+    ordering = ['-last_used_at']
+    readonly_fields = ['key', 'model', 'result', 'hit_count', 'created_at', 'last_used_at']
+
+
+@admin.register(LLMCall)
+class LLMCallAdmin(admin.ModelAdmin):
+    list_display = [
+        'created_at', 'endpoint', 'plan', 'model', 'status', 'prompt_tokens', 'completion_tokens', 'latency_ms', 'user'
+    ]
+    list_filter = ['status', 'endpoint', 'plan', 'model', 'stream']
+    search_fields = ['user__email']
+    ordering = ['-created_at']
+    list_select_related = ['user']
+
+
+@admin.register(LLMUsageDaily)
+class LLMUsageDailyAdmin(admin.ModelAdmin):
+    list_display = [
+        'date', 'plan', 'endpoint', 'model', 'calls', 'errors', 'rate_limited',
+        'prompt_tokens', 'completion_tokens', 'latency_p50_ms', 'latency_p95_ms'
+    ]
+    list_filter = ['plan', 'endpoint', 'model']
+    date_hierarchy = 'date'
+    ordering = ['-date', 'plan', 'endpoint', 'model']
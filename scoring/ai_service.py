@@ -4,11 +4,26 @@ AI Service - سرویس هوش مصنوعی برای امتیازدهی ایده
 """
 
 import json
-import re
+import logging
+
 import requests
-from django.conf import settings
 from decouple import config
 
+from .analysis_cache import AnalysisCache
+from .llm_dispatch import BACKGROUND_QUEUE_TIMEOUT, llm_dispatcher
+from .prescreen import screen, zero_score_result
+from .prompt_budget import PromptBudget
+
+logger = logging.getLogger(__name__)
+
+# Prompt tokens per scoring call (system prompt and the full idea)
+SCORING_PROMPT_TOKEN_BUDGET = config('SCORING_PROMPT_TOKEN_BUDGET', default=6000, cast=int)
+
+# PromptBudget priorities: lower is dropped first
+NODE_ITEM_PRIORITY = 1
+LIST_ITEM_PRIORITY = 2
+BLOCK_PRIORITY = 3
+
 
 class IdeaAnalyzer:
     """
@@ -23,7 +38,7 @@ class IdeaAnalyzer:
 3. **تشخیص تقلب**: در صورت امتیازدهی مجدد، اگر کاربر سعی کرده با تغییر کامل ایده سیستم را فریب دهد، شدیداً جریمه کن.
 
 ### سناریوی امتیازدهی مجدد (Re-Scoring Rules):
-اگر کاربر ایده را ویرایش کرده و درخواست امتیاز مجدد دارد، متن جدید را با متن قبلی (که در پرامپت می‌آید) مقایسه کن:
+اگر کاربر ایده را ویرایش کرده و درخواست امتیاز مجدد دارد، تغییرات نسبت به نسخه قبلی (diff و درصد شباهت که در پرامپت می‌آید) را بررسی کن:
 1. **تغییر ماهیت (Cheat Detection)**: اگر ایده کاملاً عوض شده (مثلاً از "نانوایی" به "هوش مصنوعی" تبدیل شده)، این تقلب است. **امتیاز کل را 0 بده** و در فیدبک بنویس: "تغییر کامل ماهیت ایده در ویرایش مجاز نیست. لطفاً ایده جدید ثبت کنید."
 2. **تغییرات جزئی**: اگر فقط چند کلمه تغییر کرده و ارزش افزوده‌ای ایجاد نشده، امتیاز را تغییر نده یا حتی کم کن.
 3. **بهبود واقعی**: تنها در صورتی امتیاز را بالا ببر که استراتژی، مدل درآمدی یا جزئیات فنی واقعاً شفاف‌تر و پخته‌تر شده باشند.
@@ -69,118 +84,145 @@ class IdeaAnalyzer:
 3. امتیازدهی منصفانه و سخت‌گیرانه باشد
 4. اگر تقلب تشخیص دادی، total_score = 0"""
 
-    def __init__(self):
-        self.api_key = config('GROQ_API_KEY', default='')
-        self.model = config('GROQ_MODEL', default='llama-3.3-70b-versatile')
-        self.api_url = 'https://api.groq.com/openai/v1/chat/completions'
+    def __init__(self, client=None):
+        self.client = client or llm_dispatcher
+    
+    def _add_block(self, prompt, idx, block):
+        """یک بلوک: سطر خلاصه ثابت + آیتم‌ها (چک‌لیست، لینک، نود) که زودتر از خود بلوک حذف می‌شوند"""
+        block_type = block.get('type', 'unknown')
+        block_name = block.get('name', 'بدون نام')
+        block_value = block.get('value', {})
+        header = ''
+        items = []
+        priority = LIST_ITEM_PRIORITY
+        
+        if block_type == 'checklist':
+            checklist = block_value if isinstance(block_value, list) else []
+            completed = len([i for i in checklist if i.get('done', False)])
+            header = f"\n- چک‌لیست «{block_name}»: {completed}/{len(checklist)} تکمیل"
+            for item in checklist[:5]:  # Max 5 items
+                status = "✓" if item.get('done') else "○"
+                items.append(f"\n  {status} {item.get('text', '')}")
+        
+        elif block_type == 'tags':
+            tags = block_value if isinstance(block_value, list) else []
+            header = f"\n- تگ‌های «{block_name}»: {', '.join([t.get('text', '') for t in tags[:10]])}"
+        
+        elif block_type == 'progress':
+            progress = block_value if isinstance(block_value, (int, float)) else 0
+            header = f"\n- پیشرفت «{block_name}»: {progress}%"
+        
+        elif block_type == 'link':
+            links = block_value if isinstance(block_value, list) else []
+            header = f"\n- لینک‌های «{block_name}»:"
+            items = [f"\n  - {link.get('title', link.get('url', ''))}" for link in links[:3]]  # Max 3 links
+            priority = NODE_ITEM_PRIORITY
+        
+        elif block_type == 'node_graph':
+            nodes = block_value.get('nodes', []) if isinstance(block_value, dict) else []
+            edges = block_value.get('edges', []) if isinstance(block_value, dict) else []
+            header = f"\n- گراف نودی «{block_name}»: {len(nodes)} نود، {len(edges)} اتصال"
+            items = [f"\n  - {node.get('type', '?')}: {node.get('label', '')}" for node in nodes[:5]]  # Max 5 nodes
+            priority = NODE_ITEM_PRIORITY
+        
+        return prompt.add(f'block:{idx}', header, items, priority=priority, drop_priority=BLOCK_PRIORITY)
     
     def analyze_idea(self, title: str, description: str, category: str = None, 
-                    previous_description: str = None, previous_score: float = None,
+                    changes: str = None, previous_score: float = None,
                     blocks: list = None, budget: str = None, 
-                    execution_steps: str = None, required_skills: str = None) -> dict:
+                    execution_steps: str = None, required_skills: str = None,
+                    caller=None, use_cache: bool = True) -> dict:
         """
         تحلیل و امتیازدهی یک ایده به همراه جزئیات پیشرفته
+        changes: diff فشرده نسبت به نسخه امتیازدهی‌شده قبلی (scoring/change_detection.py)
+        caller: llm_dispatch.LLMCaller (اولویت صف و برچسب تله‌متری)؛ در worker اجرا می‌شود پس صبر طولانی‌تر مجاز است
+        use_cache: False یعنی تحلیل تازه حتی اگر ورودی یکسان قبلاً تحلیل شده باشد
+        خروجی شامل cached (آیا از AnalysisCache آمده) است؛ ایده‌های ردشده در
+        پیش‌بررسی محلی (scoring/prescreen.py) بدون فراخوانی LLM با prescreened برمی‌گردند
         """
-        if not self.api_key:
+        # Obvious kill-switch cases never reach the model
+        reason = screen(description)
+        if reason:
+            logger.info('Idea prescreened as %s, LLM call skipped', reason)
+            return {**zero_score_result(reason), 'cached': False}
+        
+        if not self.client.is_configured:
             return {
                 'error': 'Groq API key not configured',
                 'total_score': 0
             }
         
-        # ساخت پرامپت کاربر
-        user_prompt = f"""لطفاً این ایده رو تحلیل و امتیازدهی کن:
+        # ساخت پرامپت کاربر در بودجه SCORING_PROMPT_TOKEN_BUDGET
+        prompt = PromptBudget(SCORING_PROMPT_TOKEN_BUDGET)
+        system = prompt.add('system_prompt', self.SYSTEM_PROMPT, required=True)
+        prompt.add('idea', f"""لطفاً این ایده رو تحلیل و امتیازدهی کن:
 
 **عنوان ایده:** {title}
 
-**توضیحات فعلی:** {description}
+""", required=True)
+        prompt.add('description', items=[f"**توضیحات فعلی:** {description}"], required=True, truncate=True)
+        prompt.add('category', f"""
 
-**دسته‌بندی:** {category or 'مشخص نشده'}"""
+**دسته‌بندی:** {category or 'مشخص نشده'}""", required=True)
 
         # Add advanced fields if present
         if budget:
-            user_prompt += f"\n\n**بودجه تقریبی:** {budget}"
+            prompt.add('budget', f"\n\n**بودجه تقریبی:** {budget}", required=True, truncate=True)
         
         if execution_steps:
-            user_prompt += f"\n\n**مراحل اجرا:** {execution_steps}"
+            prompt.add('execution_steps', f"\n\n**مراحل اجرا:** {execution_steps}", required=True, truncate=True)
         
         if required_skills:
-            user_prompt += f"\n\n**تخصص‌های مورد نیاز:** {required_skills}"
+            prompt.add('required_skills', f"\n\n**تخصص‌های مورد نیاز:** {required_skills}", required=True, truncate=True)
 
         # Add blocks information
         if blocks and len(blocks) > 0:
-            user_prompt += "\n\n**بلوک‌های پیشرفته ایده:**"
-            for block in blocks:
-                block_type = block.get('type', 'unknown')
-                block_name = block.get('name', 'بدون نام')
-                block_value = block.get('value', {})
-                
-                if block_type == 'checklist':
-                    items = block_value if isinstance(block_value, list) else []
-                    completed = len([i for i in items if i.get('done', False)])
-                    user_prompt += f"\n- چک‌لیست «{block_name}»: {completed}/{len(items)} تکمیل"
-                    for item in items[:5]:  # Max 5 items
-                        status = "✓" if item.get('done') else "○"
-                        user_prompt += f"\n  {status} {item.get('text', '')}"
-                
-                elif block_type == 'tags':
-                    tags = block_value if isinstance(block_value, list) else []
-                    user_prompt += f"\n- تگ‌های «{block_name}»: {', '.join([t.get('text', '') for t in tags[:10]])}"
-                
-                elif block_type == 'progress':
-                    progress = block_value if isinstance(block_value, (int, float)) else 0
-                    user_prompt += f"\n- پیشرفت «{block_name}»: {progress}%"
-                
-                elif block_type == 'link':
-                    links = block_value if isinstance(block_value, list) else []
-                    user_prompt += f"\n- لینک‌های «{block_name}»:"
-                    for link in links[:3]:  # Max 3 links
-                        user_prompt += f"\n  - {link.get('title', link.get('url', ''))}"
-                
-                elif block_type == 'node_graph':
-                    nodes = block_value.get('nodes', []) if isinstance(block_value, dict) else []
-                    edges = block_value.get('edges', []) if isinstance(block_value, dict) else []
-                    user_prompt += f"\n- گراف نودی «{block_name}»: {len(nodes)} نود، {len(edges)} اتصال"
-                    for node in nodes[:5]:  # Max 5 nodes
-                        user_prompt += f"\n  - {node.get('type', '?')}: {node.get('label', '')}"
-
-        if previous_description:
-            user_prompt += f"""
+            prompt.add('blocks', "\n\n**بلوک‌های پیشرفته ایده:**", priority=BLOCK_PRIORITY)
+            for idx, block in enumerate(blocks):
+                self._add_block(prompt, idx, block)
+
+        if changes:
+            prompt.add('changes', f"""
 
 ---
-**اطلاعات نسخه قبلی (برای مقایسه):**
-**توضیحات قبلی:** {previous_description}
+**تغییرات نسبت به نسخه قبلی (برای مقایسه؛ - حذف‌شده، + اضافه‌شده):**
+{changes}
 **امتیاز قبلی:** {previous_score}
 
 لطفاً تغییرات را بررسی کن. اگر ماهیت ایده کاملاً عوض شده، امتیاز 0 بده. اگر بهبود یافته، امتیاز را متناسب افزایش بده.
-"""
+""", required=True, truncate=True)
+
+        prompt.add('output', "\nJSON خروجی:", required=True)
 
-        user_prompt += "\nJSON خروجی:"
+        report = prompt.fit()
+        log = logger.warning if report.over_budget else logger.info if report.dropped else logger.debug
+        log('Scoring prompt: %s', report)
+
+        messages = [
+            {'role': 'system', 'content': prompt.render([system])},
+            {'role': 'user', 'content': prompt.render(prompt.sections[1:])}
+        ]
+        params = {
+            'temperature': 0.3,  # Less random for consistent scoring
+            'max_tokens': 2000,
+            'response_format': {'type': 'json_object'},
+        }
+        cache_key = AnalysisCache.make_key(self.client.model, messages, params)
+        if use_cache:
+            cached = AnalysisCache.get(cache_key)
+            if cached is not None:
+                return {**cached, 'cached': True}
 
         try:
-            response = requests.post(
-                self.api_url,
-                headers={
-                    'Authorization': f'Bearer {self.api_key}',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    'model': self.model,
-                    'messages': [
-                        {'role': 'system', 'content': self.SYSTEM_PROMPT},
-                        {'role': 'user', 'content': user_prompt}
-                    ],
-                    'temperature': 0.3, # Less random for consistent scoring
-                    'max_tokens': 2000,
-                    'response_format': {'type': 'json_object'}
-                },
-                timeout=60
+            response = self.client.chat_completion(
+                messages=messages,
+                caller=caller,
+                max_wait=BACKGROUND_QUEUE_TIMEOUT,
+                **params
             )
             
-            response.raise_for_status()
-            data = response.json()
-            
             # استخراج پاسخ AI
-            ai_response = data['choices'][0]['message']['content']
+            ai_response = response.content
             
             # پارس JSON
             result = json.loads(ai_response)
@@ -190,7 +232,9 @@ class IdeaAnalyzer:
                 scores = result.get('scores', {})
                 result['total_score'] = sum(scores.values())
             
-            return result
+            # A bypassed lookup still refreshes the entry for the next identical request
+            AnalysisCache.set(cache_key, self.client.model, result)
+            return {**result, 'cached': False}
             
         except requests.exceptions.RequestException as e:
             return {
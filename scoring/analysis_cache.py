@@ -0,0 +1,91 @@
+"""
+Analysis Cache - استفاده مجدد از تحلیل AI برای ورودی‌های یکسان
+کلید: هش SHA-256 از مدل، پیام‌ها (شامل پرامپت سیستم و نسخه قبلی ایده) و پارامترهای نمونه‌برداری
+"""
+
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from decouple import config
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import AnalysisCacheEntry
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_CACHE_ENABLED = config('ANALYSIS_CACHE_ENABLED', default=True, cast=bool)
+ANALYSIS_CACHE_TTL = timedelta(days=config('ANALYSIS_CACHE_TTL_DAYS', default=30, cast=float))
+ANALYSIS_CACHE_MAX_ENTRIES = config('ANALYSIS_CACHE_MAX_ENTRIES', default=20000, cast=int)
+
+
+class AnalysisCache:
+    """
+    کش نتایج IdeaAnalyzer
+    - get/set با کلید make_key؛ ورودی منقضی‌شده (قدیمی‌تر از TTL) نادیده گرفته می‌شود
+    - prune (کار دوره‌ای worker): حذف منقضی‌ها و سپس قدیمی‌ترین استفاده‌ها تا سقف MAX_ENTRIES
+    """
+
+    @staticmethod
+    def make_key(model, messages, params):
+        payload = json.dumps(
+            {'model': model, 'messages': messages, 'params': params},
+            ensure_ascii=False, sort_keys=True, separators=(',', ':')
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def get(cls, key):
+        """نتیجه کش‌شده یا None؛ شمارنده استفاده به صورت اتمیک افزایش می‌یابد"""
+        if not ANALYSIS_CACHE_ENABLED:
+            return None
+        entry = AnalysisCacheEntry.objects.filter(
+            key=key, created_at__gte=timezone.now() - ANALYSIS_CACHE_TTL
+        ).values('id', 'result').first()
+        if entry is None:
+            return None
+        AnalysisCacheEntry.objects.filter(id=entry['id']).update(
+            hit_count=F('hit_count') + 1, last_used_at=timezone.now()
+        )
+        return entry['result']
+
+    @classmethod
+    def set(cls, key, model, result):
+        if not ANALYSIS_CACHE_ENABLED:
+            return
+        try:
+            with transaction.atomic():
+                AnalysisCacheEntry.objects.update_or_create(
+                    key=key,
+                    defaults={
+                        'model': model, 'result': result,
+                        'created_at': timezone.now(), 'last_used_at': timezone.now(),
+                    },
+                )
+        except IntegrityError:
+            # Another worker stored the same analysis first
+            pass
+
+    @classmethod
+    def prune(cls, max_entries=None):
+        """حذف ورودی‌های منقضی و مازاد (LRU)؛ خروجی: تعداد حذف‌شده"""
+        max_entries = ANALYSIS_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        expired, _ = AnalysisCacheEntry.objects.filter(
+            created_at__lt=timezone.now() - ANALYSIS_CACHE_TTL
+        ).delete()
+
+        evicted = 0
+        # last_used_at of the first entry past the limit; it and everything older goes
+        cutoff = list(AnalysisCacheEntry.objects.order_by('-last_used_at').values_list(
+            'last_used_at', flat=True
+        )[max_entries:max_entries + 1])
+        if cutoff:
+            evicted, _ = AnalysisCacheEntry.objects.filter(last_used_at__lte=cutoff[0]).delete()
+
+        if expired or evicted:
+            logger.info('Analysis cache pruned: %d expired, %d evicted', expired, evicted)
+        return expired + evicted
+
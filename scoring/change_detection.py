@@ -0,0 +1,151 @@
+"""
+Change Detection - تشخیص تغییر معنادار ایده نسبت به آخرین امتیازدهی
+مقایسه همه فیلدهای امتیازدهی‌شده با shingleهای کلمه‌ای (Jaccard) و ساخت diff فشرده برای پرامپت
+"""
+
+import difflib
+import re
+
+from .prescreen import normalize
+
+# Fields sent to the model, in prompt order, with their Persian labels
+SCORED_FIELDS = {
+    'title': 'عنوان',
+    'category': 'دسته‌بندی',
+    'description': 'توضیحات',
+    'budget': 'بودجه',
+    'execution_steps': 'مراحل اجرا',
+    'required_skills': 'تخصص‌های مورد نیاز',
+    'blocks': 'بلوک‌ها',
+}
+
+SHINGLE_SIZE = 3
+# Weighted share of shingles that must differ for a re-score to be worth an LLM call
+MIN_CHANGE_RATIO = 0.1
+# Any token edit in a field this short (title, budget, category) counts as meaningful
+SHORT_FIELD_TOKENS = 12
+# Diff limits: tokens per hunk side and hunks overall
+MAX_HUNK_TOKENS = 40
+MAX_HUNKS = 12
+
+_DIGITS = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩', '01234567890123456789')
+_TOKEN = re.compile(r'[\w\u200c]+')
+
+
+def tokenize(text):
+    """کلمات نرمال‌شده (بدون علائم نگارشی و فاصله‌ها، ارقام فارسی به لاتین)"""
+    return _TOKEN.findall(normalize(text).translate(_DIGITS).lower())
+
+
+def _leaves(value):
+    if isinstance(value, dict):
+        for key in sorted(value):
+            yield from _leaves(value[key])
+    elif isinstance(value, list):
+        for item in value:
+            yield from _leaves(item)
+    elif value is not None:
+        yield str(value)
+
+
+def _blocks_text(blocks):
+    lines = []
+    for block in blocks or []:
+        if isinstance(block, dict):
+            lines.append(' '.join([str(block.get('name', '')), *_leaves(block.get('value'))]))
+    return '\n'.join(lines)
+
+
+def scoring_snapshot(idea):
+    """متن همه فیلدهایی که در امتیازدهی دیده می‌شوند (برای ذخیره در Idea.last_scored_snapshot)"""
+    return {
+        'title': idea.title or '',
+        'category': idea.category.name if idea.category else '',
+        'description': idea.description or '',
+        'budget': idea.budget or '',
+        'execution_steps': idea.execution_steps or '',
+        'required_skills': idea.required_skills or '',
+        'blocks': _blocks_text(idea.blocks),
+    }
+
+
+def shingles(tokens, size=SHINGLE_SIZE):
+    if len(tokens) < size:
+        return {tuple(tokens)} if tokens else set()
+    return {tuple(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _phrase(tokens):
+    text = ' '.join(tokens[:MAX_HUNK_TOKENS])
+    return text + ' …' if len(tokens) > MAX_HUNK_TOKENS else text
+
+
+class ChangeReport:
+    """
+    نتیجه مقایسه دو snapshot
+    - similarity: شباهت کلی وزن‌دار (۰ تا ۱)
+    - changed_fields: فیلدهایی که کلماتشان عوض شده
+    - is_meaningful: آیا ارزش امتیازدهی مجدد دارد
+    """
+
+    def __init__(self, old, new):
+        self.old = old
+        self.new = new
+        self.fields = {}
+        self.short_field_changed = False
+        weighted_change = 0.0
+        total_weight = 0
+
+        for field in SCORED_FIELDS:
+            old_tokens = tokenize(old.get(field, ''))
+            new_tokens = tokenize(new.get(field, ''))
+            weight = max(len(old_tokens), len(new_tokens))
+            total_weight += weight
+            if old_tokens == new_tokens:
+                continue
+            change = 1 - jaccard(shingles(old_tokens), shingles(new_tokens))
+            weighted_change += weight * change
+            self.fields[field] = (old_tokens, new_tokens)
+            if weight <= SHORT_FIELD_TOKENS:
+                self.short_field_changed = True
+
+        self.change_ratio = weighted_change / total_weight if total_weight else 0.0
+        self.similarity = 1 - self.change_ratio
+
+    @property
+    def changed_fields(self):
+        return list(self.fields)
+
+    @property
+    def is_meaningful(self):
+        return self.short_field_changed or self.change_ratio >= MIN_CHANGE_RATIO
+
+    def diff_text(self):
+        """diff کلمه‌ای فشرده فیلدهای تغییرکرده ('-' حذف‌شده، '+' اضافه‌شده)"""
+        lines = [f'شباهت کلی با نسخه امتیازدهی‌شده قبلی: {round(self.similarity * 100)}٪']
+        hunks = 0
+        for field, (old_tokens, new_tokens) in self.fields.items():
+            lines.append(f'**{SCORED_FIELDS[field]}:**')
+            matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+                if tag == 'equal':
+                    continue
+                if hunks == MAX_HUNKS:
+                    lines.append('… (تغییرات بیشتر حذف شد)')
+                    return '\n'.join(lines)
+                hunks += 1
+                if i2 > i1:
+                    lines.append(f'- {_phrase(old_tokens[i1:i2])}')
+                if j2 > j1:
+                    lines.append(f'+ {_phrase(new_tokens[j1:j2])}')
+        return '\n'.join(lines)
+
+
+def compare(old_snapshot, new_snapshot):
+    return ChangeReport(old_snapshot or {}, new_snapshot)
@@ -3,12 +3,38 @@ Chat Advisor AI Service - دستیار هوشمند ایده (Enhanced V2)
 Agent حرفه‌ای با توانایی تغییر فیلدها، بلوک‌ها و گراف
 """
 
-import json
-import re
+import logging
 import requests
-from django.conf import settings
+from contextlib import aclosing
+
 from decouple import config
 
+from IdeaFlow.async_views import run_sync
+
+from .llm_dispatch import llm_dispatcher
+from .context_cache import idea_context_cache
+from .idea_actions import apply_actions
+from .prompt_budget import PromptBudget
+from .system_actions import SystemActionParser, parse_system_actions
+
+logger = logging.getLogger(__name__)
+
+# Prompt tokens per chat call (system prompt, idea context, history and the new message)
+CHAT_PROMPT_TOKEN_BUDGET = config('CHAT_PROMPT_TOKEN_BUDGET', default=6000, cast=int)
+MAX_HISTORY_MESSAGES = 20
+# The latest messages are kept ahead of idea details when the prompt is trimmed
+RECENT_MESSAGES = 4
+
+# PromptBudget priorities: lower is dropped first
+OLD_MESSAGE_PRIORITY = 0
+NODE_ITEM_PRIORITY = 1
+LIST_ITEM_PRIORITY = 2
+BLOCK_PRIORITY = 3
+SUMMARY_PRIORITY = 4
+RECENT_MESSAGE_PRIORITY = 5
+
+CHAT_COMPLETION_PARAMS = {'temperature': 0.7, 'max_tokens': 2000}
+
 
 class ChatAdvisor:
     """
@@ -235,157 +261,196 @@ class ChatAdvisor:
 
 میخوای یه چک‌لیست برای مراحل اجرا هم بسازم؟"""
 
-    def __init__(self):
-        self.api_key = config('GROQ_API_KEY', default='')
-        self.model = config('GROQ_MODEL', default='llama-3.3-70b-versatile')
-        self.api_url = 'https://api.groq.com/openai/v1/chat/completions'
+    def __init__(self, client=None):
+        self.client = client or llm_dispatcher
     
-    def build_idea_context(self, idea, chat_count=0):
-        """ساخت context کامل از اطلاعات ایده شامل بلوک‌ها"""
-        context = f"""
+    def idea_context_sections(self, idea):
+        """
+        بخش‌های PromptBudget برای context ایده (شامل بلوک‌ها)؛ فقط به خود ایده وابسته است
+        تا نتیجه با کلید (id, updated_at) کش شود (scoring/context_cache.py)
+        """
+        prompt = PromptBudget(budget=None)
+        sections = [
+            prompt.add('idea', f"""
 ## 📌 اطلاعات ایده فعلی
 
 **عنوان:** {idea.title}
-**توضیحات:** {idea.description}
-"""
-        if idea.budget:
-            context += f"**💰 بودجه:** {idea.budget}\n"
-        else:
-            context += "**💰 بودجه:** (تعیین نشده)\n"
-            
+""", required=True),
+            prompt.add('description', items=[f"**توضیحات:** {idea.description}\n"], required=True, truncate=True),
+        ]
+        
+        details = f"**💰 بودجه:** {idea.budget}\n" if idea.budget else "**💰 بودجه:** (تعیین نشده)\n"
         if idea.execution_steps:
-            context += f"**📋 مراحل اجرا:** {idea.execution_steps}\n"
+            details += f"**📋 مراحل اجرا:** {idea.execution_steps}\n"
         else:
-            context += "**📋 مراحل اجرا:** (تعیین نشده)\n"
-            
+            details += "**📋 مراحل اجرا:** (تعیین نشده)\n"
         if idea.required_skills:
-            context += f"**👥 تخصص‌ها:** {idea.required_skills}\n"
+            details += f"**👥 تخصص‌ها:** {idea.required_skills}\n"
         else:
-            context += "**👥 تخصص‌ها:** (تعیین نشده)\n"
-            
+            details += "**👥 تخصص‌ها:** (تعیین نشده)\n"
         if idea.ai_score:
-            context += f"**📊 امتیاز AI:** {idea.ai_score}/100\n"
+            details += f"**📊 امتیاز AI:** {idea.ai_score}/100\n"
+        sections.append(prompt.add('details', details, required=True, truncate=True))
         
         if idea.ai_feedback:
-            context += f"\n**📝 بازخورد AI:**\n{idea.ai_feedback[:500]}...\n"
+            sections.append(prompt.add(
+                'ai_feedback', f"\n**📝 بازخورد AI:**\n{idea.ai_feedback[:500]}...\n", priority=BLOCK_PRIORITY
+            ))
         
         # بلوک‌های پیشرفته
         if hasattr(idea, 'blocks') and idea.blocks:
-            context += f"\n**🧩 بلوک‌های پیشرفته ({len(idea.blocks)} عدد):**\n"
+            sections.append(prompt.add(
+                'blocks', f"\n**🧩 بلوک‌های پیشرفته ({len(idea.blocks)} عدد):**\n", priority=BLOCK_PRIORITY
+            ))
             for idx, block in enumerate(idea.blocks):
-                block_type = block.get('type', 'unknown')
-                block_name = block.get('name', 'بدون نام')
-                block_value = block.get('value', {})
-                
-                context += f"\n**[بلوک {idx}] {block_name}** (نوع: {block_type})\n"
-                
-                if block_type == 'checklist':
-                    items = block_value if isinstance(block_value, list) else []
-                    completed = len([i for i in items if i.get('done', False)])
-                    context += f"تکمیل: {completed}/{len(items)}\n"
-                    for item in items[:5]:
-                        status = "✓" if item.get('done') else "○"
-                        context += f"  {status} {item.get('text', '')}\n"
-                
-                elif block_type == 'tags':
-                    tags = block_value if isinstance(block_value, list) else []
-                    tag_texts = [t.get('text', '') for t in tags[:10]]
-                    context += f"تگ‌ها: {', '.join(tag_texts)}\n"
-                
-                elif block_type == 'progress':
-                    progress = block_value if isinstance(block_value, (int, float)) else 0
-                    context += f"پیشرفت: {progress}%\n"
-                
-                elif block_type == 'link':
-                    links = block_value if isinstance(block_value, list) else []
-                    for link in links[:3]:
-                        context += f"  - {link.get('title', link.get('url', ''))}\n"
-                
-                elif block_type == 'node_graph':
-                    nodes = block_value.get('nodes', []) if isinstance(block_value, dict) else []
-                    edges = block_value.get('edges', []) if isinstance(block_value, dict) else []
-                    context += f"گراف: {len(nodes)} نود، {len(edges)} اتصال\n"
-                    for node in nodes[:8]:
-                        context += f"  - [{node.get('type', '?')}] {node.get('label', '')}\n"
+                sections.append(self._add_block(prompt, idx, block))
         
         # فیلدهای سفارشی
         try:
             custom_fields = idea.custom_fields.all()
             if custom_fields:
-                context += "\n**🎨 فیلدهای سفارشی:**\n"
-                for field in custom_fields:
-                    context += f"- **{field.name}** ({field.get_field_type_display()}): {field.value}\n"
+                sections.append(prompt.add(
+                    'custom_fields',
+                    "\n**🎨 فیلدهای سفارشی:**\n",
+                    [f"- **{field.name}** ({field.get_field_type_display()}): {field.value}\n"
+                     for field in custom_fields],
+                    priority=LIST_ITEM_PRIORITY,
+                    drop_priority=BLOCK_PRIORITY,
+                ))
         except:
             pass
         
+        return sections
+    
+    def add_idea_context(self, prompt, idea):
+        """اضافه کردن context ایده (از کش در صورت وجود) به prompt؛ خروجی: لیست بخش‌ها"""
+        return prompt.extend(idea_context_cache.sections(idea, self.idea_context_sections))
+    
+    def _add_chat_count(self, prompt, chat_count):
         if chat_count > 0:
-            context += f"\n**💬 تعداد پیام‌های قبلی:** {chat_count}\n"
+            return [prompt.add('chat_count', f"\n**💬 تعداد پیام‌های قبلی:** {chat_count}\n", required=True)]
+        return []
+    
+    def _add_block(self, prompt, idx, block):
+        """یک بلوک: سطر خلاصه ثابت + آیتم‌ها (چک‌لیست، لینک، نود) که زودتر از خود بلوک حذف می‌شوند"""
+        block_type = block.get('type', 'unknown')
+        block_name = block.get('name', 'بدون نام')
+        block_value = block.get('value', {})
+        
+        header = f"\n**[بلوک {idx}] {block_name}** (نوع: {block_type})\n"
+        items = []
+        priority = LIST_ITEM_PRIORITY
+        
+        if block_type == 'checklist':
+            checklist = block_value if isinstance(block_value, list) else []
+            completed = len([i for i in checklist if i.get('done', False)])
+            header += f"تکمیل: {completed}/{len(checklist)}\n"
+            for item in checklist[:5]:
+                status = "✓" if item.get('done') else "○"
+                items.append(f"  {status} {item.get('text', '')}\n")
+        
+        elif block_type == 'tags':
+            tags = block_value if isinstance(block_value, list) else []
+            tag_texts = [t.get('text', '') for t in tags[:10]]
+            header += f"تگ‌ها: {', '.join(tag_texts)}\n"
+        
+        elif block_type == 'progress':
+            progress = block_value if isinstance(block_value, (int, float)) else 0
+            header += f"پیشرفت: {progress}%\n"
+        
+        elif block_type == 'link':
+            links = block_value if isinstance(block_value, list) else []
+            items = [f"  - {link.get('title', link.get('url', ''))}\n" for link in links[:3]]
+            priority = NODE_ITEM_PRIORITY
+        
+        elif block_type == 'node_graph':
+            nodes = block_value.get('nodes', []) if isinstance(block_value, dict) else []
+            edges = block_value.get('edges', []) if isinstance(block_value, dict) else []
+            header += f"گراف: {len(nodes)} نود، {len(edges)} اتصال\n"
+            items = [f"  - [{node.get('type', '?')}] {node.get('label', '')}\n" for node in nodes[:8]]
+            priority = NODE_ITEM_PRIORITY
         
-        return context
+        return prompt.add(f'block:{idx}', header, items, priority=priority, drop_priority=BLOCK_PRIORITY)
     
-    def chat(self, idea, messages_history, user_message):
+    def build_idea_context(self, idea, chat_count=0):
+        """ساخت context کامل از اطلاعات ایده شامل بلوک‌ها (بدون محدودیت توکن)"""
+        prompt = PromptBudget(budget=None)
+        sections = self.add_idea_context(prompt, idea) + self._add_chat_count(prompt, chat_count)
+        return prompt.render(sections)
+    
+    def _build_messages(self, idea, messages_history, user_message, session=None):
         """
-        چت با دستیار AI
+        ساخت لیست پیام‌های ارسالی به API در بودجه CHAT_PROMPT_TOKEN_BUDGET
+        session: جلسه چت برای خلاصه پیام‌های قدیمی‌تر از messages_history (scoring/chat_summary.py)
+        ترتیب حذف در صورت کمبود جا: پیام‌های قدیمی، نودها و لینک‌ها، آیتم‌های چک‌لیست و
+        فیلدهای سفارشی، کل بلوک‌ها و بازخورد AI، خلاصه گفتگو و در آخر پیام‌های اخیر
         """
-        if not self.api_key:
-            return {
-                'content': '⚠️ متأسفانه سرویس AI در دسترس نیست.',
-                'error': 'API key not configured'
-            }
-        
-        idea_context = self.build_idea_context(idea, len(messages_history))
+        summarized_count = session.summarized_count if session else 0
+        prompt = PromptBudget(CHAT_PROMPT_TOKEN_BUDGET)
+        system = prompt.add('system_prompt', self.SYSTEM_PROMPT + "\n\n---\n", required=True)
+        # Stable prefix first (system prompt, then the cached idea context) so provider-side
+        # prompt caching can reuse it; per-turn parts (summary, message count) come after
+        context = self.add_idea_context(prompt, idea)
+        if session and session.summary:
+            context.append(prompt.add(
+                'summary', f"\n**🧠 خلاصه گفتگوی قبلی ({summarized_count} پیام):**\n{session.summary}\n",
+                priority=SUMMARY_PRIORITY
+            ))
+        context += self._add_chat_count(prompt, summarized_count + len(messages_history))
         
-        api_messages = [
-            {
-                'role': 'system',
-                'content': self.SYSTEM_PROMPT + "\n\n---\n" + idea_context
-            }
+        # تاریخچه چت (حداکثر ۲۰ پیام آخر)
+        history = [
+            {'role': msg['role'], 'content': msg['content']}
+            for msg in messages_history[-MAX_HISTORY_MESSAGES:]
         ]
+        older = prompt.add('history', items=history[:-RECENT_MESSAGES], priority=OLD_MESSAGE_PRIORITY,
+                           drop_from='first')
+        recent = prompt.add('recent_history', items=history[-RECENT_MESSAGES:], priority=RECENT_MESSAGE_PRIORITY,
+                            drop_from='first')
+        user = prompt.add('user_message', items=[{'role': 'user', 'content': user_message}], required=True)
         
-        # تاریخچه چت (حداکثر ۲۰ پیام آخر)
-        for msg in messages_history[-20:]:
-            api_messages.append({
-                'role': msg['role'],
-                'content': msg['content']
-            })
+        report = prompt.fit()
+        log = logger.warning if report.over_budget else logger.info if report.dropped else logger.debug
+        log('Chat prompt for idea %s: %s', idea.pk, report)
         
-        api_messages.append({
-            'role': 'user',
-            'content': user_message
-        })
+        api_messages = [{'role': 'system', 'content': prompt.render([system, *context])}]
+        for section in (older, recent, user):
+            if section.included:
+                api_messages.extend(section.items)
+        return api_messages
+    
+    def _unavailable(self):
+        return {
+            'content': '⚠️ متأسفانه سرویس AI در دسترس نیست.',
+            'error': 'API key not configured'
+        }
+    
+    def _reply(self, content, actions):
+        """نتیجه نهایی: متن پاکسازی‌شده (بدون بلوک‌های سیستمی) و اکشن‌های استخراج‌شده"""
+        return {
+            'content': content,
+            'suggested_action': actions[0] if actions else None,
+            'all_actions': actions
+        }
+    
+    def chat(self, idea, messages_history, user_message, caller=None, session=None):
+        """
+        چت با دستیار AI
+        caller: llm_dispatch.LLMCaller (اولویت صف و برچسب تله‌متری)
+        session: جلسه چت (خلاصه پیام‌های قدیمی)
+        """
+        if not self.client.is_configured:
+            return self._unavailable()
+        
+        api_messages = self._build_messages(idea, messages_history, user_message, session)
         
         try:
-            response = requests.post(
-                self.api_url,
-                headers={
-                    'Authorization': f'Bearer {self.api_key}',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    'model': self.model,
-                    'messages': api_messages,
-                    'temperature': 0.7,
-                    'max_tokens': 2000,
-                },
-                timeout=60
+            response = self.client.chat_completion(
+                messages=api_messages,
+                caller=caller,
+                **CHAT_COMPLETION_PARAMS,
             )
-            
-            response.raise_for_status()
-            data = response.json()
-            
-            ai_response = data['choices'][0]['message']['content']
-            
-            # استخراج اکشن‌های سیستمی
-            actions = self._extract_system_actions(ai_response)
-            
-            # پاکسازی پاسخ از بلوک‌های سیستمی (کاربر نباید ببینه)
-            clean_content = self._clean_response(ai_response)
-            
-            return {
-                'content': clean_content,
-                'suggested_action': actions[0] if actions else None,
-                'all_actions': actions
-            }
+            return self._reply(*parse_system_actions(response.content))
             
         except requests.exceptions.RequestException as e:
             return {
@@ -398,169 +463,121 @@ class ChatAdvisor:
                 'error': str(e)
             }
     
-    def _extract_system_actions(self, response_text):
-        """استخراج اکشن‌های سیستمی از پاسخ AI"""
-        actions = []
+    async def achat(self, idea, messages_history, user_message, caller=None, session=None):
+        """
+        نسخه async چت (viewهای ASGI)
+        ساخت پرامپت (ORM و کش) با run_sync در thread اجرا می‌شود و فقط انتظار LLM روی event loop است
+        """
+        if not self.client.is_configured:
+            return self._unavailable()
+        
+        api_messages = await run_sync(self._build_messages, idea, messages_history, user_message, session)
+        
         try:
-            # پیدا کردن بلوک‌های __SYSTEM_ACTION__
-            pattern = r'```__SYSTEM_ACTION__\s*(\{[\s\S]*?\})\s*```'
-            matches = re.findall(pattern, response_text, re.DOTALL)
-            
-            for match in matches:
-                try:
-                    action = json.loads(match.strip())
-                    if 'action' in action:
-                        actions.append(action)
-                except json.JSONDecodeError:
-                    continue
+            response = await self.client.achat_completion(
+                messages=api_messages,
+                caller=caller,
+                **CHAT_COMPLETION_PARAMS,
+            )
+            return self._reply(*parse_system_actions(response.content))
             
-            # Fallback: بلوک JSON معمولی با action
-            if not actions:
-                json_pattern = r'```json\s*(\{[^`]+\})\s*```'
-                json_matches = re.findall(json_pattern, response_text, re.DOTALL)
-                for match in json_matches:
-                    try:
-                        action = json.loads(match)
-                        if 'action' in action:
-                            actions.append(action)
-                    except json.JSONDecodeError:
-                        continue
-                        
-        except Exception:
-            pass
-        
-        return actions
-    
-    def _clean_response(self, response_text):
-        """حذف بلوک‌های سیستمی از پاسخ (کاربر نباید ببینه)"""
-        # حذف بلوک‌های __SYSTEM_ACTION__
-        cleaned = re.sub(r'```__SYSTEM_ACTION__[\s\S]*?```', '', response_text)
-        # حذف بلوک‌های json که action دارن
-        cleaned = re.sub(r'```json\s*\{[^`]*"action"[^`]*\}\s*```', '', cleaned)
-        # تمیز کردن خطوط خالی اضافی
-        cleaned = re.sub(r'\n{3,}', '\n\n', cleaned)
-        return cleaned.strip()
+        except requests.exceptions.RequestException as e:
+            return {
+                'content': '⚠️ خطا در ارتباط با سرور AI.',
+                'error': str(e)
+            }
+        except Exception as e:
+            return {
+                'content': '⚠️ خطای غیرمنتظره‌ای رخ داد.',
+                'error': str(e)
+            }
     
-    def _update_idea_field(self, idea, field, value):
+    def stream_chat(self, idea, messages_history, user_message, caller=None, session=None):
         """
-        به روز رسانی یک فیلد ایده با هندل کردن موارد خاص مثل tags
+        چت با دستیار AI به صورت stream
+        رویدادها: ('delta', متن قابل نمایش) و در پایان ('done', نتیجه) یا ('error', نتیجه)
+        بلوک‌های __SYSTEM_ACTION__ در حین stream حذف و همان‌جا خوانده می‌شوند (پاسخ دوباره پارس نمی‌شود)
         """
-        if not hasattr(idea, field):
-            return False
-
-        # FIX: Handle 'tags' specifically to avoid "Direct assignment to the reverse side of a related set"
-        if field == 'tags':
-            # Convert value to tags block format
-            tag_list = []
-            if isinstance(value, list):
-                tag_list = [{'text': str(v), 'colorIndex': i % 7} for i, v in enumerate(value)]
-            elif isinstance(value, str):
-                tag_list = [{'text': v.strip(), 'colorIndex': i % 7} for i, v in enumerate(value.split(',')) if v.strip()]
-            
-            # Find existing tags block or create new one
-            tags_block = None
-            if idea.blocks:
-                for b in idea.blocks:
-                    if b.get('type') == 'tags':
-                        tags_block = b
-                        break
+        if not self.client.is_configured:
+            yield 'error', self._unavailable()
+            return
+        
+        api_messages = self._build_messages(idea, messages_history, user_message, session)
+        parser = SystemActionParser()
+        
+        try:
+            for delta in self.client.stream_chat_completion(
+                messages=api_messages,
+                caller=caller,
+                **CHAT_COMPLETION_PARAMS,
+            ):
+                visible = parser.feed(delta)
+                if visible:
+                    yield 'delta', visible
             
-            if tags_block:
-                tags_block['value'] = tag_list
-            else:
-                if not idea.blocks:
-                    idea.blocks = []
-                idea.blocks.append({
-                    "type": "tags",
-                    "name": "برچسب‌ها",
-                    "value": tag_list
-                })
-            return True # Handled specially
+            tail = parser.finish()
+            if tail:
+                yield 'delta', tail
+        except requests.exceptions.RequestException as e:
+            yield 'error', {
+                'content': '⚠️ خطا در ارتباط با سرور AI.',
+                'error': str(e)
+            }
+            return
+        except Exception as e:
+            yield 'error', {
+                'content': '⚠️ خطای غیرمنتظره‌ای رخ داد.',
+                'error': str(e)
+            }
+            return
         
-        # Normal field update
-        setattr(idea, field, value)
-        return True
+        yield 'done', self._reply(parser.content, parser.actions)
     
-    def apply_action(self, idea, action):
-        """اعمال اکشن روی ایده"""
-        action_type = action.get('action')
+    async def astream_chat(self, idea, messages_history, user_message, caller=None, session=None):
+        """نسخه async stream_chat (همان رویدادها)"""
+        if not self.client.is_configured:
+            yield 'error', self._unavailable()
+            return
+        
+        api_messages = await run_sync(self._build_messages, idea, messages_history, user_message, session)
+        parser = SystemActionParser()
         
         try:
-            if action_type == 'update_field':
-                field = action.get('field')
-                value = action.get('value')
-                if self._update_idea_field(idea, field, value):
-                    idea.save()
-                    return {'success': True, 'message': f'فیلد {field} بروزرسانی شد'}
-            
-            elif action_type == 'add_block':
-                block = action.get('block')
-                if block:
-                    if not idea.blocks:
-                        idea.blocks = []
-                    idea.blocks.append(block)
-                    idea.save()
-                    return {'success': True, 'message': f"بلوک «{block.get('name')}» اضافه شد"}
-            
-            elif action_type == 'update_block':
-                block_index = action.get('block_index', 0)
-                value = action.get('value')
-                if idea.blocks and 0 <= block_index < len(idea.blocks):
-                    idea.blocks[block_index]['value'] = value
-                    idea.save()
-                    return {'success': True, 'message': 'بلوک بروزرسانی شد'}
-            
-            elif action_type == 'add_checklist_item':
-                block_index = action.get('block_index', 0)
-                item = action.get('item')
-                if idea.blocks and 0 <= block_index < len(idea.blocks):
-                    block = idea.blocks[block_index]
-                    if block.get('type') == 'checklist':
-                        if not isinstance(block.get('value'), list):
-                            block['value'] = []
-                        block['value'].append(item)
-                        idea.save()
-                        return {'success': True, 'message': f"آیتم «{item.get('text')}» اضافه شد"}
-            
-            elif action_type == 'add_graph_node':
-                block_index = action.get('block_index', 0)
-                node = action.get('node')
-                if idea.blocks and 0 <= block_index < len(idea.blocks):
-                    block = idea.blocks[block_index]
-                    if block.get('type') == 'node_graph':
-                        if not block.get('value'):
-                            block['value'] = {'nodes': [], 'edges': []}
-                        block['value']['nodes'].append(node)
-                        idea.save()
-                        return {'success': True, 'message': f"نود «{node.get('label')}» اضافه شد"}
-            
-            elif action_type == 'add_graph_edge':
-                block_index = action.get('block_index', 0)
-                edge = action.get('edge')
-                if idea.blocks and 0 <= block_index < len(idea.blocks):
-                    block = idea.blocks[block_index]
-                    if block.get('type') == 'node_graph':
-                        if not block.get('value'):
-                            block['value'] = {'nodes': [], 'edges': []}
-                        block['value']['edges'].append(edge)
-                        idea.save()
-                        return {'success': True, 'message': 'اتصال اضافه شد'}
-            
-            elif action_type == 'batch_update':
-                updates = action.get('updates', [])
-                count = 0
-                for update in updates:
-                    field = update.get('field')
-                    value = update.get('value')
-                    if self._update_idea_field(idea, field, value):
-                        count += 1
-                idea.save()
-                return {'success': True, 'message': f'{count} تغییر اعمال شد'}
-            
-            return {'success': False, 'message': 'اکشن نامعتبر'}
+            async with aclosing(self.client.astream_chat_completion(
+                messages=api_messages,
+                caller=caller,
+                **CHAT_COMPLETION_PARAMS,
+            )) as deltas:
+                async for delta in deltas:
+                    visible = parser.feed(delta)
+                    if visible:
+                        yield 'delta', visible
             
+            tail = parser.finish()
+            if tail:
+                yield 'delta', tail
+        except requests.exceptions.RequestException as e:
+            yield 'error', {
+                'content': '⚠️ خطا در ارتباط با سرور AI.',
+                'error': str(e)
+            }
+            return
         except Exception as e:
-            return {'success': False, 'message': str(e)}
+            yield 'error', {
+                'content': '⚠️ خطای غیرمنتظره‌ای رخ داد.',
+                'error': str(e)
+            }
+            return
+        
+        yield 'done', self._reply(parser.content, parser.actions)
+    
+    def apply_action(self, idea, action):
+        """اعمال اکشن روی ایده"""
+        return apply_actions(idea, [action])
+    
+    def apply_actions(self, idea, actions):
+        """اعمال چند اکشن (مثلاً all_actions یک پاسخ) در یک تراکنش و با یک نوشتن"""
+        return apply_actions(idea, actions)
 
 
 # Singleton instance
@@ -0,0 +1,157 @@
+"""
+Chat Summary - خلاصه غلتان جلسه‌های چت طولانی
+view فقط آخرین CHAT_HISTORY_WINDOW پیام خلاصه‌نشده را می‌خواند؛ وقتی این پنجره پر شد
+جلسه summary_pending می‌شود و worker پیام‌های قدیمی را (به جز CHAT_SUMMARY_KEEP پیام آخر)
+در ChatSession.summary ادغام می‌کند. هزینه هر پیام ثابت می‌ماند و حافظه بلندمدت از بین نمی‌رود
+"""
+
+import logging
+
+from decouple import config
+from django.db.models import F
+
+from ideas.models import ChatSession
+
+from .llm_client import LLMError
+from .llm_dispatch import BACKGROUND_QUEUE_TIMEOUT, LLMCaller, llm_dispatcher
+from .prompt_budget import PromptBudget
+
+logger = logging.getLogger(__name__)
+
+# Unsummarised messages read per chat turn; a full window asks the worker for a summary
+CHAT_HISTORY_WINDOW = config('CHAT_HISTORY_WINDOW', default=20, cast=int)
+# Latest messages left out of the summary (the prompt still sends them verbatim)
+CHAT_SUMMARY_KEEP = config('CHAT_SUMMARY_KEEP', default=8, cast=int)
+# Messages folded into the summary per LLM call (a lagging session catches up over several runs)
+CHAT_SUMMARY_BATCH = 40
+CHAT_SUMMARY_SESSIONS_PER_RUN = 20
+SUMMARY_PROMPT_TOKEN_BUDGET = config('CHAT_SUMMARY_PROMPT_TOKEN_BUDGET', default=6000, cast=int)
+SUMMARY_MAX_TOKENS = 600
+# Characters kept from each message in the summary transcript
+MESSAGE_EXCERPT_CHARS = 1500
+
+ROLE_LABELS = {'user': 'کاربر', 'assistant': 'مشاور', 'system': 'سیستم'}
+
+
+def load_history(session):
+    """
+    آخرین CHAT_HISTORY_WINDOW پیام خلاصه‌نشده جلسه (قدیمی به جدید) با یک کوئری محدود
+    اگر پنجره پر باشد جلسه برای خلاصه‌سازی علامت می‌خورد
+    """
+    messages = session.messages.order_by('-created_at')
+    if session.summarized_until:
+        messages = messages.filter(created_at__gt=session.summarized_until)
+    history = list(messages.values('role', 'content')[:CHAT_HISTORY_WINDOW])
+    history.reverse()
+
+    if len(history) >= CHAT_HISTORY_WINDOW and not session.summary_pending:
+        ChatSession.objects.filter(pk=session.pk).update(summary_pending=True)
+        session.summary_pending = True
+    return history
+
+
+class ChatSummarizer:
+    """
+    ادغام پیام‌های قدیمی یک جلسه در خلاصه قبلی آن با LLM (در worker اجرا می‌شود)
+    """
+
+    SYSTEM_PROMPT = """تو خلاصه‌نویس گفتگوی یک کاربر با مشاور استارتاپ هستی.
+خلاصه قبلی (اگر هست) و ادامه گفتگو را می‌گیری و یک خلاصه جدید و کامل می‌نویسی که جایگزین خلاصه قبلی می‌شود.
+
+- تصمیم‌ها، اعداد، ترجیحات و اطلاعاتی که کاربر درباره خودش و ایده‌اش داده را نگه دار.
+- تغییراتی که در ایده اعمال یا پیشنهاد شد و سؤال‌های بی‌پاسخ را ذکر کن.
+- تعارف‌ها، تکرارها و جزئیات کم‌اهمیت را حذف کن.
+- فارسی، به صورت فهرست کوتاه و حداکثر ۲۵۰ کلمه بنویس. فقط خود خلاصه را برگردان."""
+
+    def __init__(self, client=None):
+        self.client = client or llm_dispatcher
+        # run_pending goes round the pending sessions by id, resuming after the last one handled
+        self._resume_after = 0
+
+    def _build_messages(self, session, messages):
+        prompt = PromptBudget(SUMMARY_PROMPT_TOKEN_BUDGET)
+        prompt.add('previous_summary', f"**خلاصه قبلی:**\n{session.summary or '(ندارد)'}\n\n",
+                   required=True, truncate=True)
+        prompt.add('transcript', "**ادامه گفتگو:**\n", [
+            f"{ROLE_LABELS.get(message['role'], message['role'])}: {message['content'][:MESSAGE_EXCERPT_CHARS]}\n"
+            for message in messages
+        ], required=True, truncate=True)
+        prompt.add('output', "\nخلاصه جدید:", required=True)
+        report = prompt.fit()
+        logger.debug('Chat summary prompt for session %s: %s', session.pk, report)
+        return [
+            {'role': 'system', 'content': self.SYSTEM_PROMPT},
+            {'role': 'user', 'content': prompt.render()},
+        ]
+
+    def summarize(self, session):
+        """
+        خلاصه‌سازی یک جلسه؛ خروجی: تعداد پیام‌های ادغام‌شده
+        نتیجه فقط اگر جلسه در این فاصله توسط پردازه دیگری خلاصه نشده باشد ذخیره می‌شود
+        """
+        pending = session.messages.order_by('created_at')
+        if session.summarized_until:
+            pending = pending.filter(created_at__gt=session.summarized_until)
+        # Newest first so the kept tail can be cut without counting the whole backlog
+        recent = list(pending.reverse().values('role', 'content', 'created_at')[:CHAT_SUMMARY_KEEP + CHAT_SUMMARY_BATCH])
+        recent.reverse()
+        fold = recent[:-CHAT_SUMMARY_KEEP] if CHAT_SUMMARY_KEEP else recent
+        if not fold:
+            ChatSession.objects.filter(pk=session.pk).update(summary_pending=False)
+            return 0
+        if len(recent) == CHAT_SUMMARY_KEEP + CHAT_SUMMARY_BATCH:
+            # Backlog beyond one batch: fold the oldest messages first
+            fold = list(pending.values('role', 'content', 'created_at')[:CHAT_SUMMARY_BATCH])
+
+        response = self.client.chat_completion(
+            messages=self._build_messages(session, fold),
+            caller=LLMCaller.for_user(session.idea.user, 'chat_summary'),
+            max_wait=BACKGROUND_QUEUE_TIMEOUT,
+            temperature=0.2,
+            max_tokens=SUMMARY_MAX_TOKENS,
+        )
+        summary = response.content.strip()
+
+        remaining = pending.filter(created_at__gt=fold[-1]['created_at']).count()
+        updated = ChatSession.objects.filter(
+            pk=session.pk, summarized_until=session.summarized_until
+        ).update(
+            summary=summary,
+            summarized_until=fold[-1]['created_at'],
+            summarized_count=F('summarized_count') + len(fold),
+            summary_pending=remaining >= CHAT_HISTORY_WINDOW,
+        )
+        if not updated:
+            logger.info('Chat session %s was summarised concurrently, result dropped', session.pk)
+            return 0
+        return len(fold)
+
+    def run_pending(self, limit=CHAT_SUMMARY_SESSIONS_PER_RUN):
+        """
+        خلاصه‌سازی جلسه‌های در انتظار (کار دوره‌ای worker)؛ خروجی: تعداد جلسه‌ها
+        جلسه‌ها به ترتیب id و به صورت چرخشی برداشته می‌شوند تا جلسه‌ای که مدام خطا می‌دهد
+        نوبت بقیه را نگیرد
+        """
+        if not self.client.is_configured:
+            return 0
+        pending = ChatSession.objects.filter(summary_pending=True).select_related('idea__user').order_by('pk')
+        sessions = list(pending.filter(pk__gt=self._resume_after)[:limit])
+        if len(sessions) < limit and self._resume_after:
+            # Wrap around to the start of the queue
+            sessions += pending.filter(pk__lte=self._resume_after)[:limit - len(sessions)]
+        done = 0
+        for session in sessions:
+            self._resume_after = session.pk
+            try:
+                if self.summarize(session):
+                    done += 1
+            except LLMError as e:
+                # Stays pending; the next round retries
+                logger.warning('Chat summary for session %s failed: %s', session.pk, e)
+            except Exception:
+                logger.exception('Chat summary for session %s crashed', session.pk)
+        return done
+
+
+# Singleton instance
+chat_summarizer = ChatSummarizer()
@@ -0,0 +1,67 @@
+"""
+Idea Context Cache - کش بخش‌های context ایده در پرامپت چت
+کلید (idea.id, idea.updated_at): هر ذخیره ایده (و تغییر فیلدهای سفارشی، ideas/signals.py)
+updated_at را عوض می‌کند، پس ورودی قدیمی هیچ‌وقت خوانده نمی‌شود و فقط منتظر حذف می‌ماند.
+دو لایه: LRU درون پردازه (بدون شبکه) و کش مشترک Django (Redis در production) بین workerها
+"""
+
+import threading
+from collections import OrderedDict
+
+from decouple import config
+from django.core.cache import cache
+
+# Bump when the rendered context format changes, so old entries are ignored after a deploy
+IDEA_CONTEXT_VERSION = 1
+IDEA_CONTEXT_CACHE_SIZE = config('IDEA_CONTEXT_CACHE_SIZE', default=256, cast=int)
+IDEA_CONTEXT_CACHE_TIMEOUT = config('IDEA_CONTEXT_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+
+
+class IdeaContextCache:
+    """
+    sections(idea, build): لیست Sectionهای context ایده (نسخه مستقل برای هر پرامپت)
+    build(idea) فقط وقتی اجرا می‌شود که هیچ‌کدام از دو لایه این نسخه ایده را نداشته باشند
+    """
+
+    KEY_PREFIX = 'idea-context'
+
+    def __init__(self, max_entries=IDEA_CONTEXT_CACHE_SIZE, timeout=IDEA_CONTEXT_CACHE_TIMEOUT):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, idea):
+        return f'{self.KEY_PREFIX}:v{IDEA_CONTEXT_VERSION}:{idea.pk}:{idea.updated_at.timestamp()}'
+
+    def _remember(self, key, sections):
+        with self._lock:
+            self._entries[key] = sections
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def sections(self, idea, build):
+        if idea.pk is None or idea.updated_at is None:
+            return build(idea)
+
+        key = self.key(idea)
+        with self._lock:
+            sections = self._entries.get(key)
+            if sections is not None:
+                self._entries.move_to_end(key)
+        if sections is None:
+            sections = cache.get(key)
+            if sections is None:
+                sections = build(idea)
+                cache.set(key, sections, self.timeout)
+            self._remember(key, sections)
+        return [section.copy() for section in sections]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Singleton instance
+idea_context_cache = IdeaContextCache()
@@ -0,0 +1,248 @@
+"""
+Idea Actions - اعمال اکشن‌های مشاور (بلوک‌های __SYSTEM_ACTION__) روی ایده
+ردیف ایده در یک تراکنش با select_for_update قفل می‌شود، همه اکشن‌های یک دسته روی همین نسخه
+اعتبارسنجی و در پایان با یک save(update_fields) نوشته می‌شوند (همه یا هیچ‌کدام).
+تغییر بلوک‌ها عبارت jsonb_set / jsonb_insert / || روی خود ستون است؛ فقط ستون‌های تغییرکرده
+(و updated_at برای کش context چت) نوشته می‌شوند، نه کل ردیف با description و blocks
+"""
+
+import copy
+import logging
+
+from django.contrib.postgres.fields import ArrayField
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import CharField, F, Func, JSONField, Value
+
+from ideas.models import Idea
+
+logger = logging.getLogger(__name__)
+
+# Fields the advisor may change (the update_field list in its system prompt); tags live in a block
+EDITABLE_FIELDS = ('title', 'description', 'budget', 'execution_steps', 'required_skills', 'visibility')
+# Loaded with the row lock: the blocks to validate against, and what the post_save receivers read
+LOCKED_FIELDS = ('user', 'ai_score', 'blocks')
+TAG_COLOR_COUNT = 7
+
+
+class ActionError(Exception):
+    """اکشن قابل اجرا نیست؛ هیچ‌کدام از اکشن‌های دسته نوشته نمی‌شوند"""
+
+
+class JSONBSet(Func):
+    """jsonb_set(target, path, value): جایگزینی (یا ساختن) مقدار یک مسیر"""
+    function = 'jsonb_set'
+    output_field = JSONField()
+
+
+class JSONBAppend(Func):
+    """jsonb_insert(target, path, value, true) با مسیر ختم به -1: افزودن به انتهای آرایه"""
+    function = 'jsonb_insert'
+    template = '%(function)s(%(expressions)s, true)'
+    output_field = JSONField()
+
+
+class JSONBConcat(Func):
+    """target || value"""
+    template = '(%(expressions)s)'
+    arg_joiner = ' || '
+    output_field = JSONField()
+
+
+def _json(value):
+    # A copy: the IdeaChanges.blocks snapshot keeps changing while the batch is collected
+    return Value(copy.deepcopy(value), output_field=JSONField())
+
+
+def _path(*keys):
+    return Value([str(key) for key in keys], output_field=ArrayField(CharField()))
+
+
+class IdeaChanges:
+    """
+    تغییرات جمع‌شده روی یک ایده قفل‌شده
+    self.blocks نسخه Python ستون است تا اکشن بعدی همین دسته (مثلاً آیتم چک‌لیستی که تازه ساخته شد)
+    درست اعتبارسنجی شود؛ خود ستون فقط با self.blocks_expr تغییر می‌کند
+    """
+
+    def __init__(self, idea):
+        self.idea = idea
+        self.fields = {}
+        if isinstance(idea.blocks, list):
+            self.blocks = copy.deepcopy(idea.blocks)
+            self._blocks_source = F('blocks')
+        else:
+            self.blocks = []
+            self._blocks_source = _json([])
+        self.blocks_expr = None
+
+    def _edit_blocks(self, build):
+        self.blocks_expr = build(self.blocks_expr if self.blocks_expr is not None else self._blocks_source)
+
+    def _block(self, index, block_type=None):
+        if isinstance(index, bool) or not isinstance(index, int) or not 0 <= index < len(self.blocks):
+            return None
+        block = self.blocks[index]
+        if not isinstance(block, dict) or (block_type and block.get('type') != block_type):
+            return None
+        return block
+
+    def _graph_block(self, index):
+        """بلوک node_graph با مقدار {nodes, edges} (مقدار خالی ساخته می‌شود)"""
+        block = self._block(index, 'node_graph')
+        if block is None:
+            return False
+        if not isinstance(block.get('value'), dict):
+            self.set_block_value(index, {'nodes': [], 'edges': []})
+        return True
+
+    def add_block(self, block):
+        self.blocks.append(block)
+        self._edit_blocks(lambda blocks: JSONBConcat(blocks, _json([block])))
+
+    def set_block_value(self, index, value, key=None):
+        """مقدار بلوک (یا یک کلید داخل مقدار آن) با jsonb_set"""
+        block = self.blocks[index]
+        if key is None:
+            block['value'] = value
+            path = _path(index, 'value')
+        else:
+            block['value'][key] = value
+            path = _path(index, 'value', key)
+        self._edit_blocks(lambda blocks: JSONBSet(blocks, path, _json(value)))
+
+    def append_to_block(self, index, item, key=None):
+        """افزودن item به آرایه مقدار بلوک (یا آرایه value[key])؛ آرایه ناموجود ساخته می‌شود"""
+        items = self.blocks[index].get('value')
+        if key is not None:
+            items = items.get(key)
+        if not isinstance(items, list):
+            self.set_block_value(index, [item], key)
+            return
+        items.append(item)
+        path = _path(index, 'value', *([] if key is None else [key]), -1)
+        self._edit_blocks(lambda blocks: JSONBAppend(blocks, path, _json(item)))
+
+    def set_tags(self, value):
+        """tags رابطه جدا نیست: بلوک tags (اولین بلوک از این نوع یا یک بلوک جدید)"""
+        if isinstance(value, list):
+            tags = [str(v) for v in value]
+        elif isinstance(value, str):
+            tags = [v.strip() for v in value.split(',') if v.strip()]
+        else:
+            tags = []
+        tag_list = [{'text': text, 'colorIndex': i % TAG_COLOR_COUNT} for i, text in enumerate(tags)]
+
+        for index, block in enumerate(self.blocks):
+            if isinstance(block, dict) and block.get('type') == 'tags':
+                self.set_block_value(index, tag_list)
+                return
+        self.add_block({'type': 'tags', 'name': 'برچسب‌ها', 'value': tag_list})
+
+    def set_field(self, field, value):
+        """خروجی: False اگر فیلد قابل تغییر نباشد"""
+        if field == 'tags':
+            self.set_tags(value)
+            return True
+        if field not in EDITABLE_FIELDS:
+            return False
+        try:
+            self.fields[field] = Idea._meta.get_field(field).clean(value, self.idea)
+        except ValidationError as e:
+            raise ActionError(f"فیلد {field}: {' '.join(e.messages)}")
+        return True
+
+    def apply(self, action):
+        """ثبت یک اکشن؛ خروجی: پیام نتیجه"""
+        if not isinstance(action, dict):
+            raise ActionError('اکشن نامعتبر')
+        action_type = action.get('action')
+
+        if action_type == 'update_field':
+            field = action.get('field')
+            if self.set_field(field, action.get('value')):
+                return f'فیلد {field} بروزرسانی شد'
+
+        elif action_type == 'add_block':
+            block = action.get('block')
+            if isinstance(block, dict) and block:
+                self.add_block(block)
+                return f"بلوک «{block.get('name')}» اضافه شد"
+
+        elif action_type == 'update_block':
+            index = action.get('block_index', 0)
+            if self._block(index) is not None:
+                self.set_block_value(index, action.get('value'))
+                return 'بلوک بروزرسانی شد'
+
+        elif action_type == 'add_checklist_item':
+            index = action.get('block_index', 0)
+            item = action.get('item')
+            if isinstance(item, dict) and self._block(index, 'checklist') is not None:
+                self.append_to_block(index, item)
+                return f"آیتم «{item.get('text')}» اضافه شد"
+
+        elif action_type == 'add_graph_node':
+            index = action.get('block_index', 0)
+            node = action.get('node')
+            if isinstance(node, dict) and self._graph_block(index):
+                self.append_to_block(index, node, 'nodes')
+                return f"نود «{node.get('label')}» اضافه شد"
+
+        elif action_type == 'add_graph_edge':
+            index = action.get('block_index', 0)
+            edge = action.get('edge')
+            if isinstance(edge, dict) and self._graph_block(index):
+                self.append_to_block(index, edge, 'edges')
+                return 'اتصال اضافه شد'
+
+        elif action_type == 'batch_update':
+            updates = action.get('updates') or []
+            count = sum(
+                1 for update in updates
+                if isinstance(update, dict) and self.set_field(update.get('field'), update.get('value'))
+            )
+            return f'{count} تغییر اعمال شد'
+
+        raise ActionError('اکشن نامعتبر')
+
+    @property
+    def update_fields(self):
+        fields = list(self.fields)
+        if self.blocks_expr is not None:
+            fields.append('blocks')
+        return fields
+
+    def save(self):
+        """یک UPDATE برای همه تغییرات (post_save با update_fields اجرا می‌شود)"""
+        update_fields = self.update_fields
+        if not update_fields:
+            return
+        for field, value in self.fields.items():
+            setattr(self.idea, field, value)
+        if self.blocks_expr is not None:
+            self.idea.blocks = self.blocks_expr
+        # updated_at invalidates the chat advisor's idea context cache (scoring/context_cache.py)
+        self.idea.save(update_fields=update_fields + ['updated_at'])
+
+
+def apply_actions(idea, actions):
+    """
+    اعمال اکشن‌ها به ترتیب روی ایده در یک تراکنش
+    خروجی: {'success': bool, 'message': str}؛ اگر یکی اجرا نشود هیچ تغییری ذخیره نمی‌شود
+    """
+    if not actions:
+        return {'success': False, 'message': 'اکشن نامعتبر'}
+    try:
+        with transaction.atomic():
+            locked = Idea.objects.select_for_update().only(*LOCKED_FIELDS).get(pk=idea.pk)
+            changes = IdeaChanges(locked)
+            messages = [changes.apply(action) for action in actions]
+            changes.save()
+    except ActionError as e:
+        return {'success': False, 'message': str(e)}
+    except Exception:
+        # Database or ORM text is not for the client; the transaction was rolled back either way
+        logger.exception('Applying advisor actions to idea %s failed', idea.pk)
+        return {'success': False, 'message': 'خطا در اعمال تغییرات؛ دوباره تلاش کنید'}
+    return {'success': True, 'message': '\n'.join(messages)}
@@ -0,0 +1,169 @@
+"""
+Scoring Jobs - صف پس‌زمینه امتیازدهی AI
+ثبت کار در view، برداشتن و اجرای آن در worker (run_scoring_worker)
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from decouple import config
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .analysis_cache import AnalysisCache
+from .chat_summary import chat_summarizer
+from .llm_client import llm_client
+from .llm_dispatch import BACKGROUND_QUEUE_TIMEOUT, LLMCaller, priority_for_user
+from .models import ScoringJob
+from .ranking import recompute_ranks
+from .services import ScoringService, UserScoreService
+from .telemetry import LLMUsageRollup
+
+logger = logging.getLogger(__name__)
+
+
+def _longest_job_seconds():
+    """
+    بیشترین زمانی که یک worker سالم روی یک کار می‌ماند: انتظار برای سهمیه provider،
+    سپس همه تلاش‌های LLM با timeout و بیشترین backoff بین آن‌ها
+    """
+    attempts = llm_client.max_retries + 1
+    return (
+        BACKGROUND_QUEUE_TIMEOUT
+        + attempts * (llm_client.connect_timeout + llm_client.read_timeout)
+        + llm_client.max_retries * llm_client.backoff_max
+    )
+
+
+# A running job older than this is assumed to belong to a dead worker; it must outlast any
+# live run (about 10 minutes with the default settings), or a second worker re-claims the job
+STALE_JOB_MARGIN = config('SCORING_STALE_JOB_MARGIN', default=300, cast=float)
+STALE_JOB_TIMEOUT = timedelta(seconds=_longest_job_seconds() + STALE_JOB_MARGIN)
+
+# Periodic maintenance run by the scoring worker (seconds, 0 disables)
+RANK_RECOMPUTE_INTERVAL = config('RANK_RECOMPUTE_INTERVAL', default=300, cast=float)
+SCORE_RECONCILE_INTERVAL = config('SCORE_RECONCILE_INTERVAL', default=3600, cast=float)
+ANALYSIS_CACHE_PRUNE_INTERVAL = config('ANALYSIS_CACHE_PRUNE_INTERVAL', default=600, cast=float)
+LLM_USAGE_ROLLUP_INTERVAL = config('LLM_USAGE_ROLLUP_INTERVAL', default=300, cast=float)
+LLM_TELEMETRY_PRUNE_INTERVAL = config('LLM_TELEMETRY_PRUNE_INTERVAL', default=3600, cast=float)
+CHAT_SUMMARY_INTERVAL = config('CHAT_SUMMARY_INTERVAL', default=15, cast=float)
+
+
+def enqueue_scoring(idea, user, bypass_cache=False):
+    """
+    ثبت کار امتیازدهی برای ایده
+    اگر کار فعالی برای همین ایده در صف باشد، همان برگردانده می‌شود
+    bypass_cache: تحلیل تازه بدون استفاده از AnalysisCache
+    """
+    active = ScoringJob.objects.filter(idea=idea, status__in=ScoringJob.ACTIVE_STATUSES)
+    job = active.first()
+    if job:
+        return job, False
+    try:
+        with transaction.atomic():
+            return ScoringJob.objects.create(
+                idea=idea, user=user, priority=priority_for_user(user), bypass_cache=bypass_cache
+            ), True
+    except IntegrityError:
+        # A concurrent request queued one first (one active job per idea, enforced by the database)
+        job = active.first()
+        if job is None:
+            raise
+        return job, False
+
+
+def claim_next_job():
+    """
+    برداشتن قدیمی‌ترین کار با بالاترین اولویت در صف به صورت اتمیک
+    (SKIP LOCKED اجازه می‌دهد چند worker بدون رقابت روی یک سطر کار کنند)
+    """
+    stale_before = timezone.now() - STALE_JOB_TIMEOUT
+    with transaction.atomic():
+        job = ScoringJob.objects.select_for_update(skip_locked=True).filter(
+            Q(status=ScoringJob.Status.PENDING) |
+            Q(status=ScoringJob.Status.RUNNING, started_at__lt=stale_before),
+            attempts__lt=ScoringJob.MAX_ATTEMPTS,
+        ).order_by('-priority', 'created_at').first()
+        if job is None:
+            return None
+
+        job.status = ScoringJob.Status.RUNNING
+        job.attempts += 1
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'attempts', 'started_at'])
+        return job
+
+
+def run_job(job):
+    """اجرای یک کار امتیازدهی و ثبت نتیجه"""
+    try:
+        caller = LLMCaller.for_user(job.user, 'ai_score', priority=job.priority)
+        success, payload = ScoringService.score_idea(
+            job.idea, caller=caller, use_cache=not job.bypass_cache
+        )
+    except Exception as e:
+        logger.exception('Scoring job %s crashed', job.pk)
+        success, payload = False, {'error': f'Analysis failed: {str(e)}'}
+
+    job.status = ScoringJob.Status.DONE if success else ScoringJob.Status.FAILED
+    job.result = payload
+    job.error = '' if success else payload.get('error', '')
+    job.cache_hit = success and payload.get('cached', False)
+    job.prescreen_reason = payload.get('prescreened', '') if success else ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'cache_hit', 'prescreen_reason', 'finished_at'])
+    return job
+
+
+def fail_exhausted_jobs():
+    """کارهای گیرکرده‌ای که به سقف تلاش رسیده‌اند ناموفق علامت می‌خورند"""
+    stale_before = timezone.now() - STALE_JOB_TIMEOUT
+    return ScoringJob.objects.filter(
+        status=ScoringJob.Status.RUNNING,
+        started_at__lt=stale_before,
+        attempts__gte=ScoringJob.MAX_ATTEMPTS,
+    ).update(
+        status=ScoringJob.Status.FAILED,
+        error='Worker timed out',
+        finished_at=timezone.now()
+    )
+
+
+class PeriodicTask:
+    """
+    اجرای دوره‌ای یک تابع داخل حلقه worker (بین کارهای امتیازدهی)
+    """
+
+    def __init__(self, func, interval):
+        self.func = func
+        self.interval = interval
+        self.last_run = None
+
+    def maybe_run(self):
+        now = time.monotonic()
+        if self.interval <= 0 or (self.last_run is not None and now - self.last_run < self.interval):
+            return None
+        self.last_run = now
+        try:
+            return self.func()
+        except Exception:
+            logger.exception('Periodic task %s failed', self.func.__qualname__)
+            return None
+
+
+def maintenance_tasks():
+    """
+    کارهای دوره‌ای: اصلاح drift امتیازها (ساعتی)، بازسازی کامل رتبه‌ها (هر ۵ دقیقه)،
+    پاکسازی کش تحلیل AI (هر ۱۰ دقیقه)، تجمیع مصرف LLM (هر ۵ دقیقه)، حذف تله‌متری خام قدیمی (ساعتی)
+    و خلاصه‌سازی جلسه‌های چت طولانی (هر ۱۵ ثانیه)
+    """
+    return [
+        PeriodicTask(UserScoreService.reconcile, SCORE_RECONCILE_INTERVAL),
+        PeriodicTask(recompute_ranks, RANK_RECOMPUTE_INTERVAL),
+        PeriodicTask(AnalysisCache.prune, ANALYSIS_CACHE_PRUNE_INTERVAL),
+        PeriodicTask(LLMUsageRollup.run, LLM_USAGE_ROLLUP_INTERVAL),
+        PeriodicTask(LLMUsageRollup.prune, LLM_TELEMETRY_PRUNE_INTERVAL),
+        PeriodicTask(chat_summarizer.run_pending, CHAT_SUMMARY_INTERVAL),
+    ]
@@ -0,0 +1,395 @@
+"""
+LLM Client - کلاینت مشترک ارتباط با Groq
+نشست HTTP پایدار (keep-alive) برای هر worker، تلاش مجدد با backoff و اندازه‌گیری تأخیر
+متدهای a* (achat_completion، astream_chat_completion) نسخه async برای viewهای ASGI هستند (httpx)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+
+class LLMError(requests.exceptions.RequestException):
+    """خطای نهایی فراخوانی LLM (بعد از تمام تلاش‌ها)"""
+
+    def __init__(self, message, status_code=None, latency_ms=None, attempts=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.latency_ms = latency_ms
+        self.attempts = attempts
+
+
+class LLMResponse:
+    """پاسخ موفق LLM به همراه متادیتای فراخوانی"""
+
+    def __init__(self, data, status_code, latency_ms, attempts, headers=None):
+        self.data = data
+        self.status_code = status_code
+        self.latency_ms = latency_ms
+        self.attempts = attempts
+        self.headers = headers or {}
+
+    @property
+    def content(self):
+        return self.data['choices'][0]['message']['content']
+
+    @property
+    def usage(self):
+        return self.data.get('usage') or {}
+
+
+class LLMClient:
+    """
+    کلاینت chat completions سازگار با OpenAI
+    - یک requests.Session برای هر thread/پردازه (connection pool + keep-alive)
+    - backoff نمایی با jitter روی 429 و 5xx و خطاهای اتصال
+    - timeout جداگانه برای اتصال و خواندن
+    - یک httpx.AsyncClient برای هر event loop (متدهای async)؛ صدها فراخوانی همزمان در یک پردازه
+    """
+
+    RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+    def __init__(self):
+        self.api_key = config('GROQ_API_KEY', default='')
+        self.model = config('GROQ_MODEL', default='llama-3.3-70b-versatile')
+        self.api_url = config('GROQ_API_URL', default='https://api.groq.com/openai/v1/chat/completions')
+        self.connect_timeout = config('LLM_CONNECT_TIMEOUT', default=5, cast=float)
+        self.read_timeout = config('LLM_READ_TIMEOUT', default=60, cast=float)
+        self.max_retries = config('LLM_MAX_RETRIES', default=3, cast=int)
+        self.backoff_base = config('LLM_BACKOFF_BASE', default=0.5, cast=float)
+        self.backoff_max = config('LLM_BACKOFF_MAX', default=8, cast=float)
+        self.pool_size = config('LLM_POOL_SIZE', default=10, cast=int)
+        # In-flight calls per ASGI process; sync workers only ever hold one per thread
+        self.async_pool_size = config('LLM_ASYNC_POOL_SIZE', default=200, cast=int)
+        self._local = threading.local()
+        self._async_sessions = weakref.WeakKeyDictionary()
+        # Called with every HTTP response, retried ones included (see llm_dispatch.ProviderQuota)
+        self.response_hooks = []
+
+    @property
+    def is_configured(self):
+        return bool(self.api_key)
+
+    @property
+    def session(self):
+        """نشست HTTP مخصوص thread فعلی (بعد از fork دوباره ساخته می‌شود)"""
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update({
+                'Authorization': f'Bearer {self.api_key}',
+                'Content-Type': 'application/json'
+            })
+            self._local.session = session
+            self._local.pid = pid
+        return self._local.session
+
+    @property
+    def async_session(self):
+        """کلاینت httpx مخصوص event loop فعلی (هر پردازه uvicorn یک loop دارد)"""
+        loop = asyncio.get_running_loop()
+        session = self._async_sessions.get(loop)
+        if session is None:
+            session = httpx.AsyncClient(
+                headers={
+                    'Authorization': f'Bearer {self.api_key}',
+                    'Content-Type': 'application/json'
+                },
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.async_pool_size,
+                    max_keepalive_connections=self.async_pool_size,
+                ),
+            )
+            self._async_sessions[loop] = session
+        return session
+
+    def _observe(self, response):
+        for hook in self.response_hooks:
+            try:
+                hook(response)
+            except Exception:
+                logger.exception('LLM response hook failed')
+
+    def _backoff_delay(self, attempt, response=None):
+        """تأخیر قبل از تلاش بعدی (full jitter، با احترام به Retry-After)"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.backoff_max)
+                except ValueError:
+                    pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def chat_completion(self, messages, model=None, **params):
+        """
+        ارسال درخواست chat completion
+        خروجی: LLMResponse - در صورت شکست نهایی LLMError
+        """
+        payload = {'model': model or self.model, 'messages': messages, **params}
+        timeout = (self.connect_timeout, self.read_timeout)
+        started = time.monotonic()
+        last_error = None
+        status_code = None
+
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                response = self.session.post(self.api_url, json=payload, timeout=timeout)
+                self._observe(response)
+                status_code = response.status_code
+                if status_code not in self.RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    latency_ms = int((time.monotonic() - started) * 1000)
+                    logger.info('LLM call ok model=%s attempts=%d latency_ms=%d',
+                                payload['model'], attempt + 1, latency_ms)
+                    return LLMResponse(response.json(), status_code, latency_ms, attempt + 1, response.headers)
+                last_error = f'HTTP {status_code}'
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                last_error = str(e)
+            except requests.exceptions.RequestException as e:
+                # Non-retryable (4xx other than 429)
+                latency_ms = int((time.monotonic() - started) * 1000)
+                raise LLMError(str(e), status_code=status_code, latency_ms=latency_ms, attempts=attempt + 1) from e
+
+            if attempt < self.max_retries:
+                delay = self._backoff_delay(attempt, response)
+                logger.warning('LLM call failed (%s), retrying in %.2fs', last_error, delay)
+                time.sleep(delay)
+
+        latency_ms = int((time.monotonic() - started) * 1000)
+        raise LLMError(
+            f'LLM request failed after {self.max_retries + 1} attempts: {last_error}',
+            status_code=status_code,
+            latency_ms=latency_ms,
+            attempts=self.max_retries + 1
+        )
+
+    def _open_stream(self, payload):
+        """
+        باز کردن اتصال stream؛ تلاش مجدد فقط قبل از دریافت اولین بایت ممکن است
+        خروجی: (response, تعداد تلاش)
+        """
+        timeout = (self.connect_timeout, self.read_timeout)
+        last_error = None
+        status_code = None
+
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                response = self.session.post(self.api_url, json=payload, timeout=timeout, stream=True)
+                self._observe(response)
+                status_code = response.status_code
+                if status_code not in self.RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    return response, attempt + 1
+                response.close()
+                last_error = f'HTTP {status_code}'
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                last_error = str(e)
+            except requests.exceptions.RequestException as e:
+                raise LLMError(str(e), status_code=status_code, attempts=attempt + 1) from e
+
+            if attempt < self.max_retries:
+                time.sleep(self._backoff_delay(attempt, response))
+
+        raise LLMError(
+            f'LLM request failed after {self.max_retries + 1} attempts: {last_error}',
+            status_code=status_code,
+            attempts=self.max_retries + 1
+        )
+
+    def stream_chat_completion(self, messages, model=None, **params):
+        """
+        درخواست chat completion به صورت stream (Server-Sent Events سمت provider)
+        هر بار یک تکه متن (delta) برمی‌گرداند؛ مقدار بازگشتی generator آمار فراخوانی است:
+        {'status_code', 'attempts', 'latency_ms', 'first_token_ms', 'usage'}
+        """
+        payload = {'model': model or self.model, 'messages': messages, 'stream': True, **params}
+        started = time.monotonic()
+        response, attempts = self._open_stream(payload)
+        first_token_ms = None
+        usage = {}
+
+        try:
+            for raw_line in response.iter_lines():
+                line = raw_line.decode('utf-8', errors='replace')
+                if not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    break
+                try:
+                    chunk = json.loads(data)
+                except json.JSONDecodeError:
+                    continue
+                # Token usage arrives on the last chunk (Groq: x_groq.usage, OpenAI: usage)
+                usage = chunk.get('usage') or (chunk.get('x_groq') or {}).get('usage') or usage
+                choices = chunk.get('choices') or []
+                if not choices:
+                    continue
+                delta = choices[0].get('delta', {}).get('content')
+                if delta:
+                    if first_token_ms is None:
+                        first_token_ms = int((time.monotonic() - started) * 1000)
+                    yield delta
+        except requests.exceptions.RequestException as e:
+            raise LLMError(
+                str(e), status_code=response.status_code,
+                latency_ms=int((time.monotonic() - started) * 1000), attempts=attempts
+            ) from e
+        finally:
+            response.close()
+            logger.info('LLM stream done model=%s first_token_ms=%s latency_ms=%d',
+                        payload['model'], first_token_ms, int((time.monotonic() - started) * 1000))
+
+        return {
+            'status_code': response.status_code,
+            'attempts': attempts,
+            'latency_ms': int((time.monotonic() - started) * 1000),
+            'first_token_ms': first_token_ms,
+            'usage': usage,
+        }
+
+    async def achat_completion(self, messages, model=None, **params):
+        """نسخه async chat_completion (همان تلاش مجدد و خروجی)"""
+        payload = {'model': model or self.model, 'messages': messages, **params}
+        started = time.monotonic()
+        last_error = None
+        status_code = None
+
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                response = await self.async_session.post(self.api_url, json=payload)
+                self._observe(response)
+                status_code = response.status_code
+                if status_code not in self.RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    latency_ms = int((time.monotonic() - started) * 1000)
+                    logger.info('LLM call ok model=%s attempts=%d latency_ms=%d',
+                                payload['model'], attempt + 1, latency_ms)
+                    return LLMResponse(response.json(), status_code, latency_ms, attempt + 1, response.headers)
+                last_error = f'HTTP {status_code}'
+            except httpx.TransportError as e:
+                # Connection errors and timeouts
+                last_error = str(e) or type(e).__name__
+            except httpx.HTTPError as e:
+                latency_ms = int((time.monotonic() - started) * 1000)
+                raise LLMError(str(e), status_code=status_code, latency_ms=latency_ms, attempts=attempt + 1) from e
+
+            if attempt < self.max_retries:
+                delay = self._backoff_delay(attempt, response)
+                logger.warning('LLM call failed (%s), retrying in %.2fs', last_error, delay)
+                await asyncio.sleep(delay)
+
+        latency_ms = int((time.monotonic() - started) * 1000)
+        raise LLMError(
+            f'LLM request failed after {self.max_retries + 1} attempts: {last_error}',
+            status_code=status_code,
+            latency_ms=latency_ms,
+            attempts=self.max_retries + 1
+        )
+
+    async def _aopen_stream(self, payload):
+        """نسخه async _open_stream؛ خروجی: (response, تعداد تلاش)"""
+        last_error = None
+        status_code = None
+
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                request = self.async_session.build_request('POST', self.api_url, json=payload)
+                response = await self.async_session.send(request, stream=True)
+                self._observe(response)
+                status_code = response.status_code
+                if status_code not in self.RETRY_STATUS_CODES:
+                    if status_code >= 400:
+                        await response.aclose()
+                        raise LLMError(f'HTTP {status_code}', status_code=status_code, attempts=attempt + 1)
+                    return response, attempt + 1
+                await response.aclose()
+                last_error = f'HTTP {status_code}'
+            except httpx.TransportError as e:
+                last_error = str(e) or type(e).__name__
+            except httpx.HTTPError as e:
+                raise LLMError(str(e), status_code=status_code, attempts=attempt + 1) from e
+
+            if attempt < self.max_retries:
+                await asyncio.sleep(self._backoff_delay(attempt, response))
+
+        raise LLMError(
+            f'LLM request failed after {self.max_retries + 1} attempts: {last_error}',
+            status_code=status_code,
+            attempts=self.max_retries + 1
+        )
+
+    async def astream_chat_completion(self, messages, model=None, stats=None, **params):
+        """
+        نسخه async stream_chat_completion
+        generator async مقدار بازگشتی ندارد؛ آمار فراخوانی در پایان در dict داده‌شده (stats) نوشته می‌شود
+        """
+        payload = {'model': model or self.model, 'messages': messages, 'stream': True, **params}
+        started = time.monotonic()
+        response, attempts = await self._aopen_stream(payload)
+        first_token_ms = None
+        usage = {}
+
+        try:
+            async for line in response.aiter_lines():
+                if not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    break
+                try:
+                    chunk = json.loads(data)
+                except json.JSONDecodeError:
+                    continue
+                usage = chunk.get('usage') or (chunk.get('x_groq') or {}).get('usage') or usage
+                choices = chunk.get('choices') or []
+                if not choices:
+                    continue
+                delta = choices[0].get('delta', {}).get('content')
+                if delta:
+                    if first_token_ms is None:
+                        first_token_ms = int((time.monotonic() - started) * 1000)
+                    yield delta
+        except httpx.HTTPError as e:
+            raise LLMError(
+                str(e) or type(e).__name__, status_code=response.status_code,
+                latency_ms=int((time.monotonic() - started) * 1000), attempts=attempts
+            ) from e
+        finally:
+            await response.aclose()
+            logger.info('LLM stream done model=%s first_token_ms=%s latency_ms=%d',
+                        payload['model'], first_token_ms, int((time.monotonic() - started) * 1000))
+
+        if stats is not None:
+            stats.update({
+                'status_code': response.status_code,
+                'attempts': attempts,
+                'latency_ms': int((time.monotonic() - started) * 1000),
+                'first_token_ms': first_token_ms,
+                'usage': usage,
+            })
+
+
+# Singleton instance
+llm_client = LLMClient()
@@ -0,0 +1,362 @@
+"""
+LLM Dispatch - زمان‌بندی فراخوانی‌های LLM بر اساس سهمیه باقی‌مانده provider
+Groq سقف درخواست و توکن را برای کل کلید API اعمال می‌کند؛ وضعیت این سقف از هدرهای
+x-ratelimit-* هر پاسخ خوانده و در کش مشترک (Redis) برای همه پردازه‌ها نگه داشته می‌شود
+"""
+
+import asyncio
+import logging
+import math
+import re
+import time
+from contextlib import aclosing
+
+from decouple import config
+from django.core.cache import cache
+
+from .llm_client import LLMError, llm_client
+from .models import LLMCall
+from .prompt_budget import count_message_tokens
+from .telemetry import call_status, record_call
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_FREE = 0
+PRIORITY_PAID = 1
+
+# Share of each provider limit that only paid-plan calls may use
+PAID_RESERVE = config('LLM_PAID_RESERVE', default=0.2, cast=float)
+# How long a call may wait for budget: interactive (chat) and background (scoring worker)
+QUEUE_TIMEOUT = config('LLM_QUEUE_TIMEOUT', default=20, cast=float)
+BACKGROUND_QUEUE_TIMEOUT = config('LLM_BACKGROUND_QUEUE_TIMEOUT', default=300, cast=float)
+POLL_INTERVAL = 0.5
+
+DEFAULT_COMPLETION_TOKENS = 1024
+
+DIMENSIONS = ('requests', 'tokens')
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+def parse_duration(value):
+    """'2m59.56s' / '7.66s' / '120ms' (فرمت هدرهای reset در Groq) -> ثانیه"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def _int_header(headers, name):
+    try:
+        return int(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(messages, max_tokens=None):
+    """تخمین توکن‌های مصرفی یک فراخوانی (پرامپت + سقف پاسخ) برای رزرو از سهمیه"""
+    return count_message_tokens(messages) + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+
+def _plan_priority(plan):
+    return PRIORITY_PAID if plan is not None and not plan.is_free else PRIORITY_FREE
+
+
+def priority_for_user(user):
+    """اولویت کاربر: پلن پولی بالاتر از رایگان (از حافظه همان درخواست در LimitService)"""
+    from subscriptions.services import LimitService
+
+    return _plan_priority(LimitService.get_user_plan(user))
+
+
+class LLMCaller:
+    """
+    فراخواننده LLM: اولویت صف و برچسب‌های تله‌متری (کاربر، پلن، اندپوینت)
+    """
+
+    # Label for users without an active subscription
+    NO_PLAN = 'none'
+
+    def __init__(self, endpoint, user_id=None, plan=NO_PLAN, priority=PRIORITY_FREE):
+        self.endpoint = endpoint
+        self.user_id = user_id
+        self.plan = plan
+        self.priority = priority
+
+    @classmethod
+    def for_user(cls, user, endpoint, priority=None):
+        """priority: اگر داده نشود از پلن کاربر (مثل priority_for_user) محاسبه می‌شود"""
+        from subscriptions.services import LimitService
+
+        plan = LimitService.get_user_plan(user)
+        return cls(
+            endpoint,
+            user_id=user.pk,
+            plan=plan.slug if plan is not None else cls.NO_PLAN,
+            priority=_plan_priority(plan) if priority is None else priority,
+        )
+
+    def __repr__(self):
+        return f'<LLMCaller {self.endpoint} user={self.user_id} plan={self.plan} priority={self.priority}>'
+
+
+class ProviderQuota:
+    """
+    سهمیه باقی‌مانده provider در کش مشترک
+
+    - llm:quota:requests / llm:quota:tokens: شمارنده باقی‌مانده؛ با هر پاسخ از هدرها بازنویسی
+      و با هر رزرو به صورت اتمیک کم می‌شود. TTL برابر زمان reset است، پس نبودن کلید یعنی
+      پنجره provider تازه شده (یا هنوز پاسخی ندیده‌ایم) و محدودیتی اعمال نمی‌شود
+    - llm:quota:limits: سقف کل و زمان reset هر بعد (برای سهم رزرو پلن‌های پولی)
+    - llm:quota:paused_until: بعد از 429 همه پردازه‌ها تا Retry-After صبر می‌کنند
+    """
+
+    KEY_PREFIX = 'llm:quota'
+
+    def _key(self, name):
+        return f'{self.KEY_PREFIX}:{name}'
+
+    def observe(self, response):
+        """به‌روزرسانی وضعیت از هدرهای یک پاسخ HTTP (hook روی LLMClient)"""
+        headers = response.headers
+        now = time.time()
+        limits = cache.get(self._key('limits')) or {}
+
+        for dimension in DIMENSIONS:
+            remaining = _int_header(headers, f'x-ratelimit-remaining-{dimension}')
+            reset = parse_duration(headers.get(f'x-ratelimit-reset-{dimension}'))
+            if remaining is None or not reset:
+                continue
+            cache.set(self._key(dimension), remaining, math.ceil(reset))
+            limit = _int_header(headers, f'x-ratelimit-limit-{dimension}')
+            if limit:
+                limits[dimension] = limit
+            limits[f'{dimension}_reset_at'] = now + reset
+        if limits:
+            cache.set(self._key('limits'), limits, 60 * 60 * 24)
+
+        if response.status_code == 429:
+            pause = parse_duration(headers.get('Retry-After')) or max(
+                (parse_duration(headers.get(f'x-ratelimit-reset-{d}')) or 0) for d in DIMENSIONS
+            ) or 1
+            cache.set(self._key('paused_until'), now + pause, math.ceil(pause))
+            logger.warning('LLM provider rate limited, pausing dispatch for %.1fs', pause)
+
+    def try_reserve(self, tokens, priority):
+        """
+        رزرو یک درخواست و tokens توکن
+        خروجی: None اگر رزرو شد، وگرنه ثانیه‌های پیشنهادی تا تلاش بعدی
+        """
+        now = time.time()
+        paused_until = cache.get(self._key('paused_until'))
+        if paused_until and paused_until > now:
+            return paused_until - now
+
+        limits = cache.get(self._key('limits')) or {}
+        amounts = {'requests': 1, 'tokens': tokens}
+        if limits.get('tokens'):
+            # A prompt bigger than the whole window still fits once it resets
+            amounts['tokens'] = min(tokens, limits['tokens'])
+
+        taken = []
+        for dimension in DIMENSIONS:
+            key = self._key(dimension)
+            try:
+                left = cache.decr(key, amounts[dimension])
+            except ValueError:
+                # Window reset or never observed: nothing to enforce
+                continue
+            taken.append((key, amounts[dimension]))
+
+            floor = 0 if priority >= PRIORITY_PAID else int(limits.get(dimension, 0) * PAID_RESERVE)
+            if left < floor:
+                for taken_key, amount in taken:
+                    try:
+                        cache.incr(taken_key, amount)
+                    except ValueError:
+                        pass
+                reset_at = limits.get(f'{dimension}_reset_at') or now
+                return max(reset_at - now, POLL_INTERVAL)
+        return None
+
+
+class LLMDispatcher:
+    """
+    لایه جلوی LLMClient برای IdeaAnalyzer و ChatAdvisor
+    - قبل از هر فراخوانی از سهمیه مشترک provider رزرو می‌کند
+    - اگر سهمیه تمام باشد فراخوانی منتظر می‌ماند (حداکثر max_wait ثانیه) به جای گرفتن 429
+    - کاربران پلن رایگان نمی‌توانند سهم PAID_RESERVE آخر هر پنجره را مصرف کنند
+    - هر فراخوانی (موفق، ناموفق یا ردشده در صف) در تله‌متری ثبت می‌شود (scoring/telemetry.py)
+    - متدهای a* همان رفتار را برای viewهای async دارند؛ انتظار صف با asyncio.sleep است و
+      عملیات سهمیه (چند دستور Redis زیر میلی‌ثانیه) مستقیم روی event loop اجرا می‌شود
+    """
+
+    def __init__(self, client=None, quota=None):
+        self.client = client or llm_client
+        self.quota = quota or ProviderQuota()
+        self.client.response_hooks.append(self.quota.observe)
+
+    @property
+    def is_configured(self):
+        return self.client.is_configured
+
+    @property
+    def model(self):
+        return self.client.model
+
+    def acquire(self, tokens, priority=PRIORITY_FREE, max_wait=None):
+        """
+        صبر تا رزرو سهمیه؛ خروجی: ثانیه‌های انتظار در صف
+        در صورت اتمام زمان LLMError با status 429
+        """
+        max_wait = QUEUE_TIMEOUT if max_wait is None else max_wait
+        started = time.monotonic()
+
+        while True:
+            delay = self._poll(tokens, priority, started, max_wait)
+            if delay is None:
+                return time.monotonic() - started
+            time.sleep(delay)
+
+    async def aacquire(self, tokens, priority=PRIORITY_FREE, max_wait=None):
+        """نسخه async acquire"""
+        max_wait = QUEUE_TIMEOUT if max_wait is None else max_wait
+        started = time.monotonic()
+
+        while True:
+            delay = self._poll(tokens, priority, started, max_wait)
+            if delay is None:
+                return time.monotonic() - started
+            await asyncio.sleep(delay)
+
+    def _poll(self, tokens, priority, started, max_wait):
+        """یک تلاش رزرو؛ خروجی: None اگر رزرو شد، وگرنه ثانیه‌های انتظار تا تلاش بعدی"""
+        retry_in = self.quota.try_reserve(tokens, priority)
+        waited = time.monotonic() - started
+        if retry_in is None:
+            if waited >= POLL_INTERVAL:
+                logger.info('LLM call dispatched after %.1fs in queue (priority=%d)', waited, priority)
+            return None
+        left = max_wait - waited
+        if left <= 0:
+            raise LLMError(f'LLM rate limit budget exhausted (queued {max_wait:.0f}s)', status_code=429)
+        return min(retry_in, POLL_INTERVAL, left)
+
+    def _acquire_for(self, caller, model, messages, params, max_wait, stream):
+        """رزرو سهمیه برای caller؛ ردشدن در صف هم ثبت می‌شود. خروجی: میلی‌ثانیه انتظار"""
+        started = time.monotonic()
+        try:
+            return self.acquire(estimate_tokens(messages, params.get('max_tokens')), caller.priority, max_wait) * 1000
+        except LLMError as e:
+            self._record_rejected(caller, model, e, started, stream)
+            raise
+
+    async def _aacquire_for(self, caller, model, messages, params, max_wait, stream):
+        started = time.monotonic()
+        try:
+            waited = await self.aacquire(estimate_tokens(messages, params.get('max_tokens')), caller.priority, max_wait)
+        except LLMError as e:
+            self._record_rejected(caller, model, e, started, stream)
+            raise
+        return waited * 1000
+
+    @staticmethod
+    def _record_rejected(caller, model, error, started, stream):
+        record_call(caller, model, call_status(error.status_code), status_code=error.status_code,
+                    queue_ms=(time.monotonic() - started) * 1000, attempts=0, stream=stream)
+
+    @staticmethod
+    def _record_error(caller, model, error, queue_ms, stream=False):
+        record_call(caller, model, call_status(error.status_code), status_code=error.status_code,
+                    latency_ms=error.latency_ms, queue_ms=queue_ms, attempts=error.attempts, stream=stream)
+
+    @staticmethod
+    def _record_response(caller, model, response, queue_ms):
+        record_call(caller, model, call_status(response.status_code), status_code=response.status_code,
+                    usage=response.usage, latency_ms=response.latency_ms, queue_ms=queue_ms,
+                    attempts=response.attempts)
+
+    @staticmethod
+    def _record_cancelled(caller, model, started, queue_ms):
+        # Consumer stopped reading (client disconnected) before the provider sent usage
+        record_call(caller, model, LLMCall.Status.CANCELLED,
+                    latency_ms=int((time.monotonic() - started) * 1000), queue_ms=queue_ms, stream=True)
+
+    @staticmethod
+    def _record_stream(caller, model, stats, started, queue_ms):
+        record_call(caller, model, call_status(stats.get('status_code', 200)),
+                    status_code=stats.get('status_code', 200), usage=stats.get('usage'),
+                    latency_ms=stats.get('latency_ms', int((time.monotonic() - started) * 1000)),
+                    first_token_ms=stats.get('first_token_ms'), queue_ms=queue_ms,
+                    attempts=stats.get('attempts'), stream=True)
+
+    def chat_completion(self, messages, model=None, caller=None, max_wait=None, **params):
+        caller = caller or LLMCaller('unknown')
+        model = model or self.model
+        queue_ms = self._acquire_for(caller, model, messages, params, max_wait, stream=False)
+        try:
+            response = self.client.chat_completion(messages, model=model, **params)
+        except LLMError as e:
+            self._record_error(caller, model, e, queue_ms)
+            raise
+        self._record_response(caller, model, response, queue_ms)
+        return response
+
+    async def achat_completion(self, messages, model=None, caller=None, max_wait=None, **params):
+        caller = caller or LLMCaller('unknown')
+        model = model or self.model
+        queue_ms = await self._aacquire_for(caller, model, messages, params, max_wait, stream=False)
+        try:
+            response = await self.client.achat_completion(messages, model=model, **params)
+        except LLMError as e:
+            self._record_error(caller, model, e, queue_ms)
+            raise
+        self._record_response(caller, model, response, queue_ms)
+        return response
+
+    def stream_chat_completion(self, messages, model=None, caller=None, max_wait=None, **params):
+        caller = caller or LLMCaller('unknown')
+        model = model or self.model
+        queue_ms = self._acquire_for(caller, model, messages, params, max_wait, stream=True)
+        started = time.monotonic()
+        try:
+            stats = (yield from self.client.stream_chat_completion(messages, model=model, **params)) or {}
+        except LLMError as e:
+            self._record_error(caller, model, e, queue_ms, stream=True)
+            raise
+        except GeneratorExit:
+            self._record_cancelled(caller, model, started, queue_ms)
+            raise
+        self._record_stream(caller, model, stats, started, queue_ms)
+
+    async def astream_chat_completion(self, messages, model=None, caller=None, max_wait=None, **params):
+        caller = caller or LLMCaller('unknown')
+        model = model or self.model
+        queue_ms = await self._aacquire_for(caller, model, messages, params, max_wait, stream=True)
+        started = time.monotonic()
+        stats = {}
+        try:
+            # aclosing: an abandoned stream must still release its HTTP connection right away
+            async with aclosing(self.client.astream_chat_completion(
+                messages, model=model, stats=stats, **params
+            )) as deltas:
+                async for delta in deltas:
+                    yield delta
+        except LLMError as e:
+            self._record_error(caller, model, e, queue_ms, stream=True)
+            raise
+        except (GeneratorExit, asyncio.CancelledError):
+            # aclose() by the consumer, or the ASGI server cancelling a disconnected response
+            self._record_cancelled(caller, model, started, queue_ms)
+            raise
+        self._record_stream(caller, model, stats, started, queue_ms)
+
+
+# Singleton instance
+llm_dispatcher = LLMDispatcher()
@@ -0,0 +1,82 @@
+"""
+Management command to run the background AI scoring workers
+Usage: python manage.py run_scoring_worker --processes 4
+"""
+
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from scoring.jobs import claim_next_job, fail_exhausted_jobs, maintenance_tasks, run_job
+
+
+def worker_loop(poll_interval, once=False, maintenance=False):
+    """
+    حلقه اصلی هر پردازه worker
+    maintenance: این پردازه کارهای دوره‌ای (رتبه‌بندی، اصلاح امتیازها) را هم اجرا می‌کند (فقط یکی از پردازه‌ها)
+    """
+    stopping = False
+    periodic = maintenance_tasks() if maintenance else []
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    while not stopping:
+        close_old_connections()
+        for task in periodic:
+            task.maybe_run()
+        job = claim_next_job()
+        if job is None:
+            if once:
+                break
+            fail_exhausted_jobs()
+            time.sleep(poll_interval)
+            continue
+        run_job(job)
+
+
+class Command(BaseCommand):
+    help = 'Runs a pool of worker processes that execute queued AI scoring jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2, help='Number of worker processes')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the queue in this process and exit')
+
+    def handle(self, *args, **options):
+        poll_interval = options['poll_interval']
+
+        if options['once'] or options['processes'] <= 1:
+            self.stdout.write('Scoring worker started (single process)')
+            worker_loop(poll_interval, once=options['once'], maintenance=not options['once'])
+            return
+
+        # Forked children must not share the parent's DB socket
+        connections.close_all()
+
+        processes = [
+            multiprocessing.Process(
+                target=worker_loop, args=(poll_interval,), kwargs={'maintenance': index == 0}, daemon=True
+            )
+            for index in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(self.style.SUCCESS(f'Started {len(processes)} scoring workers'))
+
+        def _terminate(signum, frame):
+            for process in processes:
+                process.terminate()
+
+        signal.signal(signal.SIGTERM, _terminate)
+        signal.signal(signal.SIGINT, _terminate)
+
+        for process in processes:
+            process.join()
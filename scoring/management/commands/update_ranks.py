@@ -0,0 +1,22 @@
+"""
+Management command to recompute the leaderboard ranks in one statement
+Usage: python manage.py update_ranks [--method competition|dense]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scoring.ranking import RANK_FUNCTIONS, recompute_ranks
+
+
+class Command(BaseCommand):
+    help = 'Recomputes UserScore.rank with a window function (RANK / DENSE_RANK)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--method', choices=sorted(RANK_FUNCTIONS), help='Defaults to SCORE_RANK_METHOD')
+
+    def handle(self, *args, **options):
+        try:
+            updated = recompute_ranks(options['method'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f'Updated rank for {updated} users'))
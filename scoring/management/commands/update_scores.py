@@ -1,22 +1,24 @@
+"""
+Management command to reconcile UserScore with the users' ideas
+Usage: python manage.py update_scores [--dry-run]
+"""
+
 from django.core.management.base import BaseCommand
-from scoring.models import UserScore
-from django.contrib.auth import get_user_model
 
-User = get_user_model()
+from scoring.services import UserScoreService
+
 
 class Command(BaseCommand):
-    help = 'Recalculates scores for all users'
+    help = 'Recalculates user scores where the incremental counters drifted, then re-ranks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report users with drifted scores')
 
     def handle(self, *args, **options):
-        users = User.objects.all()
-        count = 0
-        
-        for user in users:
-            # Ensure UserScore exists
-            score, created = UserScore.objects.get_or_create(user=user)
-            score.update_score()
-            count += 1
-            if count % 10 == 0:
-                self.stdout.write(f'Updated {count} users...')
-                
-        self.stdout.write(self.style.SUCCESS(f'Successfully updated scores for {count} users'))
+        if options['dry_run']:
+            drifted = UserScoreService.reconcile(dry_run=True)
+            self.stdout.write(f'{drifted} user scores have drifted')
+            return
+
+        fixed = UserScoreService.reconcile()
+        self.stdout.write(self.style.SUCCESS(f'Reconciled scores for {fixed} users'))
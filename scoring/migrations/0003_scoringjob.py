@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-18 01:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ideas', '0006_marketplace_models'),
+        ('scoring', '0002_add_sum_score'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoringJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'در صف'), ('running', 'در حال اجرا'), ('done', 'انجام شد'), ('failed', 'ناموفق')], default='pending', max_length=20, verbose_name='وضعیت')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='تعداد تلاش')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='نتیجه')),
+                ('error', models.TextField(blank=True, verbose_name='خطا')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ثبت')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='شروع اجرا')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='پایان اجرا')),
+                ('idea', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scoring_jobs', to='ideas.idea', verbose_name='ایده')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scoring_jobs', to=settings.AUTH_USER_MODEL, verbose_name='کاربر')),
+            ],
+            options={
+                'verbose_name': 'کار امتیازدهی',
+                'verbose_name_plural': 'کارهای امتیازدهی',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='scoring_sco_status_af91f9_idx'), models.Index(fields=['idea', 'status'], name='scoring_sco_idea_id_b2f8c5_idx')],
+            },
+        ),
+    ]
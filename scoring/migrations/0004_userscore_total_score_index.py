@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 02:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scoring', '0003_scoringjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userscore',
+            index=models.Index(fields=['-total_score'], name='scoring_use_total_s_f79aad_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-18 02:37
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_scored_ideas_count(apps, schema_editor):
+    UserScore = apps.get_model('scoring', 'UserScore')
+    Idea = apps.get_model('ideas', 'Idea')
+    scored = Idea.objects.filter(user=OuterRef('user'), ai_score__isnull=False).order_by().values('user').annotate(
+        total=Count('id')
+    ).values('total')
+    UserScore.objects.update(scored_ideas_count=Coalesce(Subquery(scored, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scoring', '0004_userscore_total_score_index'),
+        ('ideas', '0010_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userscore',
+            name='scored_ideas_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد ایده\u200cهای امتیازگرفته'),
+        ),
+        migrations.RunPython(backfill_scored_ideas_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-18 02:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ideas', '0010_keyset_pagination_indexes'),
+        ('scoring', '0005_userscore_scored_ideas_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='scoringjob',
+            name='scoring_sco_status_af91f9_idx',
+        ),
+        migrations.AddField(
+            model_name='scoringjob',
+            name='priority',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='اولویت'),
+        ),
+        migrations.AddIndex(
+            model_name='scoringjob',
+            index=models.Index(fields=['status', '-priority', 'created_at'], name='scoring_sco_status_1bb3d5_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-18 02:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scoring', '0006_scoringjob_priority'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True, verbose_name='هش ورودی')),
+                ('model', models.CharField(max_length=100, verbose_name='مدل')),
+                ('result', models.JSONField(verbose_name='نتیجه تحلیل')),
+                ('hit_count', models.PositiveIntegerField(default=0, verbose_name='تعداد استفاده')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ثبت')),
+                ('last_used_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='آخرین استفاده')),
+            ],
+            options={
+                'verbose_name': 'کش تحلیل AI',
+                'verbose_name_plural': 'کش تحلیل\u200cهای AI',
+                'ordering': ['-last_used_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='scoringjob',
+            name='bypass_cache',
+            field=models.BooleanField(default=False, verbose_name='بدون کش تحلیل'),
+        ),
+        migrations.AddField(
+            model_name='scoringjob',
+            name='cache_hit',
+            field=models.BooleanField(default=False, verbose_name='از کش تحلیل'),
+        ),
+    ]
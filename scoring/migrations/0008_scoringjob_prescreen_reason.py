@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 03:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scoring', '0007_analysis_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scoringjob',
+            name='prescreen_reason',
+            field=models.CharField(blank=True, max_length=20, verbose_name='رد در پیش\u200cبررسی'),
+        ),
+    ]
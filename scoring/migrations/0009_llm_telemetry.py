@@ -0,0 +1,66 @@
+# Generated by Django 6.0 on 2026-10-18 03:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scoring', '0008_scoringjob_prescreen_reason'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMCall',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('plan', models.CharField(max_length=50, verbose_name='پلن')),
+                ('endpoint', models.CharField(max_length=50, verbose_name='اندپوینت')),
+                ('model', models.CharField(max_length=100, verbose_name='مدل')),
+                ('status', models.CharField(choices=[('ok', 'موفق'), ('error', 'خطا'), ('rate_limited', 'محدودیت نرخ'), ('cancelled', 'لغو شده')], max_length=20, verbose_name='وضعیت')),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='کد HTTP')),
+                ('stream', models.BooleanField(default=False, verbose_name='stream')),
+                ('prompt_tokens', models.PositiveIntegerField(default=0, verbose_name='توکن ورودی')),
+                ('completion_tokens', models.PositiveIntegerField(default=0, verbose_name='توکن خروجی')),
+                ('latency_ms', models.PositiveIntegerField(default=0, verbose_name='تأخیر (ms)')),
+                ('first_token_ms', models.PositiveIntegerField(blank=True, null=True, verbose_name='اولین توکن (ms)')),
+                ('queue_ms', models.PositiveIntegerField(default=0, verbose_name='انتظار در صف (ms)')),
+                ('attempts', models.PositiveSmallIntegerField(default=1, verbose_name='تعداد تلاش')),
+                ('created_at', models.DateTimeField(db_index=True, verbose_name='زمان')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='llm_calls', to=settings.AUTH_USER_MODEL, verbose_name='کاربر')),
+            ],
+            options={
+                'verbose_name': 'فراخوانی LLM',
+                'verbose_name_plural': 'فراخوانی\u200cهای LLM',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LLMUsageDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='روز')),
+                ('plan', models.CharField(max_length=50, verbose_name='پلن')),
+                ('endpoint', models.CharField(max_length=50, verbose_name='اندپوینت')),
+                ('model', models.CharField(max_length=100, verbose_name='مدل')),
+                ('calls', models.PositiveIntegerField(default=0, verbose_name='تعداد فراخوانی')),
+                ('errors', models.PositiveIntegerField(default=0, verbose_name='خطا')),
+                ('rate_limited', models.PositiveIntegerField(default=0, verbose_name='محدودیت نرخ')),
+                ('prompt_tokens', models.BigIntegerField(default=0, verbose_name='توکن ورودی')),
+                ('completion_tokens', models.BigIntegerField(default=0, verbose_name='توکن خروجی')),
+                ('latency_p50_ms', models.PositiveIntegerField(default=0, verbose_name='تأخیر p50 (ms)')),
+                ('latency_p95_ms', models.PositiveIntegerField(default=0, verbose_name='تأخیر p95 (ms)')),
+                ('latency_max_ms', models.PositiveIntegerField(default=0, verbose_name='بیشترین تأخیر (ms)')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='آخرین بروزرسانی')),
+            ],
+            options={
+                'verbose_name': 'مصرف روزانه LLM',
+                'verbose_name_plural': 'مصرف روزانه LLM',
+                'ordering': ['-date', 'plan', 'endpoint', 'model'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'plan', 'endpoint', 'model'), name='llm_usage_daily_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-18 04:03
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+ACTIVE = ['pending', 'running']
+
+
+def fail_duplicate_active_jobs(apps, schema_editor):
+    """Keep the newest active job per idea; older duplicates would violate the constraint"""
+    ScoringJob = apps.get_model('scoring', 'ScoringJob')
+    newer = ScoringJob.objects.filter(idea=OuterRef('idea'), status__in=ACTIVE, id__gt=OuterRef('id'))
+    ScoringJob.objects.filter(status__in=ACTIVE).filter(Exists(newer)).update(
+        status='failed', error='Duplicate job', finished_at=timezone.now()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scoring', '0009_llm_telemetry'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicate_active_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='scoringjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('idea',), name='scoring_job_one_active_per_idea'),
+        ),
+    ]
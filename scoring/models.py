@@ -2,10 +2,23 @@
 Scoring Models - مدل‌های امتیازدهی
 """
 
+import math
+
 from django.db import models
+from django.db.models.functions import Floor
 from django.conf import settings
 
 
+def score_points(ai_score):
+    """سهم یک ایده در امتیاز کاربر: ai_score گرد‌شده (نیم به بالا)؛ None یعنی صفر"""
+    return 0 if ai_score is None else math.floor(ai_score + 0.5)
+
+
+def score_points_expression(field='ai_score'):
+    """همان score_points در SQL (همان محاسبه float، پس همان عدد) برای Sum روی ایده‌ها"""
+    return Floor(models.F(field) + 0.5)
+
+
 class UserScore(models.Model):
     """
     امتیاز کلی هر کاربر برای رتبه‌بندی
@@ -34,6 +47,11 @@ class UserScore(models.Model):
         default=0,
         verbose_name='مجموع امتیاز AI'
     )
+    # Ideas with an ai_score; keeps avg_ai_score maintainable from deltas
+    scored_ideas_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='تعداد ایده‌های امتیازگرفته'
+    )
     
     # Ranking
     rank = models.PositiveIntegerField(
@@ -52,6 +70,7 @@ class UserScore(models.Model):
         indexes = [
             models.Index(fields=['-sum_ai_score']),
             models.Index(fields=['-avg_ai_score']),
+            models.Index(fields=['-total_score']),
             models.Index(fields=['rank']),
         ]
     
@@ -60,30 +79,35 @@ class UserScore(models.Model):
     
     def update_score(self):
         """
-        محاسبه مجدد امتیاز کاربر بر اساس ایده‌ها
+        محاسبه کامل امتیاز کاربر از روی همه ایده‌ها (یک aggregate)
+        تغییرات عادی به صورت delta با UserScoreService.apply_idea_change اعمال می‌شوند؛
+        این متد برای ساخت اولیه و اصلاح drift است
         """
-        from ideas.models import Idea
+        from .ranking import update_rank_window
         
-        ideas = self.user.ideas.all()
-        self.ideas_count = ideas.count()
+        # Unranked rows enter the ranking as new entrants
+        old_total = self.total_score if self.rank is not None else None
         
-        # Calculate scores
-        scored_ideas = ideas.exclude(ai_score__isnull=True)
-        if scored_ideas.exists():
-            data = scored_ideas.aggregate(
-                avg=models.Avg('ai_score'),
-                sum=models.Sum('ai_score')
-            )
-            self.avg_ai_score = data['avg'] or 0
-            self.sum_ai_score = data['sum'] or 0
-        else:
-            self.avg_ai_score = 0
-            self.sum_ai_score = 0
+        data = self.user.ideas.aggregate(
+            count=models.Count('id'),
+            scored=models.Count('ai_score'),
+            sum=models.Sum(score_points_expression())
+        )
+        self.ideas_count = data['count']
+        self.scored_ideas_count = data['scored']
+        self.sum_ai_score = int(data['sum'] or 0)
+        # Same average as the delta updates keep (UserScoreService.apply_idea_change)
+        self.avg_ai_score = self.sum_ai_score / self.scored_ideas_count if self.scored_ideas_count else 0
         
         # Total score can be redundant if we have sum_ai_score, 
         # but let's keep it as sum for now to maintain compatibility if used elsewhere
         self.total_score = self.sum_ai_score
-        self.save()
+        self.save(update_fields=[
+            'ideas_count', 'scored_ideas_count', 'avg_ai_score', 'sum_ai_score', 'total_score', 'updated_at'
+        ])
+        
+        # Re-rank only the score window this change moved through
+        update_rank_window(old_total, self.total_score)
 
 
 class ScoreLog(models.Model):
@@ -128,3 +152,182 @@ class ScoreLog(models.Model):
     
     def __str__(self):
         return f"{self.user.email}: {self.points_change:+d} ({self.action})"
+
+
+class ScoringJob(models.Model):
+    """
+    صف کارهای پس‌زمینه امتیازدهی AI
+    (درخواست HTTP فقط کار را ثبت می‌کند و worker آن را اجرا می‌کند)
+    """
+    
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'در صف'
+        RUNNING = 'running', 'در حال اجرا'
+        DONE = 'done', 'انجام شد'
+        FAILED = 'failed', 'ناموفق'
+    
+    idea = models.ForeignKey(
+        'ideas.Idea',
+        on_delete=models.CASCADE,
+        related_name='scoring_jobs',
+        verbose_name='ایده'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='scoring_jobs',
+        verbose_name='کاربر'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name='وضعیت'
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name='تعداد تلاش')
+    # پلن پولی = 1؛ worker کارهای با اولویت بالاتر را زودتر برمی‌دارد
+    priority = models.PositiveSmallIntegerField(default=0, verbose_name='اولویت')
+    bypass_cache = models.BooleanField(default=False, verbose_name='بدون کش تحلیل')
+    cache_hit = models.BooleanField(default=False, verbose_name='از کش تحلیل')
+    # دلیل رد در پیش‌بررسی محلی (scoring/prescreen.py)؛ خالی یعنی ایده به LLM رسیده یا از کش آمده
+    prescreen_reason = models.CharField(max_length=20, blank=True, verbose_name='رد در پیش‌بررسی')
+    result = models.JSONField(null=True, blank=True, verbose_name='نتیجه')
+    error = models.TextField(blank=True, verbose_name='خطا')
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ثبت')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='شروع اجرا')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='پایان اجرا')
+    
+    MAX_ATTEMPTS = 3
+    ACTIVE_STATUSES = [Status.PENDING, Status.RUNNING]
+    
+    class Meta:
+        verbose_name = 'کار امتیازدهی'
+        verbose_name_plural = 'کارهای امتیازدهی'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', '-priority', 'created_at']),
+            models.Index(fields=['idea', 'status']),
+        ]
+        constraints = [
+            # At most one queued or running job per idea (enqueue_scoring returns the existing one)
+            models.UniqueConstraint(
+                fields=['idea'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='scoring_job_one_active_per_idea',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Job #{self.pk}: {self.idea_id} ({self.status})"
+    
+    @property
+    def is_finished(self):
+        return self.status in (self.Status.DONE, self.Status.FAILED)
+
+
+class AnalysisCacheEntry(models.Model):
+    """
+    کش نتیجه تحلیل AI بر اساس هش ورودی‌های کامل پرامپت و نام مدل
+    (در دیتابیس تا بین همه پردازه‌های worker مشترک باشد؛ انقضا و حذف LRU در scoring/analysis_cache.py)
+    """
+    key = models.CharField(max_length=64, unique=True, verbose_name='هش ورودی')
+    model = models.CharField(max_length=100, verbose_name='مدل')
+    result = models.JSONField(verbose_name='نتیجه تحلیل')
+    hit_count = models.PositiveIntegerField(default=0, verbose_name='تعداد استفاده')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ثبت')
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='آخرین استفاده')
+    
+    class Meta:
+        verbose_name = 'کش تحلیل AI'
+        verbose_name_plural = 'کش تحلیل‌های AI'
+        ordering = ['-last_used_at']
+    
+    def __str__(self):
+        return f"{self.key[:12]} ({self.model}, {self.hit_count} hits)"
+
+
+class LLMCall(models.Model):
+    """
+    تله‌متری هر فراخوانی LLM (توکن، تأخیر، وضعیت، مدل، کاربر و اندپوینت)
+    به صورت دسته‌ای و خارج از مسیر درخواست نوشته می‌شود (scoring/telemetry.py)؛
+    سطرهای قدیمی بعد از تجمیع در LLMUsageDaily حذف می‌شوند
+    """
+    
+    class Status(models.TextChoices):
+        OK = 'ok', 'موفق'
+        ERROR = 'error', 'خطا'
+        RATE_LIMITED = 'rate_limited', 'محدودیت نرخ'
+        # Stream closed by the client before the provider finished
+        CANCELLED = 'cancelled', 'لغو شده'
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='llm_calls',
+        verbose_name='کاربر'
+    )
+    plan = models.CharField(max_length=50, verbose_name='پلن')
+    endpoint = models.CharField(max_length=50, verbose_name='اندپوینت')
+    model = models.CharField(max_length=100, verbose_name='مدل')
+    status = models.CharField(max_length=20, choices=Status.choices, verbose_name='وضعیت')
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name='کد HTTP')
+    stream = models.BooleanField(default=False, verbose_name='stream')
+    prompt_tokens = models.PositiveIntegerField(default=0, verbose_name='توکن ورودی')
+    completion_tokens = models.PositiveIntegerField(default=0, verbose_name='توکن خروجی')
+    latency_ms = models.PositiveIntegerField(default=0, verbose_name='تأخیر (ms)')
+    first_token_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name='اولین توکن (ms)')
+    queue_ms = models.PositiveIntegerField(default=0, verbose_name='انتظار در صف (ms)')
+    attempts = models.PositiveSmallIntegerField(default=1, verbose_name='تعداد تلاش')
+    created_at = models.DateTimeField(db_index=True, verbose_name='زمان')
+    
+    class Meta:
+        verbose_name = 'فراخوانی LLM'
+        verbose_name_plural = 'فراخوانی‌های LLM'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.endpoint} {self.model} ({self.status}, {self.latency_ms}ms)"
+
+
+class LLMUsageDaily(models.Model):
+    """
+    تجمیع روزانه LLMCall به تفکیک پلن، اندپوینت و مدل
+    سطرهای با endpoint و model برابر ALL جمع کل هر پلن در آن روز هستند
+    (صدک‌ها قابل جمع زدن نیستند، پس برای هر سطح جداگانه محاسبه می‌شوند)
+    """
+    ALL = '*'
+    
+    date = models.DateField(verbose_name='روز')
+    plan = models.CharField(max_length=50, verbose_name='پلن')
+    endpoint = models.CharField(max_length=50, verbose_name='اندپوینت')
+    model = models.CharField(max_length=100, verbose_name='مدل')
+    calls = models.PositiveIntegerField(default=0, verbose_name='تعداد فراخوانی')
+    errors = models.PositiveIntegerField(default=0, verbose_name='خطا')
+    rate_limited = models.PositiveIntegerField(default=0, verbose_name='محدودیت نرخ')
+    prompt_tokens = models.BigIntegerField(default=0, verbose_name='توکن ورودی')
+    completion_tokens = models.BigIntegerField(default=0, verbose_name='توکن خروجی')
+    latency_p50_ms = models.PositiveIntegerField(default=0, verbose_name='تأخیر p50 (ms)')
+    latency_p95_ms = models.PositiveIntegerField(default=0, verbose_name='تأخیر p95 (ms)')
+    latency_max_ms = models.PositiveIntegerField(default=0, verbose_name='بیشترین تأخیر (ms)')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='آخرین بروزرسانی')
+    
+    class Meta:
+        verbose_name = 'مصرف روزانه LLM'
+        verbose_name_plural = 'مصرف روزانه LLM'
+        ordering = ['-date', 'plan', 'endpoint', 'model']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'plan', 'endpoint', 'model'], name='llm_usage_daily_unique'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.date} {self.plan}/{self.endpoint}/{self.model}: {self.calls} calls"
+    
+    @property
+    def total_tokens(self):
+        return self.prompt_tokens + self.completion_tokens
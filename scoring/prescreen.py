@@ -0,0 +1,127 @@
+"""
+Pre-screen - رد سریع و محلی ایده‌هایی که قطعاً امتیاز صفر می‌گیرند (بدون فراخوانی LLM)
+همان قوانین "Kill Switch" در IdeaAnalyzer.SYSTEM_PROMPT، فقط برای موارد واضح:
+توضیحات خیلی کوتاه، متن تکراری/اسپم و متن نامفهوم
+"""
+
+import math
+import re
+from collections import Counter
+
+# Arabic letter forms and bidi marks that Persian keyboards mix in
+_NORMALIZE = str.maketrans({
+    'ي': 'ی', 'ى': 'ی', 'ك': 'ک', 'ة': 'ه', 'ۀ': 'ه',
+    '\u200f': ' ', '\u200e': ' ',
+})
+# Sentence ends: . ! ? and their Persian forms, ellipsis, line breaks (no split inside 3.5)
+_SENTENCE_END = re.compile(r'(?<=[.!?؟…۔])\s+|\n+')
+# Words keep the zero-width non-joiner (می‌خواهم)
+_WORD = re.compile(r'[\w\u200c]+')
+
+MIN_SENTENCES = 3
+MIN_SENTENCE_WORDS = 3
+# Fewer than MIN_SENTENCES sentences is only an obvious reject when the text is also this short
+MIN_WORDS_WITHOUT_SENTENCES = 30
+MIN_LETTER_ENTROPY = 3.0
+MIN_ENTROPY_LETTERS = 30
+MAX_TOP_WORD_SHARE = 0.5
+MIN_UNIQUE_WORD_RATIO = 0.2
+MIN_WORDS_FOR_REPETITION = 8
+# Share of letters and digits among non-space characters
+MIN_LETTER_RATIO = 0.5
+LONG_WORD = 15
+MAX_LONG_WORD_SHARE = 0.3
+
+REASONS = {
+    'too_short': (
+        'نیاز به تلاش بیشتر',
+        'توضیحات ایده خیلی کوتاه است (کمتر از ۳ جمله کامل).',
+        'ایده را حداقل در چند جمله توضیح دهید: مسئله، راه‌حل و مشتری هدف.',
+    ),
+    'repetitive': (
+        'تقلب/اسپم',
+        'متن ایده از کلمات یا عبارات تکراری تشکیل شده است.',
+        'ایده را با جملات واقعی و غیرتکراری توضیح دهید.',
+    ),
+    'gibberish': (
+        'تقلب/اسپم',
+        'متن ایده نامفهوم است و محتوای قابل ارزیابی ندارد.',
+        'ایده را به زبان ساده و با جملات کامل بنویسید.',
+    ),
+}
+
+
+def normalize(text):
+    return (text or '').translate(_NORMALIZE)
+
+
+def split_sentences(text):
+    """تقسیم متن فارسی/انگلیسی به جمله‌ها؛ فقط جمله‌هایی با حداقل MIN_SENTENCE_WORDS کلمه"""
+    sentences = []
+    for piece in _SENTENCE_END.split(text):
+        if len(_WORD.findall(piece)) >= MIN_SENTENCE_WORDS:
+            sentences.append(piece.strip())
+    return sentences
+
+
+def letter_entropy(letters):
+    """آنتروپی شانون (بیت) توزیع حروف"""
+    counts = Counter(letters)
+    total = len(letters)
+    return -sum(count / total * math.log2(count / total) for count in counts.values())
+
+
+def screen(description):
+    """
+    بررسی محلی ایده
+    خروجی: None (برای LLM ارسال شود) یا کد دلیل رد ('too_short' / 'repetitive' / 'gibberish')
+    """
+    text = normalize(description)
+    words = _WORD.findall(text)
+
+    if len(split_sentences(text)) < MIN_SENTENCES and len(words) < MIN_WORDS_WITHOUT_SENTENCES:
+        return 'too_short'
+
+    if len(words) >= MIN_WORDS_FOR_REPETITION:
+        counts = Counter(word.lower() for word in words)
+        if counts.most_common(1)[0][1] / len(words) > MAX_TOP_WORD_SHARE:
+            return 'repetitive'
+        if len(counts) / len(words) < MIN_UNIQUE_WORD_RATIO:
+            return 'repetitive'
+
+    visible = [char for char in text if not char.isspace()]
+    letters = [char.lower() for char in visible if char.isalpha()]
+    # Digits are content too (budgets, dates, figures); only symbols make text gibberish
+    if sum(1 for char in visible if char.isalnum()) / len(visible) < MIN_LETTER_RATIO:
+        return 'gibberish'
+    if len(letters) >= MIN_ENTROPY_LETTERS and letter_entropy(letters) < MIN_LETTER_ENTROPY:
+        return 'repetitive'
+    # Keyboard mashing without spaces shows up as implausibly long "words"
+    if sum(1 for word in words if len(word) > LONG_WORD) / len(words) > MAX_LONG_WORD_SHARE:
+        return 'gibberish'
+
+    return None
+
+
+def zero_score_result(reason):
+    """نتیجه هم‌شکل با خروجی JSON مدل برای ایده ردشده"""
+    verdict, weakness, suggestion = REASONS[reason]
+    return {
+        'scores': {
+            'innovation': 0,
+            'feasibility': 0,
+            'market_potential': 0,
+            'impact': 0,
+            'competitive_advantage': 0,
+        },
+        'total_score': 0,
+        'feedback': {
+            'strengths': [],
+            'weaknesses': [weakness],
+            'suggestions': [suggestion],
+            'comparison': '',
+        },
+        'summary': weakness,
+        'verdict': verdict,
+        'prescreened': reason,
+    }
@@ -0,0 +1,218 @@
+"""
+Prompt Budget - ساخت پرامپت در سقف توکن مشخص
+پرامپت از بخش‌ها (Section) ساخته می‌شود؛ اگر تخمین محلی توکن‌ها از بودجه بیشتر باشد
+اول آیتم‌ها و بخش‌های کم‌ارزش (اولویت کمتر) حذف و در آخر متن‌های بلند کوتاه می‌شوند
+"""
+
+import copy
+import math
+
+# Local token estimate without the model's tokenizer: Latin text averages ~4 characters
+# per token, Persian (and other non-ASCII) text tokenises much more densely
+ASCII_CHARS_PER_TOKEN = 4
+OTHER_CHARS_PER_TOKEN = 2.5
+# Role and framing tokens the API adds around every chat message
+MESSAGE_OVERHEAD_TOKENS = 4
+TRUNCATION_MARK = ' …'
+TRUNCATE_PASSES = 3
+
+
+def count_tokens(text):
+    """تخمین تعداد توکن‌های یک متن"""
+    if not text:
+        return 0
+    ascii_chars = len(text.encode('ascii', 'ignore'))
+    return math.ceil(ascii_chars / ASCII_CHARS_PER_TOKEN + (len(text) - ascii_chars) / OTHER_CHARS_PER_TOKEN)
+
+
+def count_message_tokens(messages):
+    """تخمین توکن‌های لیست پیام‌های chat completion"""
+    return sum(count_tokens(message.get('content') or '') + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def _item_tokens(item):
+    if isinstance(item, dict):
+        return count_tokens(item.get('content') or '') + MESSAGE_OVERHEAD_TOKENS
+    return count_tokens(item)
+
+
+class Section:
+    """
+    یک بخش پرامپت: header ثابت + آیتم‌ها (متن یا پیام chat)
+    - priority: اولویت حذف آیتم‌ها (کمتر = زودتر حذف می‌شود)
+    - drop_priority: اولویت حذف کل بخش (پیش‌فرض همان priority)؛ بخش required حذف نمی‌شود
+    - keep: حداقل آیتمی که با حذف آیتم‌ها باقی می‌ماند (پیش‌فرض: همه آیتم‌های بخش required)
+    - drop_from: 'last' (آخرین آیتم‌ها اول) یا 'first' (قدیمی‌ترین پیام‌ها اول)
+    - truncate: در آخرین مرحله متن بخش می‌تواند کوتاه شود
+    """
+
+    def __init__(self, name, header='', items=(), priority=0, drop_priority=None, required=False,
+                 keep=None, drop_from='last', truncate=False):
+        self.name = name
+        self.header = header
+        self.items = list(items)
+        self.priority = priority
+        self.drop_priority = priority if drop_priority is None else drop_priority
+        self.required = required
+        self.keep = (len(self.items) if required else 0) if keep is None else keep
+        self.drop_from = drop_from
+        self.truncate = truncate
+        self.included = True
+        self.dropped_items = 0
+        self.truncated = False
+        self._header_tokens = count_tokens(header)
+        self._item_tokens = [_item_tokens(item) for item in self.items]
+
+    @property
+    def tokens(self):
+        if not self.included:
+            return 0
+        return self._header_tokens + sum(self._item_tokens)
+
+    @property
+    def can_drop_item(self):
+        return self.included and len(self.items) > self.keep
+
+    def drop_item(self):
+        index = 0 if self.drop_from == 'first' else -1
+        self.items.pop(index)
+        self.dropped_items += 1
+        return self._item_tokens.pop(index)
+
+    def drop(self):
+        freed = self.tokens
+        self.included = False
+        return freed
+
+    def truncate_to(self, max_tokens):
+        """کوتاه کردن متن بخش (header یا تنها آیتم متنی) تا حدود max_tokens؛ خروجی: توکن آزادشده"""
+        before = self.tokens
+        if self.items and not isinstance(self.items[-1], dict):
+            text, other = self.items[-1], before - self._item_tokens[-1]
+        else:
+            text, other = self.header, before - self._header_tokens
+        current = count_tokens(text)
+        allowed = max_tokens - other - count_tokens(TRUNCATION_MARK)
+        if allowed <= 0 or current <= allowed:
+            return 0
+        ending = '\n' if text.endswith('\n') else ''
+        text = text[:int(len(text) * allowed / current)].rstrip() + TRUNCATION_MARK + ending
+        if self.items and not isinstance(self.items[-1], dict):
+            self.items[-1] = text
+            self._item_tokens[-1] = count_tokens(text)
+        else:
+            self.header = text
+            self._header_tokens = count_tokens(text)
+        self.truncated = True
+        return before - self.tokens
+
+    def copy(self):
+        """نسخه مستقل برای یک پرامپت (fit آیتم‌ها را حذف می‌کند؛ بخش‌های کش‌شده نباید تغییر کنند)"""
+        clone = copy.copy(self)
+        clone.items = list(self.items)
+        clone._item_tokens = list(self._item_tokens)
+        return clone
+
+    def render(self):
+        """متن بخش (آیتم‌ها جداکننده خودشان را دارند)"""
+        if not self.included:
+            return ''
+        return self.header + ''.join(self.items)
+
+
+class PromptReport:
+    """گزارش مصرف توکن هر بخش و آنچه برای جا شدن در بودجه حذف یا کوتاه شد"""
+
+    def __init__(self, budget, sections):
+        self.budget = budget
+        self.sections = {section.name: section.tokens for section in sections}
+        self.total = sum(self.sections.values())
+        self.dropped = {
+            section.name: 'all' if not section.included else section.dropped_items
+            for section in sections if not section.included or section.dropped_items
+        }
+        self.truncated = [section.name for section in sections if section.truncated]
+
+    @property
+    def over_budget(self):
+        return self.total > self.budget
+
+    def as_dict(self):
+        return {
+            'budget': self.budget,
+            'total': self.total,
+            'sections': self.sections,
+            'dropped': self.dropped,
+            'truncated': self.truncated,
+        }
+
+    def __str__(self):
+        sections = ' '.join(f'{name}={tokens}' for name, tokens in self.sections.items())
+        return f'{self.total}/{self.budget} tokens [{sections}] dropped={self.dropped} truncated={self.truncated}'
+
+
+class PromptBudget:
+    """
+    جمع‌آوری بخش‌ها به ترتیب نمایش و جا دادن آن‌ها در budget توکن
+
+    ترتیب حذف: کمترین اولویت اول (آیتم‌ها با priority، کل بخش با drop_priority)؛
+    بین اولویت‌های برابر بخش‌های انتهایی‌تر پرامپت زودتر کوتاه می‌شوند
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.sections = []
+
+    def add(self, name, header='', items=(), **options):
+        section = Section(name, header, items, **options)
+        self.sections.append(section)
+        return section
+
+    def extend(self, sections):
+        """اضافه کردن بخش‌های از پیش ساخته‌شده (مثلاً از کش)"""
+        self.sections.extend(sections)
+        return sections
+
+    @property
+    def tokens(self):
+        return sum(section.tokens for section in self.sections)
+
+    def _next_cut(self):
+        best = None
+        for order, section in enumerate(self.sections):
+            if section.can_drop_item:
+                key = (section.priority, -order)
+            elif section.included and not section.required:
+                key = (section.drop_priority, -order)
+            else:
+                continue
+            if best is None or key < best[0]:
+                best = (key, section)
+        return best[1] if best else None
+
+    def fit(self):
+        """حذف/کوتاه کردن تا جا شدن در بودجه؛ خروجی: PromptReport"""
+        total = self.tokens
+        while total > self.budget:
+            section = self._next_cut()
+            if section is None:
+                break
+            total -= section.drop_item() if section.can_drop_item else section.drop()
+
+        # Only required text is left: shorten the longest truncatable sections
+        for section in sorted((s for s in self.sections if s.truncate and s.included),
+                              key=lambda s: s.tokens, reverse=True):
+            # The estimate is re-measured after each cut, so a second pass absorbs rounding
+            for _ in range(TRUNCATE_PASSES):
+                if total <= self.budget:
+                    break
+                freed = section.truncate_to(section.tokens - (total - self.budget))
+                if not freed:
+                    break
+                total -= freed
+
+        return PromptReport(self.budget, self.sections)
+
+    def render(self, sections=None):
+        """متن بخش‌های داده‌شده (پیش‌فرض همه) به ترتیب اضافه شدن"""
+        return ''.join(section.render() for section in (self.sections if sections is None else sections))
@@ -0,0 +1,102 @@
+"""
+Ranking - محاسبه رتبه کاربران داخل دیتابیس با توابع پنجره‌ای
+- recompute_ranks: کل جدول با یک UPDATE ... FROM (SELECT RANK() OVER ...)
+- update_rank_window: فقط بازه امتیاز قدیم تا جدید وقتی امتیاز یک کاربر تغییر می‌کند
+"""
+
+from decouple import config
+from django.db import connection, transaction
+
+from .models import UserScore
+
+# competition: 1, 2, 2, 4 - dense: 1, 2, 2, 3
+RANK_FUNCTIONS = {
+    'competition': 'RANK',
+    'dense': 'DENSE_RANK',
+}
+RANK_METHOD = config('SCORE_RANK_METHOD', default='competition')
+
+# Serialises full and window updates so they never interleave on the same rows
+_RANK_LOCK_ID = 0x1DEAF10
+
+
+def _rank_function(method):
+    method = method or RANK_METHOD
+    try:
+        return RANK_FUNCTIONS[method]
+    except KeyError:
+        raise ValueError(f'Unknown rank method {method!r} (expected one of {", ".join(RANK_FUNCTIONS)})')
+
+
+def _lock(cursor):
+    cursor.execute('SELECT pg_advisory_xact_lock(%s)', [_RANK_LOCK_ID])
+
+
+def recompute_ranks(method=None):
+    """
+    رتبه‌بندی کل کاربران بر اساس total_score در یک دستور
+    فقط سطرهایی که رتبه‌شان عوض شده بازنویسی می‌شوند؛ خروجی: تعداد سطرهای تغییرکرده
+    """
+    function = _rank_function(method)
+    table = UserScore._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        _lock(cursor)
+        cursor.execute(f"""
+            UPDATE {table} AS s
+            SET rank = r.new_rank
+            FROM (
+                SELECT id, {function}() OVER (ORDER BY total_score DESC) AS new_rank
+                FROM {table}
+            ) AS r
+            WHERE s.id = r.id AND s.rank IS DISTINCT FROM r.new_rank
+        """)
+        return cursor.rowcount
+
+
+def update_rank_window(old_total, new_total, method=None):
+    """
+    بروزرسانی تدریجی رتبه‌ها پس از تغییر امتیاز یک کاربر از old_total به new_total
+    (old_total=None یعنی کاربر تازه وارد رتبه‌بندی شده است)
+
+    فقط سطرهای بازه [min, max] دوباره رتبه می‌گیرند: رتبه محلی در پنجره + تعداد
+    امتیازهای بالاتر از پنجره. سطرهای پایین‌تر فقط وقتی جابه‌جا می‌شوند که تعداد
+    رقبای بالاترشان عوض شده باشد (ورود کاربر جدید، یا مقدار یکتای جدید/حذف‌شده در حالت dense)
+    """
+    function = _rank_function(method)
+    dense = function == 'DENSE_RANK'
+    if old_total == new_total:
+        return
+    low, high = (new_total, new_total) if old_total is None else sorted((old_total, new_total))
+    table = UserScore._meta.db_table
+    above = 'COUNT(DISTINCT total_score)' if dense else 'COUNT(*)'
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        _lock(cursor)
+        cursor.execute(f"""
+            UPDATE {table} AS s
+            SET rank = r.local_rank + (SELECT {above} FROM {table} WHERE total_score > %(high)s)
+            FROM (
+                SELECT id, {function}() OVER (ORDER BY total_score DESC) AS local_rank
+                FROM {table}
+                WHERE total_score BETWEEN %(low)s AND %(high)s
+            ) AS r
+            WHERE s.id = r.id
+        """, {'low': low, 'high': high})
+
+        if dense:
+            cursor.execute(f"""
+                SELECT
+                    (SELECT COUNT(*) FROM {table} WHERE total_score = %(new)s) = 1,
+                    (SELECT COUNT(*) FROM {table} WHERE total_score = %(old)s) = 0
+            """, {'new': new_total, 'old': old_total})
+            new_value_added, old_value_gone = cursor.fetchone()
+            shift = int(new_value_added) - int(old_value_gone and old_total is not None)
+        else:
+            shift = 1 if old_total is None else 0
+
+        if shift:
+            cursor.execute(
+                f'UPDATE {table} SET rank = rank + %s WHERE total_score < %s AND rank IS NOT NULL',
+                [shift, low]
+            )
+
@@ -3,7 +3,7 @@ Scoring Serializers - سریالایزرهای امتیازدهی
 """
 
 from rest_framework import serializers
-from .models import UserScore, ScoreLog
+from .models import UserScore, ScoreLog, ScoringJob
 
 
 class UserScoreSerializer(serializers.ModelSerializer):
@@ -46,3 +46,15 @@ class ScoreLogSerializer(serializers.ModelSerializer):
         model = ScoreLog
         fields = ['id', 'action', 'action_display', 'points_change', 'description', 'created_at']
         read_only_fields = ['id', 'created_at']
+
+
+class ScoringJobSerializer(serializers.ModelSerializer):
+    """
+    سریالایزر وضعیت کار امتیازدهی
+    """
+    is_finished = serializers.BooleanField(read_only=True)
+    
+    class Meta:
+        model = ScoringJob
+        fields = ['id', 'idea', 'status', 'is_finished', 'result', 'error', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
@@ -0,0 +1,314 @@
+"""
+Scoring Services - سرویس امتیازدهی AI ایده‌ها
+منطق مشترک بین view (اعتبارسنجی) و worker (اجرای تحلیل)
+و نگهداری تدریجی امتیاز کاربران (UserScore)
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import (
+    Case, Count, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Cast, Coalesce, Greatest
+from django.db.models.lookups import GreaterThan
+
+from .change_detection import compare, scoring_snapshot
+from .models import UserScore, score_points, score_points_expression
+from .ranking import recompute_ranks, update_rank_window
+
+
+class ScoringService:
+    """
+    اعتبارسنجی، اجرای تحلیل AI و ذخیره نتیجه روی ایده
+    """
+
+    VERDICT_EMOJIS = {
+        'عالی': '🏆',
+        'خوب': '👍',
+        'متوسط': '👌',
+        'نیاز به بهبود': '📈',
+        'ضعیف': '⚠️'
+    }
+
+    SCORE_LABELS = {
+        'innovation': 'نوآوری',
+        'feasibility': 'امکان‌پذیری',
+        'market_potential': 'پتانسیل بازار',
+        'impact': 'تأثیرگذاری',
+        'competitive_advantage': 'مزیت رقابتی'
+    }
+
+    @classmethod
+    def check_can_score(cls, idea, changes=None):
+        """
+        بررسی امکان امتیازگیری
+        changes: نتیجه detect_changes اگر از قبل محاسبه شده است
+        خروجی: None اگر مجاز است، در غیر این صورت دیکشنری خطا
+        """
+        if idea.scoring_count >= idea.MAX_SCORING_ATTEMPTS:
+            return {
+                'error': f'شما فقط {idea.MAX_SCORING_ATTEMPTS} بار می‌توانید امتیازگیری کنید',
+                'remaining_attempts': 0
+            }
+
+        # Re-scoring needs a meaningful edit across any scored field (not just whitespace/punctuation)
+        if changes is None:
+            changes = cls.detect_changes(idea)
+        if changes is not None and not changes.is_meaningful:
+            return {
+                'error': 'برای امتیازگیری مجدد باید ایده را ویرایش کنید و تغییرات معناداری ایجاد کنید.',
+                'similarity': round(changes.similarity * 100),
+                'remaining_attempts': idea.MAX_SCORING_ATTEMPTS - idea.scoring_count
+            }
+
+        return None
+
+    @classmethod
+    def detect_changes(cls, idea):
+        """
+        مقایسه ایده با نسخه آخرین امتیازدهی
+        خروجی: ChangeReport یا None اگر هنوز امتیاز نگرفته است
+        """
+        if idea.scoring_count == 0:
+            return None
+        current = scoring_snapshot(idea)
+        previous = idea.last_scored_snapshot
+        if previous is None:
+            # Scored before snapshots existed: only the description was recorded
+            previous = {**current, 'description': idea.last_scored_description}
+        return compare(previous, current)
+
+    @classmethod
+    def build_feedback(cls, result):
+        """ساخت متن بازخورد قابل نمایش از خروجی JSON مدل"""
+        feedback_parts = []
+
+        # Summary
+        if result.get('summary'):
+            feedback_parts.append(f"📝 {result['summary']}")
+
+        # Verdict
+        verdict = result.get('verdict', '')
+        if verdict:
+            emoji = cls.VERDICT_EMOJIS.get(verdict, '📊')
+            feedback_parts.append(f"\n{emoji} **ارزیابی کلی:** {verdict}")
+
+        # Scores breakdown
+        scores = result.get('scores', {})
+        if scores:
+            feedback_parts.append("\n\n📊 **امتیازات تفکیکی:**")
+            for key, label in cls.SCORE_LABELS.items():
+                if key in scores:
+                    feedback_parts.append(f"• {label}: {scores[key]}/20")
+
+        # Strengths
+        feedback = result.get('feedback', {})
+        if feedback.get('strengths'):
+            feedback_parts.append("\n\n✅ **نقاط قوت:**")
+            for s in feedback['strengths']:
+                feedback_parts.append(f"• {s}")
+
+        # Weaknesses
+        if feedback.get('weaknesses'):
+            feedback_parts.append("\n\n⚠️ **نقاط ضعف:**")
+            for w in feedback['weaknesses']:
+                feedback_parts.append(f"• {w}")
+
+        # Suggestions
+        if feedback.get('suggestions'):
+            feedback_parts.append("\n\n💡 **پیشنهادات:**")
+            for sg in feedback['suggestions']:
+                feedback_parts.append(f"• {sg}")
+
+        return '\n'.join(feedback_parts)
+
+    @classmethod
+    def score_idea(cls, idea, caller=None, use_cache=True):
+        """
+        تحلیل ایده با AI و ذخیره امتیاز
+        caller: llm_dispatch.LLMCaller (اولویت صف از ScoringJob.priority و برچسب تله‌متری)
+        use_cache: استفاده از AnalysisCache برای ورودی تکراری (ScoringJob.bypass_cache)
+        خروجی: (success, payload) - payload همان پاسخ API قدیمی ai_score است
+        """
+        from .ai_service import idea_analyzer
+
+        changes = cls.detect_changes(idea)
+        error = cls.check_can_score(idea, changes)
+        if error:
+            return False, error
+
+        # Get category name
+        category_name = idea.category.name if idea.category else None
+
+        # Analyze idea with AI (including blocks and advanced fields)
+        result = idea_analyzer.analyze_idea(
+            title=idea.title,
+            description=idea.description,
+            category=category_name,
+            changes=changes.diff_text() if changes else None,
+            previous_score=idea.ai_score if idea.scoring_count > 0 else None,
+            blocks=idea.blocks or None,
+            budget=idea.budget,
+            execution_steps=idea.execution_steps,
+            required_skills=idea.required_skills,
+            caller=caller,
+            use_cache=use_cache
+        )
+
+        # Check for errors
+        if 'error' in result:
+            return False, {'error': result['error']}
+
+        # What was scored, for the next re-score's change detection
+        scored_description = idea.description
+        scored_snapshot = scoring_snapshot(idea)
+
+        with transaction.atomic():
+            # The LLM call took a while: re-check against the current row under a lock, so two
+            # runs for one idea can never both be charged (or go past MAX_SCORING_ATTEMPTS)
+            locked = type(idea).objects.select_for_update().get(pk=idea.pk)
+            error = cls.check_can_score(locked)
+            if error:
+                return False, error
+
+            locked.ai_score = result.get('total_score', 0)
+            locked.last_scored_description = scored_description
+            locked.last_scored_snapshot = scored_snapshot
+            locked.ai_feedback = cls.build_feedback(result)
+            locked.scoring_count += 1
+            # UserScore follows through the Idea post_save signal (ai_score delta)
+            locked.save(update_fields=[
+                'ai_score', 'last_scored_description', 'last_scored_snapshot', 'ai_feedback',
+                'scoring_count', 'updated_at',
+            ])
+
+        remaining = locked.MAX_SCORING_ATTEMPTS - locked.scoring_count
+
+        return True, {
+            'ai_score': locked.ai_score,
+            'ai_feedback': locked.ai_feedback,
+            'scores': result.get('scores', {}),
+            'verdict': result.get('verdict', ''),
+            'scoring_count': locked.scoring_count,
+            'remaining_attempts': remaining,
+            'cached': result.get('cached', False),
+            'prescreened': result.get('prescreened', ''),
+            'message': f'امتیاز AI محاسبه شد. ({remaining} بار دیگر باقی مانده)'
+        }
+
+
+def _idea_aggregate(aggregate, output_field):
+    """Subquery تجمیعی روی ایده‌های هر کاربر برای reconcile"""
+    from ideas.models import Idea
+
+    rows = Idea.objects.filter(user=OuterRef('user')).order_by().values('user').annotate(
+        value=aggregate
+    ).values('value')
+    return Subquery(rows, output_field=output_field)
+
+
+class UserScoreService:
+    """
+    نگهداری UserScore با delta به جای aggregate کامل روی همه ایده‌های کاربر
+    - apply_idea_change: یک UPDATE با F() برای ساخت/حذف ایده یا تغییر ai_score
+    - reconcile: اصلاح دوره‌ای drift (به‌روزرسانی‌های bulk، خطاها، ...)
+    """
+
+    @staticmethod
+    def _average(total, scored):
+        return Case(
+            When(GreaterThan(scored, 0), then=Cast(total, FloatField()) / Cast(scored, FloatField())),
+            default=Value(0.0),
+            output_field=FloatField()
+        )
+
+    @classmethod
+    def apply_idea_change(cls, user_id, old_score=None, new_score=None, ideas_delta=0, create_missing=True):
+        """
+        اعمال تغییر یک ایده روی امتیاز کاربر
+        old_score/new_score: ai_score قبل و بعد (None یعنی بدون امتیاز)
+        ideas_delta: +1 برای ایده جدید، -1 برای ایده حذف‌شده
+        """
+        # Each idea counts with its rounded score, the same rule as update_score and reconcile
+        sum_delta = score_points(new_score) - score_points(old_score)
+        scored_delta = (new_score is not None) - (old_score is not None)
+        if not (sum_delta or scored_delta or ideas_delta):
+            return
+
+        total = Greatest(F('sum_ai_score') + sum_delta, 0)
+        scored = Greatest(F('scored_ideas_count') + scored_delta, 0)
+        # Right-hand sides all read the pre-update row, so this is one consistent UPDATE
+        score_row = UserScore.objects.filter(user_id=user_id)
+        changes = dict(
+            ideas_count=Greatest(F('ideas_count') + ideas_delta, 0),
+            scored_ideas_count=scored,
+            sum_ai_score=total,
+            total_score=total,
+            avg_ai_score=cls._average(total, scored),
+        )
+
+        if not sum_delta:
+            # Totals unchanged: no rank window to update
+            if score_row.update(**changes):
+                return
+        else:
+            with transaction.atomic(savepoint=False):
+                # Read under the row lock: the rank window needs the exact total before this change
+                row = score_row.select_for_update().values('total_score', 'rank').first()
+                if row is not None:
+                    score_row.update(**changes)
+            if row is not None:
+                # Greatest(..., 0) as in the UPDATE, so this is the value it wrote
+                new_total = max(row['total_score'] + sum_delta, 0)
+                update_rank_window(row['total_score'] if row['rank'] is not None else None, new_total)
+                return
+
+        if create_missing:
+            # First idea of this user: build the row from scratch (already includes this change)
+            score, _ = UserScore.objects.get_or_create(user_id=user_id)
+            score.update_score()
+
+    @classmethod
+    def reconcile(cls, dry_run=False):
+        """
+        مقایسه UserScore با ایده‌های واقعی و اصلاح سطرهای drift‌شده در یک UPDATE
+        خروجی: تعداد سطرهای اصلاح‌شده (یا drift‌شده در dry_run)
+        """
+        User = get_user_model()
+
+        missing = list(User.objects.filter(score__isnull=True).values_list('id', flat=True))
+        if missing and not dry_run:
+            UserScore.objects.bulk_create(
+                [UserScore(user_id=user_id) for user_id in missing], ignore_conflicts=True
+            )
+
+        actual_count = Coalesce(_idea_aggregate(Count('id'), IntegerField()), 0)
+        actual_scored = Coalesce(_idea_aggregate(Count('ai_score'), IntegerField()), 0)
+        actual_sum = Coalesce(
+            _idea_aggregate(Cast(Sum(score_points_expression()), IntegerField()), IntegerField()), 0
+        )
+
+        drifted = UserScore.objects.alias(
+            actual_count=actual_count,
+            actual_scored=actual_scored,
+            actual_sum=actual_sum,
+        ).filter(
+            ~Q(ideas_count=F('actual_count')) |
+            ~Q(scored_ideas_count=F('actual_scored')) |
+            ~Q(sum_ai_score=F('actual_sum')) |
+            ~Q(total_score=F('actual_sum'))
+        )
+
+        if dry_run:
+            return drifted.count() + len(missing)
+
+        fixed = drifted.update(
+            ideas_count=actual_count,
+            scored_ideas_count=actual_scored,
+            sum_ai_score=actual_sum,
+            total_score=actual_sum,
+            avg_ai_score=cls._average(actual_sum, actual_scored),
+        )
+        if fixed or missing:
+            recompute_ranks()
+        return fixed
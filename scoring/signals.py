@@ -1,15 +1,43 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
 from ideas.models import Idea
 from .models import UserScore
+from .services import UserScoreService
+
+# ai_score was deferred when the idea was loaded, so its previous value is unknown
+_UNKNOWN = object()
+
+
+@receiver(post_init, sender=Idea)
+def remember_ai_score(sender, instance, **kwargs):
+    """
+    Keep the loaded ai_score so post_save can apply just the difference.
+    """
+    instance._saved_ai_score = instance.__dict__.get('ai_score', _UNKNOWN)
+
 
 @receiver(post_save, sender=Idea)
-@receiver(post_delete, sender=Idea)
-def update_user_score(sender, instance, **kwargs):
+def update_user_score(sender, instance, created, **kwargs):
     """
-    Update user score when an idea is saved or deleted.
+    Apply an idea's creation or ai_score change to its user's score as a delta.
     """
-    user = instance.user
-    if user:
-        score, created = UserScore.objects.get_or_create(user=user)
+    old_score = instance._saved_ai_score
+    instance._saved_ai_score = instance.ai_score
+    if created:
+        UserScoreService.apply_idea_change(instance.user_id, new_score=instance.ai_score, ideas_delta=1)
+    elif old_score is _UNKNOWN:
+        # Can't tell what changed: rebuild this user's row
+        score, _ = UserScore.objects.get_or_create(user_id=instance.user_id)
         score.update_score()
+    elif old_score != instance.ai_score:
+        UserScoreService.apply_idea_change(instance.user_id, old_score, instance.ai_score)
+
+
+@receiver(post_delete, sender=Idea)
+def remove_idea_score(sender, instance, **kwargs):
+    """
+    The user (and their UserScore) may be going away in the same cascade: never create a row here.
+    """
+    UserScoreService.apply_idea_change(
+        instance.user_id, old_score=instance.ai_score, ideas_delta=-1, create_missing=False
+    )
@@ -0,0 +1,219 @@
+"""
+System Actions - جدا کردن بلوک‌های __SYSTEM_ACTION__ از پاسخ مشاور در یک پیمایش
+SystemActionParser متن را (کامل یا تکه‌های stream) یک بار می‌خواند: متن قابل نمایش را
+همان لحظه برمی‌گرداند و مقادیر داخل بلوک‌ها را با decoder خود JSON (نه regex) می‌خواند،
+پس JSON تودرتو (مثل گراف نودی)، چند اکشن در یک بلوک و ``` داخل رشته‌ها بلوک را نمی‌شکنند
+"""
+
+import json
+import re
+
+FENCE = '```'
+ACTION_TAG = '__SYSTEM_ACTION__'
+JSON_TAG = 'json'
+
+_SPACE = re.compile(r'\s*')
+_NEWLINE_RUN = re.compile(r'\n{3,}')
+_decoder = json.JSONDecoder()
+
+
+def _actions_in(value):
+    """اکشن‌های یک مقدار JSON (یک شیء یا آرایه‌ای از اشیاء)"""
+    values = value if isinstance(value, list) else [value]
+    return [item for item in values if isinstance(item, dict) and 'action' in item]
+
+
+class SystemActionParser:
+    """
+    پارسر تدریجی پاسخ مشاور
+    - feed(chunk): متنی که اکنون نمایش آن امن است؛ finish(): باقیمانده
+    - بلوک‌های __SYSTEM_ACTION__ همیشه و بلوک‌های json فقط اگر action داشته باشند حذف می‌شوند
+    - actions: اکشن‌های بلوک‌های سیستمی (یا در نبود آن‌ها، اکشن‌های بلوک‌های json)
+    مجموع خروجی feed و finish همان متن نهایی است (خطوط خالی بیش از دو تا ادغام و دو طرف trim شده)
+    """
+
+    TEXT, ACTION, JSON, CODE = range(4)
+
+    def __init__(self):
+        self.state = self.TEXT
+        self.buffer = ''
+        self._actions = []
+        self._json_actions = []
+        self._started = False
+        self._pending_space = ''
+        self._shown = []
+        self._reset_block(0)
+
+    @property
+    def actions(self):
+        return self._actions or self._json_actions
+
+    @property
+    def content(self):
+        """متن قابل نمایش تا این لحظه (بعد از finish: متن نهایی)"""
+        return ''.join(self._shown)
+
+    def _reset_block(self, pos):
+        self._pos = pos
+        self._fence_from = pos
+        self._block_actions = []
+
+    def _emit(self, text):
+        """متن قابل نمایش: ادغام خطوط خالی و نگه داشتن فاصله انتهایی تا آمدن متن بعدی"""
+        if not text:
+            return ''
+        if self._pending_space:
+            text = self._pending_space + text
+        if '\n\n\n' in text:
+            text = _NEWLINE_RUN.sub('\n\n', text)
+        body = text.rstrip()
+        self._pending_space = text[len(body):]
+        if not self._started:
+            body = body.lstrip()
+            self._started = bool(body)
+        self._shown.append(body)
+        return body
+
+    def _partial_fence(self, text):
+        """طول بک‌تیک‌های انتهایی که ممکن است نیمه اول یک fence باشند"""
+        tail = len(text) - len(text.rstrip('`'))
+        return tail if tail < len(FENCE) else 0
+
+    def _read_block(self):
+        """
+        خواندن مقادیر JSON بلوک جاری از self._pos
+        خروجی: محل fence پایانی بلوک، یا None اگر بلوک هنوز کامل نشده
+        """
+        buffer = self.buffer
+        pos = self._pos
+        while True:
+            pos = _SPACE.match(buffer, pos).end()
+            if buffer.startswith(FENCE, pos):
+                self._pos = pos
+                return pos
+            if pos == len(buffer) or FENCE.startswith(buffer[pos:]):
+                break
+            # Values are only decoded once a fence has arrived after them (no re-parsing per chunk)
+            fence = buffer.find(FENCE, max(pos, self._fence_from))
+            if fence == -1:
+                self._fence_from = len(buffer) - self._partial_fence(buffer)
+                break
+            if buffer[pos] not in '{[':
+                # Not JSON: skip to the closing fence
+                pos = fence
+                continue
+            try:
+                value, pos = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                if e.msg.startswith('Unterminated string'):
+                    # The fence is part of a string value: wait for the next one
+                    self._fence_from = fence + len(FENCE)
+                    break
+                if e.pos >= len(buffer):
+                    # Every fence so far was inside the value, which is still arriving
+                    self._fence_from = len(buffer) - self._partial_fence(buffer)
+                    break
+                # Malformed value: like any fence outside a string, this one closes the block
+                pos = fence
+                continue
+            self._block_actions.extend(_actions_in(value))
+
+        self._pos = pos
+        return None
+
+    def _close_json_block(self, block):
+        """بلوک ```json: اگر اکشن داشت حذف و برای fallback نگه داشته می‌شود، وگرنه همان متن"""
+        if self._block_actions or '"action"' in block:
+            self._json_actions.extend(self._block_actions)
+            return ''
+        return block
+
+    def feed(self, chunk):
+        """افزودن تکه جدید؛ خروجی: متنی که اکنون نمایش آن امن است"""
+        self.buffer += chunk
+        if self.state in (self.TEXT, self.CODE) and '`' not in self.buffer:
+            # Most chunks: plain text with no fence in sight
+            text, self.buffer = self.buffer, ''
+            return self._emit(text)
+        out = []
+
+        while self.buffer:
+            if self.state == self.TEXT:
+                idx = self.buffer.find(FENCE)
+                if idx == -1:
+                    keep = self._partial_fence(self.buffer)
+                    out.append(self.buffer[:len(self.buffer) - keep])
+                    self.buffer = self.buffer[len(self.buffer) - keep:]
+                    break
+                out.append(self.buffer[:idx])
+                rest = self.buffer[idx + len(FENCE):]
+                if ACTION_TAG.startswith(rest) or JSON_TAG.startswith(rest):
+                    # Not enough characters yet to know which fence this is
+                    self.buffer = self.buffer[idx:]
+                    break
+                if rest.startswith(ACTION_TAG):
+                    self.state = self.ACTION
+                    self.buffer = rest[len(ACTION_TAG):]
+                    self._reset_block(0)
+                elif rest.startswith(JSON_TAG):
+                    # The raw block is kept: it is shown as-is unless it carries an action
+                    self.state = self.JSON
+                    self.buffer = self.buffer[idx:]
+                    self._reset_block(len(FENCE) + len(JSON_TAG))
+                else:
+                    self.state = self.CODE
+                    out.append(FENCE)
+                    self.buffer = rest
+
+            elif self.state == self.CODE:
+                idx = self.buffer.find(FENCE)
+                if idx == -1:
+                    keep = self._partial_fence(self.buffer)
+                    out.append(self.buffer[:len(self.buffer) - keep])
+                    self.buffer = self.buffer[len(self.buffer) - keep:]
+                    break
+                out.append(self.buffer[:idx + len(FENCE)])
+                self.state = self.TEXT
+                self.buffer = self.buffer[idx + len(FENCE):]
+
+            else:
+                if self.buffer.find(FENCE, self._fence_from) == -1:
+                    # Nothing can end a value or the block before the next fence
+                    self._fence_from = len(self.buffer) - self._partial_fence(self.buffer)
+                    break
+                end = self._read_block()
+                if end is None:
+                    break
+                end += len(FENCE)
+                if self.state == self.ACTION:
+                    self._actions.extend(self._block_actions)
+                else:
+                    out.append(self._close_json_block(self.buffer[:end]))
+                self.state = self.TEXT
+                self.buffer = self.buffer[end:]
+
+        return self._emit(''.join(out))
+
+    def finish(self):
+        """پایان پاسخ؛ خروجی: باقیمانده قابل نمایش (بلوک باز سیستمی نمایش داده نمی‌شود)"""
+        remaining = self.buffer
+        if self.state in (self.ACTION, self.JSON):
+            # Cut off inside a block: values completed before that still count
+            self.buffer = f'{remaining}\n{FENCE}'
+            self._read_block()
+            if self.state == self.ACTION:
+                self._actions.extend(self._block_actions)
+                remaining = ''
+            else:
+                remaining = self._close_json_block(remaining)
+        self.buffer = ''
+        self.state = self.TEXT
+        return self._emit(remaining)
+
+
+def parse_system_actions(text):
+    """پاسخ کامل؛ خروجی: (متن قابل نمایش، لیست اکشن‌ها)"""
+    parser = SystemActionParser()
+    parser.feed(text or '')
+    parser.finish()
+    return parser.content, parser.actions
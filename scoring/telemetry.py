@@ -0,0 +1,232 @@
+"""
+LLM Telemetry - ثبت توکن، تأخیر و وضعیت هر فراخوانی LLM و تجمیع روزانه آن
+- رکوردها در حافظه پردازه جمع و توسط یک thread پس‌زمینه با bulk_create نوشته می‌شوند
+  (هیچ INSERTی در مسیر درخواست کاربر اجرا نمی‌شود)
+- LLMUsageRollup (کار دوره‌ای worker): بازمحاسبه LLMUsageDaily و حذف سطرهای خام قدیمی
+"""
+
+import atexit
+import logging
+import os
+import threading
+from datetime import datetime, time, timedelta
+
+from decouple import config
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, InterfaceError, OperationalError, connection
+from django.utils import timezone
+
+from .models import LLMCall, LLMUsageDaily
+
+logger = logging.getLogger(__name__)
+
+LLM_TELEMETRY_ENABLED = config('LLM_TELEMETRY_ENABLED', default=True, cast=bool)
+LLM_TELEMETRY_BATCH_SIZE = config('LLM_TELEMETRY_BATCH_SIZE', default=50, cast=int)
+LLM_TELEMETRY_FLUSH_INTERVAL = config('LLM_TELEMETRY_FLUSH_INTERVAL', default=5, cast=float)
+# Records kept in memory while the database is unreachable; newer ones are dropped past this
+LLM_TELEMETRY_MAX_BUFFER = config('LLM_TELEMETRY_MAX_BUFFER', default=5000, cast=int)
+LLM_TELEMETRY_RETENTION = timedelta(days=config('LLM_TELEMETRY_RETENTION_DAYS', default=30, cast=float))
+
+# Days (today included) recomputed by each rollup; late flushes land at most a few seconds late
+ROLLUP_DAYS = 2
+
+
+def call_status(status_code):
+    if status_code == 429:
+        return LLMCall.Status.RATE_LIMITED
+    if status_code is not None and status_code < 400:
+        return LLMCall.Status.OK
+    return LLMCall.Status.ERROR
+
+
+class TelemetryBuffer:
+    """
+    بافر درون‌پردازه‌ای رکوردهای LLMCall
+    thread نوشتن با اولین رکورد هر پردازه ساخته می‌شود (بعد از fork در gunicorn/worker هم)
+    و هر flush_interval ثانیه یا با پر شدن یک batch، بافر را در یک INSERT می‌نویسد
+    """
+
+    def __init__(self, batch_size=LLM_TELEMETRY_BATCH_SIZE, flush_interval=LLM_TELEMETRY_FLUSH_INTERVAL,
+                 max_size=LLM_TELEMETRY_MAX_BUFFER):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self._reset()
+        # A forked child must not inherit the parent's records, lock state or (dead) thread
+        os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self.flush)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._records = []
+        self._thread = None
+        self.dropped = 0
+
+    def add(self, record):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='llm-telemetry', daemon=True)
+                self._thread.start()
+            if len(self._records) >= self.max_size:
+                self.dropped += 1
+                return
+            self._records.append(record)
+            if len(self._records) >= self.batch_size:
+                self._wake.set()
+
+    def flush(self):
+        """نوشتن همه رکوردهای بافر؛ خروجی: تعداد نوشته‌شده"""
+        with self._lock:
+            records, self._records = self._records, []
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            logger.warning('LLM telemetry buffer full, dropped %d records', dropped)
+        if not records:
+            return 0
+        try:
+            return self._write(records)
+        except (OperationalError, InterfaceError):
+            # Database unreachable: the records are fine, keep them for the next flush
+            connection.close()
+            logger.exception('Failed to write %d LLM telemetry records', len(records))
+            with self._lock:
+                self._records[:0] = records[:max(self.max_size - len(self._records), 0)]
+            return 0
+        except Exception:
+            # The batch itself is rejected: retried once (see _write), never re-queued where
+            # it would block every later flush
+            connection.close()
+            logger.exception('Dropped %d LLM telemetry records the database rejected', len(records))
+            return 0
+
+    def _write(self, records):
+        try:
+            LLMCall.objects.bulk_create(records, batch_size=self.batch_size)
+        except DatabaseError as e:
+            if isinstance(e, (OperationalError, InterfaceError)):
+                raise
+            # A fresh connection, in case the error left this one unusable
+            connection.close()
+            # Usually a user deleted since the call was recorded (user is SET_NULL on delete)
+            self._forget_missing_users(records)
+            LLMCall.objects.bulk_create(records, batch_size=self.batch_size)
+        return len(records)
+
+    @staticmethod
+    def _forget_missing_users(records):
+        user_ids = {record.user_id for record in records if record.user_id is not None}
+        existing = set(get_user_model().objects.filter(id__in=user_ids).values_list('id', flat=True))
+        for record in records:
+            if record.user_id not in existing:
+                record.user_id = None
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self.flush():
+                # This thread's connection would otherwise stay open between flushes
+                # (after a failure flush closes it itself: a broken one is never reused)
+                connection.close()
+
+
+buffer = TelemetryBuffer()
+
+
+def record_call(caller, model, status, status_code=None, usage=None, latency_ms=None,
+                first_token_ms=None, queue_ms=0, attempts=None, stream=False):
+    """ثبت یک فراخوانی LLM در بافر (caller: llm_dispatch.LLMCaller)"""
+    if not LLM_TELEMETRY_ENABLED:
+        return
+    usage = usage or {}
+    buffer.add(LLMCall(
+        user_id=caller.user_id,
+        plan=caller.plan,
+        endpoint=caller.endpoint,
+        model=model or '',
+        status=status,
+        status_code=status_code,
+        stream=stream,
+        prompt_tokens=usage.get('prompt_tokens') or 0,
+        completion_tokens=usage.get('completion_tokens') or 0,
+        latency_ms=latency_ms or 0,
+        first_token_ms=first_token_ms,
+        queue_ms=int(queue_ms),
+        attempts=1 if attempts is None else attempts,
+        created_at=timezone.now(),
+    ))
+
+
+class LLMUsageRollup:
+    """
+    تجمیع LLMCall در LLMUsageDaily با یک INSERT ... SELECT ... ON CONFLICT
+    GROUPING SETS هم سطرهای (پلن، اندپوینت، مدل) و هم جمع کل هر پلن (با ALL) را در یک پیمایش می‌سازد
+    """
+
+    @classmethod
+    def run(cls, days=ROLLUP_DAYS):
+        """بازمحاسبه days روز اخیر (به وقت TIME_ZONE)؛ خروجی: تعداد سطرهای LLMUsageDaily"""
+        tz = timezone.get_current_timezone()
+        since = datetime.combine(timezone.localdate() - timedelta(days=days - 1), time.min, tzinfo=tz)
+        calls = LLMCall._meta.db_table
+        daily = LLMUsageDaily._meta.db_table
+        params = {
+            'all': LLMUsageDaily.ALL,
+            'tz': str(tz),
+            'since': since,
+            'ok': LLMCall.Status.OK,
+            'error': LLMCall.Status.ERROR,
+            'rate_limited': LLMCall.Status.RATE_LIMITED,
+        }
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO {daily} (
+                    date, plan, endpoint, model, calls, errors, rate_limited,
+                    prompt_tokens, completion_tokens,
+                    latency_p50_ms, latency_p95_ms, latency_max_ms, updated_at
+                )
+                SELECT
+                    c.day, c.plan,
+                    CASE WHEN GROUPING(c.endpoint) = 1 THEN %(all)s ELSE c.endpoint END,
+                    CASE WHEN GROUPING(c.model) = 1 THEN %(all)s ELSE c.model END,
+                    COUNT(*),
+                    COUNT(*) FILTER (WHERE c.status = %(error)s),
+                    COUNT(*) FILTER (WHERE c.status = %(rate_limited)s),
+                    COALESCE(SUM(c.prompt_tokens), 0),
+                    COALESCE(SUM(c.completion_tokens), 0),
+                    COALESCE(ROUND(PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY c.latency_ms)
+                        FILTER (WHERE c.status = %(ok)s)), 0),
+                    COALESCE(ROUND(PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY c.latency_ms)
+                        FILTER (WHERE c.status = %(ok)s)), 0),
+                    COALESCE(MAX(c.latency_ms) FILTER (WHERE c.status = %(ok)s), 0),
+                    NOW()
+                FROM (
+                    SELECT (created_at AT TIME ZONE %(tz)s)::date AS day, plan, endpoint, model,
+                           status, prompt_tokens, completion_tokens, latency_ms
+                    FROM {calls}
+                    WHERE created_at >= %(since)s
+                ) AS c
+                GROUP BY GROUPING SETS ((c.day, c.plan, c.endpoint, c.model), (c.day, c.plan))
+                ON CONFLICT (date, plan, endpoint, model) DO UPDATE SET
+                    calls = EXCLUDED.calls,
+                    errors = EXCLUDED.errors,
+                    rate_limited = EXCLUDED.rate_limited,
+                    prompt_tokens = EXCLUDED.prompt_tokens,
+                    completion_tokens = EXCLUDED.completion_tokens,
+                    latency_p50_ms = EXCLUDED.latency_p50_ms,
+                    latency_p95_ms = EXCLUDED.latency_p95_ms,
+                    latency_max_ms = EXCLUDED.latency_max_ms,
+                    updated_at = EXCLUDED.updated_at
+            """, params)
+            return cursor.rowcount
+
+    @classmethod
+    def prune(cls):
+        """حذف سطرهای خام قدیمی‌تر از RETENTION (تجمیع روزانه‌شان باقی می‌ماند)؛ خروجی: تعداد حذف‌شده"""
+        # Never delete days the rollup may still recompute
+        retention = max(LLM_TELEMETRY_RETENTION, timedelta(days=ROLLUP_DAYS + 1))
+        deleted, _ = LLMCall.objects.filter(created_at__lt=timezone.now() - retention).delete()
+        if deleted:
+            logger.info('LLM telemetry pruned: %d calls', deleted)
+        return deleted
@@ -1,3 +1,1207 @@
-from django.test import TestCase
+import copy
+import json
+import random
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, OperationalError, connection
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from ideas.models import ChatMessage, ChatSession, Idea, IdeaCustomField
+
+from . import analysis_cache, chat_summary
+from .ai_service import IdeaAnalyzer
+from .change_detection import MAX_HUNK_TOKENS, MAX_HUNKS, compare
+from .chat_advisor import ChatAdvisor
+from .context_cache import IdeaContextCache
+from .idea_actions import apply_actions
+from .jobs import STALE_JOB_TIMEOUT, claim_next_job, enqueue_scoring, fail_exhausted_jobs, run_job
+from .llm_client import LLMError, LLMResponse
+from .llm_dispatch import (
+    PAID_RESERVE, PRIORITY_FREE, PRIORITY_PAID, LLMDispatcher, ProviderQuota, parse_duration,
+)
+from .models import AnalysisCacheEntry, LLMCall, LLMUsageDaily, ScoringJob
+from .prescreen import screen, zero_score_result
+from .prompt_budget import TRUNCATION_MARK, PromptBudget, count_tokens
+from .system_actions import SystemActionParser, parse_system_actions
+from .telemetry import LLMUsageRollup, TelemetryBuffer
+
+
+def action_block(*actions, tag='__SYSTEM_ACTION__'):
+    body = '\n'.join(json.dumps(action, ensure_ascii=False, indent=2) for action in actions)
+    return f'```{tag}\n{body}\n```'
+
+
+def stream(chunks):
+    parser = SystemActionParser()
+    shown = ''.join(parser.feed(chunk) for chunk in chunks) + parser.finish()
+    return shown, parser.actions
+
+
+UPDATE_BUDGET = {'action': 'update_field', 'field': 'budget', 'value': '۸۰ میلیون تومان'}
+NODE_GRAPH = {
+    'action': 'add_block',
+    'block': {
+        'type': 'node_graph',
+        'name': 'نقشه ایده',
+        'value': {
+            'nodes': [
+                {'id': 1, 'type': 'idea', 'label': 'ایده {اصلی}', 'x': 200, 'y': 100},
+                {'id': 2, 'type': 'problem', 'label': 'مشکل', 'x': 100, 'y': 200},
+            ],
+            'edges': [{'from': 1, 'to': 2}],
+        },
+    },
+}
+
+
+class SystemActionParserTests(SimpleTestCase):
+    """جدا کردن بلوک‌های __SYSTEM_ACTION__ از پاسخ مشاور (کامل و stream)"""
+
+    RESPONSES = [
+        'فقط یک توصیه ساده، بدون هیچ اکشنی.',
+        'بودجه رو ثبت میکنم:\n\n' + action_block(UPDATE_BUDGET) + '\n\n✅ ثبت شد.',
+        'گراف:\n' + action_block(NODE_GRAPH) + '\nبررسیش کن.',
+        'دو تغییر:\n\n' + action_block(UPDATE_BUDGET, {'action': 'update_block', 'block_index': 1, 'value': 40}),
+        'مراحل:\n\n' + action_block({
+            'action': 'update_field', 'field': 'execution_steps',
+            'value': 'نصب:\n```bash\npip install -r requirements.txt\n```\nاجرا',
+        }) + '\n\nانجام شد.',
+        'نمونه کد:\n\n```python\nprint("hi")\n```\n\nو خروجی:\n\n```json\n{"id": 1, "tags": ["a"]}\n```\n\nتمام.',
+        'با fallback:\n\n' + action_block(UPDATE_BUDGET, tag='json') + '\n\nانجام شد!',
+        'الان عنوان رو عوض میکنم.\n\n```__SYSTEM_ACTION__\n{"action": "update_field", "field": "title", "value": "اپ"}\n',
+    ]
+
+    def test_plain_text_is_unchanged(self):
+        self.assertEqual(parse_system_actions('سلام!\n\nچطور کمکت کنم؟'), ('سلام!\n\nچطور کمکت کنم؟', []))
+
+    def test_action_block_is_hidden_and_parsed(self):
+        content, actions = parse_system_actions(self.RESPONSES[1])
+        self.assertEqual(actions, [UPDATE_BUDGET])
+        self.assertEqual(content, 'بودجه رو ثبت میکنم:\n\n✅ ثبت شد.')
+
+    def test_nested_json(self):
+        content, actions = parse_system_actions(self.RESPONSES[2])
+        self.assertEqual(actions, [NODE_GRAPH])
+        self.assertNotIn('nodes', content)
+
+    def test_multiple_actions(self):
+        text = self.RESPONSES[3] + '\n\nو یکی دیگر:\n' + action_block(NODE_GRAPH)
+        content, actions = parse_system_actions(text)
+        self.assertEqual([action['action'] for action in actions], ['update_field', 'update_block', 'add_block'])
+        self.assertEqual(content, 'دو تغییر:\n\nو یکی دیگر:')
+
+    def test_fence_inside_string_value(self):
+        content, actions = parse_system_actions(self.RESPONSES[4])
+        self.assertEqual(len(actions), 1)
+        self.assertIn('```bash', actions[0]['value'])
+        self.assertEqual(content, 'مراحل:\n\nانجام شد.')
+
+    def test_json_block_without_action_is_shown(self):
+        content, actions = parse_system_actions(self.RESPONSES[5])
+        self.assertEqual(actions, [])
+        self.assertEqual(content, self.RESPONSES[5])
+
+    def test_json_block_with_action_is_a_fallback(self):
+        content, actions = parse_system_actions(self.RESPONSES[6])
+        self.assertEqual(actions, [UPDATE_BUDGET])
+        self.assertEqual(content, 'با fallback:\n\nانجام شد!')
+
+        # Ignored once the response has a real system action block
+        _, actions = parse_system_actions(self.RESPONSES[6] + '\n' + action_block(NODE_GRAPH))
+        self.assertEqual(actions, [NODE_GRAPH])
+
+    def test_cut_off_final_block(self):
+        content, actions = parse_system_actions(self.RESPONSES[7])
+        self.assertEqual(actions, [{'action': 'update_field', 'field': 'title', 'value': 'اپ'}])
+        self.assertEqual(content, 'الان عنوان رو عوض میکنم.')
+
+        # Cut off inside the value: nothing complete to apply, and nothing leaks into the text
+        content, actions = parse_system_actions('باشه.\n```__SYSTEM_ACTION__\n{"action": "update_fi')
+        self.assertEqual((content, actions), ('باشه.', []))
+
+    def test_stream_matches_full_parse_at_every_split(self):
+        for text in self.RESPONSES:
+            expected = parse_system_actions(text)
+            for split in range(len(text) + 1):
+                with self.subTest(text=text[:20], split=split):
+                    self.assertEqual(stream([text[:split], text[split:]]), expected)
+
+    def test_stream_matches_full_parse_for_random_chunks(self):
+        rng = random.Random(0)
+        for text in self.RESPONSES:
+            expected = parse_system_actions(text)
+            for _ in range(50):
+                cuts = sorted(rng.sample(range(len(text) + 1), min(len(text), rng.randint(1, 12))))
+                chunks = [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+                with self.subTest(text=text[:20], cuts=cuts):
+                    self.assertEqual(stream(chunks), expected)
+
+    def test_streamed_text_is_never_taken_back(self):
+        text = self.RESPONSES[1]
+        parser = SystemActionParser()
+        shown = ''
+        for char in text:
+            shown += parser.feed(char)
+            self.assertTrue(parse_system_actions(text)[0].startswith(shown))
+        self.assertNotIn('__SYSTEM_ACTION__', shown + parser.finish())
+
+
+class PrescreenTests(SimpleTestCase):
+    """رد محلی ایده‌های واضحاً بی‌ارزش؛ ایده‌های معمولی باید به LLM برسند"""
+
+    PERSIAN = (
+        'بسیاری از بیماران برای گرفتن نوبت پزشک ساعت‌ها پشت خط تلفن منتظر می‌مانند. '
+        'ما یک اپلیکیشن می‌سازیم که نوبت‌های خالی مطب‌ها را به صورت زنده نشان می‌دهد. '
+        'بیمار نوبت را آنلاین رزرو می‌کند و یک روز قبل پیامک یادآوری می‌گیرد. '
+        'درآمد از اشتراک ماهانه مطب‌ها و کارمزد هر رزرو به دست می‌آید.'
+    )
+    ENGLISH = (
+        'Small farms lose a large share of their harvest because they cannot predict demand. '
+        'We offer a simple app that collects orders from nearby restaurants a week in advance. '
+        'Farmers plan what to pick and deliver in one shared route. '
+        'We charge restaurants a small fee per order.'
+    )
+    NUMBERS = (
+        'بودجه: 1,200,000,000 ریال در 12 ماه (1403/01/01 - 1403/12/29).\n'
+        'سرور: 45,000,000 ریال؛ توسعه: 850,000,000 ریال؛ بازاریابی: 300,000,000 ریال.\n'
+        'هدف: 5,000 کاربر تا 1403/06/31 و 20,000 کاربر تا 1404/12/29.\n'
+        'تبدیل: 3.5%؛ ارزش مشتری: 2,400,000 ریال؛ هزینه جذب: 650,000 ریال.'
+    )
+
+    def test_normal_ideas_pass(self):
+        self.assertIsNone(screen(self.PERSIAN))
+        self.assertIsNone(screen(self.ENGLISH))
+        self.assertIsNone(screen(self.PERSIAN.replace('ی', 'ي').replace('ک', 'ك')))
+
+    def test_number_heavy_text_passes(self):
+        self.assertIsNone(screen(self.NUMBERS))
+        self.assertIsNone(screen(self.NUMBERS.translate(str.maketrans('0123456789', '۰۱۲۳۴۵۶۷۸۹'))))
+
+    def test_empty_or_short_text(self):
+        for text in (None, '', '   ', 'یک اپ برای رزرو نوبت.'):
+            with self.subTest(text=text):
+                self.assertEqual(screen(text), 'too_short')
+
+    def test_spam(self):
+        self.assertEqual(screen('خرید ارزان ' * 40), 'repetitive')
+        self.assertEqual(screen('بهترین بهترین بهترین ایده. ' * 10), 'repetitive')
+        self.assertEqual(screen(' '.join(f'x{i} ###### !!!' for i in range(40))), 'gibberish')
+        rng = random.Random(0)
+        mashing = ' '.join(''.join(rng.choices('asdfghjklqwerty', k=20)) for _ in range(40))
+        self.assertEqual(screen(mashing), 'gibberish')
+
+    def test_rejection_looks_like_a_model_result(self):
+        result = zero_score_result(screen(''))
+        self.assertEqual(result['total_score'], 0)
+        self.assertEqual(result['prescreened'], 'too_short')
+
+
+def snapshot(**fields):
+    base = {
+        'title': 'اپلیکیشن رزرو نوبت پزشک',
+        'category': 'سلامت',
+        'description': ' '.join(f'جمله شماره {i} درباره مشکل بیماران و راه‌حل ما است.' for i in range(30)),
+        'budget': '۸۰ میلیون تومان',
+        'execution_steps': 'ساخت MVP، جذب ده مطب، راه‌اندازی عمومی',
+        'required_skills': 'برنامه‌نویس موبایل، طراح',
+        'blocks': '',
+    }
+    return {**base, **fields}
+
+
+class ChangeDetectionTests(SimpleTestCase):
+    """تغییر معنادار ایده نسبت به آخرین امتیازدهی و diff فشرده آن"""
+
+    def test_whitespace_and_punctuation_edits_are_not_meaningful(self):
+        old = snapshot()
+        new = snapshot(
+            title='  اپلیکیشن   رزرو نوبت پزشک!!',
+            description=old['description'].replace('.', '؛').replace(' ', '\n'),
+            budget='۸۰ میلیون تومان.',
+        )
+        report = compare(old, new)
+        self.assertFalse(report.is_meaningful)
+        self.assertEqual(report.changed_fields, [])
+        self.assertEqual(report.similarity, 1)
+
+    def test_persian_and_latin_digits_are_the_same(self):
+        self.assertEqual(compare(snapshot(budget='80 میلیون تومان'), snapshot()).changed_fields, [])
+
+    def test_short_field_change_is_meaningful(self):
+        report = compare(snapshot(), snapshot(budget='۵۰۰ میلیون تومان'))
+        self.assertEqual(report.changed_fields, ['budget'])
+        self.assertLess(report.change_ratio, 0.1)
+        self.assertTrue(report.is_meaningful)
+
+    def test_small_edit_to_long_text_is_not_meaningful(self):
+        old = snapshot()
+        report = compare(old, snapshot(description=old['description'].replace('شماره 7', 'شماره هفت')))
+        self.assertEqual(report.changed_fields, ['description'])
+        self.assertFalse(report.is_meaningful)
+
+    def test_rewrite_is_meaningful(self):
+        description = ' '.join(f'مدل درآمدی نسخه {i} بر پایه اشتراک سالانه مطب‌ها است.' for i in range(30))
+        self.assertTrue(compare(snapshot(), snapshot(description=description)).is_meaningful)
+
+    def test_first_scoring_compares_with_nothing(self):
+        report = compare(None, snapshot())
+        self.assertTrue(report.is_meaningful)
+        self.assertEqual(report.similarity, 0)
+
+    def test_diff_text_shows_removed_and_added_words(self):
+        diff = compare(snapshot(), snapshot(budget='۱۲۰ میلیون تومان')).diff_text()
+        self.assertIn('**بودجه:**', diff)
+        self.assertIn('- 80', diff)
+        self.assertIn('+ 120', diff)
+
+    def test_diff_text_limits(self):
+        old = snapshot()
+        words = ' '.join(f'کلمه{i}' for i in range(MAX_HUNK_TOKENS * 2))
+        report = compare(old, snapshot(description=old['description'] + ' ' + words))
+        added = [line for line in report.diff_text().splitlines() if line.startswith('+ ')]
+        self.assertEqual(len(added), 1)
+        self.assertEqual(len(added[0].split()), 1 + MAX_HUNK_TOKENS + 1)
+        self.assertTrue(added[0].endswith(' …'))
+
+        # Every other sentence edited: far more hunks than the limit
+        description = ' '.join(
+            f'جمله شماره {i} درباره مشکل {"کاربران" if i % 2 else "بیماران"} و راه‌حل ما است.' for i in range(30)
+        )
+        lines = compare(old, snapshot(description=description)).diff_text().splitlines()
+        self.assertEqual(sum(1 for line in lines if line.startswith('+ ')), MAX_HUNKS)
+        self.assertEqual(lines[-1], '… (تغییرات بیشتر حذف شد)')
+
+
+class PromptBudgetTests(SimpleTestCase):
+    """جا دادن بخش‌های پرامپت در بودجه توکن"""
+
+    LINE = 'this line is forty characters long ....\n'  # 10 tokens
+
+    def build(self, budget):
+        prompt = PromptBudget(budget)
+        prompt.add('system', 'S' * 40, required=True)
+        prompt.add('idea', 'I' * 40, priority=3)
+        prompt.add('history', 'H' * 4, items=[self.LINE] * 4, priority=1, drop_from='first')
+        prompt.add('similar', 'X' * 40, priority=2, drop_priority=0)
+        return prompt
+
+    def test_nothing_is_cut_within_budget(self):
+        prompt = self.build(1000)
+        report = prompt.fit()
+        self.assertEqual(report.dropped, {})
+        self.assertEqual(report.truncated, [])
+        self.assertEqual(report.total, count_tokens(prompt.render()))
+
+    def test_cuts_follow_priority(self):
+        # 71 tokens: similar (drop_priority 0), then history items (priority 1), then
+        # the empty history section, then idea (3); system is required
+        for budget, dropped in [
+            (60, {'similar': 'all', 'history': 1}),
+            (21, {'similar': 'all', 'history': 4}),
+            (20, {'similar': 'all', 'history': 'all'}),
+            (10, {'idea': 'all', 'similar': 'all', 'history': 'all'}),
+        ]:
+            with self.subTest(budget=budget):
+                prompt = self.build(budget)
+                report = prompt.fit()
+                self.assertEqual(report.dropped, dropped)
+                self.assertLessEqual(report.total, budget)
+                self.assertEqual(report.total, count_tokens(prompt.render()))
+
+    def test_drop_from_first_keeps_the_latest_items(self):
+        prompt = PromptBudget(25)
+        prompt.add('history', items=[f'message {i} is here, padded to forty chars\n'[:40] for i in range(4)],
+                   drop_from='first')
+        prompt.fit()
+        self.assertEqual([item.split()[1] for item in prompt.sections[0].items], ['2', '3'])
+
+    def test_required_sections_are_never_dropped(self):
+        prompt = PromptBudget(5)
+        prompt.add('system', 'S' * 40, required=True)
+        prompt.add('rules', items=[self.LINE, self.LINE], required=True)
+        prompt.add('extra', items=[self.LINE], priority=9)
+        report = prompt.fit()
+        self.assertEqual(report.dropped, {'extra': 'all'})
+        self.assertEqual(len(prompt.sections[1].items), 2)
+        self.assertTrue(report.over_budget)
+
+    def test_truncation_brings_the_total_under_budget(self):
+        prompt = PromptBudget(100)
+        prompt.add('system', 'S' * 40, required=True)
+        idea = prompt.add('idea', items=['توضیحات ایده ' * 200], required=True, truncate=True)
+        report = prompt.fit()
+        self.assertEqual(report.truncated, ['idea'])
+        self.assertFalse(report.over_budget)
+        self.assertLessEqual(count_tokens(prompt.render()), 100)
+        self.assertTrue(idea.items[0].endswith(TRUNCATION_MARK))
+
+    def test_fit_leaves_shared_sections_untouched(self):
+        cached = PromptBudget(0).add('history', items=[self.LINE] * 4)
+        prompt = PromptBudget(15)
+        prompt.extend([cached.copy()])
+        prompt.fit()
+        self.assertEqual(len(cached.items), 4)
+        self.assertEqual(cached.tokens, 40)
+
+
+def make_idea(username='owner', **fields):
+    user = get_user_model().objects.create_user(
+        username=username, email=f'{username}@example.com', password='pass1234'
+    )
+    fields.setdefault('title', 'اپ رزرو نوبت')
+    fields.setdefault('description', 'توضیحات ایده')
+    return Idea.objects.create(user=user, **fields)
+
+
+class ScoringJobTests(TestCase):
+    """صف امتیازدهی: ثبت کار در view، برداشتن و اجرای آن در worker"""
+
+    def setUp(self):
+        self.idea = make_idea()
+        self.user = self.idea.user
+
+    def test_ai_score_queues_a_job(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post(f'/api/ideas/{self.idea.pk}/ai_score/', {}, format='json')
+
+        self.assertEqual(response.status_code, 202)
+        job = ScoringJob.objects.get(idea=self.idea)
+        self.assertEqual(response.data['job_id'], job.pk)
+        self.assertEqual(response.data['status'], ScoringJob.Status.PENDING)
+        self.assertEqual(response.data['status_url'], f'/api/scoring/jobs/{job.pk}/')
+        self.assertFalse(job.bypass_cache)
+
+        # A second request while the job is queued returns the same job
+        response = client.post(f'/api/ideas/{self.idea.pk}/ai_score/', {'refresh': True}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['job_id'], job.pk)
+        self.assertEqual(ScoringJob.objects.filter(idea=self.idea).count(), 1)
+
+        status_response = client.get(response.data['status_url'])
+        self.assertEqual(status_response.status_code, 200)
+
+    def test_enqueue_returns_the_active_job(self):
+        job, created = enqueue_scoring(self.idea, self.user)
+        self.assertTrue(created)
+        self.assertEqual(enqueue_scoring(self.idea, self.user), (job, False))
+
+        job.status = ScoringJob.Status.DONE
+        job.save(update_fields=['status'])
+        new_job, created = enqueue_scoring(self.idea, self.user, bypass_cache=True)
+        self.assertTrue(created)
+        self.assertNotEqual(new_job.pk, job.pk)
+        self.assertTrue(new_job.bypass_cache)
+
+    def test_enqueue_race_returns_the_winning_job(self):
+        winner = ScoringJob.objects.create(idea=self.idea, user=self.user)
+        real_first = QuerySet.first
+        checks = []
+
+        def racing_first(queryset):
+            if queryset.model is not ScoringJob:
+                return real_first(queryset)
+            # The first check runs before the concurrent request commits its job
+            checks.append(queryset)
+            return None if len(checks) == 1 else real_first(queryset)
+
+        with mock.patch.object(QuerySet, 'first', racing_first):
+            job, created = enqueue_scoring(self.idea, self.user)
+
+        self.assertEqual((job, created), (winner, False))
+        self.assertEqual(len(checks), 2)
+        self.assertEqual(ScoringJob.objects.filter(idea=self.idea).count(), 1)
+
+    def test_claim_order_and_stale_jobs(self):
+        other = make_idea('second')
+        free_job = ScoringJob.objects.create(idea=self.idea, user=self.user)
+        paid_job = ScoringJob.objects.create(idea=other, user=other.user, priority=1)
+
+        claimed = claim_next_job()
+        self.assertEqual(claimed, paid_job)
+        self.assertEqual((claimed.status, claimed.attempts), (ScoringJob.Status.RUNNING, 1))
+        self.assertEqual(claim_next_job(), free_job)
+        # Both are running on live workers
+        self.assertIsNone(claim_next_job())
+
+        # A worker died: its job is picked up again once it is older than the stale timeout
+        ScoringJob.objects.filter(pk=free_job.pk).update(
+            started_at=timezone.now() - STALE_JOB_TIMEOUT - timedelta(seconds=1)
+        )
+        reclaimed = claim_next_job()
+        self.assertEqual(reclaimed, free_job)
+        self.assertEqual(reclaimed.attempts, 2)
+        self.assertIsNone(claim_next_job())
+
+    def test_exhausted_stale_jobs_fail(self):
+        job = ScoringJob.objects.create(
+            idea=self.idea, user=self.user, status=ScoringJob.Status.RUNNING,
+            attempts=ScoringJob.MAX_ATTEMPTS,
+            started_at=timezone.now() - STALE_JOB_TIMEOUT - timedelta(seconds=1),
+        )
+        self.assertIsNone(claim_next_job())
+        self.assertEqual(fail_exhausted_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (ScoringJob.Status.FAILED, 'Worker timed out'))
+
+    def test_run_job_records_failures(self):
+        ScoringJob.objects.create(idea=self.idea, user=self.user)
+        job = claim_next_job()
+
+        with mock.patch('scoring.jobs.ScoringService.score_idea', side_effect=RuntimeError('boom')):
+            with self.assertLogs('scoring.jobs', 'ERROR'):
+                run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ScoringJob.Status.FAILED)
+        self.assertEqual(job.error, 'Analysis failed: boom')
+        self.assertIsNotNone(job.finished_at)
+
+        other = make_idea('second')
+        ScoringJob.objects.create(idea=other, user=other.user)
+        job = claim_next_job()
+        with mock.patch('scoring.jobs.ScoringService.score_idea', return_value=(False, {'error': 'LLM down'})):
+            run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error, job.cache_hit), (ScoringJob.Status.FAILED, 'LLM down', False))
+
+    def test_run_job_records_results(self):
+        ScoringJob.objects.create(idea=self.idea, user=self.user)
+        job = claim_next_job()
+        payload = {'score': 0, 'cached': True, 'prescreened': 'too_short'}
+
+        with mock.patch('scoring.jobs.ScoringService.score_idea', return_value=(True, payload)) as score_idea:
+            run_job(job)
+
+        self.assertEqual(score_idea.call_args.kwargs['use_cache'], True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ScoringJob.Status.DONE)
+        self.assertEqual(job.result, payload)
+        self.assertTrue(job.cache_hit)
+        self.assertEqual((job.error, job.prescreen_reason), ('', 'too_short'))
+
+
+def add_messages(session, count, start=0):
+    """پیام‌های متناوب کاربر/مشاور با فاصله زمانی یک ثانیه (ترتیب created_at قطعی)"""
+    base = timezone.now() - timedelta(hours=1)
+    messages = ChatMessage.objects.bulk_create([
+        ChatMessage(session=session, role='user' if i % 2 == 0 else 'assistant', content=f'پیام {i}')
+        for i in range(start, start + count)
+    ])
+    for i, message in zip(range(start, start + count), messages):
+        ChatMessage.objects.filter(pk=message.pk).update(created_at=base + timedelta(seconds=i))
+    return list(session.messages.order_by('created_at'))
+
+
+def llm_reply(content):
+    return LLMResponse({'choices': [{'message': {'content': content}}]}, 200, latency_ms=0, attempts=1)
+
+
+class ChatSummaryTests(TestCase):
+    """خلاصه غلتان جلسه‌های چت (scoring/chat_summary.py)"""
+
+    def setUp(self):
+        self.idea = make_idea()
+        self.session = ChatSession.objects.create(idea=self.idea)
+        self.client = mock.Mock(is_configured=True)
+        self.client.chat_completion.return_value = llm_reply(' خلاصه جدید ')
+        self.summarizer = chat_summary.ChatSummarizer(client=self.client)
+
+    def test_load_history_marks_a_full_window(self):
+        window = chat_summary.CHAT_HISTORY_WINDOW
+        add_messages(self.session, window - 1)
+        history = chat_summary.load_history(self.session)
+        self.assertEqual(len(history), window - 1)
+        self.assertFalse(ChatSession.objects.get(pk=self.session.pk).summary_pending)
+
+        add_messages(self.session, 3, start=window - 1)
+        history = chat_summary.load_history(self.session)
+        # Only the latest window, oldest first
+        self.assertEqual([m['content'] for m in history], [f'پیام {i}' for i in range(2, window + 2)])
+        self.assertTrue(self.session.summary_pending)
+        self.assertTrue(ChatSession.objects.get(pk=self.session.pk).summary_pending)
+
+    def test_load_history_skips_summarized_messages(self):
+        messages = add_messages(self.session, 10)
+        self.session.summarized_until = messages[5].created_at
+        self.assertEqual([m['content'] for m in chat_summary.load_history(self.session)],
+                         [f'پیام {i}' for i in range(6, 10)])
+
+    def test_summarize_folds_all_but_the_latest_messages(self):
+        keep = chat_summary.CHAT_SUMMARY_KEEP
+        messages = add_messages(self.session, keep + 12)
+        self.session.summary_pending = True
+        self.session.save(update_fields=['summary_pending'])
+
+        self.assertEqual(self.summarizer.summarize(self.session), 12)
+
+        prompt = self.client.chat_completion.call_args.kwargs['messages'][1]['content']
+        self.assertIn('پیام 11', prompt)
+        self.assertNotIn('پیام 12', prompt)
+        session = ChatSession.objects.get(pk=self.session.pk)
+        self.assertEqual(session.summary, 'خلاصه جدید')
+        self.assertEqual(session.summarized_until, messages[11].created_at)
+        self.assertEqual(session.summarized_count, 12)
+        self.assertFalse(session.summary_pending)
+
+    def test_summarize_drops_a_concurrent_result(self):
+        add_messages(self.session, chat_summary.CHAT_SUMMARY_KEEP + 4)
+        stale = ChatSession.objects.get(pk=self.session.pk)
+        ChatSession.objects.filter(pk=self.session.pk).update(summarized_until=timezone.now(), summary='قبلی')
+
+        self.assertEqual(self.summarizer.summarize(stale), 0)
+        self.assertEqual(ChatSession.objects.get(pk=self.session.pk).summary, 'قبلی')
+
+    def test_summarize_with_nothing_to_fold_clears_the_flag(self):
+        add_messages(self.session, chat_summary.CHAT_SUMMARY_KEEP)
+        ChatSession.objects.filter(pk=self.session.pk).update(summary_pending=True)
+
+        self.assertEqual(self.summarizer.summarize(self.session), 0)
+        self.client.chat_completion.assert_not_called()
+        self.assertFalse(ChatSession.objects.get(pk=self.session.pk).summary_pending)
+
+    def pending_sessions(self, count):
+        sessions = [self.session] + [ChatSession.objects.create(idea=self.idea) for _ in range(count - 1)]
+        for session in sessions:
+            add_messages(session, chat_summary.CHAT_SUMMARY_KEEP + 2)
+        ChatSession.objects.filter(pk__in=[s.pk for s in sessions]).update(summary_pending=True)
+        return sessions
+
+    def still_pending(self, sessions):
+        return set(ChatSession.objects.filter(pk__in=[s.pk for s in sessions], summary_pending=True)
+                   .values_list('pk', flat=True))
+
+    def test_run_pending_survives_failing_sessions(self):
+        sessions = broken, flaky, healthy = self.pending_sessions(3)
+        self.client.chat_completion.side_effect = [
+            RuntimeError('bad payload'), LLMError('rate limited'), llm_reply('خلاصه'),
+        ]
+
+        with self.assertLogs('scoring.chat_summary', 'WARNING') as logs:
+            self.assertEqual(self.summarizer.run_pending(), 1)
+
+        self.assertIn(f'session {broken.pk} crashed', logs.output[0])
+        self.assertIn('rate limited', logs.output[1])
+        self.assertEqual(self.still_pending(sessions), {broken.pk, flaky.pk})
+
+    def test_run_pending_goes_round_the_queue(self):
+        sessions = broken, other = self.pending_sessions(2)
+        # The first session keeps failing; with one session per run the second still gets its turn
+        self.client.chat_completion.side_effect = RuntimeError('bad payload')
+        with self.assertLogs('scoring.chat_summary', 'ERROR'):
+            self.assertEqual(self.summarizer.run_pending(limit=1), 0)
+
+        self.client.chat_completion.side_effect = None
+        self.assertEqual(self.summarizer.run_pending(limit=1), 1)
+        self.assertEqual(self.still_pending(sessions), {broken.pk})
+
+        # Back at the start of the queue
+        self.assertEqual(self.summarizer.run_pending(limit=1), 1)
+        self.assertEqual(self.still_pending(sessions), set())
+
+
+class BrokenStreamClient:
+    """stream که بعد از چند تکه با خطای غیرشبکه‌ای قطع می‌شود"""
+
+    is_configured = True
+
+    def stream_chat_completion(self, messages, **params):
+        yield 'سلام، '
+        raise ValueError('malformed chunk')
+
+    async def astream_chat_completion(self, messages, **params):
+        yield 'سلام، '
+        raise ValueError('malformed chunk')
+
+
+class ChatAdvisorStreamTests(TestCase):
+    """خطای غیرمنتظره وسط stream باید به رویداد error تبدیل شود، نه خطای پاسخ"""
+
+    def setUp(self):
+        self.idea = make_idea()
+        self.advisor = ChatAdvisor(client=BrokenStreamClient())
+
+    def assert_error_after_delta(self, events):
+        self.assertEqual(events[0], ('delta', 'سلام،'))
+        kind, payload = events[-1]
+        self.assertEqual(kind, 'error')
+        self.assertEqual(payload['error'], 'malformed chunk')
+        self.assertEqual(len(events), 2)
+
+    def test_stream_chat(self):
+        self.assert_error_after_delta(list(self.advisor.stream_chat(self.idea, [], 'سلام')))
+
+    def test_astream_chat(self):
+        async def collect():
+            return [event async for event in self.advisor.astream_chat(self.idea, [], 'سلام')]
+
+        # run_sync hands the connection back after each phase, which would end the test transaction
+        with mock.patch('IdeaFlow.async_views.close_old_connections'):
+            self.assert_error_after_delta(async_to_sync(collect)())
+
+
+def provider_response(status_code=200, **headers):
+    """پاسخ HTTP با هدرهای x-ratelimit-* (requests_remaining=... -> x-ratelimit-remaining-requests)"""
+    names = {}
+    for name, value in headers.items():
+        if name == 'retry_after':
+            names['Retry-After'] = value
+        else:
+            dimension, kind = name.rsplit('_', 1)
+            names[f'x-ratelimit-{kind}-{dimension}'] = str(value)
+    return SimpleNamespace(status_code=status_code, headers=names)
+
+
+QUOTA_HEADERS = dict(
+    requests_limit=100, requests_remaining=50, requests_reset='2m59.56s',
+    tokens_limit=10000, tokens_remaining=4000, tokens_reset='7.66s',
+)
+
+
+class ProviderQuotaTests(SimpleTestCase):
+    """سهمیه مشترک provider از هدرهای x-ratelimit-* و رزرو با سهم پلن‌های پولی"""
+
+    def setUp(self):
+        cache.clear()
+        self.quota = ProviderQuota()
+
+    def remaining(self, dimension):
+        return cache.get(f'llm:quota:{dimension}')
+
+    def test_parse_duration(self):
+        self.assertAlmostEqual(parse_duration('2m59.56s'), 179.56)
+        self.assertAlmostEqual(parse_duration('7.66s'), 7.66)
+        self.assertAlmostEqual(parse_duration('120ms'), 0.12)
+        self.assertEqual(parse_duration('1h'), 3600)
+        self.assertEqual(parse_duration('3'), 3)
+        self.assertIsNone(parse_duration(''))
+        self.assertIsNone(parse_duration('soon'))
+
+    def test_observe_headers(self):
+        self.quota.observe(provider_response(**QUOTA_HEADERS))
+
+        self.assertEqual((self.remaining('requests'), self.remaining('tokens')), (50, 4000))
+        limits = cache.get('llm:quota:limits')
+        self.assertEqual((limits['requests'], limits['tokens']), (100, 10000))
+        self.assertAlmostEqual(limits['tokens_reset_at'] - time.time(), 7.66, delta=1)
+
+    def test_observe_ignores_missing_or_garbled_headers(self):
+        self.quota.observe(provider_response(requests_remaining='many', requests_reset='1m', tokens_remaining=10))
+        self.assertIsNone(self.remaining('requests'))
+        self.assertIsNone(self.remaining('tokens'))
+        self.assertIsNone(self.quota.try_reserve(500, PRIORITY_FREE))
+
+    def test_unobserved_quota_is_not_enforced(self):
+        self.assertIsNone(self.quota.try_reserve(10 ** 6, PRIORITY_FREE))
+
+    def test_reserve_takes_from_both_dimensions(self):
+        self.quota.observe(provider_response(**QUOTA_HEADERS))
+        self.assertIsNone(self.quota.try_reserve(1000, PRIORITY_FREE))
+        self.assertEqual((self.remaining('requests'), self.remaining('tokens')), (49, 3000))
+
+    def test_free_calls_leave_the_paid_reserve(self):
+        self.quota.observe(provider_response(**QUOTA_HEADERS))
+        floor = int(10000 * PAID_RESERVE)
+
+        # Would leave fewer tokens than the paid reserve: refused and fully rolled back
+        retry_in = self.quota.try_reserve(4000 - floor + 1, PRIORITY_FREE)
+        self.assertAlmostEqual(retry_in, 7.66, delta=1)
+        self.assertEqual((self.remaining('requests'), self.remaining('tokens')), (50, 4000))
+
+        self.assertIsNone(self.quota.try_reserve(4000 - floor, PRIORITY_FREE))
+        self.assertIsNotNone(self.quota.try_reserve(1, PRIORITY_FREE))
+        # Paid calls may use the reserve
+        self.assertIsNone(self.quota.try_reserve(floor, PRIORITY_PAID))
+        self.assertEqual(self.remaining('tokens'), 0)
+
+    def test_prompt_larger_than_the_window(self):
+        self.quota.observe(provider_response(**dict(QUOTA_HEADERS, tokens_remaining=10000)))
+        self.assertIsNone(self.quota.try_reserve(50000, PRIORITY_PAID))
+        self.assertEqual(self.remaining('tokens'), 0)
+
+    def test_rate_limited_response_pauses_everyone(self):
+        self.quota.observe(provider_response(**QUOTA_HEADERS))
+        with self.assertLogs('scoring.llm_dispatch', 'WARNING'):
+            self.quota.observe(provider_response(429, retry_after='2'))
+
+        self.assertAlmostEqual(self.quota.try_reserve(1, PRIORITY_PAID), 2, delta=0.5)
+        self.assertEqual(self.remaining('requests'), 50)
+
+
+class LLMDispatcherTests(SimpleTestCase):
+    """صف فراخوانی‌ها تا آزاد شدن سهمیه و خطای 429 بعد از max_wait"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = SimpleNamespace(response_hooks=[], is_configured=True, model='test-model')
+        self.dispatcher = LLMDispatcher(client=self.client)
+        self.observe = self.client.response_hooks[0]
+
+    def test_hook_is_registered(self):
+        self.observe(provider_response(**QUOTA_HEADERS))
+        self.assertEqual(cache.get('llm:quota:requests'), 50)
+
+    def test_acquire_with_budget(self):
+        self.observe(provider_response(**QUOTA_HEADERS))
+        self.assertLess(self.dispatcher.acquire(100, PRIORITY_FREE, max_wait=1), 0.1)
+        self.assertEqual(cache.get('llm:quota:tokens'), 3900)
+
+    def test_acquire_waits_for_a_pause(self):
+        with self.assertLogs('scoring.llm_dispatch', 'WARNING'):
+            self.observe(provider_response(429, retry_after='300ms'))
+        waited = self.dispatcher.acquire(100, PRIORITY_FREE, max_wait=2)
+        self.assertGreaterEqual(waited, 0.3)
+
+    def test_acquire_times_out(self):
+        self.observe(provider_response(**dict(QUOTA_HEADERS, tokens_remaining=100)))
+        started = time.monotonic()
+        with self.assertRaises(LLMError) as raised:
+            self.dispatcher.acquire(500, PRIORITY_FREE, max_wait=0.2)
+        self.assertEqual(raised.exception.status_code, 429)
+        self.assertLess(time.monotonic() - started, 1)
+        # The paid tier still gets through
+        self.assertLess(self.dispatcher.acquire(100, PRIORITY_PAID, max_wait=0.2), 0.1)
+
+    def test_aacquire(self):
+        self.observe(provider_response(**dict(QUOTA_HEADERS, tokens_remaining=100)))
+        with self.assertRaises(LLMError) as raised:
+            async_to_sync(self.dispatcher.aacquire)(500, PRIORITY_FREE, max_wait=0.2)
+        self.assertEqual(raised.exception.status_code, 429)
+        self.assertLess(async_to_sync(self.dispatcher.aacquire)(100, PRIORITY_PAID, max_wait=0.2), 0.1)
+
+
+SCORED_IDEA = dict(
+    title='اپ رزرو نوبت آرایشگاه',
+    description=(
+        'مشتری‌ها برای گرفتن نوبت آرایشگاه باید تلفن بزنند و منتظر بمانند. '
+        'این اپ نوبت‌های خالی آرایشگاه‌های محله را نشان می‌دهد و رزرو آنلاین را ممکن می‌کند. '
+        'درآمد از کارمزد هر رزرو و اشتراک ماهانه آرایشگاه‌ها است.'
+    ),
+    category='خدمات',
+    budget='۲۰۰ میلیون تومان',
+    execution_steps='MVP در سه ماه',
+    required_skills='برنامه‌نویسی موبایل',
+    blocks=[{'type': 'checklist', 'name': 'کارها', 'value': [{'text': 'مصاحبه با آرایشگاه‌ها', 'done': False}]}],
+    changes='+ اشتراک ماهانه',
+    previous_score=55.0,
+)
+
+
+class AnalysisCacheTests(TestCase):
+    """کلید کش باید به همه ورودی‌های پرامپت وابسته باشد؛ انقضا و حذف LRU"""
+
+    def setUp(self):
+        self.client = mock.Mock(is_configured=True, model='llama-test')
+        self.client.chat_completion.return_value = llm_reply(json.dumps({'scores': {'innovation': 10}, 'total_score': 10}))
+        self.analyzer = IdeaAnalyzer(client=self.client)
+
+    def analyze(self, **changes):
+        return self.analyzer.analyze_idea(**{**SCORED_IDEA, **changes})
+
+    def test_identical_input_is_served_from_the_cache(self):
+        self.assertFalse(self.analyze()['cached'])
+        result = self.analyze()
+        self.assertTrue(result['cached'])
+        self.assertEqual(result['total_score'], 10)
+        self.assertEqual(self.client.chat_completion.call_count, 1)
+        self.assertEqual(AnalysisCacheEntry.objects.get().hit_count, 1)
+
+        # A bypassed lookup calls the model and refreshes the entry
+        self.assertFalse(self.analyzer.analyze_idea(**SCORED_IDEA, use_cache=False)['cached'])
+        self.assertEqual(self.client.chat_completion.call_count, 2)
+        self.assertEqual(AnalysisCacheEntry.objects.count(), 1)
+
+    def test_every_prompt_input_changes_the_key(self):
+        self.analyze()
+        variants = {
+            'title': 'اپ رزرو نوبت آرایشگاه زنانه',
+            'description': SCORED_IDEA['description'] + ' پرداخت هم داخل اپ انجام می‌شود.',
+            'category': 'فناوری',
+            'budget': '۳۰۰ میلیون تومان',
+            'execution_steps': 'MVP در شش ماه',
+            'required_skills': 'طراحی رابط کاربری',
+            'blocks': [{'type': 'checklist', 'name': 'کارها', 'value': [{'text': 'مصاحبه با آرایشگاه‌ها', 'done': True}]}],
+            'changes': '+ اشتراک سالانه',
+            'previous_score': 60.0,
+        }
+        for field, value in variants.items():
+            with self.subTest(field=field):
+                calls = self.client.chat_completion.call_count
+                self.assertFalse(self.analyze(**{field: value})['cached'])
+                self.assertEqual(self.client.chat_completion.call_count, calls + 1)
+        self.assertEqual(AnalysisCacheEntry.objects.count(), len(variants) + 1)
+
+    def test_model_prompt_and_params_change_the_key(self):
+        messages = [{'role': 'system', 'content': 'prompt'}, {'role': 'user', 'content': 'idea'}]
+        params = {'temperature': 0.3}
+        key = analysis_cache.AnalysisCache.make_key('model-a', messages, params)
+        self.assertEqual(analysis_cache.AnalysisCache.make_key('model-a', [dict(m) for m in messages], dict(params)), key)
+        self.assertNotEqual(analysis_cache.AnalysisCache.make_key('model-b', messages, params), key)
+        self.assertNotEqual(analysis_cache.AnalysisCache.make_key('model-a', messages, {'temperature': 0.4}), key)
+        self.assertNotEqual(analysis_cache.AnalysisCache.make_key(
+            'model-a', [{'role': 'system', 'content': 'prompt v2'}, messages[1]], params
+        ), key)
+
+        self.analyze()
+        with mock.patch.object(IdeaAnalyzer, 'SYSTEM_PROMPT', IdeaAnalyzer.SYSTEM_PROMPT + '\nنسخه ۲'):
+            self.assertFalse(self.analyze()['cached'])
+        self.client.model = 'llama-next'
+        self.assertFalse(self.analyze()['cached'])
+
+    def entry(self, name, age, last_used):
+        now = timezone.now()
+        entry = AnalysisCacheEntry.objects.create(key=name, model='m', result={'total_score': 1})
+        AnalysisCacheEntry.objects.filter(pk=entry.pk).update(created_at=now - age, last_used_at=now - last_used)
+        return name
+
+    def test_expired_entries(self):
+        ttl = analysis_cache.ANALYSIS_CACHE_TTL
+        fresh = self.entry('fresh', ttl - timedelta(hours=1), timedelta(0))
+        stale = self.entry('stale', ttl + timedelta(hours=1), timedelta(0))
+
+        self.assertEqual(analysis_cache.AnalysisCache.get(fresh), {'total_score': 1})
+        # Expiry counts from creation, however recently the entry was used
+        self.assertIsNone(analysis_cache.AnalysisCache.get(stale))
+        self.assertEqual(analysis_cache.AnalysisCache.prune(), 1)
+        self.assertEqual(list(AnalysisCacheEntry.objects.values_list('key', flat=True)), [fresh])
+
+    def test_prune_evicts_least_recently_used(self):
+        for i in range(5):
+            self.entry(f'entry-{i}', timedelta(hours=1), timedelta(minutes=i))
+
+        self.assertEqual(analysis_cache.AnalysisCache.prune(max_entries=2), 3)
+        self.assertEqual(list(AnalysisCacheEntry.objects.values_list('key', flat=True)), ['entry-0', 'entry-1'])
+        self.assertEqual(analysis_cache.AnalysisCache.prune(max_entries=2), 0)
+
+        # Reading an entry makes it recent again
+        analysis_cache.AnalysisCache.get('entry-1')
+        self.assertEqual(analysis_cache.AnalysisCache.prune(max_entries=1), 1)
+        self.assertEqual(list(AnalysisCacheEntry.objects.values_list('key', flat=True)), ['entry-1'])
+
+    def test_disabled(self):
+        with mock.patch.object(analysis_cache, 'ANALYSIS_CACHE_ENABLED', False):
+            self.analyze()
+            self.assertFalse(self.analyze()['cached'])
+        self.assertFalse(AnalysisCacheEntry.objects.exists())
+
+
+def llm_call(plan='rollup-test', endpoint='chat', model='llama', status=LLMCall.Status.OK, latency_ms=100,
+             prompt_tokens=10, completion_tokens=5, user_id=None, created_at=None):
+    return LLMCall(
+        user_id=user_id, plan=plan, endpoint=endpoint, model=model, status=status, latency_ms=latency_ms,
+        prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, created_at=created_at or timezone.now(),
+    )
+
+
+class TelemetryBufferTests(TestCase):
+    """نوشتن دسته‌ای تله‌متری: نگه داشتن دسته وقتی دیتابیس در دسترس نیست، یک تلاش دوباره برای دسته ردشده"""
+
+    def setUp(self):
+        self.buffer = TelemetryBuffer(batch_size=10, flush_interval=60, max_size=3)
+        # Pretend the writer thread is running: the tests flush by hand, inside the test transaction
+        self.buffer._thread = mock.Mock()
+        # flush() closes the connection after a failure, which would end the test transaction
+        patcher = mock.patch('scoring.telemetry.connection')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def written(self):
+        return LLMCall.objects.filter(plan='rollup-test').count()
+
+    def test_flush_writes_the_batch(self):
+        for _ in range(2):
+            self.buffer.add(llm_call())
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(self.written(), 2)
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_full_buffer_drops_new_records(self):
+        for _ in range(5):
+            self.buffer.add(llm_call())
+        with self.assertLogs('scoring.telemetry', 'WARNING') as logs:
+            self.assertEqual(self.buffer.flush(), 3)
+        self.assertIn('dropped 2 records', logs.output[0])
+
+    def test_unreachable_database_keeps_the_batch(self):
+        self.buffer.add(llm_call())
+        self.buffer.add(llm_call())
+        with mock.patch.object(LLMCall.objects, 'bulk_create', side_effect=OperationalError('server closed')):
+            with self.assertLogs('scoring.telemetry', 'ERROR'):
+                self.assertEqual(self.buffer.flush(), 0)
+
+        # Re-queued ahead of newer records, still within max_size
+        self.buffer.add(llm_call(endpoint='newer'))
+        self.buffer.add(llm_call(endpoint='dropped'))
+        with self.assertLogs('scoring.telemetry', 'WARNING'):
+            self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(sorted(LLMCall.objects.filter(plan='rollup-test').values_list('endpoint', flat=True)),
+                         ['chat', 'chat', 'newer'])
+
+    def test_rejected_batch_is_retried_without_deleted_users(self):
+        user = get_user_model().objects.create_user(username='caller', email='caller@example.com', password='x')
+        records = [llm_call(user_id=user.pk), llm_call(user_id=user.pk + 10 ** 6)]
+        for record in records:
+            self.buffer.add(record)
+
+        real_bulk_create = LLMCall.objects.bulk_create
+        attempts = []
+
+        def bulk_create(objs, **kwargs):
+            # The foreign key is checked at commit; here the first insert fails like it would there
+            attempts.append([obj.user_id for obj in objs])
+            if len(attempts) == 1:
+                raise IntegrityError('violates foreign key constraint')
+            return real_bulk_create(objs, **kwargs)
+
+        with mock.patch.object(LLMCall.objects, 'bulk_create', side_effect=bulk_create):
+            self.assertEqual(self.buffer.flush(), 2)
+
+        self.assertEqual(attempts, [[user.pk, user.pk + 10 ** 6], [user.pk, None]])
+        self.assertEqual(set(LLMCall.objects.filter(plan='rollup-test').values_list('user_id', flat=True)),
+                         {user.pk, None})
+
+    def test_batch_rejected_twice_is_dropped(self):
+        self.buffer.add(llm_call())
+        with mock.patch.object(LLMCall.objects, 'bulk_create', side_effect=IntegrityError('bad row')) as bulk_create:
+            with self.assertLogs('scoring.telemetry', 'ERROR') as logs:
+                self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(bulk_create.call_count, 2)
+        self.assertIn('Dropped 1', logs.output[0])
+        # Not re-queued: the next flush has nothing to write
+        self.assertEqual(self.buffer.flush(), 0)
+
+
+class LLMUsageRollupTests(TestCase):
+    """تجمیع روزانه با GROUPING SETS: سطر هر (اندپوینت، مدل) و جمع کل هر پلن"""
+
+    def rows(self):
+        return {
+            (row.endpoint, row.model): row
+            for row in LLMUsageDaily.objects.filter(plan='rollup-test', date=timezone.localdate())
+        }
+
+    def test_rollup(self):
+        LLMCall.objects.bulk_create([
+            llm_call(latency_ms=100),
+            llm_call(latency_ms=200),
+            llm_call(latency_ms=300),
+            llm_call(status=LLMCall.Status.ERROR, latency_ms=5000),
+            llm_call(endpoint='ai_score', latency_ms=1000, prompt_tokens=1000, completion_tokens=300),
+            llm_call(endpoint='ai_score', model='llama-big', status=LLMCall.Status.RATE_LIMITED, latency_ms=0),
+            llm_call(plan='other-plan'),
+            # Outside the recomputed days
+            llm_call(created_at=timezone.now() - timedelta(days=5)),
+        ])
+
+        LLMUsageRollup.run()
+        rows = self.rows()
+        self.assertEqual(set(rows), {('chat', 'llama'), ('ai_score', 'llama'), ('ai_score', 'llama-big'),
+                                     (LLMUsageDaily.ALL, LLMUsageDaily.ALL)})
+
+        chat = rows['chat', 'llama']
+        self.assertEqual((chat.calls, chat.errors, chat.rate_limited), (4, 1, 0))
+        # Latency percentiles only over successful calls
+        self.assertEqual((chat.latency_p50_ms, chat.latency_p95_ms, chat.latency_max_ms), (200, 290, 300))
+        self.assertEqual((chat.prompt_tokens, chat.completion_tokens), (40, 20))
+
+        total = rows[LLMUsageDaily.ALL, LLMUsageDaily.ALL]
+        self.assertEqual((total.calls, total.errors, total.rate_limited), (6, 1, 1))
+        self.assertEqual((total.prompt_tokens, total.completion_tokens), (1050, 325))
+        self.assertEqual(total.latency_max_ms, 1000)
+        self.assertEqual(rows['ai_score', 'llama-big'].latency_p50_ms, 0)
+
+        # Re-running updates the same rows
+        LLMCall.objects.bulk_create([llm_call(latency_ms=400)])
+        LLMUsageRollup.run()
+        rows = self.rows()
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows['chat', 'llama'].calls, 5)
+        self.assertEqual(rows[LLMUsageDaily.ALL, LLMUsageDaily.ALL].calls, 7)
+
+    def test_prune_keeps_days_still_rolled_up(self):
+        LLMCall.objects.bulk_create([
+            llm_call(created_at=timezone.now() - timedelta(days=1)),
+            llm_call(created_at=timezone.now() - timedelta(days=400)),
+        ])
+        self.assertEqual(LLMUsageRollup.prune(), 1)
+        self.assertEqual(LLMCall.objects.filter(plan='rollup-test').count(), 1)
+
+
+class ContextCacheTests(TestCase):
+    """کش context ایده با کلید (id, updated_at): هر ویرایش ایده یا فیلدهای سفارشی آن را باطل می‌کند"""
+
+    def setUp(self):
+        cache.clear()
+        self.idea = make_idea('context-owner', budget='۵۰ میلیون تومان')
+        self.context_cache = IdeaContextCache(max_entries=2)
+        self.build = mock.Mock(wraps=ChatAdvisor().idea_context_sections)
+
+    def render(self, idea=None):
+        idea = Idea.objects.get(pk=(idea or self.idea).pk)
+        prompt = PromptBudget(budget=None)
+        return prompt.render(prompt.extend(self.context_cache.sections(idea, self.build)))
+
+    def test_repeat_lookups_build_once(self):
+        idea = Idea.objects.get(pk=self.idea.pk)
+        first = self.context_cache.sections(idea, self.build)
+        second = self.context_cache.sections(idea, self.build)
+        self.assertEqual(self.build.call_count, 1)
+        # Every prompt gets its own copies
+        self.assertEqual([section.name for section in first], [section.name for section in second])
+        self.assertIsNot(first[0], second[0])
+
+        # A worker with an empty LRU reads the shared cache
+        self.context_cache.clear()
+        self.context_cache.sections(idea, self.build)
+        self.assertEqual(self.build.call_count, 1)
+
+    def test_idea_edit_invalidates(self):
+        self.assertIn('۵۰ میلیون تومان', self.render())
+        self.idea.budget = '۸۰ میلیون تومان'
+        self.idea.save()
+
+        context = self.render()
+        self.assertEqual(self.build.call_count, 2)
+        self.assertIn('۸۰ میلیون تومان', context)
+        self.assertNotIn('۵۰ میلیون تومان', context)
+
+    def test_custom_field_edit_invalidates(self):
+        self.render()
+        field = IdeaCustomField.objects.create(idea=self.idea, name='کانال فروش', value='اینستاگرام')
+        self.assertIn('اینستاگرام', self.render())
+
+        field.value = 'وب‌سایت'
+        field.save()
+        context = self.render()
+        self.assertIn('وب‌سایت', context)
+        self.assertNotIn('اینستاگرام', context)
+
+        field.delete()
+        self.assertNotIn('کانال فروش', self.render())
+        self.assertEqual(self.build.call_count, 4)
+
+    def test_advisor_action_invalidates(self):
+        self.render()
+        result = apply_actions(self.idea, [UPDATE_BUDGET])
+        self.assertTrue(result['success'])
+        self.assertIn(UPDATE_BUDGET['value'], self.render())
+        self.assertEqual(self.build.call_count, 2)
+
+    def test_lru_evicts_the_oldest_entry(self):
+        ideas = [self.idea, make_idea('context-second'), make_idea('context-third')]
+        for idea in ideas:
+            self.render(idea)
+        self.assertEqual(len(self.context_cache._entries), 2)
+        self.assertNotIn(self.context_cache.key(Idea.objects.get(pk=self.idea.pk)), self.context_cache._entries)
+
+        # The evicted entry is still in the shared cache
+        self.render(self.idea)
+        self.assertEqual(self.build.call_count, 3)
+
+
+CHECKLIST_BLOCK = {'type': 'checklist', 'name': 'کارها', 'value': [{'text': 'مصاحبه با مشتری', 'done': True}]}
+
+
+class IdeaActionsTests(TestCase):
+    """اکشن‌های مشاور: همه یا هیچ‌کدام، فقط فیلدهای مجاز و تغییر بلوک‌ها با عبارت‌های jsonb"""
+
+    def setUp(self):
+        self.idea = make_idea('actions-owner', budget='۵۰ میلیون تومان', ai_score=70,
+                              blocks=[copy.deepcopy(CHECKLIST_BLOCK)])
+
+    def stored(self):
+        return Idea.objects.get(pk=self.idea.pk)
+
+    def test_failed_action_rolls_back_the_batch(self):
+        before = self.stored()
+        result = apply_actions(self.idea, [
+            UPDATE_BUDGET,
+            {'action': 'add_checklist_item', 'block_index': 0, 'item': {'text': 'ساخت MVP', 'done': False}},
+            {'action': 'update_block', 'block_index': 5, 'value': 50},
+        ])
+        self.assertEqual(result, {'success': False, 'message': 'اکشن نامعتبر'})
+
+        idea = self.stored()
+        self.assertEqual(idea.budget, '۵۰ میلیون تومان')
+        self.assertEqual(idea.blocks, [CHECKLIST_BLOCK])
+        self.assertEqual(idea.updated_at, before.updated_at)
+
+    def test_invalid_value_names_the_field(self):
+        result = apply_actions(self.idea, [
+            UPDATE_BUDGET,
+            {'action': 'update_field', 'field': 'visibility', 'value': 'secret'},
+        ])
+        self.assertFalse(result['success'])
+        self.assertIn('visibility', result['message'])
+        self.assertEqual(self.stored().budget, '۵۰ میلیون تومان')
+
+    def test_only_editable_fields(self):
+        for field, value in [('ai_score', 100), ('user', 1), ('edit_count', 0), ('last_scored_description', '')]:
+            with self.subTest(field=field):
+                result = apply_actions(self.idea, [{'action': 'update_field', 'field': field, 'value': value}])
+                self.assertFalse(result['success'])
+
+        # In a batch_update the others are applied and the rejected ones skipped
+        result = apply_actions(self.idea, [{'action': 'batch_update', 'updates': [
+            {'field': 'ai_score', 'value': 100},
+            {'field': 'required_skills', 'value': 'برنامه‌نویسی موبایل'},
+        ]}])
+        self.assertEqual(result, {'success': True, 'message': '1 تغییر اعمال شد'})
+        idea = self.stored()
+        self.assertEqual(idea.ai_score, 70)
+        self.assertEqual(idea.required_skills, 'برنامه‌نویسی موبایل')
+
+    def test_block_changes_are_jsonb_updates(self):
+        actions = [
+            {'action': 'add_checklist_item', 'block_index': 0, 'item': {'text': 'ساخت MVP', 'done': False}},
+            {'action': 'add_block', 'block': {'type': 'node_graph', 'name': 'نقشه'}},
+            {'action': 'add_graph_node', 'block_index': 1, 'node': {'id': 1, 'label': 'مشتری'}},
+            {'action': 'add_graph_edge', 'block_index': 1, 'edge': {'from': 1, 'to': 1}},
+            {'action': 'update_field', 'field': 'tags', 'value': 'سلامت, رزرو'},
+            UPDATE_BUDGET,
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            result = apply_actions(self.idea, actions)
+        self.assertTrue(result['success'], result['message'])
+
+        update = next(query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE'))
+        self.assertIn('jsonb_insert', update)
+        self.assertIn('jsonb_set', update)
+        self.assertIn('||', update)
+        # Only the changed columns are written
+        self.assertNotIn('"description"', update)
+
+        self.assertEqual(self.stored().blocks, [
+            {**CHECKLIST_BLOCK, 'value': CHECKLIST_BLOCK['value'] + [{'text': 'ساخت MVP', 'done': False}]},
+            {'type': 'node_graph', 'name': 'نقشه',
+             'value': {'nodes': [{'id': 1, 'label': 'مشتری'}], 'edges': [{'from': 1, 'to': 1}]}},
+            {'type': 'tags', 'name': 'برچسب‌ها',
+             'value': [{'text': 'سلامت', 'colorIndex': 0}, {'text': 'رزرو', 'colorIndex': 1}]},
+        ])
+        self.assertEqual(self.stored().budget, UPDATE_BUDGET['value'])
+
+    def test_edits_apply_to_the_stored_blocks(self):
+        # The caller's copy is stale: another request added a block since it was loaded
+        progress = {'type': 'progress', 'name': 'پیشرفت', 'value': 10}
+        Idea.objects.filter(pk=self.idea.pk).update(blocks=[CHECKLIST_BLOCK, progress])
+        result = apply_actions(self.idea, [{'action': 'update_block', 'block_index': 1, 'value': 40}])
+        self.assertTrue(result['success'])
+        self.assertEqual(self.stored().blocks[1]['value'], 40)
+        self.assertEqual(self.stored().blocks[0], CHECKLIST_BLOCK)
+
+    def test_database_error_is_not_shown(self):
+        with mock.patch.object(Idea, 'save', side_effect=OperationalError('deadlock detected')), \
+                self.assertLogs('scoring.idea_actions', 'ERROR'):
+            result = apply_actions(self.idea, [UPDATE_BUDGET])
+        self.assertFalse(result['success'])
+        self.assertNotIn('deadlock', result['message'])
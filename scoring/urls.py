@@ -12,5 +12,6 @@ urlpatterns = [
     path('my/', views.MyScoreView.as_view(), name='my_score'),
     path('leaderboard/', views.LeaderboardView.as_view(), name='leaderboard'),
     path('logs/', views.MyScoreLogsView.as_view(), name='score_logs'),
+    path('jobs/<int:pk>/', views.ScoringJobDetailView.as_view(), name='scoring_job'),
     path('update-ranks/', views.UpdateRanksView.as_view(), name='update_ranks'),
 ]
@@ -2,16 +2,18 @@
 Scoring Views - ویوهای امتیازدهی
 """
 
-from rest_framework import generics
+from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 
-from .models import UserScore, ScoreLog
+from .models import UserScore, ScoreLog, ScoringJob
+from .ranking import recompute_ranks
 from .serializers import (
     UserScoreSerializer,
     LeaderboardSerializer,
     ScoreLogSerializer,
+    ScoringJobSerializer,
 )
 
 
@@ -57,20 +59,32 @@ class MyScoreLogsView(generics.ListAPIView):
         return ScoreLog.objects.filter(user=self.request.user)[:20]
 
 
-class UpdateRanksView(APIView):
+class ScoringJobDetailView(generics.RetrieveAPIView):
     """
-    بروزرسانی رتبه‌بندی کل کاربران
-    (می‌تواند با Celery به صورت دوره‌ای اجرا شود)
+    وضعیت کار امتیازدهی (برای polling از سمت کلاینت)
     """
+    serializer_class = ScoringJobSerializer
     permission_classes = [IsAuthenticated]
     
+    def get_queryset(self):
+        return ScoringJob.objects.filter(user=self.request.user)
+
+
+class UpdateRanksView(APIView):
+    """
+    بروزرسانی رتبه‌بندی کل کاربران (فقط ادمین)
+    یک دستور UPDATE با تابع پنجره‌ای؛ به صورت دوره‌ای هم توسط run_scoring_worker اجرا می‌شود
+    POST: {"method": "competition" | "dense"}
+    """
+    permission_classes = [IsAdminUser]
+    
     def post(self, request):
-        # Rank all users by total_score
-        scores = UserScore.objects.order_by('-total_score')
-        for rank, score in enumerate(scores, 1):
-            score.rank = rank
-            score.save(update_fields=['rank'])
+        try:
+            updated = recompute_ranks(request.data.get('method'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
-            'message': f'رتبه‌بندی برای {scores.count()} کاربر بروزرسانی شد.'
+            'message': f'رتبه {updated} کاربر بروزرسانی شد.',
+            'updated': updated
         })
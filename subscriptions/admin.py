@@ -4,7 +4,7 @@ from .models import SubscriptionPlan, UserSubscription, UsageLog
 
 @admin.register(SubscriptionPlan)
 class SubscriptionPlanAdmin(admin.ModelAdmin):
-    list_display = ['name', 'price', 'is_free', 'is_active', 'ideas_per_day', 'ai_chats_per_day']
+    list_display = ['name', 'price', 'is_free', 'is_active', 'ideas_per_day', 'ai_chats_per_day', 'ai_requests_per_minute']
     list_filter = ['is_active', 'is_free']
     prepopulated_fields = {'slug': ('name',)}
 
@@ -5,3 +5,6 @@ class SubscriptionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'subscriptions'
     verbose_name = 'اشتراک‌ها'
+
+    def ready(self):
+        import subscriptions.signals
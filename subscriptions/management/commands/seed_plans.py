@@ -24,6 +24,8 @@ class Command(BaseCommand):
             ai_chats_per_day=5,
             ai_scoring_attempts=3,
             custom_fields_per_idea=3,
+            ai_requests_per_minute=6,
+            write_requests_per_minute=30,
             is_active=True,
             order=1
         )
@@ -40,6 +42,8 @@ class Command(BaseCommand):
             ai_chats_per_day=50,
             ai_scoring_attempts=10,
             custom_fields_per_idea=10,
+            ai_requests_per_minute=30,
+            write_requests_per_minute=120,
             is_active=True,
             is_featured=True,
             order=2
@@ -57,6 +61,8 @@ class Command(BaseCommand):
             ai_chats_per_day=999,
             ai_scoring_attempts=999,
             custom_fields_per_idea=999,
+            ai_requests_per_minute=120,
+            write_requests_per_minute=600,
             is_active=True,
             order=3
         )
@@ -38,6 +38,8 @@ class Command(BaseCommand):
                 'ai_chats_per_day': 999999,
                 'ai_scoring_attempts': 999999,
                 'custom_fields_per_idea': 999999,
+                'ai_requests_per_minute': 600,
+                'write_requests_per_minute': 1200,
                 'is_active': True,
                 'is_featured': True,
             }
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 02:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscriptionplan',
+            name='ai_requests_per_minute',
+            field=models.PositiveIntegerField(default=6, verbose_name='درخواست AI در دقیقه'),
+        ),
+        migrations.AddField(
+            model_name='subscriptionplan',
+            name='write_requests_per_minute',
+            field=models.PositiveIntegerField(default=30, verbose_name='عملیات ثبت (ستاره، کامنت، سرمایه\u200cگذاری) در دقیقه'),
+        ),
+    ]
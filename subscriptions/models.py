@@ -37,6 +37,16 @@ class SubscriptionPlan(models.Model):
         verbose_name='تعداد فیلد سفارشی هر ایده'
     )
     
+    # محدودیت نرخ (پنجره لغزان یک‌دقیقه‌ای، مشترک بین همه اندپوینت‌های هر گروه)
+    ai_requests_per_minute = models.PositiveIntegerField(
+        default=6,
+        verbose_name='درخواست AI در دقیقه'
+    )
+    write_requests_per_minute = models.PositiveIntegerField(
+        default=30,
+        verbose_name='عملیات ثبت (ستاره، کامنت، سرمایه‌گذاری) در دقیقه'
+    )
+    
     # وضعیت
     is_active = models.BooleanField(default=True, verbose_name='فعال')
     is_featured = models.BooleanField(default=False, verbose_name='ویژه')
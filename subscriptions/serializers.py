@@ -14,7 +14,8 @@ class SubscriptionPlanSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'slug', 'description', 'price', 'is_free',
             'ideas_per_day', 'ai_chats_per_day', 'ai_scoring_attempts',
-            'custom_fields_per_idea', 'is_featured'
+            'custom_fields_per_idea', 'ai_requests_per_minute',
+            'write_requests_per_minute', 'is_featured'
         ]
 
 
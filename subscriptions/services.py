@@ -2,14 +2,23 @@
 Subscriptions Services - سرویس‌های بررسی محدودیت‌ها
 """
 
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
-from django.db.models import Sum
-from .models import SubscriptionPlan, UserSubscription, UsageLog
+from .models import SubscriptionPlan, UsageLog
+
+# All plans rarely change; invalidated by the SubscriptionPlan signals (subscriptions/signals.py)
+PLAN_CACHE_KEY = 'subscriptions:plans'
+PLAN_CACHE_TTL = 60 * 10
 
 
 class LimitService:
     """
     سرویس بررسی و مدیریت محدودیت‌های کاربر
+    - پلن‌ها از کش خوانده می‌شوند
+    - پلن کاربر و مصرف امروز در هر درخواست فقط یک بار (با یک کوئری) خوانده و روی شیء user نگه داشته می‌شود
     """
     
     # پلن پیش‌فرض رایگان
@@ -18,21 +27,92 @@ class LimitService:
         'ai_chats_per_day': 5,
         'ai_scoring_attempts': 3,
         'custom_fields_per_idea': 3,
+        'ai_requests_per_minute': 6,
+        'write_requests_per_minute': 30,
+    }
+    
+    # سقف روزانه هر نوع مصرف قابل رزرو
+    USAGE_LIMITS = {
+        UsageLog.UsageType.IDEA_CREATE: 'ideas_per_day',
+        UsageLog.UsageType.AI_CHAT: 'ai_chats_per_day',
     }
     
+    # ========== Plan cache ==========
+    
     @classmethod
-    def get_user_plan(cls, user):
-        """دریافت پلن فعال کاربر"""
-        try:
-            subscription = user.subscription
-            if subscription.is_active:
-                return subscription.plan
-        except UserSubscription.DoesNotExist:
-            pass
+    def get_plans(cls):
+        """همه پلن‌ها از کش: {'by_id': {id: plan}, 'free': پلن رایگان فعال یا None}"""
+        plans = cache.get(PLAN_CACHE_KEY)
+        if plans is None:
+            all_plans = list(SubscriptionPlan.objects.all())
+            plans = {
+                'by_id': {plan.id: plan for plan in all_plans},
+                'free': next((plan for plan in all_plans if plan.is_free and plan.is_active), None),
+            }
+            cache.set(PLAN_CACHE_KEY, plans, PLAN_CACHE_TTL)
+        return plans
+    
+    @classmethod
+    def invalidate_plans(cls):
+        cache.delete(PLAN_CACHE_KEY)
+    
+    # ========== Per-request state ==========
+    
+    @classmethod
+    def _load_state(cls, user):
+        """
+        اشتراک کاربر و مصرف امروز همه انواع، در یک کوئری
+        (request.user در هر درخواست ساخته می‌شود، پس این حافظه به همان درخواست محدود است)
+        """
+        today = timezone.now().date()
+        state = getattr(user, '_limit_state', None)
+        if state is not None and state['date'] == today:
+            return state
+        
+        usage_columns = {
+            f'usage_{usage_type}': Coalesce(Subquery(
+                UsageLog.objects.filter(
+                    user=OuterRef('pk'), usage_type=usage_type, date=today
+                ).values('count')[:1]
+            ), 0)
+            for usage_type in UsageLog.UsageType.values
+        }
+        row = type(user).objects.filter(pk=user.pk).values(
+            'subscription__plan_id', 'subscription__expires_at', **usage_columns
+        ).first() or {}
+        
+        state = {
+            'date': today,
+            'plan': cls._resolve_plan(row.get('subscription__plan_id'), row.get('subscription__expires_at')),
+            'usage': {
+                usage_type: row.get(f'usage_{usage_type}', 0)
+                for usage_type in UsageLog.UsageType.values
+            },
+        }
+        user._limit_state = state
+        return state
+    
+    @classmethod
+    def _resolve_plan(cls, plan_id, expires_at):
+        """پلن اشتراک فعال (همان منطق UserSubscription.is_active) یا پلن رایگان"""
+        plans = cls.get_plans()
+        if plan_id is not None and (expires_at is None or timezone.now() <= expires_at):
+            plan = plans['by_id'].get(plan_id)
+            if plan is None:
+                # Plan created after the cache was filled
+                cls.invalidate_plans()
+                plans = cls.get_plans()
+                plan = plans['by_id'].get(plan_id)
+            if plan is not None:
+                return plan
         
         # اگر پلن ندارد، پلن رایگان پیش‌فرض
-        free_plan = SubscriptionPlan.objects.filter(is_free=True, is_active=True).first()
-        return free_plan
+        return plans['free']
+    
+    @classmethod
+    def get_user_plan(cls, user):
+        """دریافت پلن فعال کاربر"""
+        return cls._load_state(user)['plan']
     
     @classmethod
     def get_limits(cls, user):
@@ -45,6 +125,8 @@ class LimitService:
                 'ai_chats_per_day': plan.ai_chats_per_day,
                 'ai_scoring_attempts': plan.ai_scoring_attempts,
                 'custom_fields_per_idea': plan.custom_fields_per_idea,
+                'ai_requests_per_minute': plan.ai_requests_per_minute,
+                'write_requests_per_minute': plan.write_requests_per_minute,
             }
         
         return cls.DEFAULT_LIMITS
@@ -52,32 +134,72 @@ class LimitService:
     @classmethod
     def get_today_usage(cls, user, usage_type):
         """دریافت مصرف امروز"""
-        today = timezone.now().date()
+        return cls._load_state(user)['usage'].get(usage_type, 0)
+    
+    @staticmethod
+    def _remember_usage(user, date, usage_type, count):
+        """همگام نگه داشتن حافظه همین درخواست با دیتابیس"""
+        state = getattr(user, '_limit_state', None)
+        if state is not None and state['date'] == date:
+            state['usage'][usage_type] = count
+    
+    @classmethod
+    def _upsert_usage(cls, user, usage_type, date, limit=None):
+        """
+        افزایش اتمیک شمارنده با یک دستور (بدون قفل نگه‌داشته‌شده بین بررسی و افزایش)
+        با limit: فقط اگر count < limit باشد؛ خروجی count جدید یا None اگر سقف پر است
+        """
+        table = UsageLog._meta.db_table
+        sql = f"""
+            INSERT INTO {table} (user_id, usage_type, date, count)
+            VALUES (%(user)s, %(usage_type)s, %(date)s, 1)
+            ON CONFLICT (user_id, usage_type, date)
+            DO UPDATE SET count = {table}.count + 1
+        """
+        if limit is not None:
+            sql += f" WHERE {table}.count < %(limit)s"
+        sql += " RETURNING count"
         
-        try:
-            log = UsageLog.objects.get(
-                user=user,
-                usage_type=usage_type,
-                date=today
-            )
-            return log.count
-        except UsageLog.DoesNotExist:
-            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(sql, {'user': user.pk, 'usage_type': usage_type, 'date': date, 'limit': limit})
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        cls._remember_usage(user, date, usage_type, row[0])
+        return row[0]
     
     @classmethod
     def increment_usage(cls, user, usage_type):
         """افزایش مصرف"""
-        today = timezone.now().date()
-        
-        log, created = UsageLog.objects.get_or_create(
-            user=user,
-            usage_type=usage_type,
-            date=today,
-            defaults={'count': 0}
-        )
-        log.count += 1
-        log.save()
-        return log.count
+        return cls._upsert_usage(user, usage_type, timezone.now().date())
+    
+    @classmethod
+    def reserve(cls, user, usage_type):
+        """
+        رزرو یک واحد از سهمیه امروز قبل از کار پرهزینه (مثل فراخوانی LLM)
+        بررسی و افزایش در یک دستور انجام می‌شود، پس درخواست‌های همزمان نمی‌توانند از سقف رد شوند
+        خروجی: UsageReservation یا None اگر سقف پر است
+        """
+        limit = cls.get_limits(user)[cls.USAGE_LIMITS[usage_type]]
+        date = timezone.now().date()
+        if limit <= 0 or cls._upsert_usage(user, usage_type, date, limit=limit) is None:
+            cls._remember_usage(user, date, usage_type, limit)
+            return None
+        return UsageReservation(user, usage_type, date)
+    
+    @classmethod
+    def refund(cls, user, usage_type, date):
+        """برگرداندن یک واحد رزروشده (کار پرهزینه انجام نشد)"""
+        table = UsageLog._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                UPDATE {table} SET count = GREATEST(count - 1, 0)
+                WHERE user_id = %s AND usage_type = %s AND date = %s
+                RETURNING count
+            """, [user.pk, usage_type, date])
+            row = cursor.fetchone()
+        if row is not None:
+            cls._remember_usage(user, date, usage_type, row[0])
     
     @classmethod
     def can_create_idea(cls, user):
@@ -111,5 +233,52 @@ class LimitService:
         }
 
 
+class UsageReservation:
+    """
+    یک واحد سهمیه رزروشده؛ با refund() (یا خطا داخل بلوک with) برگردانده می‌شود
+    
+        reservation = LimitService.reserve(user, UsageLog.UsageType.AI_CHAT)
+        with reservation:
+            ...  # exception -> refund
+    
+    در viewهای async: async with reservation / await reservation.arefund()
+    """
+    
+    def __init__(self, user, usage_type, date):
+        self.user = user
+        self.usage_type = usage_type
+        self.date = date
+        self.refunded = False
+    
+    def refund(self):
+        if not self.refunded:
+            self.refunded = True
+            LimitService.refund(self.user, self.usage_type, self.date)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        # Only real errors: GeneratorExit (client closed a stream) keeps the charge
+        if exc_type is not None and issubclass(exc_type, Exception):
+            self.refund()
+        return False
+    
+    async def arefund(self):
+        if not self.refunded:
+            # Lazy: IdeaFlow.async_views imports DRF, whose settings import the throttles (and this module)
+            from IdeaFlow.async_views import run_sync
+            await run_sync(self.refund)
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        # Same rule in async views: CancelledError (client disconnected) keeps the charge
+        if exc_type is not None and issubclass(exc_type, Exception):
+            await self.arefund()
+        return False
+
+
 # شیء singleton برای استفاده آسان
 limit_service = LimitService()
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import SubscriptionPlan
+from .services import LimitService
+
+
+@receiver(post_save, sender=SubscriptionPlan)
+@receiver(post_delete, sender=SubscriptionPlan)
+def invalidate_plan_cache(sender, instance, **kwargs):
+    """
+    Plan limits are served from the cache; drop it whenever a plan changes.
+    """
+    LimitService.invalidate_plans()
@@ -0,0 +1,212 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.test import TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from .models import SubscriptionPlan, UsageLog, UserSubscription
+from .services import LimitService, UsageReservation
+from .throttles import THROTTLE_CACHE, PlanRateThrottle, SlidingWindow, parse_rate
+
+CHAT = UsageLog.UsageType.AI_CHAT
+
+
+def make_user(name='member', **limits):
+    """کاربر با پلن اختصاصی (سقف‌ها مستقل از پلن‌های موجود در دیتابیس)"""
+    user = get_user_model().objects.create_user(username=name, email=f'{name}@example.com', password='pass1234')
+    plan = SubscriptionPlan.objects.create(name=name, slug=f'test-{name}', **limits)
+    UserSubscription.objects.create(user=user, plan=plan)
+    return user
+
+
+class UsageReservationTests(TestCase):
+    """رزرو سهمیه روزانه قبل از کار پرهزینه و برگرداندن آن در صورت خطا"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.limit = 3
+        self.user = make_user(ai_chats_per_day=self.limit)
+
+    def used(self):
+        log = UsageLog.objects.filter(user=self.user, usage_type=CHAT).first()
+        return log.count if log else 0
+
+    def test_reserve_up_to_the_limit(self):
+        reservations = [LimitService.reserve(self.user, CHAT) for _ in range(self.limit)]
+        self.assertTrue(all(isinstance(reservation, UsageReservation) for reservation in reservations))
+
+        self.assertIsNone(LimitService.reserve(self.user, CHAT))
+        self.assertEqual(self.used(), self.limit)
+        self.assertEqual(LimitService.get_today_usage(self.user, CHAT), self.limit)
+        self.assertFalse(LimitService.can_chat_with_ai(self.user))
+
+        # A refund frees one slot
+        reservations[0].refund()
+        self.assertIsNotNone(LimitService.reserve(self.user, CHAT))
+        self.assertEqual(self.used(), self.limit)
+
+    def test_limit_is_shared_between_requests(self):
+        # Each request has its own user object (and usage memo): the database enforces the limit
+        for _ in range(self.limit):
+            self.assertIsNotNone(LimitService.reserve(get_user_model().objects.get(pk=self.user.pk), CHAT))
+        self.assertIsNone(LimitService.reserve(get_user_model().objects.get(pk=self.user.pk), CHAT))
+
+    def test_exception_refunds(self):
+        reservation = LimitService.reserve(self.user, CHAT)
+        with self.assertRaises(ValueError):
+            with reservation:
+                raise ValueError('LLM call failed')
+
+        self.assertTrue(reservation.refunded)
+        self.assertEqual(self.used(), 0)
+        self.assertEqual(LimitService.get_today_usage(self.user, CHAT), 0)
+
+    def test_success_and_disconnect_keep_the_charge(self):
+        with LimitService.reserve(self.user, CHAT):
+            pass
+        # A client closing a stream is not a failure: the LLM call was made
+        with self.assertRaises(GeneratorExit):
+            with LimitService.reserve(self.user, CHAT):
+                raise GeneratorExit
+        self.assertEqual(self.used(), 2)
+
+    def test_refund_twice_counts_once(self):
+        first = LimitService.reserve(self.user, CHAT)
+        LimitService.reserve(self.user, CHAT)
+
+        first.refund()
+        first.refund()
+        with self.assertRaises(RuntimeError):
+            with first:
+                raise RuntimeError
+        self.assertEqual(self.used(), 1)
+
+    def test_async_context_manager(self):
+        async def fail(reservation):
+            async with reservation:
+                raise ValueError('LLM call failed')
+
+        async def succeed(reservation):
+            async with reservation:
+                pass
+            await reservation.arefund()
+            await reservation.arefund()
+
+        # run_sync hands the connection back after each phase, which would end the test transaction
+        with mock.patch('IdeaFlow.async_views.close_old_connections'):
+            reservation = LimitService.reserve(self.user, CHAT)
+            with self.assertRaises(ValueError):
+                async_to_sync(fail)(reservation)
+            self.assertTrue(reservation.refunded)
+            self.assertEqual(self.used(), 0)
+
+            kept = LimitService.reserve(self.user, CHAT)
+            LimitService.reserve(self.user, CHAT)
+            async_to_sync(succeed)(kept)
+        self.assertEqual(self.used(), 1)
+
+
+class SlidingWindowTests(TestCase):
+    """شمارنده پنجره لغزان روی کش throttle"""
+
+    def setUp(self):
+        self.cache = caches[THROTTLE_CACHE]
+        self.cache.clear()
+        self.window = SlidingWindow('throttle:test', limit=3, window=60)
+
+    def hits(self, now, count=1):
+        return [self.window.hit(self.cache, now) for _ in range(count)]
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('10/min'), (10, 60))
+        self.assertEqual(parse_rate('5/hour'), (5, 3600))
+        self.assertIsNone(parse_rate(None))
+
+    def test_full_window_waits_for_the_boundary(self):
+        self.assertEqual(self.hits(600, 3), [True] * 3)
+        self.assertEqual(self.hits(615), [False])
+        self.assertEqual(self.window.wait, 45)
+        # Denied hits are not counted
+        self.assertEqual(self.cache.get('throttle:test:10'), 3)
+
+    def test_previous_window_slides_out(self):
+        self.hits(600, 3)
+        # Right after the boundary the previous window still counts in full
+        self.assertEqual(self.hits(660), [False])
+        self.assertAlmostEqual(self.window.wait, 20)
+        # A third of it has slid out: room for one request
+        self.assertEqual(self.hits(680), [True])
+        self.assertEqual(self.hits(680), [False])
+        # Next window: the full bucket no longer counts, the one hit at 680 does
+        self.assertEqual(self.hits(720, 3), [True, True, False])
+
+    def test_undo(self):
+        self.hits(600, 3)
+        self.window.undo(self.cache)
+        self.assertEqual(self.cache.get('throttle:test:10'), 2)
+        self.assertEqual(self.hits(600), [True])
+
+
+class PlanRateThrottleTests(TestCase):
+    """بودجه دقیقه‌ای پلن برای هر گروه و سقف جداگانه هر اندپوینت"""
+
+    def setUp(self):
+        caches['default'].clear()
+        caches[THROTTLE_CACHE].clear()
+        self.factory = APIRequestFactory()
+
+    def request(self, user, method='post'):
+        request = Request(getattr(self.factory, method)('/'))
+        request.user = user
+        return request
+
+    def allowed(self, user, scope, count=1, method='post', now=600):
+        view = SimpleNamespace(throttle_scope=scope) if scope else SimpleNamespace()
+        results = []
+        with mock.patch('subscriptions.throttles.time') as clock:
+            clock.time.return_value = now
+            for _ in range(count):
+                throttle = PlanRateThrottle()
+                results.append(throttle.allow_request(self.request(user, method), view))
+        self.last = throttle
+        return results
+
+    def test_plan_budget_per_group(self):
+        basic = make_user('basic', ai_requests_per_minute=2)
+        pro = make_user('pro', ai_requests_per_minute=4)
+
+        # ai_chat and ai_score share the plan's AI budget
+        self.assertEqual(self.allowed(basic, 'ai_chat') + self.allowed(basic, 'ai_score', 2), [True, True, False])
+        self.assertEqual(self.last.wait(), 60)
+        self.assertEqual(self.allowed(pro, 'ai_chat', 5), [True] * 4 + [False])
+        # Other groups have their own budget
+        self.assertEqual(self.allowed(basic, 'comment'), [True])
+        # The next minute the previous one decays
+        self.assertEqual(self.allowed(basic, 'ai_chat', now=690), [True])
+
+    def test_endpoint_cap_undoes_the_group_hit(self):
+        user = make_user('investor', write_requests_per_minute=100)
+        limit = 2
+        with mock.patch.dict('rest_framework.settings.api_settings.DEFAULT_THROTTLE_RATES', {'invest': '2/hour'}):
+            self.assertEqual(self.allowed(user, 'invest', limit + 1), [True] * limit + [False])
+
+        self.assertEqual(self.last.denied.key, f'throttle:invest:user:{user.pk}')
+        # The denied request does not use up the plan's write budget
+        self.assertEqual(caches[THROTTLE_CACHE].get(f'throttle:write:user:{user.pk}:10'), limit)
+
+    def test_anonymous_uses_default_limits(self):
+        limit = LimitService.DEFAULT_LIMITS['ai_requests_per_minute']
+        self.assertEqual(self.allowed(AnonymousUser(), 'ai_chat', limit + 1), [True] * limit + [False])
+
+    def test_exempt_requests(self):
+        user = make_user('reader', ai_requests_per_minute=1)
+        self.allowed(user, 'ai_chat', 2)
+
+        # Reads and views without a throttle_scope are never throttled
+        self.assertEqual(self.allowed(user, 'ai_chat', 3, method='get'), [True] * 3)
+        self.assertEqual(self.allowed(user, None, 3), [True] * 3)
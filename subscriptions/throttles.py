@@ -0,0 +1,148 @@
+"""
+Subscriptions Throttles - محدودیت نرخ درخواست‌ها بر اساس پلن و اندپوینت
+شمارنده‌ها در کش 'throttle' (Redis در production) هستند تا بین همه workerها و سرورها مشترک باشند
+"""
+
+import time
+
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .services import LimitService
+
+
+THROTTLE_CACHE = 'throttle'
+
+# گروه هر scope و فیلد بودجه دقیقه‌ای آن گروه در SubscriptionPlan
+SCOPE_GROUPS = {
+    'ai_score': 'ai',
+    'ai_chat': 'ai',
+    'star': 'write',
+    'comment': 'write',
+    'invest': 'write',
+}
+PLAN_RATE_FIELDS = {
+    'ai': 'ai_requests_per_minute',
+    'write': 'write_requests_per_minute',
+}
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'10/min' -> (10, 60)؛ None یعنی بدون محدودیت"""
+    if rate is None:
+        return None
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+class SlidingWindow:
+    """
+    شمارنده پنجره لغزان (sliding window counter) روی کش مشترک
+
+    تخمین تعداد درخواست‌های window ثانیه اخیر = شمارنده پنجره جاری + سهم زمانی پنجره قبلی.
+    هر درخواست اول با incr اتمیک ثبت می‌شود و اگر از سقف رد شد برگردانده می‌شود،
+    پس درخواست‌های همزمان نمی‌توانند با هم از یک بررسی عبور کنند.
+    """
+
+    def __init__(self, key, limit, window):
+        self.key = key
+        self.limit = limit
+        self.window = window
+        self.wait = None
+
+    def _bucket(self, index):
+        return f'{self.key}:{index}'
+
+    def hit(self, cache, now):
+        """ثبت یک درخواست؛ False اگر سقف پر است (self.wait: ثانیه تا آزاد شدن)"""
+        index, offset = divmod(now, self.window)
+        index = int(index)
+        elapsed = offset / self.window
+        bucket = self._bucket(index)
+
+        # Two windows of TTL: the bucket is still read as "previous" during the next window
+        cache.add(bucket, 0, self.window * 2)
+        try:
+            current = cache.incr(bucket)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.set(bucket, 1, self.window * 2)
+            current = 1
+        previous = cache.get(self._bucket(index - 1), 0)
+
+        if previous * (1 - elapsed) + current <= self.limit:
+            self.index = index
+            return True
+
+        cache.decr(bucket)
+        if current > self.limit or not previous:
+            # Current window alone is full: wait for it to become the (decaying) previous one
+            self.wait = (1 - elapsed) * self.window
+        else:
+            # Wait until enough of the previous window has slid out
+            needed = 1 - (self.limit - current) / previous
+            self.wait = max(needed - elapsed, 0) * self.window
+        return False
+
+    def undo(self, cache):
+        """برگرداندن یک hit موفق (وقتی محدودیت دیگری همان درخواست را رد کرد)"""
+        try:
+            cache.decr(self._bucket(self.index))
+        except ValueError:
+            pass
+
+
+class PlanRateThrottle(BaseThrottle):
+    """
+    محدودیت نرخ برای viewهایی که throttle_scope دارند (فقط متدهای نوشتنی)
+
+    دو سقف با هم بررسی می‌شوند:
+    - بودجه دقیقه‌ای پلن کاربر برای گروه scope (مثلاً همه درخواست‌های AI با هم)
+    - سقف خود اندپوینت از REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'][scope] (برای همه پلن‌ها)
+    """
+
+    def __init__(self):
+        self.cache = caches[THROTTLE_CACHE]
+        self.denied = None
+
+    def get_windows(self, request, scope):
+        if request.user and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+            limits = LimitService.get_limits(request.user)
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+            limits = LimitService.DEFAULT_LIMITS
+
+        windows = []
+        group = SCOPE_GROUPS.get(scope)
+        if group:
+            windows.append(SlidingWindow(
+                f'throttle:{group}:{ident}', limits[PLAN_RATE_FIELDS[group]], 60
+            ))
+        rate = parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(scope))
+        if rate:
+            windows.append(SlidingWindow(f'throttle:{scope}:{ident}', *rate))
+        return windows
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope is None or request.method in SAFE_METHODS:
+            return True
+
+        now = time.time()
+        passed = []
+        for window in self.get_windows(request, scope):
+            if not window.hit(self.cache, now):
+                for done in passed:
+                    done.undo(self.cache)
+                self.denied = window
+                return False
+            passed.append(window)
+        return True
+
+    def wait(self):
+        return self.denied.wait if self.denied else None
@@ -1,3 +1,4 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
 from .models import SupportTicket, TicketMessage
 
@@ -14,7 +15,7 @@ class TicketMessageSerializer(serializers.ModelSerializer):
     def get_is_me(self, obj):
         request = self.context.get('request')
         if request:
-            return obj.sender == request.user
+            return obj.sender_id == request.user.id
         return False
 
 class SupportTicketSerializer(serializers.ModelSerializer):
@@ -26,8 +27,20 @@ class SupportTicketSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'user_name', 'subject', 'status', 'priority', 'created_at', 'updated_at', 'last_message']
         read_only_fields = ['id', 'user', 'status', 'created_at', 'updated_at']
         
+    @staticmethod
+    def setup_eager_loading(queryset, request=None):
+        # Only the newest message of each ticket is loaded (one query for the whole page)
+        return queryset.select_related('user').prefetch_related(Prefetch(
+            'messages',
+            queryset=TicketMessage.objects.select_related('sender').order_by('-created_at', '-id')[:1],
+            to_attr='latest_messages'
+        ))
+        
     def get_last_message(self, obj):
-        last = obj.messages.last()
+        if hasattr(obj, 'latest_messages'):
+            last = obj.latest_messages[0] if obj.latest_messages else None
+        else:
+            last = obj.messages.last()
         if last:
             return TicketMessageSerializer(last, context=self.context).data
         return None
@@ -37,3 +50,9 @@ class SupportTicketDetailSerializer(SupportTicketSerializer):
     
     class Meta(SupportTicketSerializer.Meta):
         fields = SupportTicketSerializer.Meta.fields + ['messages']
+    
+    @staticmethod
+    def setup_eager_loading(queryset, request=None):
+        return SupportTicketSerializer.setup_eager_loading(queryset, request).prefetch_related(
+            Prefetch('messages', queryset=TicketMessage.objects.select_related('sender'))
+        )
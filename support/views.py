@@ -12,7 +12,10 @@ class SupportTicketViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return SupportTicket.objects.filter(user=self.request.user).order_by('-updated_at')
+        return self.get_serializer_class().setup_eager_loading(
+            SupportTicket.objects.filter(user=self.request.user).order_by('-updated_at'),
+            self.request
+        )
     
     def get_serializer_class(self):
         if self.action == 'retrieve':